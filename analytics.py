@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+跨运行的统计分析与列式导出 - 基于 NumPy
+
+1. 把 stats.json 中的每次运行转换为按列存放的数组: 运行表每次运行一行，
+   URL表每次运行的每个URL一行；转换结果按 stats.json 的修改时间与大小缓存为 .npz，
+   统计文件未变化时再次分析直接加载数组
+2. 按配置、按URL、按天聚合，计算吞吐的分位数与趋势 (最小二乘斜率)，全部为数组运算，
+   不逐条遍历运行记录
+3. 运行表、URL表与各次运行的速度序列可导出为 CSV、Parquet 或 Arrow (后两者需要 pyarrow)
+"""
+
+import os
+import csv
+import json
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from timeseries import HEADER as SERIES_HEADER, SERIES_MAGIC
+
+CACHE_VERSION = 1
+INT_COLUMNS = ("total_bytes", "payload_bytes", "wire_bytes", "upload_bytes", "upload_count", "download_count",
+               "elapsed_seconds", "threads")
+TEXT_COLUMNS = ("config_name", "mode", "meter_basis", "series")
+TIME_COLUMNS = ("start_time", "end_time")
+PERCENTILES = (5, 50, 95)
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+EXPORT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+SECONDS_PER_DAY = 86400
+MIN_TREND_DAYS = 1.0  # 运行跨度不足这么多天时不计算趋势，几分钟内的几次运行算出的斜率没有意义
+
+
+def load_runs(stats_file, cache_file=None):
+    """读取 (运行表, URL表)，均为 {列名: 数组}，运行按开始时间排序"""
+    stat = os.stat(stats_file)
+    key = np.array([CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with np.load(cache_file, allow_pickle=False) as cached:
+                if np.array_equal(cached["key"], key):
+                    return _split_cache(cached)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(stats_file, "r") as f:
+        runs, urls = _to_columns(json.load(f))
+    if cache_file:
+        _write_cache(cache_file, key, runs, urls)
+    return runs, urls
+
+
+def _to_columns(stats):
+    ids = list(stats)
+    records = [stats[run_id] for run_id in ids]
+    count = len(records)
+    runs = {"run_id": np.array(ids, dtype=str)}
+    for key in INT_COLUMNS:
+        runs[key] = np.fromiter((record.get(key) or 0 for record in records), dtype=np.int64, count=count)
+    runs["limit_speed"] = np.fromiter((record.get("limit_speed") or 0 for record in records), dtype=np.float64,
+                                      count=count)
+    for key in TEXT_COLUMNS:
+        runs[key] = np.array([record.get(key) or "" for record in records], dtype=str)
+    for key in TIME_COLUMNS:
+        # 统计文件中的时间是本地时间的文本，直接按本地日期解析
+        runs[key] = np.array([(record.get(key) or "NaT").replace(" ", "T") for record in records],
+                             dtype="datetime64[s]")
+
+    order = np.argsort(runs["start_time"], kind="stable")
+    runs = {key: values[order] for key, values in runs.items()}
+    records = [records[i] for i in order]
+
+    run_index, url_names, counts, payloads, wires = [], [], [], [], []
+    for index, record in enumerate(records):
+        usage = record.get("url_usage") or {}
+        url_bytes = record.get("url_bytes") or {}
+        for url in usage.keys() | url_bytes.keys():
+            payload, wire = url_bytes.get(url) or (0, 0)
+            run_index.append(index)
+            url_names.append(url)
+            counts.append(usage.get(url, 0))
+            payloads.append(payload)
+            wires.append(wire)
+    urls = {
+        "run_index": np.array(run_index, dtype=np.int64),
+        "url": np.array(url_names, dtype=str),
+        "count": np.array(counts, dtype=np.int64),
+        "payload_bytes": np.array(payloads, dtype=np.int64),
+        "wire_bytes": np.array(wires, dtype=np.int64)
+    }
+    return runs, urls
+
+
+def _write_cache(cache_file, key, runs, urls):
+    # 先写临时文件再替换，并发的分析不会读到写了一半的缓存
+    directory = os.path.dirname(cache_file) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, key=key, **{f"run.{name}": values for name, values in runs.items()},
+                     **{f"url.{name}": values for name, values in urls.items()})
+        os.replace(temp_path, cache_file)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def _split_cache(cached):
+    runs, urls = {}, {}
+    for name in cached.files:
+        table, _, column = name.partition(".")
+        if table == "run":
+            runs[column] = cached[name]
+        elif table == "url":
+            urls[column] = cached[name]
+    return runs, urls
+
+
+def select_runs(runs, urls, since=None):
+    """只保留 since (YYYY-MM-DD) 当天及之后开始的运行，URL表随之筛选并重新编号"""
+    if since is None:
+        return runs, urls
+    try:
+        mask = runs["start_time"] >= np.datetime64(since, "s")
+    except ValueError:
+        raise ValueError(f"无效的日期 {since}，应为 YYYY-MM-DD") from None
+    new_index = np.cumsum(mask) - 1
+    url_mask = mask[urls["run_index"]]
+    runs = {key: values[mask] for key, values in runs.items()}
+    urls = {key: values[url_mask] for key, values in urls.items()}
+    urls["run_index"] = new_index[urls["run_index"]]
+    return runs, urls
+
+
+def throughput(runs):
+    """每次运行的平均吞吐，单位字节/秒，运行时长为0时为NaN"""
+    elapsed = runs["elapsed_seconds"].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(elapsed > 0, runs["total_bytes"] / elapsed, np.nan)
+
+
+def _group_slopes(groups, x, y, size, min_span=0.0):
+    """每组 y 对 x 的最小二乘斜率，点数不足或 x 的跨度小于 min_span 时为NaN"""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    groups, x, y = groups[valid], x[valid], y[valid]
+    low = np.full(size, np.inf)
+    high = np.full(size, -np.inf)
+    np.minimum.at(low, groups, x)
+    np.maximum.at(high, groups, x)
+    n = np.bincount(groups, minlength=size).astype(np.float64)
+    sx = np.bincount(groups, x, size)
+    sy = np.bincount(groups, y, size)
+    sxx = np.bincount(groups, x * x, size)
+    sxy = np.bincount(groups, x * y, size)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where((n >= 2) & (denominator > 0) & (high - low >= min_span),
+                        (n * sxy - sx * sy) / denominator, np.nan)
+
+
+def _group_percentiles(groups, values, size):
+    """每组的 PERCENTILES 分位数: 按 (组, 值) 排序后在各组的区间内取分位"""
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    bounds = np.searchsorted(groups, np.arange(size + 1))
+    result = np.full((size, len(PERCENTILES)), np.nan)
+    for group in range(size):
+        segment = values[bounds[group]:bounds[group + 1]]
+        if len(segment):
+            result[group] = np.percentile(segment, PERCENTILES)
+    return result
+
+
+def analyze(runs, urls, url_limit=10, day_limit=14):
+    """跨运行的汇总: 总体、按配置、按URL与按天"""
+    speeds = throughput(runs)
+    starts = runs["start_time"]
+    known_starts = starts[~np.isnat(starts)]
+    # 趋势按距第一次运行的天数计算，开始时间缺失的运行不参与
+    if len(known_starts):
+        days_since = (starts - known_starts.min()).astype(np.float64) / SECONDS_PER_DAY
+        days_since[np.isnat(starts)] = np.nan
+        speeds_for_trend = np.where(np.isnat(starts), np.nan, speeds)
+    else:
+        days_since = speeds_for_trend = np.full(len(speeds), np.nan)
+
+    configs, config_index = np.unique(runs["config_name"], return_inverse=True)
+    config_count = np.bincount(config_index, minlength=len(configs))
+    config_bytes = np.bincount(config_index, runs["total_bytes"], len(configs))
+    config_percentiles = _group_percentiles(config_index, speeds, len(configs))
+    config_slopes = _group_slopes(config_index, days_since, speeds_for_trend, len(configs), MIN_TREND_DAYS)
+    by_config = [{
+        "config": str(name),
+        "runs": int(config_count[i]),
+        "total_bytes": float(config_bytes[i]),
+        "throughput": dict(zip(PERCENTILES, config_percentiles[i].tolist())),
+        "trend_per_day": float(config_slopes[i])
+    } for i, name in enumerate(configs)]
+
+    url_names, url_index = np.unique(urls["url"], return_inverse=True)
+    url_count = np.bincount(url_index, urls["count"], len(url_names))
+    url_payload = np.bincount(url_index, urls["payload_bytes"], len(url_names))
+    url_wire = np.bincount(url_index, urls["wire_bytes"], len(url_names))
+    top = np.argsort(-url_count, kind="stable")[:url_limit]
+    by_url = [{
+        "url": str(url_names[i]),
+        "count": int(url_count[i]),
+        "payload_bytes": float(url_payload[i]),
+        "wire_bytes": float(url_wire[i])
+    } for i in top]
+
+    days, day_index = np.unique(runs["start_time"].astype("datetime64[D]"), return_inverse=True)
+    day_bytes = np.bincount(day_index, runs["total_bytes"], len(days))
+    day_runs = np.bincount(day_index, minlength=len(days))
+    known = ~np.isnat(days)
+    day_offsets = (days[known] - days[known].min()).astype(np.float64) if known.any() else np.zeros(0)
+    daily_slope = _group_slopes(np.zeros(len(day_offsets), dtype=np.int64), day_offsets, day_bytes[known], 1,
+                                MIN_TREND_DAYS)[0]
+    daily = [{"date": str(day), "runs": int(day_runs[i]), "total_bytes": float(day_bytes[i])}
+             for i, day in enumerate(days) if known[i]][-day_limit:]
+
+    finite = speeds[~np.isnan(speeds)]
+    return {
+        "runs": int(len(speeds)),
+        "first": str(known_starts.min()) if len(known_starts) else None,
+        "last": str(known_starts.max()) if len(known_starts) else None,
+        "total_bytes": float(runs["total_bytes"].sum()),
+        "download_count": int(runs["download_count"].sum()),
+        "throughput": dict(zip(PERCENTILES, np.percentile(finite, PERCENTILES).tolist()))
+        if len(finite) else None,
+        "by_config": by_config,
+        "by_url": by_url,
+        "urls": int(len(url_names)),
+        "daily": daily,
+        "daily_trend": float(daily_slope)
+    }
+
+
+def load_series_columns(runs, series_dir, resolution=1):
+    """各次运行的速度序列，按 resolution 秒取平均后拼接为一张长表"""
+    resolution = max(1, int(resolution))
+    run_ids, offsets, timestamps, speeds = [], [], [], []
+    for run_id, name in zip(runs["run_id"], runs["series"]):
+        if not name:
+            continue
+        path = os.path.join(series_dir, os.path.basename(str(name)))
+        try:
+            with open(path, "rb") as f:
+                magic, start_time = SERIES_HEADER.unpack(f.read(SERIES_HEADER.size))
+                raw = np.fromfile(f, dtype="<f8")
+        except (OSError, ValueError):
+            continue
+        if magic != SERIES_MAGIC or not len(raw):
+            continue
+        # 不足一段的末尾单独取平均
+        full = len(raw) // resolution * resolution
+        values = raw[:full].reshape(-1, resolution).mean(axis=1)
+        if full < len(raw):
+            values = np.append(values, raw[full:].mean())
+        offset = np.arange(len(values), dtype=np.int64) * resolution
+        run_ids.append(np.full(len(values), run_id))
+        offsets.append(offset)
+        # 与运行表的时间列一致，使用本地时间
+        local_start = np.datetime64(datetime.fromtimestamp(int(start_time)).replace(microsecond=0), "s")
+        timestamps.append(local_start + offset)
+        speeds.append(values)
+    if not run_ids:
+        return {"run_id": np.array([], dtype=str), "offset_seconds": np.array([], dtype=np.int64),
+                "timestamp": np.array([], dtype="datetime64[s]"), "speed": np.array([], dtype=np.float64)}
+    return {
+        "run_id": np.concatenate(run_ids),
+        "offset_seconds": np.concatenate(offsets),
+        "timestamp": np.concatenate(timestamps),
+        "speed": np.concatenate(speeds)
+    }
+
+
+def export(runs, urls, series, directory, fmt="csv"):
+    """把三张表写入目录 (runs、urls、series)，返回写入的文件路径列表"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    tables = {
+        "runs": dict(runs, throughput=throughput(runs)),
+        "urls": {
+            "run_id": runs["run_id"][urls["run_index"]],
+            "url": urls["url"],
+            "count": urls["count"],
+            "payload_bytes": urls["payload_bytes"],
+            "wire_bytes": urls["wire_bytes"]
+        },
+        "series": series
+    }
+    writer = _write_csv if fmt == "csv" else _arrow_writer(fmt)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, columns in tables.items():
+        path = os.path.join(directory, name + EXPORT_EXTENSIONS[fmt])
+        writer(path, columns)
+        paths.append(path)
+    return paths
+
+
+def _write_csv(path, columns):
+    names = list(columns)
+    # 时间列写为ISO格式的文本，其余列按原值写出
+    values = [columns[name].astype(str) if columns[name].dtype.kind == "M" else columns[name].tolist()
+              for name in names]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        out = csv.writer(f)
+        out.writerow(names)
+        out.writerows(zip(*values))
+
+
+def _arrow_writer(fmt):
+    import pyarrow as pa
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        write = pq.write_table
+    else:
+        import pyarrow.feather as feather
+
+        def write(table, path):
+            feather.write_feather(table, path)
+
+    def writer(path, columns):
+        write(pa.table({name: pa.array(values) for name, values in columns.items()}), path)
+
+    return writer
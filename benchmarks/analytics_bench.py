@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+跨运行分析与列式导出的耗时基准
+
+生成一年按小时运行的统计数据 (每次运行若干URL，部分运行带速度序列)，测量
+首次读取并转换为列、命中缓存后读取、分析与导出各格式的耗时。
+命中缓存后的读取与分析应在几十毫秒以内，与逐条遍历 stats.json 的 --show-stats 对比。
+
+使用示例:
+    python benchmarks/analytics_bench.py
+    python benchmarks/analytics_bench.py --days 730 --runs-per-day 24 --urls 20
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+from timeseries import SpeedSeries  # noqa: E402
+
+CONFIGS = ["默认", "夜间", "峰值", "镜像"]
+SERIES_SECONDS = 3600
+
+
+def build_stats(days, runs_per_day, url_count, series_every, series_dir):
+    """合成 stats.json 的内容，每 series_every 次运行写一个速度序列文件"""
+    urls = [f"https://mirror{i}.example.com/file.bin" for i in range(url_count)]
+    start = datetime(2025, 1, 1)
+    stats = {}
+    for index in range(int(days * runs_per_day)):
+        began = start + timedelta(hours=24 / runs_per_day * index)
+        elapsed = random.randint(600, 3600)
+        total = int(elapsed * random.uniform(50, 150) * 1024 * 1024)
+        run_id = began.strftime("%Y%m%d%H%M%S")
+        chosen = random.sample(urls, min(url_count, 5))
+        series_file = ""
+        if series_every and index % series_every == 0:
+            series = SpeedSeries(began.timestamp())
+            for _ in range(SERIES_SECONDS):
+                series.append(random.uniform(50, 150) * 1024 * 1024)
+            series_file = run_id + ".series"
+            series.save(os.path.join(series_dir, series_file))
+        stats[run_id] = {
+            "config_name": random.choice(CONFIGS),
+            "start_time": began.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": (began + timedelta(seconds=elapsed)).strftime("%Y-%m-%d %H:%M:%S"),
+            "total_bytes": total,
+            "payload_bytes": total,
+            "wire_bytes": total,
+            "download_count": random.randint(10, 500),
+            "elapsed_seconds": elapsed,
+            "threads": 8,
+            "url_usage": {url: random.randint(1, 100) for url in chosen},
+            "url_bytes": {url: [total // len(chosen)] * 2 for url in chosen},
+            "series": series_file
+        }
+    return stats
+
+
+def timed(func, *args):
+    began = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - began) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨运行分析与列式导出的耗时基准")
+    parser.add_argument("--days", type=float, default=365, help="模拟的天数 (默认: 365)")
+    parser.add_argument("--runs-per-day", type=int, default=24, help="每天的运行次数 (默认: 24)")
+    parser.add_argument("--urls", type=int, default=20, help="URL池大小，每次运行使用其中5个 (默认: 20)")
+    parser.add_argument("--series-every", type=int, default=100,
+                        help="每隔多少次运行带一个1小时的速度序列，0为不带 (默认: 100)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stats_file = os.path.join(workdir, "stats.json")
+        cache_file = os.path.join(workdir, "stats_columns.npz")
+        series_dir = os.path.join(workdir, "series")
+        stats = build_stats(args.days, args.runs_per_day, args.urls, args.series_every, series_dir)
+        with open(stats_file, "w") as f:
+            json.dump(stats, f)
+        print(f"运行次数: {len(stats)} | stats.json: {os.path.getsize(stats_file) / 1024 / 1024:.1f} MB")
+
+        def naive():
+            # 对照: 逐条遍历运行记录按配置求和
+            with open(stats_file) as f:
+                data = json.load(f)
+            totals = {}
+            for record in data.values():
+                totals[record["config_name"]] = totals.get(record["config_name"], 0) + record["total_bytes"]
+            return totals
+
+        _, naive_ms = timed(naive)
+        (runs, urls), cold_ms = timed(analytics.load_runs, stats_file, cache_file)
+        _, warm_ms = timed(analytics.load_runs, stats_file, cache_file)
+        report, analyze_ms = timed(analytics.analyze, runs, urls)
+        series, series_ms = timed(analytics.load_series_columns, runs, series_dir, 10)
+        print(f"{'步骤':<24}{'耗时(ms)':>10}")
+        print(f"{'逐条读取并按配置求和':<24}{naive_ms:>10.1f}")
+        print(f"{'首次读取并转换为列':<24}{cold_ms:>10.1f}")
+        print(f"{'命中缓存读取':<24}{warm_ms:>10.1f}")
+        print(f"{'分析':<24}{analyze_ms:>10.1f}")
+        print(f"{'读取速度序列 (10秒精度)':<24}{series_ms:>10.1f}")
+
+        for fmt in analytics.EXPORT_FORMATS:
+            try:
+                _, export_ms = timed(analytics.export, runs, urls, series, os.path.join(workdir, fmt), fmt)
+            except ImportError:
+                print(f"{'导出 ' + fmt:<24}{'需要 pyarrow':>10}")
+                continue
+            size = sum(os.path.getsize(os.path.join(workdir, fmt, name)) for name in os.listdir(os.path.join(workdir, fmt)))
+            print(f"{'导出 ' + fmt:<24}{export_ms:>10.1f}  {size / 1024 / 1024:.1f} MB")
+
+        print(f"配置数: {len(report['by_config'])} | URL数: {report['urls']} | "
+              f"速度点数: {len(series['speed'])}")
+
+
+if __name__ == "__main__":
+    main()
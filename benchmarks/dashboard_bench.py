@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+面板数量对下载吞吐的影响基准
+
+在本机启动一个返回固定内容的HTTP源站与Web UI，主面板任务运行期间分别连接
+不同数量的SSE面板和轮询方 (带 If-None-Match)，比较下载吞吐量，
+并统计每轮构建的快照数，确认它只取决于周期而与面板数量无关。
+面板运行在子进程中，不与下载线程争用本进程的GIL；在单核机器上仍会争用CPU。
+
+使用示例:
+    python benchmarks/dashboard_bench.py
+    python benchmarks/dashboard_bench.py --clients 0 10 100 --seconds 8 --threads 4
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import traffic_consumer  # noqa: E402
+import web_ui  # noqa: E402
+from traffic_consumer import TrafficConsumer  # noqa: E402
+
+BODY_SIZE = 8 * 1024 * 1024
+POLL_INTERVAL = 1.0  # 轮询方的请求间隔，单位秒，与快照周期相同
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sse_client(port, stop):
+    """持续读取SSE推送的快照"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/api/status/stream")
+    response = conn.getresponse()
+    while not stop.is_set() and response.fp.readline():
+        pass
+    conn.close()
+
+
+def poll_client(port, stop, results):
+    """按间隔轮询，内容未变化时服务端返回304"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    etag = None
+    while not stop.is_set():
+        conn.request("GET", "/api/status", headers={"If-None-Match": etag} if etag else {})
+        response = conn.getresponse()
+        response.read()
+        etag = response.getheader("ETag") or etag
+        results[response.status] = results.get(response.status, 0) + 1
+        stop.wait(POLL_INTERVAL)
+    conn.close()
+
+
+def run_clients(port, clients, stop, results):
+    """子进程: 一半为SSE面板，一半为轮询方，结束时汇报轮询结果"""
+    thread_stop = threading.Event()
+    poll_results = {}
+    for i in range(clients):
+        target, args = ((sse_client, (port, thread_stop)) if i % 2 == 0
+                        else (poll_client, (port, thread_stop, poll_results)))
+        threading.Thread(target=target, args=args, daemon=True).start()
+    stop.wait()
+    thread_stop.set()
+    results.put(poll_results)
+
+
+def run(url, port, clients, seconds, threads):
+    """返回 (吞吐量MB/s, 本轮构建的快照数, 轮询结果)"""
+    consumer = TrafficConsumer(urls=[url], threads=threads, duration=seconds, prewarm=False,
+                               logger=lambda message, color=None: None)
+    web_ui.consumer_instance = consumer
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_clients, args=(port, clients, stop, results), daemon=True)
+    process.start()
+
+    first_version = web_ui.publisher.latest().version
+    started = time.perf_counter()
+    consumer.start()
+    elapsed = time.perf_counter() - started
+    builds = web_ui.publisher.latest().version - first_version
+    stop.set()
+    poll_results = results.get()
+    process.join()
+    return consumer.total_bytes / elapsed / (1024 * 1024), builds, poll_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="面板数量对下载吞吐的影响基准")
+    parser.add_argument("--clients", type=int, nargs="+", default=[0, 10, 50],
+                        help="同时连接的面板数，一半为SSE一半为轮询 (默认: 0 10 50)")
+    parser.add_argument("--seconds", type=int, default=5, help="每轮的运行时长，单位秒 (默认: 5)")
+    parser.add_argument("--threads", type=int, default=4, help="下载线程数 (默认: 4)")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    origin = OriginServer(("127.0.0.1", 0), OriginHandler)
+    origin.body = os.urandom(BODY_SIZE)
+    start_server(origin)
+    dashboard = start_server(make_server("127.0.0.1", 0, web_ui.app, threaded=True))
+    web_ui.publisher.start()
+    url = f"http://127.0.0.1:{origin.server_address[1]}/"
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as workdir:
+        traffic_consumer.STATS_FILE = os.path.join(workdir, "stats.json")
+        traffic_consumer.SERIES_DIR = os.path.join(workdir, "series")
+        print(f"{'面板数':>8}{'吞吐(MB/s)':>14}{'相对':>8}{'构建快照':>10}{'轮询 200/304':>16}")
+        for clients in args.clients:
+            speed, builds, polls = run(url, dashboard.server_port, clients, args.seconds, args.threads)
+            baseline = baseline or speed
+            print(f"{clients:>8}{speed:>14.1f}{speed / baseline:>8.0%}{builds:>10}"
+                  f"{polls.get(200, 0):>9}/{polls.get(304, 0)}")
+
+    web_ui.publisher.stop()
+    dashboard.shutdown()
+    origin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分布式模式的本机回环检查
+
+在本机启动一个HTTP源站和若干个 agent 进程 (只监听 127.0.0.1)，由控制器下发任务，检查:
+1. 全局流量限制按各agent拆分后，汇总的流量达到限制，超出量不超过每个agent每个线程一个分块
+2. 运行中结束一个agent后，其剩余预算分给其他agent，汇总的流量仍达到限制
+3. agent 忽略控制器下发的未知配置项，不因此拒绝任务
+4. 没有令牌时 agent 拒绝监听非本机地址
+任一检查不通过时以非零状态码退出。agent 进程的主目录指向临时目录，不影响用户的统计与配置。
+
+使用示例:
+    python benchmarks/distributed_bench.py
+    python benchmarks/distributed_bench.py --agents 3 --threads 4 --limit 400 --speed 100
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import traffic_consumer  # noqa: E402
+from traffic_consumer import AGENT_TOKEN_ENV, DEFAULT_CHUNK_SIZE  # noqa: E402
+from distributed import DistributedConsumer, TrafficAgent  # noqa: E402
+
+OBJECT_SIZE = 4 * 1024 * 1024
+AGENT_STARTUP_TIMEOUT = 15.0
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """所有路径都返回同一份内容"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # agent 达到预算后会断开进行中的下载，不输出连接重置的错误
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_agents(count, home):
+    """启动 agent 进程，返回 [(进程, 地址)]"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    env.pop(AGENT_TOKEN_ENV, None)
+    agents = []
+    for _ in range(count):
+        port = free_port()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "traffic_consumer.py"), "--agent", str(port)],
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        agents.append((process, f"http://127.0.0.1:{port}"))
+
+    deadline = time.time() + AGENT_STARTUP_TIMEOUT
+    for process, url in agents:
+        while True:
+            try:
+                requests.get(url + "/status", timeout=1.0)
+                break
+            except requests.ConnectionError:
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"agent {url} 未能启动")
+                time.sleep(0.2)
+    return agents
+
+
+def run(origin, agent_urls, threads, limit, speed, kill=None):
+    """以控制器运行一次有流量限制的任务；kill 为 (进程, 秒数) 时在运行中结束该agent"""
+    consumer = DistributedConsumer(urls=[origin], threads=threads, traffic_limit=limit, limit_speed=speed,
+                                   agents=agent_urls, agent_token="", prewarm=False, checkpoint=False,
+                                   logger=lambda message, color=None: None)
+    if kill:
+        process, delay = kill
+        threading.Timer(delay, process.kill).start()
+    started = time.perf_counter()
+    consumer.start()
+    return consumer, time.perf_counter() - started
+
+
+def check_total(label, consumer, limit, slack):
+    target = limit * 1024 * 1024
+    total = consumer.total_bytes
+    states = ", ".join(f"{agent['state']} {agent['total_bytes'] / (1024 * 1024):.0f}MB"
+                       for agent in consumer.agent_summary())
+    ok = target <= total <= target + slack
+    print(f"{label}: 汇总 {total / (1024 * 1024):.1f}MB / 限制 {limit}MB ({states}) {'通过' if ok else '不通过'}")
+    return ok
+
+
+def check_unknown_settings(agent_url, origin):
+    """下发未知配置项时agent仍能开始任务"""
+    response = requests.post(agent_url + "/run", json={
+        "settings": {"urls": [origin], "threads": 1, "no_such_setting": True, "trace_file": None},
+        "budget": {"count": 1}, "lease": 5
+    }, timeout=5.0)
+    ok = response.status_code == 200
+    deadline = time.time() + 10.0
+    while ok and time.time() < deadline and requests.get(agent_url + "/status", timeout=2.0).json().get("running"):
+        time.sleep(0.2)
+    requests.post(agent_url + "/stop", json={}, timeout=5.0)
+    print(f"未知配置项: HTTP {response.status_code} {'通过' if ok else '不通过'}")
+    return ok
+
+
+def check_public_bind():
+    """没有令牌时拒绝监听非本机地址"""
+    try:
+        TrafficAgent("0.0.0.0", free_port(), token="", logger=lambda message, color=None: None).serve_forever()
+        ok = False
+    except ValueError:
+        ok = True
+    print(f"无令牌监听 0.0.0.0: {'已拒绝' if ok else '未拒绝'} {'通过' if ok else '不通过'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式模式的本机回环检查")
+    parser.add_argument("--agents", type=int, default=2, help="agent 进程数，至少2个 (默认: 2)")
+    parser.add_argument("--threads", type=int, default=2, help="每个agent的下载线程数 (默认: 2)")
+    parser.add_argument("--limit", type=int, default=200, help="全局流量限制，单位MB (默认: 200)")
+    parser.add_argument("--speed", type=float, default=50, help="全局限速，单位MB/s，使运行持续数秒 (默认: 50)")
+    args = parser.parse_args()
+    args.agents = max(2, args.agents)
+
+    origin_server = OriginServer(("127.0.0.1", 0), OriginHandler)
+    origin_server.body = os.urandom(OBJECT_SIZE)
+    threading.Thread(target=origin_server.serve_forever, daemon=True).start()
+    origin = f"http://127.0.0.1:{origin_server.server_address[1]}/obj"
+    # 每个agent最多多消耗每个线程一个分块
+    slack = args.agents * args.threads * DEFAULT_CHUNK_SIZE
+
+    failures = 0
+    agents = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # 控制器的统计文件与速度序列写到临时目录，不影响用户的历史统计
+        traffic_consumer.STATS_FILE = os.path.join(workdir, "stats.json")
+        traffic_consumer.SERIES_DIR = os.path.join(workdir, "series")
+        try:
+            agents = start_agents(args.agents, workdir)
+            urls = [url for _, url in agents]
+
+            consumer, elapsed = run(origin, urls, args.threads, args.limit, args.speed)
+            failures += not check_total(f"{len(urls)} 个agent ({elapsed:.1f}秒)", consumer, args.limit, slack)
+
+            # 运行到约三分之一时结束最后一个agent
+            delay = args.limit / args.speed / 3
+            consumer, elapsed = run(origin, urls, args.threads, args.limit, args.speed, kill=(agents[-1][0], delay))
+            dropped = consumer.agent_summary()[-1]["state"] == "掉线"
+            failures += not dropped
+            failures += not check_total(f"{delay:.1f}秒时结束一个agent ({elapsed:.1f}秒)", consumer, args.limit, slack)
+
+            failures += not check_unknown_settings(urls[0], origin)
+        finally:
+            for process, _ in agents:
+                process.kill()
+                process.wait()
+
+    failures += not check_public_bind()
+    origin_server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+内存预算下的峰值 RSS 检查
+
+在本机启动一个返回固定内容的HTTP源站，以大量线程在独立进程中运行命令行模式，
+分别不设预算与设置多个内存预算，比较内核记录的子进程峰值 RSS (ru_maxrss) 与预算，
+并列出消耗器报告的规划结果与 RSS 拆分。任一预算下峰值超出预算时以非零状态码退出，可直接用于CI。
+需要 Linux 的 /proc (消耗器读取 RSS 与拆分)。
+
+使用示例:
+    python benchmarks/memory_bench.py
+    python benchmarks/memory_bench.py --threads 400 --budgets 48 64 96 --traffic 1000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "traffic_consumer.py")
+BODY_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def run(url, threads, traffic, budget):
+    """在独立进程中运行一次，返回 (峰值RSS 字节, 统计数据中的 memory，耗时秒数)"""
+    with tempfile.TemporaryDirectory() as home:
+        command = [sys.executable, SCRIPT, "--no-gui", "-u", url, "-t", str(threads),
+                   "--traffic-limit", str(traffic), "--no-checkpoint"]
+        if budget:
+            command += ["--memory-budget", str(budget)]
+        env = dict(os.environ, HOME=home, PYTHONDONTWRITEBYTECODE="1")
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # wait4 返回该子进程自己的资源占用，ru_maxrss 在 Linux 上的单位为KB
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - started
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f"子进程以状态码 {os.waitstatus_to_exitcode(status)} 退出")
+        with open(os.path.join(home, ".traffic_consumer", "stats.json")) as f:
+            record = list(json.load(f).values())[-1]
+    return usage.ru_maxrss * 1024, record.get("memory"), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内存预算下的峰值 RSS 检查")
+    parser.add_argument("--threads", type=int, default=200, help="请求的线程数 (默认: 200)")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[48, 64, 128],
+                        help="检查的内存预算，单位MB (默认: 48 64 128)")
+    parser.add_argument("--traffic", type=int, default=2000, help="每次运行的流量，单位MB (默认: 2000)")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps"):
+        print("需要 Linux 的 /proc，跳过")
+        return
+
+    server = OriginServer(("127.0.0.1", 0), OriginHandler)
+    server.body = b"\0" * BODY_SIZE
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+
+    failures = []
+    print(f"{'预算(MB)':>9}{'峰值RSS(MB)':>13}{'线程':>11}{'分块(KB)':>10}{'线程栈':>8}{'堆':>8}{'文件':>8}{'耗时(s)':>9}")
+    for budget in [None] + args.budgets:
+        try:
+            peak, memory, elapsed = run(url, args.threads, args.traffic, budget)
+        except (OSError, RuntimeError, ValueError) as e:
+            failures.append(f"预算 {budget or '不限'}: {e}")
+            continue
+        if memory:
+            plan, parts = memory["plan"], memory["breakdown"] or {}
+            threads = f"{plan['threads']}/{plan['requested_threads']}"
+            columns = f"{plan['chunk_size'] // 1024:>10}" + "".join(
+                f"{parts.get(key, 0) / MB:>8.1f}" for key in ("stacks", "heap", "files"))
+        else:
+            threads, columns = f"{args.threads}", f"{'-':>10}{'-':>8}{'-':>8}{'-':>8}"
+        print(f"{budget or '不限':>9}{peak / MB:>13.1f}{threads:>11}{columns}{elapsed:>9.1f}")
+        if budget and peak > budget * MB:
+            failures.append(f"预算 {budget:g} MB: 峰值 RSS {peak / MB:.1f} MB 超出预算")
+        if budget and not memory:
+            failures.append(f"预算 {budget:g} MB: 统计数据中没有内存报告")
+    server.shutdown()
+
+    for failure in failures:
+        print(f"不通过: {failure}")
+    print("全部检查通过" if not failures else f"{len(failures)} 项检查不通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
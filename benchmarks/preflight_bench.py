@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行前预检与限额规划的效果基准
+
+在本机启动一个按路径返回指定大小对象的HTTP源站 (支持HEAD与Range，另有返回404的失效URL)，
+分别在不预检与预检的情况下运行流量限制与次数限制，比较:
+达到限制时被中断的下载数与超出限额的字节、在失效URL上的失败请求数与总耗时。
+不预检时每个失效URL要经过 max_retries 次带退避的失败才被标记，耗时明显更长。
+
+使用示例:
+    python benchmarks/preflight_bench.py
+    python benchmarks/preflight_bench.py --objects 40 --dead 4 --threads 8 --traffic-limit 200 --count 60
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import traffic_consumer  # noqa: E402
+from traffic_consumer import TrafficConsumer  # noqa: E402
+from request_trace import summarize  # noqa: E402
+
+MAX_OBJECT = 16 * 1024 * 1024
+OBJECT_PATH = re.compile(r"/obj/(\d+)")
+RANGE_HEADER = re.compile(r"bytes=(\d+)-(\d+)")
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """/obj/<大小> 返回该大小的内容并支持 Range，其他路径返回404"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _size(self):
+        match = OBJECT_PATH.match(self.path)
+        if match is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return int(match.group(1))
+
+    def do_HEAD(self):
+        size = self._size()
+        if size is not None:
+            self.send_response(200)
+            self.send_header("Content-Length", str(size))
+            self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+
+    def do_GET(self):
+        size = self._size()
+        if size is None:
+            return
+        start, end = 0, size - 1
+        match = RANGE_HEADER.match(self.headers.get("Range", ""))
+        if match:
+            start, end = int(match.group(1)), min(int(match.group(2)), size - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(self.server.body[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def run(urls, threads, preflight, workdir, **limits):
+    """返回 (轨迹汇总, 按计量口径统计的字节, 耗时秒数)"""
+    trace = os.path.join(workdir, f"{'preflight' if preflight else 'plain'}-{len(limits)}-{time.monotonic_ns()}.trace")
+    consumer = TrafficConsumer(urls=urls, threads=threads, preflight=preflight, trace_file=trace, checkpoint=False,
+                               logger=lambda message, color=None: None, **limits)
+    started = time.perf_counter()
+    consumer.start()
+    elapsed = time.perf_counter() - started
+    return summarize(trace), consumer.total_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行前预检与限额规划的效果基准")
+    parser.add_argument("--objects", type=int, default=20, help="对象数，大小在 256KB~16MB 之间随机 (默认: 20)")
+    parser.add_argument("--dead", type=int, default=2, help="返回404的失效URL数 (默认: 2)")
+    parser.add_argument("--threads", type=int, default=8, help="线程数 (默认: 8)")
+    parser.add_argument("--traffic-limit", type=float, default=100, help="流量限制，单位MB (默认: 100)")
+    parser.add_argument("--count", type=int, default=40, help="次数限制 (默认: 40)")
+    args = parser.parse_args()
+
+    origin = OriginServer(("127.0.0.1", 0), OriginHandler)
+    origin.body = os.urandom(MAX_OBJECT)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{origin.server_address[1]}"
+    random.seed(1)
+    urls = [f"{base}/obj/{random.randint(256 * 1024, MAX_OBJECT)}" for _ in range(args.objects)]
+    urls += [f"{base}/missing/{index}" for index in range(args.dead)]
+
+    limit_bytes = int(args.traffic_limit * 1024 * 1024)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            traffic_consumer.STATS_FILE = os.path.join(workdir, "stats.json")
+            traffic_consumer.SERIES_DIR = os.path.join(workdir, "series")
+            print(f"对象: {args.objects} 个 | 失效URL: {args.dead} 个 | 线程: {args.threads}")
+            print(f"{'限制':<16}{'预检':>6}{'完成':>8}{'中断':>8}{'失败请求':>10}{'超出限额':>14}{'耗时(s)':>10}")
+            for label, limits in ((f"流量 {args.traffic_limit:g} MB", {"traffic_limit": args.traffic_limit}),
+                                  (f"次数 {args.count}", {"count": args.count})):
+                for preflight in (False, True):
+                    summary, total, elapsed = run(urls, args.threads, preflight, workdir, **limits)
+                    events = summary["events"]
+                    over = f"{total - limit_bytes:,} B" if "traffic_limit" in limits else "-"
+                    print(f"{label:<16}{'是' if preflight else '否':>6}{events['end']:>8}{events['abort']:>8}"
+                          f"{events['error']:>10}{over:>14}{elapsed:>10.2f}")
+    finally:
+        origin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
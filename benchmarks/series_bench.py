@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+速度序列的记录与查询开销基准
+
+生成一次长时间运行的按秒速度序列 (带一个短暂的尖峰)，测量每秒追加一个点的耗时、
+不同范围与降采样方法的查询耗时、返回的点数与JSON大小，以及保存后重新读取的耗时。
+minmax 应保留尖峰，查询耗时应与运行时长基本无关。
+
+使用示例:
+    python benchmarks/series_bench.py
+    python benchmarks/series_bench.py --days 30 --points 1000
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timeseries import SpeedSeries  # noqa: E402
+
+BASE_SPEED = 100 * 1024 * 1024
+SPIKE_SPEED = 600 * 1024 * 1024
+
+
+def build(seconds):
+    series = SpeedSeries(time.time() - seconds)
+    spike = seconds // 2
+    started = time.perf_counter()
+    for i in range(seconds):
+        value = BASE_SPEED * (1 + 0.3 * math.sin(i / 3600)) + random.random() * 1024 * 1024
+        series.append(SPIKE_SPEED if i == spike else value)
+    return series, (time.perf_counter() - started) / seconds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="速度序列的记录与查询开销基准")
+    parser.add_argument("--days", type=float, default=7, help="模拟的运行时长，单位天 (默认: 7)")
+    parser.add_argument("--points", type=int, default=300, help="查询返回的点数 (默认: 300)")
+    args = parser.parse_args()
+
+    seconds = int(args.days * 86400)
+    series, append_us = build(seconds)
+    raw_bytes = len(json.dumps([[i, v] for i, v in enumerate(series.levels[0].mean)]))
+    print(f"运行时长: {seconds} 秒 | 每秒追加耗时: {append_us:.2f} us | 原始序列JSON: {raw_bytes / 1024 / 1024:.1f} MB")
+
+    failures = 0
+    print(f"{'范围':>10}{'方法':>8}{'精度(s)':>9}{'点数':>6}{'耗时(ms)':>10}{'JSON(KB)':>10}{'最大值(MB/s)':>14}")
+    for label, last in (("1小时", 3600), ("1天", 86400), ("全部", None)):
+        start = None if last is None else max(0, seconds - last)
+        for method in ("lttb", "minmax"):
+            began = time.perf_counter()
+            result = series.query(start, None, args.points, method)
+            elapsed = (time.perf_counter() - began) * 1000
+            size = len(json.dumps(result)) / 1024
+            peak = max(point[-1] for point in result["points"]) / 1024 / 1024
+            print(f"{label:>10}{method:>8}{result['resolution']:>9}{len(result['points']):>6}"
+                  f"{elapsed:>10.1f}{size:>10.1f}{peak:>14.0f}")
+            # 整次运行按 minmax 查询时必须保留尖峰
+            if last is None and method == "minmax" and peak < SPIKE_SPEED / 1024 / 1024:
+                failures += 1
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "run.series")
+        series.save(path)
+        began = time.perf_counter()
+        SpeedSeries.load(path)
+        print(f"文件大小: {os.path.getsize(path) / 1024 / 1024:.1f} MB | 读取并重建各级: "
+              f"{(time.perf_counter() - began) * 1000:.0f} ms")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离散事件模拟的速度与控制逻辑回归检查
+
+在内置的源站模型上模拟多种配置，报告虚拟时长与实际耗时之比，并检查:
+1. 同一种子的两次模拟结果完全相同
+2. 各URL完成次数的公平性 (Jain 指数) 不低于阈值 (定时运行的配置除外)
+3. 流量限制的超出量不超过每个线程一个分块，预检规划后不超出
+4. 预检规划的流量限制下，源站对象大小相同时下载次数等于计入的字节数除以对象大小 (最后一次下载也计为完成)
+5. 每种配置的加速比 (虚拟时长与实际耗时之比) 不低于下限，取该配置所有模拟中最高的一次以减少计时抖动
+任一检查不通过时以非零状态码退出，可直接用于CI。不发出网络请求。
+
+使用示例:
+    python benchmarks/simulation_bench.py
+    python benchmarks/simulation_bench.py --seeds 5 --threads 32 --min-fairness 0.98 --min-speedup 2000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from traffic_consumer import DEFAULT_CHUNK_SIZE, TrafficConsumer  # noqa: E402
+from simulation import build_model, simulate  # noqa: E402
+
+MODEL = {
+    "capacity": 1000,
+    "origins": [
+        {"url": "http://big.example.com/file.bin", "count": 10, "size": 100, "bandwidth": 40, "latency": 40},
+        {"url": "http://cdn.example.com/obj", "count": 90, "size": 7.3, "bandwidth": 25, "latency": 90,
+         "failure_rate": 0.01, "capacity": 400},
+        {"url": "http://gone.example.com/obj", "count": 2, "size": 1, "bandwidth": 10, "latency": 20,
+         "failure_rate": 1}
+    ]
+}
+
+# 对象大小相同的源站，用于检查下载次数与计入的字节数一致
+UNIFORM_SIZE = 16  # MB
+UNIFORM_MODEL = {
+    "capacity": 1000,
+    "origins": [{"url": "http://uniform.example.com/obj", "count": 20, "size": UNIFORM_SIZE, "bandwidth": 20,
+                 "latency": 30}]
+}
+
+
+def run(seed, horizon=3600, model=MODEL, **settings):
+    """返回 (模拟结果, 实际耗时秒数)"""
+    started = time.perf_counter()
+    report = simulate(TrafficConsumer(**settings).schedule_settings(), build_model(model), seed, horizon)
+    return report, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离散事件模拟的速度与控制逻辑回归检查")
+    parser.add_argument("--seeds", type=int, default=2, help="每种配置模拟的种子数 (默认: 2)")
+    parser.add_argument("--threads", type=int, default=16, help="线程数 (默认: 16)")
+    parser.add_argument("--min-fairness", type=float, default=0.95, help="URL公平性的下限 (默认: 0.95)")
+    parser.add_argument("--min-speedup", type=float, default=1000, help="每种配置加速比的下限 (默认: 1000)")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("随机 / 次数 3000", {"url_strategy": "random", "count": 3000}),
+        ("轮询 / 次数 3000", {"url_strategy": "round_robin", "count": 3000}),
+        ("随机 / 流量 20GB", {"traffic_limit": 20480}),
+        ("随机 / 流量 20GB / 预检", {"traffic_limit": 20480, "preflight": True}),
+        ("随机 / 限速 200MB/s / 1分钟", {"limit_speed": 200, "duration": 60}),
+        ("每30分钟 / 流量 5GB / 3小时", {"interval": 30, "traffic_limit": 5120}),
+        ("等大对象 / 流量 16000MB / 预检", {"traffic_limit": 16000, "preflight": True, "model": UNIFORM_MODEL}),
+    ]
+    slack = args.threads * DEFAULT_CHUNK_SIZE
+    failures = []
+    print(f"{'配置':<28}{'虚拟时长(s)':>12}{'实际(s)':>9}{'加速比':>9}{'公平性':>8}{'超出限额(B)':>14}")
+    for label, settings in scenarios:
+        horizon = 3 * 3600 if settings.get("interval") else 3600
+        best = 0.0
+        for seed in range(args.seeds):
+            report, elapsed = run(seed, horizon, threads=args.threads, **settings)
+            again, elapsed_again = run(seed, horizon, threads=args.threads, **settings)
+            if again["runs"] != report["runs"]:
+                failures.append(f"{label} 种子 {seed}: 两次模拟结果不同")
+            elapsed = min(elapsed, elapsed_again)
+            speedup = report["virtual_seconds"] / max(elapsed, 1e-6)
+            best = max(best, speedup)
+            if settings.get("model") is UNIFORM_MODEL:
+                size = UNIFORM_SIZE * 1024 * 1024
+                for run_ in report["runs"]:
+                    if run_["download_count"] != run_["total_bytes"] // size:
+                        failures.append(f"{label} 种子 {seed}: 下载次数 {run_['download_count']} 与计入的 "
+                                        f"{run_['total_bytes']:,} B 不符")
+
+            fairness = min((run_["fairness"] for run_ in report["runs"] if run_["fairness"] is not None), default=None)
+            overshoot = max((run_["limit_overshoot"] for run_ in report["runs"]
+                             if run_["limit_overshoot"] is not None), default=None)
+            # 定时运行每次只有几百次下载，各URL完成次数的抽样波动大，不检查公平性
+            if fairness is not None and not settings.get("interval") and fairness < args.min_fairness:
+                failures.append(f"{label} 种子 {seed}: 公平性 {fairness:.3f} 低于 {args.min_fairness}")
+            if overshoot is not None and overshoot > (0 if settings.get("preflight") else slack):
+                failures.append(f"{label} 种子 {seed}: 超出限额 {overshoot:,} B")
+
+            if seed == 0:
+                print(f"{label:<28}{report['virtual_seconds']:>12.0f}{elapsed:>9.2f}{speedup:>8.0f}x"
+                      f"{'-' if fairness is None else f'{fairness:.3f}':>8}"
+                      f"{'-' if overshoot is None else f'{overshoot:+,}':>14}")
+        if best < args.min_speedup:
+            failures.append(f"{label}: 加速比 {best:.0f}x 低于 {args.min_speedup:.0f}x")
+
+    for failure in failures:
+        print(f"不通过: {failure}")
+    print("全部检查通过" if not failures else f"{len(failures)} 项检查不通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
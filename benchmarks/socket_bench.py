@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+套接字参数对单连接吞吐的影响基准
+
+在本机启动一个返回固定内容的HTTP源站，用 tc netem 给回环网卡加上往返延迟，
+以单线程 (单连接) 依次运行不同的套接字参数，比较吞吐与按接收窗口估算的上限 (窗口 / RTT)。
+加延迟需要root权限与内核的 sch_netem 模块；不可用时在回环的原始延迟下运行并给出提示，
+此时各参数的差别主要反映CPU开销，而不是窗口限制。
+
+使用示例:
+    sudo python benchmarks/socket_bench.py
+    sudo python benchmarks/socket_bench.py --rtt 80 --seconds 10 --profiles default 0.25 4 16
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import traffic_consumer  # noqa: E402
+from traffic_consumer import TrafficConsumer  # noqa: E402
+
+BODY_SIZE = 64 * 1024 * 1024
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def netem(action, rtt_ms=0):
+    """在回环网卡上添加或移除延迟，每个方向各为RTT的一半，成功时返回True"""
+    command = ["tc", "qdisc", action, "dev", "lo", "root"]
+    if action == "add":
+        command += ["netem", "delay", f"{rtt_ms / 2}ms"]
+    try:
+        return subprocess.run(command, capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+
+def parse_profile(text):
+    """default 表示内核自动调整，数字为固定的接收缓冲 (MB)，可用 +bbr 等后缀指定拥塞控制算法"""
+    rcvbuf, _, congestion = text.partition("+")
+    return (None if rcvbuf == "default" else float(rcvbuf)), congestion or None
+
+
+def run(url, rcvbuf, congestion, seconds):
+    """返回 (吞吐 字节/秒, 估算的单连接接收窗口)"""
+    consumer = TrafficConsumer(urls=[url], threads=1, duration=seconds, prewarm=True,
+                               socket_rcvbuf=rcvbuf, tcp_congestion=congestion,
+                               logger=lambda message, color=None: None)
+    started = time.perf_counter()
+    consumer.start()
+    elapsed = time.perf_counter() - started
+    return consumer.total_bytes / elapsed, consumer.receive_window
+
+
+def main():
+    parser = argparse.ArgumentParser(description="套接字参数对单连接吞吐的影响基准")
+    parser.add_argument("--rtt", type=float, default=50, help="模拟的往返延迟，单位毫秒 (默认: 50)")
+    parser.add_argument("--seconds", type=int, default=8, help="每种参数的运行时长，单位秒 (默认: 8)")
+    parser.add_argument("--profiles", nargs="+", default=["0.125", "default", "1", "4"],
+                        help="要比较的参数: default 或接收缓冲MB数，可加 +bbr 等后缀 (默认: 0.125 default 1 4)")
+    args = parser.parse_args()
+
+    origin = OriginServer(("127.0.0.1", 0), OriginHandler)
+    origin.body = os.urandom(BODY_SIZE)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{origin.server_address[1]}/"
+
+    delayed = netem("add", args.rtt)
+    rtt = args.rtt / 1000 if delayed else None
+    if not delayed:
+        print("无法用 tc netem 给回环网卡加延迟 (需要root与 sch_netem)，在回环的原始延迟下运行")
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            traffic_consumer.STATS_FILE = os.path.join(workdir, "stats.json")
+            traffic_consumer.SERIES_DIR = os.path.join(workdir, "series")
+            print(f"RTT: {f'{args.rtt:.0f} ms' if delayed else '回环'}")
+            print(f"{'参数':>14}{'接收窗口':>12}{'估算上限(MB/s)':>16}{'吞吐(MB/s)':>12}")
+            for text in args.profiles:
+                rcvbuf, congestion = parse_profile(text)
+                speed, window = run(url, rcvbuf, congestion, args.seconds)
+                label = "自动调整" if window["autotune"] else f"{window['window'] / 1024 / 1024:.2f} MB"
+                ceiling = f"{window['window'] / rtt / 1024 / 1024:.1f}" if rtt else "-"
+                print(f"{text:>14}{label:>12}{ceiling:>16}{speed / 1024 / 1024:>12.1f}")
+    finally:
+        if delayed:
+            netem("del")
+        origin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+子命令启动耗时基准
+
+对每个子命令多次启动独立进程，统计启动耗时中位数，并检查该模式下
+是否加载了不需要的重量级依赖。任一子命令超出预算或加载了多余依赖时
+以非零状态码退出，可直接用于CI。
+
+使用示例:
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --runs 20 --budget-scale 1.5
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "traffic_consumer.py")
+
+# 只做配置/统计管理的子命令不应加载网络、调度或Web相关依赖
+HEAVY_MODULES = ["requests", "urllib3", "apscheduler", "flask", "flask_socketio", "http.client"]
+
+# 子命令 -> (参数, 启动耗时预算ms)，预算包含解释器自身的启动时间
+SUBCOMMANDS = {
+    "help": (["--help"], 250),
+    "list-configs": (["--list-configs"], 250),
+    "show-stats": (["--show-stats"], 250),
+    "analyze": (["--analyze"], 250),
+    "save-config": (["--save-config", "--config", "bench"], 250),
+    "delete-config": (["--delete-config", "--config", "bench"], 250),
+}
+
+# 在子进程中执行入口并在退出时报告已加载的重量级模块
+PROBE = """
+import atexit, json, runpy, sys
+heavy = {heavy!r}
+def report():
+    sys.stderr.write("\\n@@MODULES@@" + json.dumps([m for m in heavy if m in sys.modules]) + "\\n")
+atexit.register(report)
+sys.argv = {argv!r}
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+def time_startup(command, env, runs):
+    """多次启动进程，返回耗时中位数(ms)"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def loaded_heavy_modules(args, env):
+    code = PROBE.format(heavy=HEAVY_MODULES, argv=[SCRIPT] + args, script=SCRIPT)
+    result = subprocess.run([sys.executable, "-c", code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for line in result.stderr.splitlines():
+        if line.startswith("@@MODULES@@"):
+            return json.loads(line[len("@@MODULES@@"):])
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="子命令启动耗时基准")
+    parser.add_argument("--runs", type=int, default=10, help="每个子命令的启动次数 (默认: 10)")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="预算缩放系数，用于较慢的CI机器 (默认: 1.0)")
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="tc_startup_")
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    failures = 0
+
+    try:
+        baseline = time_startup([sys.executable, "-c", "pass"], env, args.runs)
+        print(f"解释器空启动: {baseline:.1f} ms")
+        print(f"{'子命令':<16}{'中位数(ms)':>12}{'预算(ms)':>10}  多余依赖")
+        for name, (argv, budget) in SUBCOMMANDS.items():
+            budget *= args.budget_scale
+            median = time_startup([sys.executable, SCRIPT] + argv, env, args.runs)
+            heavy = loaded_heavy_modules(argv, env)
+            ok = median <= budget and not heavy
+            failures += not ok
+            print(f"{name:<16}{median:>12.1f}{budget:>10.0f}  {', '.join(heavy) or '-'}"
+                  f"{'' if ok else '  <-- 超出预算'}")
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
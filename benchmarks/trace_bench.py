@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求轨迹记录开销基准
+
+多个线程同时按一次请求的典型事件序列 (开始、响应头、结束) 写入轨迹，
+测量每个事件的平均耗时与文件中每个事件占用的字节数，并确认读回的事件数一致。
+
+使用示例:
+    python benchmarks/trace_bench.py
+    python benchmarks/trace_bench.py --threads 8 --requests 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from request_trace import TraceWriter, read_trace  # noqa: E402
+
+EVENTS_PER_REQUEST = 3
+URL_COUNT = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求轨迹记录开销基准")
+    parser.add_argument("--threads", type=int, default=4, help="写入线程数 (默认: 4)")
+    parser.add_argument("--requests", type=int, default=50000, help="每个线程记录的请求数 (默认: 50000)")
+    args = parser.parse_args()
+
+    urls = [f"https://cdn.example.com/objects/{i:06d}.bin" for i in range(URL_COUNT)]
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.trace")
+        writer = TraceWriter(path, {"threads": args.threads})
+
+        def work(thread_id):
+            writer.bind(thread_id)
+            for i in range(args.requests):
+                writer.request(urls[i % URL_COUNT])
+                writer.headers(200)
+                writer.end(10 * 1024 * 1024)
+
+        threads = [threading.Thread(target=work, args=(i + 1,)) for i in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writer.close()
+
+        events = args.threads * args.requests * EVENTS_PER_REQUEST
+        _, _, records = read_trace(path)
+        size = os.path.getsize(path)
+
+    print(f"线程数: {args.threads} | 事件数: {events}")
+    print(f"每个事件耗时: {elapsed / events * 1e9:.0f} ns | 每次请求耗时: {elapsed / events * EVENTS_PER_REQUEST * 1e6:.2f} us")
+    print(f"每个事件占用: {size / events:.1f} 字节")
+    if len(records) != events:
+        print(f"读回的事件数不一致: {len(records)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
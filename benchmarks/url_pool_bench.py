@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+URL池内存与选择开销基准
+
+对比旧的按URL字符串索引的字典/列表状态与 FileUrlPool 在不同URL数下的内存占用，
+并测量选择一个URL的耗时。FileUrlPool 每个URL的内存超出预算时以非零状态码退出，
+可直接用于CI。
+
+使用示例:
+    python benchmarks/url_pool_bench.py
+    python benchmarks/url_pool_bench.py --sizes 10000 1000000 --picks 50000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from url_pool import open_url_source  # noqa: E402
+
+URL_TEMPLATE = "https://cdn.example.com/objects/{:08d}/payload.bin?variant=standard"
+LEGACY_PICK_LIMIT = 10000  # 旧的加权随机选择每次遍历全部URL，只在较小的URL数下测量
+
+
+def legacy_state(urls):
+    """旧版每个URL的状态: URL列表、使用次数、字节数、权重与失效集合"""
+    return {
+        "urls": urls,
+        "url_usage": {url: 0 for url in urls},
+        "url_bytes": {url: [0, 0] for url in urls},
+        "url_weights": [1.0] * len(urls),
+        "invalid_urls": set()
+    }
+
+
+def legacy_pick(state):
+    """旧版加权随机选择的主要开销: 每次按使用次数重新计算全部权重"""
+    urls, usage, weights = state["urls"], state["url_usage"], state["url_weights"]
+    expected = sum(usage.values()) / len(urls)
+    for i, url in enumerate(urls):
+        current = usage[url]
+        weights[i] = expected - current + 1 if current < expected else 1.0 / (current - expected + 1)
+    return random.choices(urls, weights)[0]
+
+
+def measure(build):
+    """返回 (结果, 分配的字节数)"""
+    tracemalloc.start()
+    try:
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current
+
+
+def pick_time(pick, picks):
+    """选择一次URL的平均耗时，单位微秒"""
+    started = time.perf_counter()
+    for _ in range(picks):
+        pick()
+    return (time.perf_counter() - started) / picks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URL池内存与选择开销基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="测试的URL数 (默认: 10000 100000 1000000)")
+    parser.add_argument("--picks", type=int, default=20000, help="测量选择耗时的次数 (默认: 20000)")
+    parser.add_argument("--budget", type=float, default=40,
+                        help="FileUrlPool 每个URL的内存预算，单位字节 (默认: 40)")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'URL数':>10}{'旧版(B/URL)':>14}{'URL池(B/URL)':>15}{'建索引(s)':>11}"
+          f"{'旧版选择(us)':>14}{'URL池选择(us)':>15}")
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as manifest:
+            for i in range(size):
+                manifest.write(URL_TEMPLATE.format(i) + "\n")
+        try:
+            urls = [URL_TEMPLATE.format(i) for i in range(size)]
+            legacy, legacy_bytes = measure(lambda: legacy_state(urls))
+            # 旧版同时持有URL字符串本身，计入其内存
+            legacy_bytes += sum(sys.getsizeof(url) for url in urls)
+            legacy_us = pick_time(lambda: legacy_pick(legacy), 20) if size <= LEGACY_PICK_LIMIT else None
+            del legacy, urls
+
+            started = time.perf_counter()
+            open_url_source(manifest.name).close()
+            index_seconds = time.perf_counter() - started
+            pool, pool_bytes = measure(lambda: open_url_source(manifest.name))
+            pool_us = pick_time(lambda: pool.url(pool.choose("random")), args.picks)
+            pool.close()
+        finally:
+            os.unlink(manifest.name)
+
+        per_url = pool_bytes / size
+        failures += per_url > args.budget
+        legacy_text = f"{legacy_us:.1f}" if legacy_us is not None else "-"
+        print(f"{size:>10}{legacy_bytes / size:>14.1f}{per_url:>15.1f}{index_seconds:>11.2f}"
+              f"{legacy_text:>14}{pool_us:>15.1f}{'  <-- 超出预算' if per_url > args.budget else ''}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+抽样完整性校验的吞吐开销基准
+
+在本机启动一个返回固定内容的HTTP源站，分别以不同的抽样比例运行 TrafficConsumer，
+比较吞吐量；另有一个返回损坏内容的URL，用于确认不通过的下载能被统计到。
+抽样比例为0时仍创建校验器，对比的是“只判断是否抽样”与“抽中后交给校验线程”的差别。
+
+使用示例:
+    python benchmarks/verify_bench.py
+    python benchmarks/verify_bench.py --size 64 --count 200 --threads 8 --samples 0 0.1 1
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import traffic_consumer  # noqa: E402
+from traffic_consumer import TrafficConsumer  # noqa: E402
+
+BAD_RUN_LIMIT = 100  # 校验损坏内容时的限速，单位MB/s
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    """/good 返回原始内容，/bad 返回翻转了一个字节的内容"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.server.good if self.path == "/good" else self.server.bad
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        view = memoryview(body)
+        for start in range(0, len(body), 1024 * 1024):
+            self.wfile.write(view[start:start + 1024 * 1024])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 任务达到次数后会断开进行中的下载，不输出连接重置的错误
+        pass
+
+
+def start_origin(size):
+    body = os.urandom(size)
+    server = OriginServer(("127.0.0.1", 0), OriginHandler)
+    server.good = body
+    server.bad = body[:-1] + bytes([body[-1] ^ 0xFF])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hashlib.sha256(body).hexdigest()
+
+
+def run(url, manifest, sample, count, threads, limit_speed=0):
+    """返回 (吞吐量MB/s, 校验结果)"""
+    consumer = TrafficConsumer(urls=[url], threads=threads, count=count, prewarm=False, limit_speed=limit_speed,
+                               verify_manifest=manifest, verify_sample=sample, logger=lambda message, color=None: None)
+    started = time.perf_counter()
+    consumer.start()
+    elapsed = time.perf_counter() - started
+    return consumer.total_bytes / elapsed / (1024 * 1024), consumer.verification_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽样完整性校验的吞吐开销基准")
+    parser.add_argument("--size", type=int, default=32, help="源站返回的内容大小，单位MB (默认: 32)")
+    parser.add_argument("--count", type=int, default=64, help="每轮的下载次数 (默认: 64)")
+    parser.add_argument("--threads", type=int, default=4, help="下载线程数 (默认: 4)")
+    parser.add_argument("--samples", type=float, nargs="+", default=[0.0, 0.1, 1.0],
+                        help="测试的抽样比例 (默认: 0 0.1 1)")
+    args = parser.parse_args()
+
+    server, digest = start_origin(args.size * 1024 * 1024)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        # 统计文件与速度序列写到临时目录，不影响用户的历史统计
+        traffic_consumer.STATS_FILE = os.path.join(workdir, "stats.json")
+        traffic_consumer.SERIES_DIR = os.path.join(workdir, "series")
+        manifest = os.path.join(workdir, "digests.txt")
+        with open(manifest, "w") as f:
+            f.write(f"{base}/good sha256:{digest} {args.size * 1024 * 1024}\n")
+            f.write(f"{base}/bad sha256:{digest}\n")
+
+        baseline = None
+        print(f"{'抽样比例':>8}{'吞吐(MB/s)':>14}{'相对':>8}{'通过':>8}{'不通过':>8}{'放弃':>8}")
+        for sample in args.samples:
+            speed, result = run(f"{base}/good", manifest, sample, args.count, args.threads)
+            baseline = baseline or speed
+            failures += result["failed"]
+            print(f"{sample:>8.2f}{speed:>14.1f}{speed / baseline:>8.0%}{result['passed']:>8}"
+                  f"{result['failed']:>8}{result['skipped']:>8}")
+
+        # 损坏的内容必须全部判为不通过；限速使校验线程跟得上，每次下载都能完成校验
+        _, result = run(f"{base}/bad", manifest, 1.0, max(1, args.count // 8), args.threads, BAD_RUN_LIMIT)
+        print(f"损坏内容: 通过 {result['passed']} 次，不通过 {result['failed']} 次，放弃 {result['skipped']} 次")
+        failures += result["passed"]
+
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
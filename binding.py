@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+源地址绑定 - 新连接从指定的本机地址或网卡发出，把请求按策略分散到多条上行链路
+
+1. 源地址: 每项为本机地址或网卡名，可附带权重 (如 eth1=3、10.0.0.5=2)；网卡名取其 IPv4 地址 (仅Linux)，
+   运行开始前逐一检查能否绑定，无法绑定的源地址被跳过
+2. 策略: round_robin 按线程编号轮流分配，weighted 按权重分配线程，per_url 按URL编号与权重分配，
+   同一URL始终从同一源地址发出；分配序列按平滑加权轮询生成，权重相同的源地址交替出现
+3. 按源地址统计线路字节、完成的请求数、出错的请求数与最近一秒的吞吐，由调用方在自己的锁内累加
+
+多条上行链路需要主机按源地址选择路由 (如 ip rule add from <地址> table <表>)，
+否则数据包仍从默认路由发出，只是源地址不同。
+"""
+
+import socket
+import struct
+import ipaddress
+from array import array
+
+SIOCGIFADDR = 0x8915  # Linux 上读取网卡 IPv4 地址的 ioctl
+SAMPLE_INTERVAL = 1.0  # 计算各源地址吞吐的周期，单位秒
+
+
+def parse_source(spec):
+    """解析一项源地址配置 "地址或网卡[=权重]"，返回 (名称, 权重)，格式无效时抛出 ValueError"""
+    name, sep, weight = str(spec).strip().rpartition("=")
+    if not sep:
+        name, weight = weight, "1"
+    name = name.strip()
+    try:
+        weight = int(weight)
+    except ValueError:
+        raise ValueError(f"源地址 {spec} 的权重无效") from None
+    if not name or weight < 1:
+        raise ValueError(f"源地址配置无效: {spec}")
+    return name, weight
+
+
+def interface_address(name):
+    """网卡的 IPv4 地址，网卡不存在、没有地址或平台不支持时抛出 OSError"""
+    import fcntl
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        request = struct.pack("256s", name.encode("utf-8")[:15])
+        return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24])
+
+
+def resolve_source(name):
+    """源地址配置中的名称对应的 (本机地址, 网卡名)，名称为地址时网卡名为None"""
+    try:
+        return str(ipaddress.ip_address(name)), None
+    except ValueError:
+        pass
+    try:
+        return interface_address(name), name
+    except ImportError:
+        raise OSError("当前平台不支持按网卡名绑定，请直接指定地址") from None
+
+
+def check_bindable(address):
+    """确认本机可以从该地址发起连接，不可以时抛出 OSError"""
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.bind((address, 0))
+
+
+def weighted_slots(weights):
+    """按平滑加权轮询生成分配序列，长度为权重之和"""
+    current = [0] * len(weights)
+    total = sum(weights)
+    slots = array("H")
+    for _ in range(total):
+        for index, weight in enumerate(weights):
+            current[index] += weight
+        chosen = max(range(len(weights)), key=current.__getitem__)
+        current[chosen] -= total
+        slots.append(chosen)
+    return slots
+
+
+class SourceSet:
+    """一次运行使用的源地址与按源地址的计数
+
+    sources 为 [(名称, 地址, 网卡名, 权重)]；计数数组由调用方在自己的锁内累加
+    """
+
+    def __init__(self, sources, policy, clock):
+        self.sources = list(sources)
+        self.policy = policy
+        self.clock = clock
+        self.slots = weighted_slots([1 if policy == "round_robin" else weight for _, _, _, weight in self.sources])
+        size = len(self.sources)
+        self.bytes = array("Q", [0]) * size  # 线路字节: 下载的响应头与原始响应体、上传的请求体
+        self.requests = array("Q", [0]) * size  # 完成的请求数
+        self.errors = array("Q", [0]) * size  # 出错的请求数 (含重试)
+        self.speeds = [0.0] * size  # 最近一个采样周期的吞吐，单位字节/秒
+        self._last_sample = clock()
+        self._last_bytes = list(self.bytes)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def address(self, index):
+        return self.sources[index][1]
+
+    def for_thread(self, thread_id):
+        """工作线程默认使用的源地址编号，也是 round_robin 与 weighted 策略下该线程的全部请求使用的源地址"""
+        return self.slots[(thread_id - 1) % len(self.slots)]
+
+    def choose(self, thread_id, url_id):
+        """本次请求使用的源地址编号"""
+        if self.policy == "per_url":
+            return self.slots[url_id % len(self.slots)]
+        return self.for_thread(thread_id)
+
+    def sample(self):
+        """距上次采样超过 SAMPLE_INTERVAL 时更新各源地址的吞吐"""
+        now = self.clock()
+        elapsed = now - self._last_sample
+        if elapsed < SAMPLE_INTERVAL:
+            return
+        current = list(self.bytes)
+        self.speeds = [(new - old) / elapsed for new, old in zip(current, self._last_bytes)]
+        self._last_bytes = current
+        self._last_sample = now
+
+    def summary(self, elapsed):
+        """各源地址的统计，elapsed 为本次运行的时长，用于计算平均吞吐"""
+        total = sum(self.bytes)
+        return [{
+            "source": name,
+            "address": address,
+            "interface": interface,
+            "weight": weight,
+            "bytes": self.bytes[index],
+            "share": self.bytes[index] / total if total else 0.0,
+            "requests": self.requests[index],
+            "errors": self.errors[index],
+            "speed": self.speeds[index],
+            "average_speed": self.bytes[index] / elapsed if elapsed > 0 else 0.0
+        } for index, (name, address, interface, weight) in enumerate(self.sources)]
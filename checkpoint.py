@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行进度检查点 - 进程意外退出后，有限额的运行从检查点继续，只消耗剩余的预算
+
+1. 检查点是固定大小的二进制文件: 文件头 (魔数、URL池指纹、已运行时长与各项计数)
+   加上固定数量的URL槽位 (编号、完成次数、解码字节、线路字节)，运行中只改写数值
+2. 先写同目录的临时文件并 fsync，再用 os.replace 替换，任何时刻读到的都是完整的某一次检查点
+3. URL池指纹由URL列表或清单来源与URL数得出，URL池变化后编号不再对应，检查点被忽略
+"""
+
+import os
+import re
+import struct
+import hashlib
+import tempfile
+
+CHECKPOINT_MAGIC = b"TCCKPT01"
+# 魔数、URL池指纹、写入时间 (Unix时间戳)、已运行秒数、计数个数、URL槽位数
+HEADER = struct.Struct("<8s16sddII")
+COUNTER = struct.Struct("<Q")
+SLOT = struct.Struct("<qIQQ")  # URL编号 (-1表示空槽位)、完成次数、解码字节、线路字节
+
+
+def pool_fingerprint(source, urls, size):
+    """URL池的指纹: 同一清单来源或同一URL列表、且URL数相同时一致"""
+    digest = hashlib.blake2b(digest_size=16)
+    if source is not None:
+        digest.update(b"source\0" + str(source).encode("utf-8"))
+    else:
+        for url in urls or ():
+            digest.update(url.encode("utf-8") + b"\0")
+    digest.update(str(size).encode("ascii"))
+    return digest.digest()
+
+
+def checkpoint_path(directory, config_name):
+    """每个配置一个检查点文件，文件名保留可读的配置名并附带摘要以避免冲突"""
+    name = config_name or "default"
+    safe = re.sub(r"[^0-9A-Za-z_.-]", "_", name)[:48]
+    suffix = hashlib.blake2b(name.encode("utf-8"), digest_size=4).hexdigest()
+    return os.path.join(directory, f"{safe}-{suffix}.ckpt")
+
+
+class Checkpoint:
+    """一次检查点的内容: counters 为 {计数名: 值}，slots 为 [(URL编号, 完成次数, 解码字节, 线路字节)]"""
+
+    __slots__ = ("fingerprint", "written", "elapsed", "counters", "slots")
+
+    def __init__(self, fingerprint, written, elapsed, counters, slots):
+        self.fingerprint = fingerprint
+        self.written = written
+        self.elapsed = elapsed
+        self.counters = counters
+        self.slots = slots
+
+
+def write(path, checkpoint, counter_names, slot_count):
+    """按固定的计数顺序与槽位数写入检查点，槽位不足时以空槽位补齐"""
+    slots = list(checkpoint.slots)[:slot_count]
+    slots += [(-1, 0, 0, 0)] * (slot_count - len(slots))
+    data = bytearray(HEADER.pack(CHECKPOINT_MAGIC, checkpoint.fingerprint, checkpoint.written, checkpoint.elapsed,
+                                 len(counter_names), slot_count))
+    for name in counter_names:
+        data += COUNTER.pack(checkpoint.counters.get(name, 0))
+    for slot in slots:
+        data += SLOT.pack(*slot)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def read(path, counter_names):
+    """读取检查点，文件不存在、已损坏或格式不符时返回None"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, fingerprint, written, elapsed, counter_count, slot_count = HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if magic != CHECKPOINT_MAGIC or counter_count != len(counter_names):
+        return None
+    if len(data) != HEADER.size + counter_count * COUNTER.size + slot_count * SLOT.size:
+        return None
+
+    offset = HEADER.size
+    counters = {}
+    for name in counter_names:
+        counters[name], = COUNTER.unpack_from(data, offset)
+        offset += COUNTER.size
+    slots = [slot for slot in SLOT.iter_unpack(data[offset:]) if slot[0] >= 0]
+    return Checkpoint(fingerprint, written, elapsed, counters, slots)
+
+
+def remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,574 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分布式模式 - 单台主机的网卡和CPU不足时，由多个 agent 共同产生流量
+
+agent: 运行 TrafficConsumer 工作线程，通过HTTP接收控制器下发的配置与预算
+控制器 (DistributedConsumer): 下发配置，把全局的流量限制、下载次数和限速拆分给
+各个agent，并把各agent的统计汇总到现有的命令行界面与 Web UI。agent 落后时
+按实际速度重新分配预算，agent 掉线时其未用完的预算分给其他agent。
+
+agent 与控制器之间使用 JSON over HTTP。agent 在租约时间内没有收到控制器的
+消息时自行停止，避免控制器掉线后继续消耗流量。
+"""
+
+import os
+import hmac
+import json
+import ipaddress
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from colorama import Fore, Style
+
+from traffic_consumer import TrafficConsumer, AGENT_TOKEN_ENV, URL_STATS_LIMIT, SNAPSHOT_COUNTERS
+from latency import LatencyHistogram
+from job_manager import fair_share, MIN_JOB_RATE, UNDERUSE_RATIO, DEMAND_HEADROOM
+
+AGENT_TOKEN_HEADER = "X-Agent-Token"
+DEFAULT_AGENT_HOST = "127.0.0.1"
+DEFAULT_LEASE = 10  # agent 未收到控制器消息时自行停止的时间，单位秒
+POLL_INTERVAL = 1.0  # 控制器下发预算并收集统计的周期，单位秒
+REQUEST_TIMEOUT = 2.0
+MAX_POLL_FAILURES = 3  # 连续失败该次数后认为agent已掉线
+
+# 由控制器统一拆分或控制的配置项，不随配置原样下发给agent
+CONTROLLER_SETTINGS = ("limit_speed", "traffic_limit", "count", "duration",
+                       "cron_expr", "interval", "misfire_grace_time", "coalesce", "profile_seconds")
+
+
+def parse_listen_address(value):
+    """解析 [HOST:]PORT 形式的监听地址"""
+    host, _, port = value.rpartition(":")
+    return host or DEFAULT_AGENT_HOST, int(port)
+
+
+def is_loopback(host):
+    """监听地址是否只能从本机访问"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class TrafficAgent:
+    """在本机运行工作线程，执行控制器下发的配置与预算"""
+
+    def __init__(self, host=DEFAULT_AGENT_HOST, port=5002, token=None, logger=None):
+        self.host = host
+        self.port = port
+        self.token = token if token is not None else os.environ.get(AGENT_TOKEN_ENV)
+        self.logger = logger if logger else self._default_logger
+        self.consumer = None
+        self.run_thread = None
+        self.lease = DEFAULT_LEASE
+        self.last_contact = time.time()
+        self.lock = threading.Lock()
+        self.server = None
+        # 只接受可保存到配置中的配置项，由控制器拆分的配置项除外；控制器另外下发配置名
+        self.accepted_settings = (set(TrafficConsumer().to_config()) - set(CONTROLLER_SETTINGS)) | {"config_name"}
+
+    def _default_logger(self, message, color=None):
+        if color:
+            print(f"{color}{message}{Style.RESET_ALL}")
+        else:
+            print(message)
+
+    @property
+    def running(self):
+        return self.run_thread is not None and self.run_thread.is_alive()
+
+    def serve_forever(self):
+        # 没有令牌时任何能访问该端口的主机都可以下发配置，只允许监听本机地址
+        if not self.token and not is_loopback(self.host):
+            raise ValueError(f"监听非本机地址 {self.host} 时必须设置令牌 (--agent-token 或环境变量 {AGENT_TOKEN_ENV})")
+        self.server = ThreadingHTTPServer((self.host, self.port), AgentRequestHandler)
+        self.server.daemon_threads = True
+        self.server.agent = self
+        self.logger(f"agent 已启动，监听 http://{self.host}:{self.server.server_address[1]}", Fore.CYAN)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            self.logger("接收到中断信号，正在停止...", Fore.YELLOW)
+        finally:
+            self.stop()
+            self.server.server_close()
+
+    def authorized(self, token):
+        return not self.token or hmac.compare_digest(token or "", self.token)
+
+    def handle(self, method, path, body):
+        """处理一次控制器请求，返回 (状态码, 响应)"""
+        self.last_contact = time.time()
+        if method == "GET" and path == "/status":
+            return 200, self.status()
+        if method == "POST" and path == "/run":
+            return self.run(body)
+        if method == "POST" and path == "/reconfigure":
+            return self.reconfigure(body.get("settings") or {})
+        if method == "POST" and path == "/budget":
+            self.apply_budget(body.get("budget") or {})
+            return 200, self.status()
+        if method == "POST" and path == "/stop":
+            self.stop()
+            return 200, self.status()
+        return 404, {"error": f"未知的请求: {method} {path}"}
+
+    def run(self, body):
+        """开始执行任务；resume 为真时在上一次的统计基础上继续，用于追加预算"""
+        with self.lock:
+            if self.running:
+                return 409, {"error": "agent 正在执行其他任务"}
+
+            if body.get("resume") and self.consumer is not None:
+                self.consumer._traffic_limit_triggered = False
+                self.consumer._count_limit_triggered = False
+            else:
+                settings = body.get("settings") or {}
+                ignored = sorted(key for key in settings if key not in self.accepted_settings)
+                if ignored:
+                    self.logger(f"忽略控制器下发的配置项: {', '.join(ignored)}", Fore.YELLOW)
+                settings = {key: value for key, value in settings.items() if key in self.accepted_settings}
+                # 进度由控制器按租约汇总与续发，agent自身不从检查点继续
+                settings["checkpoint"] = False
+                self.consumer = TrafficConsumer(**settings, logger=self.logger)
+            self.lease = body.get("lease") or DEFAULT_LEASE
+            self.apply_budget(body.get("budget") or {})
+
+            self.run_thread = threading.Thread(target=self.consumer.start, name="agent-run", daemon=True)
+            self.run_thread.start()
+            threading.Thread(target=self._watch_lease, args=(self.consumer,), name="agent-lease", daemon=True).start()
+
+        if not body.get("resume"):
+            self.logger(f"开始执行控制器下发的任务: {self.consumer.config_name} "
+                        f"(线程数: {self.consumer.threads})", Fore.CYAN)
+        return 200, self.status()
+
+    def reconfigure(self, settings):
+        """把控制器在运行中修改的配置应用到当前任务"""
+        consumer = self.consumer
+        if consumer is None:
+            return 409, {"error": "agent 没有正在执行的任务"}
+        try:
+            consumer.reconfigure({key: value for key, value in settings.items() if key not in CONTROLLER_SETTINGS})
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        return 200, self.status()
+
+    def apply_budget(self, budget):
+        """应用控制器分配的预算: 流量限制(MB)、下载次数和限速(MB/s)"""
+        consumer = self.consumer
+        if consumer is None:
+            return
+        consumer.traffic_limit = budget.get("traffic_limit")
+        consumer.count = budget.get("count")
+        consumer.limit_speed = budget.get("limit_speed") or 0
+        consumer._apply_rate_limit()
+
+    def stop(self):
+        consumer = self.consumer
+        if consumer is not None and consumer.active:
+            consumer.active = False
+            if self.run_thread:
+                self.run_thread.join(5.0)
+
+    def status(self):
+        consumer = self.consumer
+        if consumer is None:
+            return {"running": False}
+        status = consumer.snapshot(histograms=True)
+        status["running"] = self.running
+        # 因分配的预算用完而停止，追加预算后可以继续
+        status["limit_reached"] = consumer._traffic_limit_triggered or consumer._count_limit_triggered
+        return status
+
+    def _watch_lease(self, consumer):
+        """租约到期仍未收到控制器消息时停止任务"""
+        while self.consumer is consumer and (consumer.active or not consumer.start_time or self.running):
+            if time.time() - self.last_contact > self.lease:
+                self.logger(f"超过 {self.lease} 秒未收到控制器消息，停止任务", Fore.YELLOW)
+                consumer.active = False
+                return
+            time.sleep(1)
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """agent 的HTTP接口，请求体与响应均为JSON"""
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        agent = self.server.agent
+        if not agent.authorized(self.headers.get(AGENT_TOKEN_HEADER)):
+            self._reply(403, {"error": "令牌无效"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            code, payload = agent.handle(method, self.path, body)
+        except Exception as e:
+            code, payload = 500, {"error": str(e)}
+        self._reply(code, payload)
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 控制器每秒轮询，不输出访问日志
+        pass
+
+
+class AgentLink:
+    """控制器一侧记录的单个agent状态"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.reset()
+
+    def reset(self):
+        self.status = {}
+        self.budget = {}
+        self.failures = 0
+        self.started = False
+        self.dropped = False
+        self.speed = 0.0
+        self.last_bytes = 0
+
+    @property
+    def live(self):
+        return self.started and not self.dropped and self.status.get("running", False)
+
+    @property
+    def resumable(self):
+        """已因预算用完而停止，追加预算后可以继续的agent"""
+        return self.started and not self.dropped and not self.live and self.status.get("limit_reached", False)
+
+    def summary(self):
+        state = "掉线" if self.dropped else ("运行中" if self.live else ("已结束" if self.started else "未启动"))
+        return {
+            "url": self.url,
+            "state": state,
+            "threads": self.status.get("threads", 0),
+            "speed": self.speed,
+            "total_bytes": self.status.get("total_bytes", 0),
+            "download_count": self.status.get("download_count", 0)
+        }
+
+
+class DistributedConsumer(TrafficConsumer):
+    """分布式控制器: 对外与 TrafficConsumer 一致，实际流量由各个agent产生"""
+
+    def __init__(self, *args, agents=None, agent_token=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.agents = [AgentLink(url) for url in agents or []]
+        self.agent_token = agent_token if agent_token is not None else os.environ.get(AGENT_TOKEN_ENV)
+        self.rate_limiter = None  # 限速由各agent按分配的预算执行
+        self._session = None
+        self._agent_url_stats = []
+
+    def to_config(self):
+        config = super().to_config()
+        config["agents"] = [agent.url for agent in self.agents]
+        return config
+
+    def agent_summary(self):
+        return [agent.summary() for agent in self.agents]
+
+    def url_stats(self, limit=URL_STATS_LIMIT, ranked=False):
+        """各agent上报的URL统计之和，按完成次数从多到少排列"""
+        return self._agent_url_stats[:limit]
+
+    def url_pool_summary(self):
+        """各agent使用相同的URL来源，取各agent上报的URL池汇总中的最大值"""
+        summaries = [agent.status["url_pool"] for agent in self.agents if agent.status.get("url_pool")]
+        if not summaries:
+            return None
+        summary = dict(summaries[0])
+        for key in ("size", "used", "invalid"):
+            summary[key] = max(item[key] for item in summaries)
+        return summary
+
+    def _request(self, agent, path, payload=None):
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+            if self.agent_token:
+                self._session.headers[AGENT_TOKEN_HEADER] = self.agent_token
+        if payload is None:
+            response = self._session.get(agent.url + path, timeout=REQUEST_TIMEOUT)
+        else:
+            response = self._session.post(agent.url + path, json=payload, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(response.json().get("error", f"HTTP {response.status_code}"))
+        return response.json()
+
+    def reconfigure(self, changes):
+        """预算类配置在下一个分配周期生效，其余可在运行中修改的配置下发给各agent"""
+        applied, restart_required = super().reconfigure(changes)
+        forwarded = {key: getattr(self, key) for key in applied if key not in CONTROLLER_SETTINGS}
+        if forwarded and self.active:
+            for agent in self.agents:
+                if not (agent.live or agent.resumable):
+                    continue
+                try:
+                    agent.status = self._request(agent, "/reconfigure", {"settings": forwarded})
+                except Exception as e:
+                    self.logger(f"agent {agent.url} 更新配置失败: {e}", Fore.YELLOW)
+        return applied, restart_required
+
+    def _resize_workers(self):
+        # 工作线程运行在各agent上，线程数随配置下发
+        pass
+
+    def _apply_rate_limit(self):
+        # 限速由各agent按分配的预算执行
+        pass
+
+    def _agent_settings(self):
+        config = TrafficConsumer.to_config(self)
+        settings = {key: value for key, value in config.items() if key not in CONTROLLER_SETTINGS}
+        settings["config_name"] = self.config_name
+        return settings
+
+    def _run_task(self):
+        """把任务分发给各个agent，并周期性地重新分配预算、汇总统计"""
+        self.active = True
+        self.start_time = time.time()
+        self.status = "正在执行"
+        self._start_series()
+        self._traffic_limit_triggered = False
+        self._count_limit_triggered = False
+
+        for agent in self.agents:
+            agent.reset()
+        self._dispatch()
+
+        stats_thread = None
+        # 仅在CLI模式下启动独立的统计显示线程
+        if self.logger == self._default_logger:
+            stats_thread = threading.Thread(target=self.display_stats)
+            stats_thread.daemon = True
+            stats_thread.start()
+
+        try:
+            while self.active:
+                time.sleep(POLL_INTERVAL)
+                self._poll()
+                self._aggregate()
+                self._record_series()
+                if not self._check_limits():
+                    break
+                # 时长每轮重新读取，运行中修改后立即生效
+                if self.duration and time.time() - self.start_time >= self.duration:
+                    self.active = False
+                    break
+                self._rebalance()
+        except KeyboardInterrupt:
+            self.logger(f"\n{Fore.YELLOW}接收到中断信号，正在停止...{Style.RESET_ALL}")
+        finally:
+            self.active = False
+            self._stop_agents()
+            self._aggregate()
+            self._record_series()
+
+        if stats_thread:
+            stats_thread.join(timeout=2.0)
+
+        self.save_stats()
+        self.logger(f"{Fore.CYAN}任务已停止。{Style.RESET_ALL}")
+
+    def _dispatch(self):
+        """向所有agent下发配置与初始预算"""
+        if not self.agents:
+            self.logger("未配置任何agent，任务将停止。", Fore.RED)
+            self.active = False
+            return
+
+        self._rebalance()
+        settings = self._agent_settings()
+        for agent in self.agents:
+            try:
+                agent.status = self._request(agent, "/run", {
+                    "settings": settings, "budget": agent.budget, "lease": DEFAULT_LEASE
+                })
+                agent.started = True
+                self.logger(f"agent {agent.url} 已开始执行 (线程数: {agent.status.get('threads')})", Fore.CYAN)
+            except Exception as e:
+                agent.dropped = True
+                self.logger(f"agent {agent.url} 启动失败: {e}", Fore.RED)
+
+        if not any(agent.started for agent in self.agents):
+            self.logger("没有可用的agent，任务将停止。", Fore.RED)
+            self.active = False
+
+    def _poll(self):
+        """下发最新预算并收集各agent的统计，连续失败的agent视为掉线"""
+        for agent in self.agents:
+            if not agent.live:
+                continue
+            try:
+                agent.status = self._request(agent, "/budget", {"budget": agent.budget})
+                agent.failures = 0
+            except Exception as e:
+                # 联系不上的agent立即不再参与分配，确认掉线前其已分到的预算也会被收回
+                agent.failures += 1
+                agent.speed = 0.0
+                if agent.failures >= MAX_POLL_FAILURES:
+                    agent.dropped = True
+                    self.logger(f"agent {agent.url} 已掉线 ({e})，其剩余预算将分配给其他agent", Fore.YELLOW)
+                continue
+
+            total = agent.status.get("total_bytes", 0)
+            if agent.status.get("running"):
+                # 停止后保留最后测得的速度，作为追加预算时的权重
+                agent.speed = max(0, total - agent.last_bytes) / POLL_INTERVAL
+            agent.last_bytes = total
+
+    def _aggregate(self):
+        """把各agent最近一次上报的统计汇总到本实例，掉线agent保留其最后的统计"""
+        totals = dict.fromkeys(SNAPSHOT_COUNTERS, 0)
+        # 延迟直方图按桶相加，合并后的分位数与在同一台机器上统计的结果一致
+        response_latency = LatencyHistogram()
+        service_latency = LatencyHistogram()
+        thread_urls = {}
+        url_stats = {}
+        offset = 0
+
+        for agent in self.agents:
+            status = agent.status
+            for key in totals:
+                totals[key] += status.get(key, 0)
+            latency = status.get("latency_histograms", {})
+            response_latency.merge(latency.get("response", {}))
+            service_latency.merge(latency.get("service", {}))
+            for thread_id, url in status.get("thread_status", {}).items():
+                thread_urls[offset + int(thread_id)] = url
+            offset += status.get("threads", 0)
+            for url, count, payload, wire in status.get("url_stats", []):
+                counters = url_stats.setdefault(url, [0, 0, 0])
+                counters[0] += count
+                counters[1] += payload
+                counters[2] += wire
+
+        with self.lock:
+            for key, value in totals.items():
+                setattr(self, key, value)
+            self.response_latency = response_latency
+            self.service_latency = service_latency
+            self.threads = offset or self.threads
+            self.thread_current_urls = thread_urls
+            self._agent_url_stats = sorted(((url, *counters) for url, counters in url_stats.items()),
+                                           key=lambda item: item[1], reverse=True)
+
+    def _check_limits(self):
+        """检查全局限制，返回是否继续运行"""
+        if self._check_traffic_limit():
+            return False
+        if self.count is not None and self.download_count >= self.count:
+            self._stop_due_to_count()
+            return False
+        if not any(agent.live or agent.resumable for agent in self.agents):
+            self.logger("所有agent均已结束或掉线，任务将停止。", Fore.YELLOW)
+            self.active = False
+            return False
+        return True
+
+    def _rebalance(self):
+        """按各agent的实际速度拆分剩余的全局预算"""
+        live = [agent for agent in self.agents
+                if not agent.dropped and (agent.live or agent.resumable or not agent.started)]
+        if not live:
+            return
+
+        # 按实际速度加权，落后的agent分到更少的剩余预算；尚未测得速度的agent给予最低权重
+        weights = {agent.url: agent.speed for agent in live}
+        floor = max(weights.values()) * 0.05
+        if floor > 0:
+            weights = {url: 0.0 if agent.failures else max(weights[url], floor)
+                       for url, agent in zip(weights, live)}
+        if not any(weights.values()):
+            weights = {agent.url: 1.0 for agent in live}
+        weight_sum = sum(weights.values())
+
+        traffic_slices = {}
+        if self.traffic_limit is not None:
+            remaining = max(0, self.traffic_limit * 1024 * 1024 - self.total_bytes)
+            for agent in live:
+                consumed = agent.status.get("total_bytes", 0)
+                traffic_slices[agent.url] = (consumed + remaining * weights[agent.url] / weight_sum) / (1024 * 1024)
+
+        count_slices = {}
+        if self.count is not None:
+            remaining = max(0, self.count - self.download_count)
+            shares = {agent.url: remaining * weights[agent.url] / weight_sum for agent in live}
+            extra = remaining - sum(int(share) for share in shares.values())
+            # 最大余数法，保证拆分后的次数之和等于剩余次数
+            for url in sorted(shares, key=lambda key: shares[key] - int(shares[key]), reverse=True)[:extra]:
+                shares[url] += 1
+            for agent in live:
+                count_slices[agent.url] = agent.status.get("download_count", 0) + int(shares[agent.url])
+
+        rate_slices = {}
+        capacity = self.limit_speed * 1024 * 1024
+        if capacity > 0:
+            demands = {}
+            for agent in live:
+                allocated = agent.budget.get("limit_speed", 0) * 1024 * 1024
+                if agent.started and allocated and agent.speed < allocated * UNDERUSE_RATIO:
+                    demands[agent.url] = max(MIN_JOB_RATE, agent.speed * DEMAND_HEADROOM)
+                else:
+                    demands[agent.url] = capacity
+            allocation = fair_share(capacity, {agent.url: 1.0 for agent in live}, demands)
+            rate_slices = {url: rate / (1024 * 1024) for url, rate in allocation.items()}
+
+        for agent in live:
+            agent.budget = {
+                "traffic_limit": traffic_slices.get(agent.url),
+                "count": count_slices.get(agent.url),
+                "limit_speed": rate_slices.get(agent.url, 0)
+            }
+            if agent.resumable and self._has_budget(agent):
+                self._resume(agent)
+
+    def _has_budget(self, agent):
+        """分配给agent的预算是否超出其已消耗的量"""
+        status, budget = agent.status, agent.budget
+        if budget["traffic_limit"] is not None and \
+                budget["traffic_limit"] * 1024 * 1024 - status.get("total_bytes", 0) < self.chunk_size:
+            return False
+        if budget["count"] is not None and budget["count"] <= status.get("download_count", 0):
+            return False
+        return True
+
+    def _resume(self, agent):
+        """向因预算用完而停止的agent追加预算，继续累计其统计"""
+        try:
+            agent.status = self._request(agent, "/run", {
+                "resume": True, "budget": agent.budget, "lease": DEFAULT_LEASE
+            })
+        except Exception as e:
+            agent.failures += 1
+            self.logger(f"agent {agent.url} 追加预算失败: {e}", Fore.YELLOW)
+
+    def _stop_agents(self):
+        for agent in self.agents:
+            if not agent.started or agent.dropped:
+                continue
+            try:
+                agent.status = self._request(agent, "/stop", {})
+            except Exception as e:
+                self.logger(f"停止agent {agent.url} 失败: {e}", Fore.YELLOW)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+嵌入式接口 - 在自己的程序或测试框架中运行消耗任务，不需要读取 TrafficConsumer 的内部属性
+
+1. run(**settings) 返回运行句柄，配置项与 TrafficConsumer 的构造参数相同；句柄可作为同步或异步
+   上下文管理器使用，进入时在后台线程中启动，退出时停止并等待结束，异步代码中用 await handle.wait() 等待结束
+2. stats() 返回字段固定的统计快照 RunStats，计数在消耗器的一次加锁内复制
+3. metrics(interval) 是异步迭代器，每个周期产生一帧 MetricFrame，运行结束时产生最后一帧后停止；
+   frames(interval) 为同步版本。帧只在迭代方取下一帧时构建，没有订阅者时运行不产生任何额外开销
+4. 未提供 logger 时，日志转发到标准库 logging 的 "traffic_consumer" 记录器，不启动命令行的状态显示
+
+定时任务 (cron_expr、interval) 由调度器管理，不能通过本接口运行。
+
+使用示例:
+    with embed.run(urls=["http://127.0.0.1:8080/1mb"], threads=4, count=100) as handle:
+        stats = handle.join()
+
+    async with embed.run(urls=urls, threads=4, duration=30) as handle:
+        async for frame in handle.metrics(1.0):
+            print(frame.speed)
+"""
+
+import re
+import time
+import asyncio
+import logging
+import threading
+
+from colorama import Fore
+
+from traffic_consumer import TrafficConsumer, SNAPSHOT_COUNTERS
+
+LOGGER_NAME = "traffic_consumer"
+DEFAULT_FRAME_INTERVAL = 1.0  # 指标帧的默认周期，单位秒
+STOP_POLL = 0.1  # 停止时重复清除运行标志的周期，单位秒；运行在预检与预热之后才置位运行标志
+SCHEDULE_SETTINGS = ("cron_expr", "interval")
+LOG_LEVELS = {Fore.RED: logging.ERROR, Fore.YELLOW: logging.WARNING}
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+LEADING_COLOR = re.compile(r"\s*(\x1b\[[0-9;]*m)")
+
+# RunStats 的字段，与消耗器快照中的同名键一致
+STATS_FIELDS = ("running", "state", "config", "mode", "threads", "elapsed", "speed") + SNAPSHOT_COUNTERS + (
+    "thread_status", "url_stats", "latency", "verification", "reconcile", "governor", "sources", "memory")
+
+
+def logging_logger(name=LOGGER_NAME):
+    """把消耗器的日志转发到标准库 logging: 红色为 ERROR，黄色为 WARNING，其余为 INFO，颜色控制符被去掉"""
+    log = logging.getLogger(name)
+
+    def logger(message, color=None):
+        message = str(message)
+        if color is None:
+            # 部分消息把颜色写在文本开头
+            match = LEADING_COLOR.match(message)
+            color = match.group(1) if match else None
+        level = LOG_LEVELS.get(color, logging.INFO)
+        if log.isEnabledFor(level):
+            log.log(level, ANSI_ESCAPE.sub("", message).strip())
+    return logger
+
+
+class RunStats:
+    """一次运行的统计快照
+
+    running (bool) 运行标志，state (str) 状态描述，config (str) 配置名，mode (str) 运行模式，
+    threads (int) 线程数，elapsed (float) 本次运行的秒数，speed (float) 平均速度，单位字节/秒；
+    计数 (int): total_bytes、payload_bytes、wire_bytes、upload_bytes、upload_count、download_count、
+    verify_passed、verify_failed、verify_skipped、arrival_missed、interface_bytes；
+    thread_status (dict) 线程编号 -> 当前URL，url_stats (list) 各URL的使用次数与字节，
+    latency (dict) 延迟分位数；verification、reconcile、governor、sources、memory 未启用时为None
+    """
+
+    __slots__ = STATS_FIELDS
+
+    def __init__(self, snapshot):
+        for key in STATS_FIELDS:
+            setattr(self, key, snapshot.get(key))
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in STATS_FIELDS}
+
+    def __repr__(self):
+        return (f"RunStats(running={self.running}, elapsed={self.elapsed:.1f}, total_bytes={self.total_bytes}, "
+                f"download_count={self.download_count}, speed={self.speed:.0f})")
+
+
+class MetricFrame:
+    """一帧指标: 与上一帧之间的字节增量与速度，以及取帧时的统计快照
+
+    timestamp (float) 取帧时的 Unix 时间，elapsed (float) 本次运行的秒数，interval (float) 距上一帧的秒数，
+    bytes (int) 这段时间内计量的字节数，speed (float) 这段时间的速度，单位字节/秒，
+    final (bool) 是否为运行结束后的最后一帧，stats (RunStats)
+    """
+
+    __slots__ = ("timestamp", "elapsed", "interval", "bytes", "speed", "final", "stats")
+
+    def __init__(self, timestamp, elapsed, interval, bytes, speed, final, stats):
+        self.timestamp = timestamp
+        self.elapsed = elapsed
+        self.interval = interval
+        self.bytes = bytes
+        self.speed = speed
+        self.final = final
+        self.stats = stats
+
+    def __repr__(self):
+        return (f"MetricFrame(elapsed={self.elapsed:.1f}, bytes={self.bytes}, speed={self.speed:.0f}, "
+                f"final={self.final})")
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Run:
+    """一次在后台线程中执行的消耗任务
+
+    consumer 为底层的 TrafficConsumer；运行线程抛出的异常保存在 error 中，由 join() 与 wait() 重新抛出
+    """
+
+    def __init__(self, **settings):
+        for key in SCHEDULE_SETTINGS:
+            if settings.get(key):
+                raise ValueError(f"定时任务由调度器管理，嵌入式接口不支持 {key}")
+        if not settings.get("logger"):
+            settings["logger"] = logging_logger()
+        self.consumer = TrafficConsumer(**settings)
+        self.error = None
+        self._thread = None
+        self._done = threading.Event()
+        self._waiters = []  # 等待运行结束的异步调用方 (事件循环, Future)
+        self._waiters_lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        """在后台线程中启动运行，返回句柄本身；每个句柄只能启动一次"""
+        if self._thread is not None:
+            raise RuntimeError("运行已经启动")
+        self._thread = threading.Thread(target=self._run, name=f"embed-{self.consumer.config_name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.consumer.start()
+        except Exception as e:
+            self.error = e
+            self.consumer.logger(f"运行出错: {e}", Fore.RED)
+        finally:
+            with self._waiters_lock:
+                self._done.set()
+                waiters, self._waiters = self._waiters, []
+            for loop, future in waiters:
+                try:
+                    loop.call_soon_threadsafe(_resolve, future)
+                except RuntimeError:
+                    # 等待方的事件循环已经关闭
+                    pass
+
+    def stats(self):
+        """当前的统计快照"""
+        return RunStats(self.consumer.snapshot())
+
+    def reconfigure(self, settings):
+        """运行中修改配置，返回 (已生效的配置项, 需要重启的配置项)"""
+        return self.consumer.reconfigure(settings)
+
+    def stop(self, timeout=None):
+        """停止运行并等待结束，返回最终的统计快照；timeout 秒内未结束时返回当时的快照"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._thread is not None and not self._done.is_set():
+            self.consumer.active = False
+            wait = STOP_POLL if deadline is None else min(STOP_POLL, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            self._done.wait(wait)
+        return self.stats()
+
+    def join(self, timeout=None):
+        """等待运行自行结束 (达到限制或被停止)，返回统计快照；运行线程出错时重新抛出其异常"""
+        if self._thread is None:
+            raise RuntimeError("运行尚未启动")
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def _completion(self, loop):
+        """运行结束时在 loop 中完成的 Future"""
+        future = loop.create_future()
+        with self._waiters_lock:
+            if self._done.is_set():
+                future.set_result(None)
+            else:
+                self._waiters.append((loop, future))
+        return future
+
+    def _discard(self, loop, future):
+        with self._waiters_lock:
+            if (loop, future) in self._waiters:
+                self._waiters.remove((loop, future))
+
+    async def wait(self):
+        """异步等待运行结束，返回统计快照；运行线程出错时重新抛出其异常"""
+        if self._thread is None:
+            raise RuntimeError("运行尚未启动")
+        loop = asyncio.get_running_loop()
+        future = self._completion(loop)
+        try:
+            await future
+        finally:
+            self._discard(loop, future)
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def _mark(self):
+        return time.monotonic(), self.consumer.total_bytes
+
+    def _frame(self, last, final):
+        """构建一帧，last 为上一帧的 (时刻, 字节数)，返回 (帧, 本帧的时刻与字节数)"""
+        stats = self.stats()
+        now = time.monotonic()
+        interval = now - last[0]
+        delta = max(0, stats.total_bytes - last[1])
+        frame = MetricFrame(time.time(), stats.elapsed, interval, delta,
+                            delta / interval if interval > 0 else 0.0, final, stats)
+        return frame, (now, stats.total_bytes)
+
+    def frames(self, interval=DEFAULT_FRAME_INTERVAL):
+        """同步迭代指标帧，每 interval 秒一帧，运行结束时产生最后一帧 (final 为真) 后停止"""
+        if self._thread is None:
+            raise RuntimeError("运行尚未启动")
+        last = self._mark()
+        while True:
+            final = self._done.wait(interval)
+            frame, last = self._frame(last, final)
+            yield frame
+            if final:
+                return
+
+    async def metrics(self, interval=DEFAULT_FRAME_INTERVAL):
+        """异步迭代指标帧，每 interval 秒一帧，运行结束时产生最后一帧 (final 为真) 后停止"""
+        if self._thread is None:
+            raise RuntimeError("运行尚未启动")
+        loop = asyncio.get_running_loop()
+        done = self._completion(loop)
+        last = self._mark()
+        try:
+            while True:
+                # asyncio.wait 超时不会取消 done，整个迭代只注册一次
+                await asyncio.wait({done}, timeout=interval)
+                final = done.done()
+                frame, last = self._frame(last, final)
+                yield frame
+                if final:
+                    return
+        finally:
+            self._discard(loop, done)
+
+    def __enter__(self):
+        if self._thread is None:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 停止需要等待工作线程退出，放到线程池中执行，不阻塞事件循环
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+        return False
+
+
+def run(**settings):
+    """创建运行句柄，配置项与 TrafficConsumer 的构造参数相同；作为上下文管理器使用时进入即启动，否则调用 start()"""
+    return Run(**settings)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+完整性校验 - 抽样校验下载内容，摘要计算不占用下载线程
+
+1. 只对校验清单中列出的URL按 verify_sample 的比例抽样，下载线程只把收到的分块
+   放入校验线程的队列，不做解压与摘要计算
+2. 校验线程按 Content-Encoding 解压并增量计算摘要 (hashlib 在计算较大的分块时
+   释放GIL)，下载完整结束后与清单中的期望摘要和长度比较
+3. 每个抽样固定交给同一个校验线程，保证分块按顺序计算；校验跟不上下载时
+   (队列已过半时不再抽样，已满时放弃进行中的抽样) 记为放弃，不阻塞下载
+
+校验清单每行一个URL，其后是可选的 `算法:十六进制摘要` 与期望长度 (解码后的字节数)，
+空行与 # 开头的行会被忽略，例如:
+    https://cdn.example.com/a.bin sha256:9f86d081884c7d65... 10485760
+    https://cdn.example.com/b.bin 2097152
+"""
+
+import gzip
+import queue
+import random
+import hashlib
+import threading
+import itertools
+import zlib
+
+VERIFY_WORKERS = 2  # 校验线程数
+MAX_PENDING_CHUNKS = 128  # 每个校验线程最多排队的分块数，分块为256KB时约32MB
+DECODE_CHUNK = 256 * 1024  # 解压时单次输出的上限，限制内存占用
+
+
+class Expectation:
+    """一个URL的期望摘要与长度，未给出的项为None"""
+
+    __slots__ = ("algorithm", "digest", "length")
+
+    def __init__(self, algorithm=None, digest=None, length=None):
+        self.algorithm = algorithm
+        self.digest = digest
+        self.length = length
+
+
+def load_manifest(path):
+    """读取校验清单 {url: Expectation}，格式错误时抛出 ValueError 并指出行号"""
+    opener = gzip.open if path.endswith(".gz") else open
+    expectations = {}
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            try:
+                expectations[fields[0]] = _parse_expectation(fields[1:])
+            except ValueError as e:
+                raise ValueError(f"校验清单 {path} 第{line_no}行: {e}") from None
+    if not expectations:
+        raise ValueError(f"校验清单 {path} 中没有URL")
+    return expectations
+
+
+def _parse_expectation(fields):
+    expected = Expectation()
+    for field in fields:
+        if field.isdigit():
+            expected.length = int(field)
+            continue
+        algorithm, _, digest = field.partition(":")
+        algorithm = algorithm.lower()
+        if not digest or algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"无法识别的字段 {field!r}，应为 算法:摘要 或长度")
+        expected.algorithm = algorithm
+        expected.digest = digest.lower()
+    if expected.digest is None and expected.length is None:
+        raise ValueError("缺少期望的摘要或长度")
+    return expected
+
+
+class _Sample:
+    """一次被抽中的下载: 分块由下载线程放入队列，解压与摘要在校验线程中进行"""
+
+    __slots__ = ("verifier", "url", "expected", "tasks", "hasher", "decoder", "length", "dropped")
+
+    def __init__(self, verifier, url, expected, encoding, tasks):
+        self.verifier = verifier
+        self.url = url
+        self.expected = expected
+        self.tasks = tasks
+        self.hasher = hashlib.new(expected.algorithm) if expected.digest else None
+        self.decoder = None
+        if encoding == "gzip":
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self.decoder = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        self.length = 0
+        self.dropped = False
+
+    def feed(self, chunk):
+        """下载线程调用: 把分块交给校验线程，队列已满时放弃本次抽样"""
+        if self.dropped:
+            return
+        try:
+            self.tasks.put_nowait((self, chunk))
+        except queue.Full:
+            self.dropped = True
+            self.verifier.on_result(self.url, None, "校验队列已满")
+
+    def finish(self, completed):
+        """下载结束: 完整结束时排队比较结果，否则放弃本次抽样"""
+        if completed:
+            self.feed(None)
+        else:
+            self.dropped = True
+
+    def update(self, data):
+        """校验线程调用: 解压并累计摘要与长度"""
+        if self.decoder is None:
+            self._digest(data)
+            return
+        while data:
+            self._digest(self.decoder.decompress(data, DECODE_CHUNK))
+            data = self.decoder.unconsumed_tail
+
+    def _digest(self, data):
+        self.length += len(data)
+        if self.hasher is not None:
+            self.hasher.update(data)
+
+    def result(self):
+        """(是否通过, 不通过的原因)"""
+        if self.decoder is not None:
+            self._digest(self.decoder.flush())
+        expected = self.expected
+        if expected.length is not None and self.length != expected.length:
+            return False, f"长度 {self.length}，期望 {expected.length}"
+        if self.hasher is not None and self.hasher.hexdigest() != expected.digest:
+            return False, f"{expected.algorithm} 摘要 {self.hasher.hexdigest()}，期望 {expected.digest}"
+        return True, None
+
+
+class IntegrityVerifier:
+    """按比例抽样下载并在独立的线程中校验
+
+    on_result(url, passed, detail): passed 为 True/False 表示通过或不通过，
+    为 None 表示校验跟不上下载而放弃了该抽样
+    """
+
+    def __init__(self, expectations, on_result, workers=VERIFY_WORKERS, max_pending=MAX_PENDING_CHUNKS):
+        self.expectations = expectations
+        self.on_result = on_result
+        self.queues = [queue.Queue(max_pending) for _ in range(max(1, workers))]
+        self._turns = itertools.count()
+        for i, tasks in enumerate(self.queues):
+            threading.Thread(target=self._work, args=(tasks,), name=f"verify-{i + 1}", daemon=True).start()
+
+    def begin(self, url, encoding, sample_rate):
+        """决定是否抽样这次下载，抽中时返回 _Sample，否则返回None"""
+        expected = self.expectations.get(url)
+        if expected is None or random.random() >= sample_rate:
+            return None
+        tasks = self.queues[next(self._turns) % len(self.queues)]
+        if tasks.qsize() * 2 > tasks.maxsize:
+            # 校验线程积压过多，新的抽样大概率无法完成，直接放弃
+            self.on_result(url, None, "校验线程繁忙")
+            return None
+        return _Sample(self, url, expected, (encoding or "").strip().lower(), tasks)
+
+    def drain(self):
+        """等待已排队的分块全部校验完毕"""
+        for tasks in self.queues:
+            tasks.join()
+
+    def _work(self, tasks):
+        while True:
+            sample, chunk = tasks.get()
+            try:
+                if sample.dropped:
+                    continue
+                if chunk is None:
+                    passed, detail = sample.result()
+                    self.on_result(sample.url, passed, detail)
+                else:
+                    sample.update(chunk)
+            except zlib.error as e:
+                sample.dropped = True
+                self.on_result(sample.url, False, f"解压失败: {e}")
+            finally:
+                tasks.task_done()
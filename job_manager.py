@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多任务管理器 - 在同一进程内同时运行多个命名的 TrafficConsumer 任务
+
+1. 所有任务共享一个有上限的工作线程池和一个HTTP连接池
+2. 设置总带宽后，每秒按权重做一次最大最小公平分配: 用不满份额的任务
+   (自身限速或源站较慢) 让出的带宽按权重分给其他任务
+3. 提供按任务的状态查询与启停、调权控制，供 Web UI 的 Socket.IO 与 REST 接口使用
+"""
+
+import time
+import inspect
+import threading
+
+from traffic_consumer import TrafficConsumer, RateLimiter, DEFAULT_MAX_WORKERS, DEFAULT_DNS_TTL, DEFAULT_SOCKET_PROFILE
+
+DEFAULT_POOL_HOSTS = 16  # 共享连接池缓存的主机数
+REBALANCE_INTERVAL = 1.0  # 带宽重新分配周期，单位秒
+MIN_JOB_RATE = 64 * 1024  # 每个任务的最低带宽，保证其能探测到可用带宽的增长，单位字节/秒
+UNDERUSE_RATIO = 0.8  # 实际速率低于分配值的该比例时，认为任务用不满份额
+DEMAND_HEADROOM = 1.25  # 用不满份额的任务按实际速率的该倍数申请带宽
+
+# 多任务中不使用的配置项: 定时任务仍由主面板管理
+IGNORED_SETTINGS = ("cron_expr", "interval", "misfire_grace_time", "coalesce")
+
+# 任务可接受的配置项，回调与配置名由管理器提供
+JOB_SETTINGS = set(inspect.signature(TrafficConsumer.__init__).parameters) - {
+    "self", "config_name", "logger", "history_callback", "invalid_url_callback"
+} - set(IGNORED_SETTINGS)
+
+
+def fair_share(capacity, weights, demands):
+    """加权最大最小公平分配，需求得到满足后的剩余容量按权重分给所有任务"""
+    allocation = {key: 0.0 for key in weights}
+    active = {key for key in weights if demands.get(key, 0) > 0 and weights[key] > 0}
+    remaining = float(capacity)
+
+    while active and remaining > 1e-6:
+        unit = remaining / sum(weights[key] for key in active)
+        satisfied = [key for key in active if demands[key] - allocation[key] <= weights[key] * unit]
+        if not satisfied:
+            for key in active:
+                allocation[key] += weights[key] * unit
+            remaining = 0.0
+            break
+        for key in satisfied:
+            remaining -= demands[key] - allocation[key]
+            allocation[key] = float(demands[key])
+            active.discard(key)
+
+    # 所有需求都已满足时把余量按权重分出去，便于需求增长的任务下个周期提速
+    total_weight = sum(weight for weight in weights.values() if weight > 0)
+    if remaining > 1e-6 and total_weight:
+        for key, weight in weights.items():
+            if weight > 0:
+                allocation[key] += remaining * weight / total_weight
+    return allocation
+
+
+class ManagedJob:
+    """管理器中的单个任务及其调度状态"""
+
+    def __init__(self, name, consumer, weight):
+        self.name = name
+        self.consumer = consumer
+        self.weight = weight
+        self.thread = None
+        self.allocated_rate = 0.0  # 当前分到的带宽，单位字节/秒，0表示不限
+        self.recent_speed = 0.0  # 最近一个分配周期的实际速率，单位字节/秒
+        self.last_bytes = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def status(self):
+        consumer = self.consumer
+        return {
+            "name": self.name,
+            "running": self.running,
+            "weight": self.weight,
+            "threads": consumer.threads,
+            "mode": consumer.mode,
+            "speed": self.recent_speed,
+            "allocated_rate": self.allocated_rate,
+            "limit_speed": consumer.limit_speed,
+            "total_bytes": consumer.total_bytes,
+            "download_count": consumer.download_count,
+            "upload_bytes": consumer.upload_bytes,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "state": consumer.status if self.running else "已结束"
+        }
+
+
+class JobManager:
+    """在同一进程内运行多个任务，共享工作线程与连接池并按权重分配带宽"""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, total_limit=0,
+                 logger=None, history_callback=None, invalid_url_callback=None):
+        self.max_workers = max(1, max_workers)
+        self.total_limit = total_limit or 0  # 所有任务的总带宽，单位MB/s，0表示不限
+        self.logger = logger
+        self.history_callback = history_callback
+        self.invalid_url_callback = invalid_url_callback
+
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self._adapter = None
+        self._rebalancer = None
+
+    def configure(self, max_workers=None, total_limit=None):
+        """调整工作线程上限与总带宽，并立即重新分配"""
+        with self.lock:
+            if max_workers is not None:
+                self.max_workers = max(1, max_workers)
+            if total_limit is not None:
+                self.total_limit = max(0, total_limit)
+        self._rebalance()
+
+    @property
+    def used_workers(self):
+        return sum(job.consumer.threads for job in self.jobs.values() if job.running)
+
+    def _shared_adapter(self):
+        """所有任务共享的连接池与解析缓存，连接数上限与工作线程上限一致"""
+        if self._adapter is None:
+            from transport import ResolverCache, SpreadingAdapter
+
+            self._adapter = SpreadingAdapter(ResolverCache(DEFAULT_DNS_TTL), pool_connections=DEFAULT_POOL_HOSTS,
+                                             pool_maxsize=self.max_workers, max_retries=0)
+        return self._adapter
+
+    def _job_logger(self, name):
+        def log(message, color=None):
+            if self.logger:
+                self.logger(f"[{name}] {message}", color)
+        return log
+
+    def start_job(self, name, settings, weight=1.0):
+        """启动一个命名任务，返回实际分配的线程数；名称冲突或线程池已满时抛出 ValueError"""
+        if not name:
+            raise ValueError("任务名称不能为空")
+        weight = float(weight) if weight else 1.0
+        if weight <= 0:
+            raise ValueError("任务权重必须大于0")
+
+        settings = {key: value for key, value in (settings or {}).items() if key in JOB_SETTINGS}
+
+        with self.lock:
+            existing = self.jobs.get(name)
+            if existing and existing.running:
+                raise ValueError(f"任务 '{name}' 已在运行")
+
+            free_workers = self.max_workers - self.used_workers
+            if free_workers <= 0:
+                raise ValueError(f"工作线程已全部占用 ({self.max_workers})，请先停止其他任务")
+
+            consumer = TrafficConsumer(
+                **settings,
+                config_name=name,
+                logger=self._job_logger(name),
+                history_callback=self.history_callback,
+                invalid_url_callback=self.invalid_url_callback
+            )
+            requested = consumer.threads
+            consumer.threads = max(1, min(requested, free_workers))
+            # 指定了套接字参数、静态解析或非默认解析缓存时间的任务使用自己的连接池与解析缓存，不改变其他任务的连接与解析
+            if consumer.socket_profile == DEFAULT_SOCKET_PROFILE and not consumer.resolve \
+                    and consumer.dns_ttl == DEFAULT_DNS_TTL:
+                consumer.http_adapter = self._shared_adapter()
+            if self.total_limit > 0:
+                # 由管理器统一分配带宽，自身的限速作为该任务的需求上限
+                consumer.rate_limiter = RateLimiter(MIN_JOB_RATE)
+
+            job = ManagedJob(name, consumer, weight)
+            job.thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{name}", daemon=True)
+            self.jobs[name] = job
+            job.thread.start()
+            self._ensure_rebalancer()
+
+        if consumer.threads < requested:
+            consumer.logger(f"工作线程不足，线程数由 {requested} 调整为 {consumer.threads}")
+        self._rebalance()
+        return consumer.threads
+
+    def _run_job(self, job):
+        try:
+            job.consumer.start()
+        finally:
+            job.finished_at = time.time()
+            job.allocated_rate = 0.0
+            job.recent_speed = 0.0
+
+    def stop_job(self, name, timeout=5.0):
+        """停止任务，任务记录保留到被移除为止"""
+        with self.lock:
+            job = self.jobs.get(name)
+        if job is None:
+            raise KeyError(name)
+        job.consumer.active = False
+        if job.thread:
+            job.thread.join(timeout)
+        self._rebalance()
+        return job
+
+    def remove_job(self, name):
+        """停止并移除任务"""
+        self.stop_job(name)
+        with self.lock:
+            self.jobs.pop(name, None)
+
+    def reconfigure_job(self, name, settings):
+        """在运行中修改任务配置，返回 (已生效的配置项, 需要重启的配置项)；线程数受共享线程上限约束"""
+        settings = {key: value for key, value in (settings or {}).items() if key not in IGNORED_SETTINGS}
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                raise KeyError(name)
+            if not job.running:
+                raise ValueError(f"任务 '{name}' 未在运行")
+            consumer = job.consumer
+            requested = None
+            if settings.get("threads") is not None:
+                requested = consumer._normalize_setting("threads", settings["threads"])
+                free_workers = self.max_workers - self.used_workers + consumer.threads
+                settings["threads"] = min(requested, free_workers)
+
+        applied, restart_required = consumer.reconfigure(settings)
+        if requested is not None and settings["threads"] < requested:
+            consumer.logger(f"工作线程不足，线程数由 {requested} 调整为 {settings['threads']}")
+        # 限速变化后重新分配，总带宽由管理器统一控制时覆盖任务自身的限速器
+        self._rebalance()
+        return applied, restart_required
+
+    def set_weight(self, name, weight):
+        """调整任务权重，立即重新分配带宽"""
+        weight = float(weight)
+        if weight <= 0:
+            raise ValueError("任务权重必须大于0")
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                raise KeyError(name)
+            job.weight = weight
+        self._rebalance()
+
+    def status(self):
+        """所有任务的状态及资源占用"""
+        with self.lock:
+            jobs = [job.status() for job in self.jobs.values()]
+            return {
+                "jobs": jobs,
+                "max_workers": self.max_workers,
+                "used_workers": self.used_workers,
+                "total_limit": self.total_limit
+            }
+
+    def _ensure_rebalancer(self):
+        """启动分配线程，调用方需持有 self.lock"""
+        if self._rebalancer is not None:
+            return
+        self._rebalancer = threading.Thread(target=self._rebalance_loop, name="job-rebalancer", daemon=True)
+        self._rebalancer.start()
+
+    def _rebalance_loop(self):
+        while True:
+            time.sleep(REBALANCE_INTERVAL)
+            self._rebalance(measure=True)
+            with self.lock:
+                if not any(job.running for job in self.jobs.values()):
+                    # 没有运行中的任务时退出并释放共享连接池
+                    self._rebalancer = None
+                    if self._adapter is not None:
+                        self._adapter.close()
+                        self._adapter = None
+                    return
+
+    def _rebalance(self, measure=False):
+        """测量各任务的实际速率并按权重重新分配总带宽"""
+        with self.lock:
+            running = [job for job in self.jobs.values() if job.running]
+            if measure:
+                for job in running:
+                    total = job.consumer.total_bytes
+                    job.recent_speed = max(0, total - job.last_bytes) / REBALANCE_INTERVAL
+                    job.last_bytes = total
+
+            capacity = self.total_limit * 1024 * 1024
+            if capacity <= 0:
+                # 不限总带宽时恢复各任务自身的限速
+                for job in running:
+                    job.allocated_rate = 0.0
+                    if job.consumer.rate_limiter is not None:
+                        job.consumer.rate_limiter.set_rate(int(job.consumer.limit_speed * 1024 * 1024))
+                return
+            if not running:
+                return
+
+            weights = {job.name: job.weight for job in running}
+            demands = {job.name: self._demand(job, capacity) for job in running}
+            allocation = fair_share(capacity, weights, demands)
+            for job in running:
+                job.allocated_rate = max(MIN_JOB_RATE, allocation[job.name])
+                if job.consumer.rate_limiter is None:
+                    job.consumer.rate_limiter = RateLimiter(job.allocated_rate)
+                else:
+                    job.consumer.rate_limiter.set_rate(job.allocated_rate)
+
+    @staticmethod
+    def _demand(job, capacity):
+        """估计任务的带宽需求: 自身限速为上限，明显用不满份额时按实际速率申请"""
+        cap = job.consumer.limit_speed * 1024 * 1024 if job.consumer.limit_speed else capacity
+        if job.allocated_rate and job.recent_speed < job.allocated_rate * UNDERUSE_RATIO:
+            return min(cap, max(MIN_JOB_RATE, job.recent_speed * DEMAND_HEADROOM))
+        return cap
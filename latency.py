@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+延迟直方图 - 按对数分桶统计请求耗时，内存固定，可合并
+
+桶宽为相对精度 PRECISION (1%)，覆盖 MIN_SECONDS 到 MAX_SECONDS，超出范围的值记在两端的桶中。
+与 URL 池的计数数组一样，由调用方在自己的锁内调用 record。
+"""
+
+import math
+from array import array
+
+PRECISION = 0.01
+MIN_SECONDS = 1e-5  # 10微秒
+MAX_SECONDS = 3600.0
+_LOG_BASE = math.log1p(PRECISION)
+BUCKETS = int(math.log(MAX_SECONDS / MIN_SECONDS) / _LOG_BASE) + 2
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+
+class LatencyHistogram:
+    """请求耗时的直方图，单位秒"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = array("Q", [0]) * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def copy(self):
+        """复制当前的计数，调用方在锁内复制后可以在锁外计算分位数"""
+        other = LatencyHistogram.__new__(LatencyHistogram)
+        other.counts = array("Q", self.counts)
+        other.count = self.count
+        other.total = self.total
+        other.max = self.max
+        return other
+
+    @staticmethod
+    def _bucket(seconds):
+        if seconds <= MIN_SECONDS:
+            return 0
+        return min(BUCKETS - 1, int(math.log(seconds / MIN_SECONDS) / _LOG_BASE) + 1)
+
+    @staticmethod
+    def _bucket_value(index):
+        """桶的上界，作为落在该桶中的耗时的代表值"""
+        return MIN_SECONDS * (1 + PRECISION) ** index
+
+    def record(self, seconds):
+        self.counts[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * fraction))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """次数、平均值、各分位数与最大值，单位毫秒"""
+        result = {"count": self.count, "mean": self.total / self.count * 1000 if self.count else 0.0}
+        for key, fraction in PERCENTILES:
+            result[key] = self.percentile(fraction) * 1000
+        result["max"] = self.max * 1000
+        return result
+
+    def to_dict(self):
+        """可序列化的稀疏表示，用于agent上报"""
+        return {
+            "buckets": {str(index): count for index, count in enumerate(self.counts) if count},
+            "total": self.total,
+            "max": self.max
+        }
+
+    def merge(self, data):
+        """合并 to_dict() 的结果"""
+        for index, count in data.get("buckets", {}).items():
+            self.counts[int(index)] += count
+            self.count += count
+        self.total += data.get("total", 0.0)
+        self.max = max(self.max, data.get("max", 0.0))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+内存预算 - 按内存上限规划线程数、线程栈、分块大小与内存中的统计，运行中监控本进程的 RSS
+
+1. 规划: 预算减去规划时进程已占用的 RSS (解释器、已导入的模块与URL池) 和保留量后分给工作线程；
+   每个线程按 WORKER_OVERHEAD 加上分块缓冲估算，先把分块逐次减半 (不小于 MIN_CHUNK_SIZE)，仍放不下时减少线程数
+2. 线程栈: 工作线程以 WORKER_STACK_SIZE 创建。默认的8MB栈只有用到的页计入 RSS，但在关闭内存超额分配的
+   系统与32位系统上按整个栈计算
+3. glibc: 限制 malloc arena 数 (默认每核8个，线程多时碎片使 RSS 随运行时间增长)；
+   RSS 超过预算的 TRIM_RATIO 时把空闲的堆内存归还系统
+4. 报告: 从 /proc/self/smaps 把 RSS 分为线程栈、堆与匿名内存、文件映射 (代码与共享库) 和其他；
+   峰值取 VmHWM，运行开始时清零 (Linux 4.0+)，无法清零时为进程启动以来的峰值
+"""
+
+import os
+import re
+
+MB = 1024 * 1024
+WORKER_OVERHEAD = 64 * 1024  # 每个工作线程除分块缓冲外的估计占用: 用到的栈、会话、连接与读缓冲
+WORKER_STACK_SIZE = 256 * 1024  # 工作线程的栈大小
+MIN_CHUNK_SIZE = 16 * 1024  # 规划时分块的下限，更小的分块使每字节的CPU开销明显增加
+MIN_RESERVE = 4 * MB  # 保留给统计、日志、短时线程与堆碎片的最小内存
+RESERVE_RATIO = 0.1  # 保留量占预算的比例，与 MIN_RESERVE 取大者
+HISTORY_ENTRIES = 10  # 内存中保留的运行历史条数
+VERIFY_PENDING = 8  # 每个校验线程最多排队的分块数
+MALLOC_ARENAS = 2  # glibc malloc 的 arena 上限
+TRIM_RATIO = 0.9  # RSS 超过预算的该比例时归还空闲的堆内存
+GUARD_MAX_KB = 64  # 线程栈下方保护页映射的最大大小，单位KB
+
+STATUS_FIELDS = {"VmRSS": "rss", "VmHWM": "peak", "RssAnon": "anon", "RssFile": "file"}
+MAPPING = re.compile(r"^([0-9a-f]+)-([0-9a-f]+) (\S+) \S+ \S+ (\d+)\s*(.*)$")
+BREAKDOWN_KEYS = ("stacks", "heap", "files", "other")
+
+_libc = None
+
+
+def read_status():
+    """本进程的 RSS、峰值 RSS、匿名与文件映射部分，单位字节；没有 /proc 时返回None"""
+    try:
+        with open("/proc/self/status") as f:
+            status = {}
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in STATUS_FIELDS:
+                    status[STATUS_FIELDS[key]] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return status if "rss" in status else None
+
+
+def reset_peak():
+    """把 VmHWM 清零为当前的 RSS，成功时返回True"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def breakdown():
+    """按映射类型拆分的 RSS，单位字节；没有 /proc/self/smaps 时返回None
+
+    线程栈为 [stack] 与紧跟在保护页 (不可访问的小块匿名映射) 之后的匿名映射；
+    堆与匿名内存含 Python 对象、分块缓冲与连接；文件映射为解释器、扩展模块与共享库的代码和数据
+    """
+    totals = dict.fromkeys(BREAKDOWN_KEYS, 0)
+    try:
+        with open("/proc/self/smaps") as f:
+            kind = None
+            guard_end = None
+            for line in f:
+                match = MAPPING.match(line)
+                if match is not None:
+                    start, end, perms, inode, path = match.groups()
+                    start, end = int(start, 16), int(end, 16)
+                    anonymous = inode == "0" and (not path or path.startswith("[anon"))
+                    if path == "[stack]" or (anonymous and start == guard_end):
+                        kind = "stacks"
+                    elif anonymous or path == "[heap]":
+                        kind = "heap"
+                    elif path.startswith("/"):
+                        kind = "files"
+                    else:
+                        kind = "other"
+                    small_guard = anonymous and perms.startswith("---") and end - start <= GUARD_MAX_KB * 1024
+                    guard_end = end if small_guard else None
+                elif kind is not None and line.startswith("Rss:"):
+                    totals[kind] += int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return totals
+
+
+def _glibc():
+    """glibc 的 ctypes 句柄，其他C库或平台上返回None"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        try:
+            if os.confstr("CS_GNU_LIBC_VERSION"):
+                import ctypes
+                _libc = ctypes.CDLL(None)
+        except (AttributeError, ValueError, OSError):
+            pass
+    return _libc or None
+
+
+def limit_arenas(count=MALLOC_ARENAS):
+    """限制 glibc malloc 的 arena 数，只影响之后新建的 arena；成功时返回True"""
+    libc = _glibc()
+    return bool(libc is not None and libc.mallopt(-8, count))  # M_ARENA_MAX
+
+
+def trim():
+    """把空闲的堆内存归还系统，成功时返回True"""
+    libc = _glibc()
+    return bool(libc is not None and libc.malloc_trim(0))
+
+
+def worker_cost(chunk_size, buffers):
+    """一个工作线程的估计占用，buffers 为每个线程同时持有的分块数"""
+    return WORKER_OVERHEAD + buffers * chunk_size
+
+
+def plan_budget(budget, baseline, threads, chunk_size, buffers=1, verify_workers=0):
+    """按预算规划线程数与分块大小，单位字节；预算放不下一个线程时抛出 ValueError
+
+    baseline 为规划时进程已占用的 RSS，verify_workers 为抽样校验线程数，0表示不校验
+    """
+    reserve = max(MIN_RESERVE, int(budget * RESERVE_RATIO))
+    chunk = chunk_size
+    available = budget - baseline - reserve - verify_workers * VERIFY_PENDING * chunk
+    while chunk > MIN_CHUNK_SIZE and threads * worker_cost(chunk, buffers) > available:
+        chunk = max(MIN_CHUNK_SIZE, chunk // 2)
+        available = budget - baseline - reserve - verify_workers * VERIFY_PENDING * chunk
+    fits = int(available // worker_cost(chunk, buffers))
+    if fits < 1:
+        needed = baseline + reserve + verify_workers * VERIFY_PENDING * chunk + worker_cost(chunk, buffers)
+        raise ValueError(f"内存预算 {budget / MB:.0f} MB 不足: 进程已占用 {baseline / MB:.1f} MB，"
+                         f"保留 {reserve / MB:.1f} MB，至少需要 {needed / MB:.1f} MB")
+    return {
+        "budget": budget,
+        "baseline": baseline,
+        "reserve": reserve,
+        "requested_threads": threads,
+        "threads": min(threads, fits),
+        "chunk_size": chunk,
+        "stack_size": WORKER_STACK_SIZE,
+        "worker_cost": worker_cost(chunk, buffers),
+        "history": HISTORY_ENTRIES,
+        "verify_pending": VERIFY_PENDING
+    }
+
+
+class MemoryMonitor:
+    """按预算监控本进程的 RSS，sample 由调用方周期性调用"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.budget = plan["budget"]
+        self.peak_reset = reset_peak()
+        self.status = read_status() or {}
+        self.peak = self.status.get("rss", 0)  # 本次运行的峰值，VmHWM 无法清零时只取采样的最大值
+        self.breakdown = breakdown()
+        self.trims = 0  # 归还空闲内存的次数
+        self.over_samples = 0  # RSS 超过预算的采样次数
+        self.over = False
+
+    def sample(self):
+        """读取 RSS 与拆分，必要时归还空闲内存；RSS 从预算以内变为超出时返回True"""
+        status = read_status()
+        if status is None:
+            return False
+        if status["rss"] > self.budget * TRIM_RATIO and trim():
+            self.trims += 1
+            status = read_status() or status
+        self.status = status
+        self.peak = max(self.peak, status["rss"], status.get("peak", 0) if self.peak_reset else 0)
+        self.breakdown = breakdown()
+        over = status["rss"] > self.budget
+        crossed = over and not self.over
+        self.over = over
+        if over:
+            self.over_samples += 1
+        return crossed
+
+    def summary(self):
+        return {
+            "budget": self.budget,
+            "rss": self.status.get("rss"),
+            "peak": self.peak,
+            "breakdown": self.breakdown,
+            "trims": self.trims,
+            "over_samples": self.over_samples,
+            "plan": self.plan
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+网卡计数对账 - 把消耗器的计数与内核的网卡计数、TCP计数放在一起比较 (仅Linux)
+
+1. 网卡: /proc/net/dev 中指定网卡的收发字节与包数，运行开始时记下基准，之后按差值统计；
+   网卡计数包含本机所有进程的流量以及各层协议头和重传
+2. 主机TCP: /proc/net/snmp 的 OutSegs 与 RetransSegs，得到本机发出报文段的重传率
+3. 本进程的连接: 每次请求结束时读取该连接的 TCP_INFO，按连接累计差值，得到TCP层实际收发的
+   有效字节、本进程连接的重传率与收到的乱序包比例 (接收方看到的丢包迹象)
+
+对账结果中的开销比为网卡字节与消耗器线路字节之比，可按网卡字节执行流量限制。
+"""
+
+import socket
+import struct
+import weakref
+import threading
+
+NET_DEV = "/proc/net/dev"
+NET_ROUTE = "/proc/net/route"
+NET_SNMP = "/proc/net/snmp"
+
+# struct tcp_info 中用到的字段: (名称, 偏移, 格式)，较旧的内核返回的结构较短，缺少的字段按0计
+TCP_INFO_FIELDS = (
+    ("total_retrans", 100, "<I"),
+    ("bytes_received", 128, "<Q"),
+    ("segs_out", 136, "<I"),
+    ("data_segs_in", 152, "<I"),
+    ("bytes_sent", 200, "<Q"),
+    ("bytes_retrans", 208, "<Q"),
+    ("rcv_ooopack", 224, "<I"),
+)
+TCP_INFO_SIZE = 256
+
+
+def read_interface(name):
+    """网卡的 (接收字节, 接收包数, 发送字节, 发送包数)，网卡不存在时抛出 KeyError"""
+    with open(NET_DEV) as f:
+        for line in f:
+            iface, sep, data = line.partition(":")
+            if sep and iface.strip() == name:
+                fields = data.split()
+                return int(fields[0]), int(fields[1]), int(fields[8]), int(fields[9])
+    raise KeyError(name)
+
+
+def default_interface():
+    """默认路由所在的网卡，没有默认路由时返回None"""
+    try:
+        with open(NET_ROUTE) as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1 and fields[1] == "00000000":
+                    return fields[0]
+    except (OSError, StopIteration):
+        pass
+    return None
+
+
+def read_tcp_segments():
+    """本机TCP的 (发出的报文段数, 重传的报文段数)，无法读取时返回None"""
+    try:
+        with open(NET_SNMP) as f:
+            rows = [line.split() for line in f if line.startswith("Tcp:")]
+        values = dict(zip(rows[0][1:], rows[1][1:]))
+        return int(values["OutSegs"]), int(values["RetransSegs"])
+    except (OSError, IndexError, KeyError, ValueError):
+        return None
+
+
+def tcp_info(sock):
+    """连接的 TCP_INFO 中用到的字段，平台不支持或连接已关闭时返回None"""
+    if not hasattr(socket, "TCP_INFO"):
+        return None
+    try:
+        data = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO_SIZE)
+    except (OSError, ValueError):
+        return None
+    return tuple(struct.unpack_from(fmt, data, offset)[0] if len(data) >= offset + struct.calcsize(fmt) else 0
+                 for _, offset, fmt in TCP_INFO_FIELDS)
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+
+class Reconciler:
+    """一次运行的对账: 网卡与主机TCP计数按运行开始时的基准取差值，本进程连接的 TCP_INFO 按连接累计
+
+    网卡不存在或平台没有 /proc/net/dev 时，构造时抛出 OSError 或 KeyError
+    """
+
+    def __init__(self, interface, offset=0):
+        self.interface = interface
+        self.offset = offset  # 从检查点继续时，之前已计入的网卡字节
+        self.baseline = read_interface(interface)
+        self.current = self.baseline
+        self.segments_baseline = read_tcp_segments()
+        self.lock = threading.Lock()
+        self._sockets = weakref.WeakKeyDictionary()  # 连接 -> 上次读取的 TCP_INFO
+        self.tcp = [0] * len(TCP_INFO_FIELDS)
+
+    def sample(self):
+        """读取网卡计数，返回运行以来网卡收发的总字节数 (含 offset)"""
+        try:
+            self.current = read_interface(self.interface)
+        except (OSError, KeyError):
+            pass
+        return self.offset + self.interface_bytes(self.current)
+
+    def interface_bytes(self, current):
+        return (current[0] - self.baseline[0]) + (current[2] - self.baseline[2])
+
+    def observe(self, sock):
+        """累计该连接自上次读取以来的 TCP_INFO 差值，每次请求结束时调用"""
+        if sock is None:
+            return
+        info = tcp_info(sock)
+        if info is None:
+            return
+        with self.lock:
+            previous = self._sockets.get(sock)
+            self._sockets[sock] = info
+            for index, value in enumerate(info):
+                # 同一个对象上的新连接 (计数从0开始) 按新连接计
+                delta = value - previous[index] if previous and value >= previous[index] else value
+                self.tcp[index] += delta
+
+    def summary(self, wire_bytes):
+        """对账结果，wire_bytes 为消耗器统计的线路字节 (响应头 + 原始响应体 + 上传的请求体)"""
+        current = self.current
+        rx = current[0] - self.baseline[0]
+        tx = current[2] - self.baseline[2]
+        tcp = dict(zip((name for name, _, _ in TCP_INFO_FIELDS), self.tcp))
+        segments = read_tcp_segments()
+        retransmit_rate = None
+        if segments and self.segments_baseline:
+            retransmit_rate = _ratio(segments[1] - self.segments_baseline[1], segments[0] - self.segments_baseline[0])
+        return {
+            "interface": self.interface,
+            "rx_bytes": rx,
+            "tx_bytes": tx,
+            "rx_packets": current[1] - self.baseline[1],
+            "tx_packets": current[3] - self.baseline[3],
+            "interface_bytes": self.offset + rx + tx,
+            "wire_bytes": wire_bytes,
+            "overhead_ratio": _ratio(self.offset + rx + tx, wire_bytes),
+            "tcp_bytes_received": tcp["bytes_received"],
+            "tcp_bytes_sent": tcp["bytes_sent"],
+            "retransmit_rate": retransmit_rate,
+            "socket_retransmit_rate": _ratio(tcp["total_retrans"], tcp["segs_out"]),
+            "bytes_retransmit_rate": _ratio(tcp["bytes_retrans"], tcp["bytes_sent"]),
+            "out_of_order_rate": _ratio(tcp["rcv_ooopack"], tcp["data_segs_in"])
+        }
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行前预检与限额规划 - 计时开始前并行探测所有URL，按得到的大小规划限额的最后一段
+
+1. 预检: 对每个URL发送HEAD请求，HEAD不被支持或没有 Content-Length 时改用 Range: bytes=0-0 的GET；
+   记录大小与是否支持Range，4xx 与连续连接失败的URL直接标记失效，不再等正式下载重试耗尽
+2. 流量规划: 已开始未完成的下载按预计大小预留预算，剩余预算放不下选中的URL时，
+   支持Range的URL只请求剩余的字节数，否则改选放得下的最大的URL；都放不下时提前结束，
+   最后一段不会因达到限额而中断在半途
+3. 次数规划: 已开始的下载数加已完成的下载数不超过次数限制，不会在达到次数时中断其他线程的下载
+
+大小已知的URL按大小排序保存在紧凑数组中，查找放得下的URL为一次二分查找。
+"""
+
+import bisect
+import threading
+from array import array
+
+PROBE_ATTEMPTS = 2  # 连接失败时的探测次数，均失败后标记失效
+TRANSIENT_STATUS = (408, 429)  # 按暂时性错误处理的 4xx，URL保留
+FALLBACK_STATUS = (405, 501)  # HEAD不被支持，改用 Range GET
+FIT_PROBES = 64  # 查找放得下的URL时最多跳过的失效URL数
+# 只请求一部分的响应比探测到的响应头多出的字节上限: Content-Range 行 (两个数最多各20位)
+# 与 "206 Partial Content" 比 "200 OK" 长的状态行，按线路口径计量时从最后一段的长度中扣除
+RANGE_HEADROOM = 96
+
+
+def _content_range_total(value):
+    """Content-Range: bytes 0-0/12345 中的总长度，未知时返回-1"""
+    total = (value or "").rpartition("/")[2].strip()
+    return int(total) if total.isdigit() else -1
+
+
+def probe_url(session, url, timeout):
+    """探测一个URL，返回 (是否可用, 大小, 是否支持Range, 响应头字节数, 错误信息)
+
+    大小为响应体在线路上的字节数，未知或响应体经过压缩时为-1；连接失败时抛出异常
+    """
+    with session.head(url, timeout=timeout, allow_redirects=True) as response:
+        status = response.status_code
+        headers = response.headers
+        raw_headers = response.raw.headers
+    ranges = headers.get("Accept-Ranges", "").strip().lower() == "bytes"
+    size = int(headers["Content-Length"]) if headers.get("Content-Length", "").isdigit() else -1
+
+    if status in FALLBACK_STATUS or (status < 400 and size < 0):
+        # 只读取首个字节，不支持Range的源站返回完整响应，关闭时连接被丢弃
+        with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout) as response:
+            status = response.status_code
+            headers = response.headers
+            raw_headers = response.raw.headers
+        if status == 206:
+            ranges = True
+            size = _content_range_total(headers.get("Content-Range"))
+        elif headers.get("Content-Length", "").isdigit():
+            size = int(headers["Content-Length"])
+
+    header_bytes = sum(len(key) + len(value) + 4 for key, value in raw_headers.items()) + 32
+    if headers.get("Content-Encoding", "identity").strip().lower() != "identity":
+        # 压缩的响应体解码后的长度未知，Range也按压缩后的字节计，不参与规划
+        size = -1
+        ranges = False
+    if 400 <= status < 500 and status not in TRANSIENT_STATUS:
+        return False, -1, False, header_bytes, f"HTTP {status}"
+    if status >= 400:
+        return True, -1, False, header_bytes, None
+    return True, size, ranges, header_bytes, None
+
+
+def preflight(pool, sessions, timeout):
+    """用每个会话一个线程并行探测URL池中所有有效的URL，结果写入 pool.sizes 与 pool.ranges
+
+    返回汇总 {"probed", "dead": [(编号, 错误)], "sized", "ranges", "bytes", "header_bytes"}
+    """
+    size = len(pool)
+    pool.sizes = array("q", [-1]) * size
+    pool.ranges = bytearray(size)
+    dead = []
+    probed = []  # 每个线程探测的URL数
+    header_bytes = [0]
+    cursor = iter(range(size))
+    cursor_lock = threading.Lock()
+
+    def work(session):
+        count = 0
+        while True:
+            with cursor_lock:
+                url_id = next(cursor, None)
+            if url_id is None:
+                probed.append(count)
+                return
+            if pool.invalid[url_id]:
+                continue
+            url = pool.url(url_id)
+            count += 1
+            for _ in range(PROBE_ATTEMPTS):
+                try:
+                    alive, length, ranges, headers, error = probe_url(session, url, timeout)
+                    break
+                except Exception as exc:
+                    alive, length, ranges, headers, error = False, -1, False, 0, exc
+            if not alive:
+                dead.append((url_id, error))
+                continue
+            pool.sizes[url_id] = length
+            pool.ranges[url_id] = ranges
+            if headers > header_bytes[0]:
+                header_bytes[0] = headers
+
+    threads = [threading.Thread(target=work, args=(session,), name="preflight", daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sized = [length for length in pool.sizes if length >= 0]
+    return {
+        "probed": sum(probed),
+        "dead": dead,
+        "sized": len(sized),
+        "ranges": pool.ranges.count(1),
+        "bytes": sum(sized),
+        "header_bytes": header_bytes[0]
+    }
+
+
+class Reservation:
+    """一次已开始的请求在规划中的预留: reserved 为尚未消耗的预留字节，expected 为预计的响应体字节数 (未知时为None)，
+    length 不为None时只请求前 length 个字节"""
+
+    __slots__ = ("planner", "url_id", "reserved", "expected", "length")
+
+    def __init__(self, planner, url_id, reserved, expected, length=None):
+        self.planner = planner
+        self.url_id = url_id
+        self.reserved = reserved
+        self.expected = expected
+        self.length = length
+
+    def consume(self, size):
+        """已消耗 size 字节，相应减少预留，调用方持有 TrafficConsumer 的锁"""
+        if self.reserved:
+            taken = min(size, self.reserved)
+            self.reserved -= taken
+            self.planner.reserved -= taken
+
+
+class BudgetPlanner:
+    """按预检结果规划流量与次数限额，所有方法由调用方在 TrafficConsumer 的锁内调用
+
+    allowance 为每次请求在响应体之外计入限额的字节 (按线路口径计量时的响应头)，
+    不为0时只请求一部分的下载另外预留 RANGE_HEADROOM
+    """
+
+    def __init__(self, pool, allowance=0):
+        self.pool = pool
+        self.allowance = allowance
+        self.reserved = 0  # 已开始未完成的下载尚未消耗的预留字节
+        self.in_flight = 0  # 已开始未完成的请求数
+        ids = sorted((url_id for url_id in range(len(pool)) if pool.sizes[url_id] >= 0 and not pool.invalid[url_id]),
+                     key=pool.sizes.__getitem__)
+        self.ids = array("q", ids)
+        self.sizes = array("q", (pool.sizes[url_id] for url_id in ids))
+        self.ranged = array("q", (url_id for url_id in ids if pool.ranges[url_id]))
+
+    def reserve(self, url_id, remaining):
+        """为选中的URL在剩余预算 remaining 内预留，返回 Reservation；remaining 为None表示不规划流量；
+        预算内放不下任何URL时返回None"""
+        if remaining is None:
+            return self._start(url_id, 0, None)
+        budget = remaining - self.reserved
+        size = self.pool.sizes[url_id]
+        if size < 0:
+            # 大小未知的URL无法规划，只在预算足够时照常下载，由流量限制兜底
+            return self._start(url_id, 0, None) if budget > 0 else None
+        if size + self.allowance <= budget:
+            return self._start(url_id, size + self.allowance, size)
+        fit = self._largest_fit(budget - self.allowance)
+        if fit is not None:
+            return self._start(fit, self.pool.sizes[fit] + self.allowance, self.pool.sizes[fit])
+        length = budget - self.allowance - (RANGE_HEADROOM if self.allowance else 0)
+        if length > 0:
+            ranged = url_id if self.pool.ranges[url_id] else self._any_ranged()
+            if ranged is not None:
+                return self._start(ranged, budget, length, length)
+        return None
+
+    def _start(self, url_id, reserved, expected, length=None):
+        self.reserved += reserved
+        self.in_flight += 1
+        return Reservation(self, url_id, reserved, expected, length)
+
+    def _largest_fit(self, budget):
+        """大小不超过 budget 的最大的有效URL"""
+        index = bisect.bisect_right(self.sizes, budget) - 1
+        for _ in range(FIT_PROBES):
+            if index < 0:
+                return None
+            url_id = self.ids[index]
+            if not self.pool.invalid[url_id]:
+                return url_id
+            index -= 1
+        return None
+
+    def _any_ranged(self):
+        for url_id in self.ranged[:FIT_PROBES]:
+            if not self.pool.invalid[url_id]:
+                return url_id
+        return None
+
+    def release(self, reservation):
+        """请求结束 (完成或放弃) 后释放剩余的预留"""
+        self.reserved -= reservation.reserved
+        reservation.reserved = 0
+        self.in_flight -= 1
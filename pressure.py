@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+主机压力调节 - 按 Linux PSI 与系统负载降低并发与速率，压力缓解后逐步恢复
+
+1. 信号: /proc/pressure/cpu|memory|io 中 some 行的 avg10 (最近10秒内至少有一个任务在等待该资源的时间占比)，
+   以及1分钟负载与CPU数之比；没有 PSI 的系统 (内核早于4.20或未启用) 只看负载
+2. 下调: 任一信号超过阈值时，并发与速率的比例减半，不低于 MIN_SCALE；下调后 COOLDOWN 秒内不再下调，
+   等 avg10 反映出调节的效果
+3. 恢复: 所有信号低于阈值的 RECOVER_RATIO 倍并保持 RECOVER_AFTER 秒后，比例增加 RECOVER_STEP，直到恢复为1
+
+速率的基准为配置的限速，未限速时为首次下调前的实际速度，由调用方提供。
+每次调节记录时间、方向、原因与调节后的线程数和速率。
+"""
+
+import os
+import math
+import time
+from collections import deque
+from datetime import datetime
+
+PRESSURE_DIR = "/proc/pressure"
+PRESSURE_RESOURCES = ("cpu", "memory", "io")
+LOAD_LIMIT = 2.0  # 1分钟负载与CPU数之比的阈值
+MIN_SCALE = 0.125  # 并发与速率最低降到配置值的比例
+COOLDOWN = 10.0  # 下调后不再下调的秒数，与 avg10 的窗口一致
+RECOVER_RATIO = 0.5  # 信号低于阈值的该倍数时视为压力已缓解
+RECOVER_AFTER = 10.0  # 压力缓解保持该秒数后恢复一步
+RECOVER_STEP = 0.125  # 每次恢复增加的比例
+MAX_DECISIONS = 100  # 保留的调节记录条数
+
+
+def read_pressure(resource):
+    """资源的 PSI some avg10，单位%；文件不存在或 PSI 未启用时返回None"""
+    try:
+        with open(os.path.join(PRESSURE_DIR, resource)) as f:
+            for line in f:
+                kind, _, fields = line.partition(" ")
+                if kind == "some":
+                    for field in fields.split():
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_load():
+    """1分钟负载与CPU数之比，平台不支持时返回None"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class Governor:
+    """按主机压力计算并发与速率的比例，update 由调用方周期性调用
+
+    没有任何可读取的信号时，构造时抛出 OSError
+    """
+
+    def __init__(self, threshold, load_limit=LOAD_LIMIT, clock=time.monotonic):
+        self.threshold = threshold  # PSI some avg10 的阈值，单位%
+        self.load_limit = load_limit
+        self.clock = clock
+        self.resources = tuple(resource for resource in PRESSURE_RESOURCES if read_pressure(resource) is not None)
+        if not self.resources and read_load() is None:
+            raise OSError("没有可读取的 PSI 或系统负载")
+        self.scale = 1.0  # 当前的并发与速率比例
+        self.min_scale = 1.0  # 本次运行中的最低比例
+        self.base_rate = None  # 下调速率的基准，单位字节/秒，None表示只调节并发
+        self.signals = {}  # 最近一次读取的信号
+        self.decisions = deque(maxlen=MAX_DECISIONS)
+        self.decision_count = 0
+        self.throttled_seconds = 0.0  # 比例低于1的累计秒数
+        self._last_update = clock()
+        self._last_throttle = None
+        self._calm_since = None
+
+    def sample(self):
+        """读取各项信号，返回 {名称: (取值, 阈值)}"""
+        signals = {}
+        for resource in self.resources:
+            value = read_pressure(resource)
+            if value is not None:
+                signals[resource] = (value, self.threshold)
+        load = read_load()
+        if load is not None:
+            signals["load"] = (load, self.load_limit)
+        self.signals = signals
+        return signals
+
+    def update(self):
+        """读取信号并按需调节，比例变化时返回 ("throttle" 或 "recover", 原因)，否则返回None"""
+        now = self.clock()
+        if self.scale < 1.0:
+            self.throttled_seconds += now - self._last_update
+        self._last_update = now
+        signals = self.sample()
+
+        over = [(value / limit, name, value, limit) for name, (value, limit) in signals.items() if value > limit]
+        if over:
+            self._calm_since = None
+            if self.scale <= MIN_SCALE or (self._last_throttle is not None and now - self._last_throttle < COOLDOWN):
+                return None
+            _, name, value, limit = max(over)
+            self._last_throttle = now
+            self.scale = max(MIN_SCALE, self.scale / 2)
+            self.min_scale = min(self.min_scale, self.scale)
+            return "throttle", f"{self._describe(name, value)} 超过阈值 {limit:g}{'' if name == 'load' else '%'}"
+
+        if self.scale >= 1.0:
+            return None
+        if any(value > limit * RECOVER_RATIO for value, limit in signals.values()):
+            self._calm_since = None
+            return None
+        if self._calm_since is None:
+            self._calm_since = now
+        if now - self._calm_since < RECOVER_AFTER:
+            return None
+        self._calm_since = now
+        self.scale = min(1.0, self.scale + RECOVER_STEP)
+        return "recover", f"压力已低于阈值的 {RECOVER_RATIO:.0%} 达 {RECOVER_AFTER:g} 秒"
+
+    @staticmethod
+    def _describe(name, value):
+        return f"负载 {value:.2f}/CPU" if name == "load" else f"{name} {value:.1f}%"
+
+    def limit_threads(self, threads):
+        """按比例调节后的线程数，至少为1"""
+        return threads if self.scale >= 1.0 else max(1, math.ceil(threads * self.scale))
+
+    def limit_rate(self):
+        """按比例调节后的速率，单位字节/秒；不调节速率时返回None"""
+        if self.scale >= 1.0 or not self.base_rate:
+            return None
+        return max(1, int(self.base_rate * self.scale))
+
+    def record(self, action, reason, threads, rate):
+        """记录一次调节"""
+        self.decision_count += 1
+        self.decisions.append({
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "action": action,
+            "reason": reason,
+            "scale": self.scale,
+            "threads": threads,
+            "rate": rate
+        })
+
+    def summary(self, decisions=None):
+        """当前状态与调节记录，decisions 为返回的最近记录条数，None表示全部"""
+        records = list(self.decisions)
+        if decisions is not None:
+            records = records[-decisions:] if decisions else []
+        return {
+            "scale": self.scale,
+            "min_scale": self.min_scale,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+            "signals": {name: {"value": value, "limit": limit} for name, (value, limit) in self.signals.items()},
+            "decision_count": self.decision_count,
+            "decisions": records
+        }
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行时性能剖析 - 用于定位吞吐瓶颈（锁竞争、内存分配、GIL 或网络）
+
+在限定的时间窗口内:
+1. 周期性采样下载线程的调用栈，输出折叠栈格式 (*.folded)，
+   可直接交给 flamegraph.pl 或 speedscope 生成火焰图
+2. 统计热点路径 (_stream_download / RateLimiter.acquire / _check_traffic_limit)
+   的调用次数与耗时 (*.timings.json)
+3. 使用 tracemalloc 记录窗口内的内存分配变化 (*.tracemalloc.txt)
+
+剖析关闭时不安装任何包装器，也不启动采样线程，对下载路径没有额外开销。
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import functools
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_SAMPLE_INTERVAL = 0.01  # 采样间隔，单位秒
+WORKER_THREAD_PREFIX = "download-"
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 30
+
+
+class HotPathTimer:
+    """统计被包装函数的调用次数与耗时，每个线程独立累计以避免额外锁竞争"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._buckets = []
+        self._register_lock = threading.Lock()
+
+    def _bucket(self):
+        bucket = getattr(self._local, "bucket", None)
+        if bucket is None:
+            bucket = {}
+            self._local.bucket = bucket
+            with self._register_lock:
+                self._buckets.append(bucket)
+        return bucket
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                entry = self._bucket().get(name)
+                if entry is None:
+                    self._bucket()[name] = [1, elapsed, elapsed]
+                else:
+                    entry[0] += 1
+                    entry[1] += elapsed
+                    if elapsed > entry[2]:
+                        entry[2] = elapsed
+        return wrapper
+
+    def summary(self):
+        merged = {}
+        with self._register_lock:
+            buckets = list(self._buckets)
+        for bucket in buckets:
+            for name, (calls, total, longest) in list(bucket.items()):
+                entry = merged.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        return {
+            name: {
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "avg_ms": round(total / calls * 1000, 4) if calls else 0.0,
+                "max_ms": round(longest * 1000, 4)
+            }
+            for name, (calls, total, longest) in merged.items()
+        }
+
+
+class Profiler:
+    """对运行中的 TrafficConsumer 进行限时剖析"""
+
+    def __init__(self, consumer, duration, output_dir,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL, trace_memory=True, on_complete=None):
+        self.consumer = consumer
+        self.duration = max(1, duration)
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.on_complete = on_complete
+
+        self.timer = HotPathTimer()
+        self.stacks = Counter()
+        self.sample_count = 0
+        self.running = False
+        self.result = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._patched = []
+        self._started_tracemalloc = False
+        self._memory_baseline = None
+
+    def start(self):
+        """安装包装器并启动采样线程"""
+        self.running = True
+        self._install_hooks()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            self._memory_baseline = tracemalloc.take_snapshot()
+
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """提前结束剖析窗口"""
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _install_hooks(self):
+        consumer = self.consumer
+        targets = [
+            (consumer, "_stream_download", "TrafficConsumer._stream_download"),
+            (consumer, "_check_traffic_limit", "TrafficConsumer._check_traffic_limit"),
+        ]
+        if consumer.rate_limiter:
+            targets.append((consumer.rate_limiter, "acquire", "RateLimiter.acquire"))
+
+        # 以实例属性覆盖绑定方法，结束后删除即可恢复，原类不受影响
+        for owner, attr, label in targets:
+            original = getattr(owner, attr)
+            setattr(owner, attr, self.timer.wrap(label, original))
+            self._patched.append((owner, attr))
+
+    def _remove_hooks(self):
+        for owner, attr in self._patched:
+            owner.__dict__.pop(attr, None)
+        self._patched = []
+
+    def _run(self):
+        deadline = time.perf_counter() + self.duration
+        try:
+            while not self._stop_event.is_set() and time.perf_counter() < deadline:
+                self._sample()
+                self._stop_event.wait(self.sample_interval)
+        finally:
+            self._remove_hooks()
+            try:
+                self.result = self._write_reports()
+            except OSError as e:
+                self.consumer.logger(f"写入性能剖析报告失败: {e}")
+            finally:
+                # 报告写入失败也要结束剖析状态，否则之后的剖析请求都会被拒绝
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+                    self._started_tracemalloc = False
+                self.running = False
+
+        if self.on_complete and self.result:
+            try:
+                self.on_complete(self.result)
+            except Exception:
+                pass
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, "")
+            if not name.startswith(WORKER_THREAD_PREFIX):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                stack.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            stack.append("download-worker")
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+        self.sample_count += 1
+
+    def _write_reports(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+        result = {
+            "samples": self.sample_count,
+            "duration": self.duration,
+            "folded": base + ".folded",
+            "timings": base + ".timings.json",
+            "tracemalloc": None
+        }
+
+        with open(result["folded"], "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(result["timings"], "w") as f:
+            json.dump({
+                "samples": self.sample_count,
+                "sample_interval": self.sample_interval,
+                "hot_path": self.timer.summary()
+            }, f, indent=2)
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            result["tracemalloc"] = base + ".tracemalloc.txt"
+            with open(result["tracemalloc"], "w") as f:
+                f.write(f"当前跟踪内存: {current} B, 峰值: {peak} B\n\n")
+                f.write(f"=== 窗口内分配增长 Top {TRACEMALLOC_TOP} ===\n")
+                for stat in snapshot.compare_to(self._memory_baseline, "lineno")[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+                f.write(f"\n=== 当前分配 Top {TRACEMALLOC_TOP} ===\n")
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+
+        return result
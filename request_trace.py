@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求轨迹 - 记录每次请求的生命周期事件，并按原有时间线重放
+
+1. TraceWriter: 每个工作线程把定长的二进制记录追加到自己的缓冲区，写满后整块交给
+   后台写入线程 (deque 的追加与弹出本身是线程安全的)，记录路径上不使用锁
+2. 文件格式: 魔数 + 长度前缀的JSON元数据，之后是24字节的定长记录
+   (时间(微秒), 事件, 线程编号, 尝试次数, URL编号, 取值)；URL在首次出现时以
+   TRACE_URL 记录定义，取值为其后紧跟的UTF-8字节数
+3. ReplaySchedule: 读取轨迹，按线程还原每次请求的首次尝试及其开始时间，
+   由 TrafficConsumer 的工作线程在相同的时间点重新发出，重试仍由引擎自行处理
+
+事件与取值:
+    TRACE_START    开始一次尝试，取值为1表示上传
+    TRACE_HEADERS  收到响应头，取值为状态码 (与开始之间的间隔即首字节时间)
+    TRACE_END      完整结束，取值为本次尝试传输的字节数
+    TRACE_ABORT    因任务停止或达到限制而中断，取值为已传输的字节数
+    TRACE_ERROR    本次尝试出错，之后按退避重试
+    TRACE_INVALID  重试耗尽，URL被标记为无效
+"""
+
+import json
+import time
+import struct
+import threading
+import itertools
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+TRACE_MAGIC = b"TCTRACE1"
+RECORD = struct.Struct("<QBHBIq")
+HEADER_LENGTH = struct.Struct("<I")
+FLUSH_BYTES = 64 * 1024  # 线程缓冲区达到该大小后交给写入线程
+WRITE_INTERVAL = 0.5  # 写入线程检查待写缓冲区的周期，单位秒
+REPLAY_POLL = 0.1  # 重放等待时检查任务是否已停止的周期，单位秒
+
+TRACE_URL, TRACE_START, TRACE_HEADERS, TRACE_END, TRACE_ABORT, TRACE_ERROR, TRACE_INVALID = range(7)
+EVENT_NAMES = {
+    TRACE_START: "start", TRACE_HEADERS: "headers", TRACE_END: "end",
+    TRACE_ABORT: "abort", TRACE_ERROR: "error", TRACE_INVALID: "invalid"
+}
+
+
+class _ThreadBuffer:
+    """一个工作线程的记录缓冲区与当前请求"""
+
+    __slots__ = ("data", "thread_id", "url_id", "attempt")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.thread_id = 0
+        self.url_id = 0
+        self.attempt = 0
+
+
+class TraceWriter:
+    """把请求事件写入二进制轨迹文件"""
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.file = open(path, "wb")
+        header = json.dumps(dict(meta or {}, started_at=time.time()), ensure_ascii=False).encode("utf-8")
+        self.file.write(TRACE_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        self.origin = time.perf_counter_ns()
+
+        self._local = threading.local()
+        self._buffers = []
+        self._urls = {}
+        self._next_url_id = itertools.count()
+        self._ready = deque()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._writer.start()
+
+    def _buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = _ThreadBuffer()
+            self._buffers.append(buffer)
+        return buffer
+
+    def bind(self, thread_id):
+        """记录当前线程对应的工作线程编号"""
+        self._buffer().thread_id = thread_id
+
+    def request(self, url, upload=False, attempt=1):
+        """开始一次尝试，之后的事件都属于这次尝试"""
+        buffer = self._buffer()
+        url_id = self._urls.get(url)
+        if url_id is None:
+            candidate = next(self._next_url_id)
+            # 多个线程同时遇到新URL时只有一个编号生效，由该线程写入定义
+            url_id = self._urls.setdefault(url, candidate)
+            if url_id == candidate:
+                encoded = url.encode("utf-8")
+                self._append(buffer, TRACE_URL, url_id, len(encoded), 0, encoded)
+        buffer.url_id = url_id
+        buffer.attempt = attempt
+        self._append(buffer, TRACE_START, url_id, int(upload), attempt)
+
+    def event(self, kind, value=0):
+        """记录当前尝试的一个事件"""
+        buffer = self._buffer()
+        self._append(buffer, kind, buffer.url_id, value, buffer.attempt)
+
+    def headers(self, status):
+        self.event(TRACE_HEADERS, status)
+
+    def end(self, transferred):
+        self.event(TRACE_END, transferred)
+
+    def abort(self, transferred):
+        self.event(TRACE_ABORT, transferred)
+
+    def error(self):
+        self.event(TRACE_ERROR)
+
+    def invalid(self):
+        self.event(TRACE_INVALID)
+
+    def _append(self, buffer, kind, url_id, value, attempt, extra=None):
+        elapsed = (time.perf_counter_ns() - self.origin) // 1000
+        buffer.data += RECORD.pack(elapsed, kind, buffer.thread_id, min(attempt, 255), url_id, value)
+        if extra:
+            # 记录与其后的数据必须留在同一块中，不能被其他线程的块隔开
+            buffer.data += extra
+        if len(buffer.data) >= FLUSH_BYTES:
+            self._ready.append(bytes(buffer.data))
+            buffer.data.clear()
+
+    def _write_loop(self):
+        while not self._closed:
+            time.sleep(WRITE_INTERVAL)
+            self._drain()
+
+    def _drain(self):
+        while self._ready:
+            self.file.write(self._ready.popleft())
+
+    def close(self):
+        """写入剩余的记录并关闭文件，应在工作线程结束后调用"""
+        self._closed = True
+        self._writer.join()
+        for buffer in self._buffers:
+            if buffer.data:
+                self._ready.append(bytes(buffer.data))
+                buffer.data.clear()
+        self._drain()
+        self.file.close()
+
+
+def read_trace(path):
+    """读取轨迹文件，返回 (元数据, {URL编号: URL}, 按时间排序的记录列表)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(TRACE_MAGIC):
+        raise ValueError(f"{path} 不是请求轨迹文件")
+    offset = len(TRACE_MAGIC)
+    (header_length,) = HEADER_LENGTH.unpack_from(data, offset)
+    offset += HEADER_LENGTH.size
+    meta = json.loads(data[offset:offset + header_length].decode("utf-8"))
+    offset += header_length
+
+    urls = {}
+    records = []
+    end = len(data) - RECORD.size
+    while offset <= end:
+        record = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if record[1] == TRACE_URL:
+            urls[record[4]] = data[offset:offset + record[5]].decode("utf-8")
+            offset += record[5]
+        else:
+            records.append(record)
+    records.sort(key=lambda record: record[0])
+    return meta, urls, records
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(path):
+    """轨迹的汇总: 请求数、重试、字节数、首字节时间与请求耗时的分位数 (毫秒)"""
+    meta, urls, records = read_trace(path)
+    counts = dict.fromkeys(EVENT_NAMES.values(), 0)
+    started = {}
+    ttfb = []
+    durations = []
+    transferred = 0
+    threads = set()
+    for elapsed, kind, thread_id, attempt, url_id, value in records:
+        counts[EVENT_NAMES[kind]] += 1
+        threads.add(thread_id)
+        if kind == TRACE_START:
+            started[thread_id] = elapsed
+        elif kind == TRACE_HEADERS and thread_id in started:
+            ttfb.append((elapsed - started[thread_id]) / 1000)
+        elif kind in (TRACE_END, TRACE_ABORT):
+            transferred += value
+            if kind == TRACE_END and thread_id in started:
+                durations.append((elapsed - started[thread_id]) / 1000)
+
+    span = records[-1][0] / 1e6 if records else 0.0
+    return {
+        "meta": meta,
+        "span_seconds": span,
+        "threads": len(threads),
+        "urls": len(urls),
+        "events": counts,
+        "retries": sum(1 for record in records if record[1] == TRACE_START and record[3] > 1),
+        "bytes": transferred,
+        "ttfb_ms": {key: _percentile(ttfb, fraction) for key, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "duration_ms": {key: _percentile(durations, fraction)
+                        for key, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+    }
+
+
+def rewrite_origin(url, origin):
+    """把URL的协议与主机替换为 origin，用于对本地源站重放"""
+    target = urlsplit(origin)
+    parts = urlsplit(url)
+    return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+
+class ReplaySchedule:
+    """按轨迹中的时间线为每个工作线程提供 (URL编号, 是否上传)
+
+    只重放每次请求的首次尝试，speed 为时间倍率，0表示不等待、按顺序尽快发出
+    """
+
+    def __init__(self, path, origin=None, speed=1.0):
+        meta, urls, records = read_trace(path)
+        self.meta = meta
+        self.speed = max(0.0, speed if speed is not None else 1.0)
+        ids = {}
+        self.urls = []
+        self.steps = {}
+        for elapsed, kind, thread_id, attempt, url_id, value in records:
+            if kind != TRACE_START or attempt != 1 or url_id not in urls:
+                continue
+            if url_id not in ids:
+                ids[url_id] = len(self.urls)
+                self.urls.append(rewrite_origin(urls[url_id], origin) if origin else urls[url_id])
+            self.steps.setdefault(thread_id, deque()).append((elapsed / 1e6, ids[url_id], bool(value)))
+        if not self.steps:
+            raise ValueError(f"请求轨迹 {path} 中没有请求")
+        self.threads = max(self.steps)
+        self.requests = sum(len(steps) for steps in self.steps.values())
+        self._finished = set()
+        self._lock = threading.Lock()
+
+    def next_step(self, consumer, thread_id):
+        """等到该线程下一次请求的时间点并返回 (URL编号, 是否上传)，没有更多请求或任务已停止时返回None"""
+        steps = self.steps.get(thread_id)
+        if not steps:
+            return None
+        offset, url_index, upload = steps.popleft()
+        if self.speed:
+            due = consumer.start_time + offset / self.speed
+            while consumer.active:
+                remaining = due - time.time()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, REPLAY_POLL))
+        return (url_index, upload) if consumer.active else None
+
+    def finish_thread(self, thread_id):
+        """一个工作线程重放完毕，返回轨迹中的所有线程是否都已完毕"""
+        with self._lock:
+            self._finished.add(thread_id)
+            return self._finished.issuperset(self.steps)
@@ -0,0 +1,656 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离散事件模拟 - 在虚拟时钟上对模型化的源站运行消耗器的控制逻辑，用于调参与回归检查
+
+1. 源站模型 (JSON): 每个URL的对象大小、单连接带宽、首字节延迟与请求失败率，
+   可选的源站总带宽与本机总带宽由经过它的连接平分
+2. 工作线程是事件队列中的协程，按 TrafficConsumer 的下载循环推进虚拟时间；URL选择策略、重试与退避、
+   次数/流量/时长限制、预检后的限额规划、完成计数与URL失效处理都调用消耗器自身的实现
+3. 每次传输按当前速率连续推进，只产生一个完成事件，经过的链路上连接数变化改变其速率时才重新计算；
+   限速器是所有传输共用的传输时钟，合计速率超过限速时所有传输按同一比例放慢，限速或合计速率变化时只需调整时钟；
+   流量限制在分块边界上检查，与逐块计量的结果一致
+4. 定时任务按 APScheduler 的触发器计算虚拟时间上的执行时间，上一次运行未结束时跳过 (与 max_instances=1 一致)
+5. 同一种子下结果完全确定；不发出网络请求，也不写统计文件
+
+模型文件示例:
+    {"capacity": 1000,
+     "origins": [{"url": "http://a.example.com/1.bin", "size": 100, "bandwidth": 40, "latency": 30},
+                 {"url": "http://b.example.com/obj", "count": 50, "size": 8, "bandwidth": 20, "latency": 80,
+                  "failure_rate": 0.02, "capacity": 200, "ranges": true}]}
+大小单位MB，带宽单位MB/s，延迟单位毫秒；count 把一个源站展开为多个URL (追加 ?n=编号)。
+"""
+
+import json
+import heapq
+import random
+import itertools
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from colorama import Fore
+
+SIM_EPOCH = datetime(2025, 1, 1).timestamp()  # 虚拟时钟的起点，固定以保证结果可复现
+HEADER_BYTES = 256  # 模型化的响应头字节数
+LIMIT_CHECK = object()  # 事件队列中的流量限制检查
+MB = 1024 * 1024
+
+
+class Link:
+    """由多个连接平分的带宽 (本机下行或某个源站的上行)，capacity 为None表示不限；
+    peak 为经过它的URL的最大单连接带宽，平分后仍不低于 peak 时连接数的变化不影响任何速率"""
+
+    __slots__ = ("capacity", "active", "peak")
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.active = 0
+        self.peak = 0.0
+
+
+class UrlModel:
+    """一个URL的模型: 大小 (字节)、单连接带宽 (字节/秒)、首字节延迟 (秒)、失败率与经过的链路"""
+
+    __slots__ = ("url", "size", "bandwidth", "latency", "failure_rate", "ranges", "links")
+
+    def __init__(self, url, size, bandwidth, latency, failure_rate, ranges, links):
+        self.url = url
+        self.size = size
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.ranges = ranges
+        self.links = links
+
+
+class Transfer:
+    """一次进行中的传输: 在传输时钟上自 since 起以 rate 连续推进，done 为 since 时已收到的字节，
+    credited 为已计入统计的字节；version 在速率变化时递增，使旧的完成事件失效"""
+
+    __slots__ = ("worker", "pool", "url_id", "model", "reservation", "size", "links",
+                 "done", "credited", "rate", "since", "version", "completed")
+
+    def __init__(self, pool, url_id, model, reservation, size):
+        self.worker = None
+        self.pool = pool
+        self.url_id = url_id
+        self.model = model
+        self.reservation = reservation
+        self.size = size
+        self.links = model.links
+        self.done = 0.0
+        self.credited = 0
+        self.rate = 0.0
+        self.since = 0.0
+        self.version = 0
+        self.completed = False
+
+    def current_rate(self):
+        """当前的速率: 单连接带宽与各条链路平分后的带宽中的最小值"""
+        rate = self.model.bandwidth
+        for link in self.links:
+            if link.capacity is not None:
+                rate = min(rate, link.capacity / max(link.active, 1))
+        return rate
+
+    def received(self, tick):
+        """传输时钟为 tick 时已收到的字节数，按字节取整"""
+        return min(self.size, int(self.done + self.rate * (tick - self.since) + 0.5))
+
+
+def load_model(path):
+    """读取源站模型，返回 UrlModel 列表；格式错误时抛出 ValueError"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"源站模型 {path} 不是有效的JSON: {e}") from e
+    return build_model(data)
+
+
+def build_model(data):
+    """由模型字典创建 UrlModel 列表"""
+    origins = data.get("origins") if isinstance(data, dict) else None
+    if not origins:
+        raise ValueError("源站模型中没有 origins")
+    host = Link(data["capacity"] * MB if data.get("capacity") else None)
+    models = []
+    for origin in origins:
+        try:
+            url = origin["url"]
+            size = int(float(origin["size"]) * MB)
+            bandwidth = float(origin["bandwidth"]) * MB
+            latency = float(origin.get("latency", 0)) / 1000
+            failure_rate = min(1.0, max(0.0, float(origin.get("failure_rate", 0))))
+            count = int(origin.get("count", 1))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"源站模型中的 {origin} 缺少或有无效的字段: {e}") from e
+        if size <= 0 or bandwidth <= 0 or count <= 0:
+            raise ValueError(f"源站模型中的 {url} 的大小、带宽与数量必须大于0")
+        links = (host, Link(origin["capacity"] * MB)) if origin.get("capacity") else (host,)
+        ranges = bool(origin.get("ranges", True))
+        separator = "&" if "?" in url else "?"
+        for link in links:
+            link.peak = max(link.peak, bandwidth)
+        for index in range(count):
+            models.append(UrlModel(url if count == 1 else f"{url}{separator}n={index}",
+                                   size, bandwidth, latency, failure_rate, ranges, links))
+    return models
+
+
+def fairness(values):
+    """Jain 公平性指数: 各URL的完成次数完全相同时为1，集中在一个URL上时为 1/n"""
+    total = sum(values)
+    square = sum(value * value for value in values)
+    return total * total / (len(values) * square) if square else None
+
+
+class Simulation:
+    """在虚拟时钟上运行一个消耗器: 替换它的URL、传输、限速器时钟、URL池的随机数来源与日志，其余逻辑不变"""
+
+    def __init__(self, consumer, models, seed=0, logger=None):
+        from traffic_consumer import RateLimiter
+
+        self.consumer = consumer
+        self.models = models
+        self.random = random.Random(seed)
+        self.now = 0.0  # 从 SIM_EPOCH 起的虚拟秒数，用相对值保证微小的等待也能推进时钟
+        self.errors = 0  # 模拟的失败请求数 (含重试)
+        self._queue = []  # (虚拟时间, 同一时刻的顺序, 序号, 协程或流量限制检查, 版本)
+        self._sequence = itertools.count()
+        # 传输按传输时钟推进: 没有限速或合计速率不超过限速时与虚拟时钟同速，否则按限速与合计速率之比放慢
+        self._flows = []  # (传输时钟上的完成时刻, 序号, 传输, 版本)
+        self._transfers = {}  # 进行中的传输，按开始顺序，保证结果可复现
+        self._tick = 0.0  # 虚拟时间为 _ticked 时的传输时钟
+        self._ticked = 0.0
+        self._pace = 1.0  # 传输时钟相对虚拟时钟的速度
+        self._limit_rate = None  # 限速 (字节/秒)，None表示不限
+        self._limit_version = 0
+        self._limit_due = None  # 已安排的流量限制检查的虚拟时间
+        self._limit_near = False  # 进行中的传输合计已可能达到流量限制，按分块边界检查
+        self._links = {link for model in models for link in model.links}
+        # 所有URL都经过的链路 (本机下行) 与限速限制了合计速率的上限
+        self._shared = set.intersection(*(set(model.links) for model in models))
+        self._peak_bandwidth = max(model.bandwidth for model in models)
+
+        consumer.urls = [model.url for model in models]
+        consumer.url_source = None
+        consumer._url_pool = None
+        consumer.url_pool.random = self.random
+        consumer.logger = self._logger(logger)
+        if consumer.mode != "download" or consumer.arrival_rate:
+            consumer.logger("模拟只包含闭环的下载，上传与开环到达按闭环下载模拟", Fore.YELLOW)
+        if consumer.limit_speed > 0:
+            consumer.rate_limiter = RateLimiter(int(consumer.limit_speed * MB), clock=self.clock)
+
+    def clock(self):
+        return self.now
+
+    def _logger(self, logger):
+        """日志前加上虚拟时间；logger 为None时不输出"""
+        def log(message, color=None):
+            if logger is not None:
+                stamp = datetime.fromtimestamp(SIM_EPOCH + self.now).strftime("%m-%d %H:%M:%S.%f")[:-3]
+                logger(f"[{stamp}] {message.strip()}", color)
+        return log
+
+    def run(self, horizon):
+        """执行模拟: 定时任务在 horizon 秒内按触发器执行多次，否则执行一次 (没有任何限制时运行 horizon 秒)
+
+        返回 {"runs": [每次运行的结果], "skipped": 因上一次运行未结束而跳过的次数, "virtual_seconds": 虚拟时长}
+        """
+        consumer = self.consumer
+        began = self.now
+        if consumer.cron_expr or consumer.interval:
+            runs, skipped = self._run_schedule(self.now + horizon)
+        else:
+            unlimited = not (consumer.duration or consumer.count or consumer.traffic_limit)
+            runs, skipped = [self.run_once(self.now + horizon if unlimited else None)], 0
+        return {"runs": runs, "skipped": skipped, "virtual_seconds": self.now - began}
+
+    def _run_schedule(self, end):
+        from traffic_consumer import SCHEDULER_TIMEZONE
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+
+        consumer = self.consumer
+        start = datetime.fromtimestamp(SIM_EPOCH + self.now, timezone.utc)
+        # 与 setup_scheduler 创建的触发器一致，间隔调度的首次执行在添加作业之后一个间隔
+        if consumer.cron_expr:
+            trigger = CronTrigger.from_crontab(consumer.cron_expr)
+        else:
+            trigger = IntervalTrigger(minutes=consumer.interval, start_date=start + timedelta(minutes=consumer.interval),
+                                      timezone=SCHEDULER_TIMEZONE)
+
+        runs = []
+        skipped = 0
+        busy_until = self.now
+        fire = trigger.get_next_fire_time(None, start)
+        while fire is not None and fire.timestamp() - SIM_EPOCH < end:
+            if fire.timestamp() - SIM_EPOCH < busy_until:
+                skipped += 1
+                consumer.logger(f"上一次运行尚未结束，跳过 {datetime.fromtimestamp(fire.timestamp()):%H:%M:%S} 的计划任务",
+                                Fore.YELLOW)
+            else:
+                self.now = fire.timestamp() - SIM_EPOCH
+                consumer.logger("开始执行计划任务...", Fore.CYAN)
+                runs.append(self.run_once(end))
+                busy_until = self.now
+            fire = trigger.get_next_fire_time(fire, fire + timedelta(microseconds=1))
+        self.now = max(self.now, end)
+        return runs, skipped
+
+    def run_once(self, deadline=None):
+        """从当前虚拟时间开始执行一次运行，deadline 为虚拟时间上的截止时刻，返回本次运行的结果"""
+        consumer = self.consumer
+        consumer._reset_run_state()
+        consumer.planner = None
+        errors = self.errors
+        if consumer.preflight:
+            self._preflight()
+
+        consumer.active = True
+        consumer.start_time = self.now
+        consumer.status = "正在执行"
+        for thread_id in range(1, consumer.threads + 1):
+            self._schedule(0.0, self._worker(thread_id))
+
+        end = deadline
+        if consumer.duration:
+            end = min(end or float("inf"), consumer.start_time + consumer.duration)
+        self._loop(end)
+        # 逐块计量时，运行停止前进行中的传输已收到的完整分块都已计入，停止后收到的分块不再计入
+        self._settle(stopped=True)
+        consumer.active = False
+        consumer.status = "已停止"
+        self._queue.clear()
+        self._flows.clear()
+        for transfer in self._transfers:
+            transfer.worker = None
+        self._transfers.clear()
+        for link in self._links:
+            link.active = 0
+        self._set_pace(1.0)
+        self._limit_due = None
+        self._limit_near = False
+        return self._result(self.now - consumer.start_time, self.errors - errors)
+
+    def _schedule(self, delay, item, version=None, order=0):
+        """order 为1的事件在同一时刻的其他事件之后处理: 流量限制检查在恰好同时完成的传输计入之后进行"""
+        heapq.heappush(self._queue, (self.now + delay, order, next(self._sequence), item, version))
+
+    def _tick_at(self, when):
+        """虚拟时间 when 时的传输时钟"""
+        return self._tick + (when - self._ticked) * self._pace
+
+    def _time_at(self, tick):
+        """传输时钟到达 tick 时的虚拟时间"""
+        return self._ticked + (tick - self._tick) / self._pace
+
+    def _set_pace(self, pace):
+        if pace != self._pace:
+            self._tick = self._tick_at(self.now)
+            self._ticked = self.now
+            self._pace = pace
+
+    def _next_flow(self):
+        """最早完成的传输与其完成的虚拟时间，没有进行中的传输时返回 (None, None)；顺带丢弃失效的完成事件"""
+        flows = self._flows
+        while flows:
+            tick, _, transfer, version = flows[0]
+            if version == transfer.version and transfer.worker is not None:
+                return transfer, self._time_at(tick)
+            heapq.heappop(flows)
+        return None, None
+
+    def _loop(self, end):
+        """按虚拟时间顺序处理事件，直到任务停止、没有待处理的事件或到达 end"""
+        consumer = self.consumer
+        queue = self._queue
+        while consumer.active:
+            transfer, when = self._next_flow()
+            if queue and (transfer is None or queue[0][0] < when):
+                transfer = None
+                when = queue[0][0]
+            elif transfer is None:
+                return
+            if end is not None and when >= end:
+                self.now = end
+                return
+            self.now = when
+            if transfer is not None:
+                heapq.heappop(self._flows)
+                self._advance(self._finish_transfer(transfer), end)
+                continue
+            _, _, _, item, version = heapq.heappop(queue)
+            if item is LIMIT_CHECK:
+                if version == self._limit_version:
+                    self._limit_due = None
+                    self._check_limit()
+            else:
+                self._advance(item, end)
+
+    def _advance(self, worker, end):
+        """执行协程直到它开始一次传输、结束或要等待到其他事件之后"""
+        consumer = self.consumer
+        queue = self._queue
+        # 协程的下一个事件早于所有其他事件时直接继续执行，省去入队与出队
+        horizon = self._next_flow()[1]
+        if horizon is None or (end is not None and end < horizon):
+            horizon = end
+        while True:
+            try:
+                step = next(worker)
+            except StopIteration:
+                return
+            if step.__class__ is Transfer:
+                self._start_transfer(worker, step)
+                return
+            delay = step
+            when = self.now + delay
+            if (not consumer.active or (queue and when >= queue[0][0])
+                    or (horizon is not None and when >= horizon)):
+                self._schedule(delay, worker)
+                return
+            self.now = when
+
+    def _start_transfer(self, worker, transfer):
+        """协程产出的传输从当前虚拟时间开始，完成时继续执行该协程"""
+        transfer.worker = worker
+        transfer.since = self._tick_at(self.now)
+        self._transfers[transfer] = None
+        changed = self._shift(transfer.links, 1)
+        transfer.rate = transfer.current_rate()
+        self._schedule_finish(transfer)
+        self._retune(changed, transfer)
+        self._follow_limiter()
+        if self._limit_near or self._limit_due is None:
+            self._schedule_limit()
+
+    def _finish_transfer(self, transfer):
+        """传输收到全部字节: 计入余下的字节并检查流量限制，返回要继续执行的协程"""
+        consumer = self.consumer
+        del self._transfers[transfer]
+        self._retune(self._shift(transfer.links, -1))
+        self._follow_limiter()
+        worker = transfer.worker
+        transfer.worker = None  # 协程持有传输，断开引用环
+        if self._limit_near:
+            # 逐块计量时，此前收到的分块 (包括其他传输同一时刻收到的) 在最后一个分块之前已经计入
+            self._credit(transfer, (transfer.size - 1) // consumer.chunk_size * consumer.chunk_size)
+            if self._settle(check=True):
+                return worker
+        self._credit(transfer, transfer.size)
+        if consumer._check_traffic_limit():
+            # 与 _stream_download 一致: 按规划恰好用完预算的最后一次下载已收到全部预计的字节，仍计为完成
+            reservation = transfer.reservation
+            transfer.completed = (reservation is not None and reservation.expected is not None
+                                  and transfer.size >= reservation.expected)
+        else:
+            transfer.completed = True
+            if self._limit_near:
+                self._schedule_limit()
+        return worker
+
+    def _shift(self, links, delta):
+        """改变各链路上的连接数，返回平分后的带宽可能改变某个连接速率的链路"""
+        changed = []
+        for link in links:
+            before = link.active
+            link.active += delta
+            if link.capacity is not None and link.capacity / max(before, link.active, 1) < link.peak:
+                changed.append(link)
+        return changed
+
+    def _follow_limiter(self):
+        """按限速与进行中的传输的合计速率调整传输时钟的速度；限速在运行中被调整时重新安排流量限制检查"""
+        rate_limiter = self.consumer.rate_limiter
+        limit_rate = (rate_limiter.rate or None) if rate_limiter is not None else None
+        if limit_rate != self._limit_rate:
+            self._limit_rate = limit_rate
+            self._schedule_limit()
+        pace = 1.0
+        if limit_rate is not None:
+            demand = sum(transfer.rate for transfer in self._transfers)
+            if demand > limit_rate:
+                pace = limit_rate / demand
+        self._set_pace(pace)
+
+    def _retune(self, links, skip=None):
+        """重新计算经过 links 的传输的速率，速率变化的传输重新安排完成事件"""
+        if not links:
+            return
+        tick = self._tick_at(self.now)
+        for transfer in self._transfers:
+            if transfer is skip or not any(link in links for link in transfer.links):
+                continue
+            rate = transfer.current_rate()
+            if rate != transfer.rate:
+                transfer.done = min(transfer.size, transfer.done + transfer.rate * (tick - transfer.since))
+                transfer.since = tick
+                transfer.rate = rate
+                transfer.version += 1
+                self._schedule_finish(transfer)
+
+    def _schedule_finish(self, transfer):
+        tick = transfer.since + (transfer.size - transfer.done) / transfer.rate
+        heapq.heappush(self._flows, (tick, next(self._sequence), transfer, transfer.version))
+
+    def _credit(self, transfer, received):
+        """把传输已收到的 received 字节中尚未计入的部分计入统计"""
+        size = received - transfer.credited
+        if size <= 0:
+            return
+        transfer.credited = received
+        consumer = self.consumer
+        pool = transfer.pool
+        url_id = transfer.url_id
+        with consumer.lock:
+            consumer.total_bytes += size
+            consumer.payload_bytes += size
+            consumer.wire_bytes += size
+            pool.payload[url_id] += size
+            pool.wire[url_id] += size
+            if transfer.reservation is not None:
+                transfer.reservation.consume(size)
+
+    def _settle(self, check=False, stopped=False):
+        """把进行中的传输已收到的完整分块计入统计；check 为True时每计入一个传输检查一次流量限制，
+        同一时刻收到分块的传输依次计入，与逐块计量时先到的分块触发限制一致。返回是否达到了流量限制
+
+        最后一个分块由传输自己的完成事件计入；stopped 为True表示运行已在此刻停止，恰好此刻收到的分块不再计入
+        """
+        consumer = self.consumer
+        chunk_size = consumer.chunk_size
+        tick = self._tick_at(self.now)
+        for transfer in self._transfers:
+            received = min(transfer.received(tick) - (1 if stopped else 0), transfer.size - 1)
+            self._credit(transfer, received - received % chunk_size)
+            if check and consumer._check_traffic_limit():
+                return True
+        return False
+
+    def _peak_rate(self):
+        """所有线程合计可能达到的最高速率"""
+        rate = self.consumer.threads * self._peak_bandwidth
+        for link in self._shared:
+            if link.capacity is not None:
+                rate = min(rate, link.capacity)
+        if self._limit_rate is not None:
+            rate = min(rate, self._limit_rate)
+        return rate
+
+    def _schedule_limit(self):
+        """安排下一次流量限制检查
+
+        离限制还远时，按合计速率的上限估计最早可能达到限制的时刻，期间传输开始、结束或速率变化都不必重新安排；
+        进行中的传输合计已可能达到限制时，在下一个分块边界检查，传输开始或结束时重新安排
+        """
+        consumer = self.consumer
+        if consumer.traffic_limit is None or consumer._traffic_limit_triggered or not self._transfers:
+            return
+        now = self.now
+        chunk_size = consumer.chunk_size
+        tick = self._tick_at(now)
+        pending = sum(transfer.received(tick) - transfer.credited for transfer in self._transfers)
+        deficit = consumer.traffic_limit * MB - consumer.limited_bytes - pending
+        self._limit_near = deficit < 1
+        if not self._limit_near:
+            delay = deficit / self._peak_rate()
+        else:
+            boundary = min(transfer.since + (min(transfer.size, (transfer.credited // chunk_size + 1) * chunk_size)
+                                             - transfer.done) / transfer.rate for transfer in self._transfers)
+            delay = self._time_at(boundary) - now
+        delay = max(delay, 0.0)
+        self._limit_version += 1
+        self._limit_due = now + delay
+        self._schedule(delay, LIMIT_CHECK, self._limit_version, order=1)
+
+    def _check_limit(self):
+        if not self._settle(check=True):
+            self._schedule_limit()
+
+    def _preflight(self):
+        """模拟预检: 大小与Range支持取自模型，两次探测都失败的URL标记失效；耗时按探测线程平分延迟估算"""
+        from preflight import PROBE_ATTEMPTS, BudgetPlanner
+
+        consumer = self.consumer
+        pool = consumer.url_pool
+        pool.sizes = array("q", (model.size for model in self.models))
+        pool.ranges = bytearray(model.ranges for model in self.models)
+        for url_id, model in enumerate(self.models):
+            if not pool.invalid[url_id] and self.random.random() < model.failure_rate ** PROBE_ATTEMPTS:
+                pool.sizes[url_id] = -1
+                consumer._mark_url_invalid(pool, url_id, model.url, "模拟的请求失败", probed=True)
+        self.now += sum(model.latency for model in self.models) / min(consumer.preflight_workers, len(self.models))
+        consumer.planner = BudgetPlanner(pool, HEADER_BYTES if consumer.meter_basis == "wire" else 0)
+
+    def _worker(self, thread_id):
+        """与 TrafficConsumer.download_file 相同的循环，产出的值为要等待的虚拟秒数"""
+        from traffic_consumer import PLAN_WAIT
+
+        consumer = self.consumer
+        while consumer.active:
+            if consumer.count is not None and consumer.download_count >= consumer.count:
+                consumer._stop_due_to_count()
+                return
+
+            pool = consumer.url_pool
+            url_id = pool.choose(consumer.url_strategy)
+            if url_id is None:
+                consumer.logger("未找到可用的下载链接，任务将停止。", Fore.RED)
+                consumer.active = False
+                return
+
+            planner = consumer.planner
+            reservation = None
+            if planner is not None and planner.pool is pool:
+                reservation, waiting = consumer._plan_request(planner, url_id, False)
+                if reservation is None:
+                    if waiting:
+                        yield PLAN_WAIT
+                    continue
+                url_id = reservation.url_id
+
+            started = self.now
+            completed = yield from self._download_with_retries(pool, url_id, reservation)
+
+            # 与 download_file 一致: 按规划用完流量预算的最后一次下载已停止运行，先计入完成再退出
+            with consumer.lock:
+                if reservation is not None:
+                    planner.release(reservation)
+                if not completed:
+                    continue
+                reached = consumer._record_completion(pool, url_id, self.now - started, self.now - started)
+            if reached:
+                consumer._stop_due_to_count()
+                return
+
+    def _download_with_retries(self, pool, url_id, reservation):
+        """与 TrafficConsumer._download_with_retries 相同的重试与退避，失败发生在收到响应头之前"""
+        from traffic_consumer import MAX_RETRY_BACKOFF
+
+        consumer = self.consumer
+        model = self.models[url_id]
+        attempt = 1
+        backoff = consumer.retry_backoff
+        while attempt <= consumer.max_retries and consumer.active:
+            yield model.latency
+            if not consumer.active:
+                return False
+            if model.failure_rate and self.random.random() < model.failure_rate:
+                self.errors += 1
+                if attempt >= consumer.max_retries:
+                    consumer._mark_url_invalid(pool, url_id, model.url, "模拟的请求失败")
+                    return False
+                yield backoff
+                backoff = min(backoff * 2, MAX_RETRY_BACKOFF)
+                attempt += 1
+                continue
+            return (yield from self._stream(pool, url_id, model, reservation))
+        return False
+
+    def _stream(self, pool, url_id, model, reservation):
+        """与 TrafficConsumer._stream_download 相同的计量与流量限制检查，整个传输由事件队列推进"""
+        consumer = self.consumer
+        wire_basis = consumer.meter_basis == "wire"
+        size = reservation.length if reservation is not None and reservation.length is not None else model.size
+
+        with consumer.lock:
+            consumer.wire_bytes += HEADER_BYTES
+            pool.wire[url_id] += HEADER_BYTES
+            if wire_basis:
+                consumer.total_bytes += HEADER_BYTES
+                if reservation is not None:
+                    reservation.consume(HEADER_BYTES)
+
+        transfer = Transfer(pool, url_id, model, reservation, size)
+        yield transfer
+        return transfer.completed
+
+    def _result(self, elapsed, errors):
+        consumer = self.consumer
+        pool = consumer.url_pool
+        usage = [pool.usage[url_id] for url_id in range(len(pool)) if not pool.invalid[url_id]]
+        overshoot = None
+        if consumer.traffic_limit is not None and consumer._traffic_limit_triggered:
+            # 在截止时刻前未达到流量限制的运行没有超出量
+            overshoot = consumer.limited_bytes - int(consumer.traffic_limit * MB)
+        return {
+            "start": datetime.fromtimestamp(SIM_EPOCH + consumer.start_time).strftime("%Y-%m-%d %H:%M:%S"),
+            "elapsed": elapsed,
+            "total_bytes": consumer.total_bytes,
+            "download_count": consumer.download_count,
+            "throughput": consumer.total_bytes / elapsed if elapsed > 0 else 0.0,
+            "limit_overshoot": overshoot,
+            "fairness": fairness(usage) if usage else None,
+            "errors": errors,
+            "invalid": pool.invalid_count,
+            "latency": consumer.response_latency.summary()
+        }
+
+
+def parse_sweep(items):
+    """把 ["threads=1,4,8", "url_strategy=random,round_robin"] 解析为 [(配置项, [取值])]，取值按JSON解析，失败时按字符串"""
+    sweep = []
+    for item in items or ():
+        key, sep, values = item.partition("=")
+        if not sep or not key or not values:
+            raise ValueError(f"无效的参数扫描 {item}，格式应为 配置项=值1,值2")
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except json.JSONDecodeError:
+                parsed.append(value)
+        sweep.append((key.strip(), parsed))
+    return sweep
+
+
+def simulate(settings, models, seed, horizon, logger=None):
+    """按配置 (TrafficConsumer 的构造参数) 创建消耗器并模拟，返回 Simulation.run 的结果"""
+    from traffic_consumer import TrafficConsumer
+
+    consumer = TrafficConsumer(**settings)
+    return Simulation(consumer, models, seed, logger).run(horizon)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+状态快照发布 - 每个周期只构建并序列化一次快照，由任意数量的面板共享
+
+1. 发布线程按固定周期调用 build() 构建快照，序列化为JSON一次，
+   面板数量不影响构建次数，也不影响下载线程持有锁的时间
+2. 内容与上一次相同时不发布新版本，ETag 由内容摘要得出，
+   轮询方可以用 If-None-Match 得到 304
+3. 订阅回调 (Socket.IO 广播) 与等待新版本的流式连接 (SSE) 拿到的是同一份序列化结果
+"""
+
+import json
+import time
+import hashlib
+import threading
+
+DEFAULT_INTERVAL = 1.0  # 构建快照的周期，单位秒
+
+
+class Snapshot:
+    """一次发布的快照: 版本号、ETag 与序列化后的内容"""
+
+    __slots__ = ("version", "etag", "text", "body", "created")
+
+    def __init__(self, version, text):
+        self.version = version
+        self.text = text
+        self.body = text.encode("utf-8")
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self.created = time.time()
+
+
+class SnapshotPublisher:
+    """按周期构建快照并广播给订阅者
+
+    build() 返回可JSON序列化的对象；subscribe(callback) 注册的回调在发布线程中以 Snapshot 调用
+    """
+
+    def __init__(self, build, interval=DEFAULT_INTERVAL, logger=None):
+        self.build = build
+        self.interval = interval
+        self.logger = logger
+        self.subscribers = []
+        self.current = None
+        self.condition = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def start(self):
+        """启动发布线程，已在运行时不重复启动"""
+        with self.condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def latest(self):
+        """最近一次发布的快照，尚未发布时立即构建一次"""
+        if self.current is None:
+            self.publish()
+        return self.current
+
+    def wait(self, version, timeout):
+        """等待比 version 更新的快照，超时或已停止时返回None"""
+        with self.condition:
+            if self.current is None or self.current.version <= version:
+                self.condition.wait(timeout)
+            current = self.current
+        if current is None or current.version <= version:
+            return None
+        return current
+
+    def publish(self):
+        """构建并发布一次快照，内容未变化时不产生新版本"""
+        text = json.dumps(self.build(), ensure_ascii=False, separators=(",", ":"))
+        with self.condition:
+            current = self.current
+            if current is not None and current.text == text:
+                return None
+            snapshot = Snapshot(current.version + 1 if current else 1, text)
+            self.current = snapshot
+            self.condition.notify_all()
+        for callback in self.subscribers:
+            callback(snapshot)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.publish()
+            except Exception as e:
+                if self.logger:
+                    self.logger(f"构建状态快照失败: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -7,12 +7,19 @@ document.addEventListener('DOMContentLoaded', (event) => {
     const startBtn = document.getElementById('start-btn');
     const stopBtn = document.getElementById('stop-btn');
     const stopSchedulerBtn = document.getElementById('stop-scheduler-btn');
+    const profileBtn = document.getElementById('profile-btn');
     const saveConfigBtn = document.getElementById('save-config-btn');
+    const applyConfigBtn = document.getElementById('apply-config-btn');
+    // 运行中可以直接生效的配置项，与后端 LIVE_SETTINGS 一致
+    const LIVE_SETTINGS = ['urls', 'url_source', 'url_strategy', 'threads', 'limit_speed', 'duration', 'count', 'traffic_limit',
+        'mode', 'upload_ratio', 'upload_size', 'upload_method', 'decode_content', 'verify_sample'];
     const configSelect = document.getElementById('config-select');
     const runningStatus = document.getElementById('running-status');
     const configInputs = {
         name: document.getElementById('config-name'),
         urls: document.getElementById('urls'),
+        agents: document.getElementById('agents'),
+        url_source: document.getElementById('url-source'),
         threads: document.getElementById('threads'),
         limit_speed: document.getElementById('limit-speed'),
         traffic_limit: document.getElementById('traffic-limit'),
@@ -20,8 +27,18 @@ document.addEventListener('DOMContentLoaded', (event) => {
         count: document.getElementById('count'),
         cron_expr: document.getElementById('cron-expr'),
         interval: document.getElementById('interval'),
-        url_strategy: document.getElementById('url-strategy')
+        url_strategy: document.getElementById('url-strategy'),
+        meter_basis: document.getElementById('meter-basis'),
+        decode_content: document.getElementById('decode-content'),
+        mode: document.getElementById('mode'),
+        upload_size: document.getElementById('upload-size'),
+        upload_ratio: document.getElementById('upload-ratio'),
+        verify_manifest: document.getElementById('verify-manifest'),
+        verify_sample: document.getElementById('verify-sample'),
+        arrival_rate: document.getElementById('arrival-rate'),
+        arrival_process: document.getElementById('arrival-process')
     };
+    const schedulerJobSelect = document.getElementById('scheduler-job-select');
     const jobDetailsEl = document.getElementById('job-details');
     const nextRunTimeEl = document.getElementById('next-run-time');
     const countdownEl = document.getElementById('countdown');
@@ -40,6 +57,13 @@ document.addEventListener('DOMContentLoaded', (event) => {
     const totalThreadCountEl = document.getElementById('total-thread-count');
     const erroredThreadCountEl = document.getElementById('errored-thread-count');
     const currentConfigEl = document.getElementById('current-config');
+    const jobConfigSelect = document.getElementById('job-config-select');
+    const jobNameInput = document.getElementById('job-name');
+    const jobWeightInput = document.getElementById('job-weight');
+    const startJobBtn = document.getElementById('start-job-btn');
+    const jobsTableBody = document.getElementById('jobs-table-body');
+    const jobsWorkersEl = document.getElementById('jobs-workers');
+    const jobsTotalLimitEl = document.getElementById('jobs-total-limit');
 
     let selectedConfigName = null;
     let selectedConfigDetail = null;
@@ -180,12 +204,60 @@ document.addEventListener('DOMContentLoaded', (event) => {
     }) : null;
 
 
+    // 速度图的时间范围: live 为实时推送的最近30个点，其余从服务端查询降采样后的序列
+    const speedRangeSelect = document.getElementById('speed-range');
+    const LIVE_POINTS = 30;
+    const SERIES_POINTS = 300;
+    const SERIES_REFRESH_MS = 10000;
+    let speedRange = 'live';
+
+    function loadSpeedSeries() {
+        const params = new URLSearchParams({ run: 'current' });
+        if (speedRange === 'live') {
+            params.set('last', String(LIVE_POINTS));
+            params.set('points', String(LIVE_POINTS));
+        } else {
+            params.set('points', String(SERIES_POINTS));
+            if (speedRange !== 'all') {
+                params.set('last', speedRange);
+            }
+        }
+        fetch(`/api/series?${params}`)
+            .then((response) => (response.ok ? response.json() : null))
+            .then((result) => {
+                if (!result) return;
+                const longRange = result.end - result.start > 86400;
+                speedChart.data.labels = result.points.map(([offset]) => {
+                    const time = new Date((result.start_time + offset) * 1000);
+                    return longRange ? time.toLocaleString() : time.toLocaleTimeString();
+                });
+                speedChart.data.datasets[0].data = result.points.map(([, speed]) => +(speed / 1048576).toFixed(2));
+                speedChart.update('none');
+            })
+            .catch(() => {});
+    }
+
+    if (speedRangeSelect) {
+        speedRangeSelect.addEventListener('change', () => {
+            speedRange = speedRangeSelect.value;
+            loadSpeedSeries();
+        });
+    }
+    // 页面打开或刷新后先补上最近的速度，查看较长范围时定期刷新
+    loadSpeedSeries();
+    setInterval(() => {
+        if (speedRange !== 'live') {
+            loadSpeedSeries();
+        }
+    }, SERIES_REFRESH_MS);
+
     function addDataToChart(label, data) {
+        if (speedRange !== 'live') return;
         speedChart.data.labels.push(label);
         speedChart.data.datasets.forEach((dataset) => {
             dataset.data.push(data);
         });
-        if (speedChart.data.labels.length > 30) {
+        if (speedChart.data.labels.length > LIVE_POINTS) {
             speedChart.data.labels.shift();
             speedChart.data.datasets[0].data.shift();
         }
@@ -266,6 +338,13 @@ document.addEventListener('DOMContentLoaded', (event) => {
             const urls = Array.isArray(config.urls) ? config.urls : [];
             configInputs.urls.value = urls.join('\n');
         }
+        if (configInputs.agents) {
+            const agents = Array.isArray(config.agents) ? config.agents : [];
+            configInputs.agents.value = agents.join('\n');
+        }
+        if (configInputs.url_source) {
+            configInputs.url_source.value = config.url_source ?? '';
+        }
         if (configInputs.threads) {
             configInputs.threads.value = config.threads ?? '';
         }
@@ -290,6 +369,35 @@ document.addEventListener('DOMContentLoaded', (event) => {
         if (configInputs.url_strategy) {
             configInputs.url_strategy.value = config.url_strategy ?? '';
         }
+        if (configInputs.meter_basis) {
+            configInputs.meter_basis.value = config.meter_basis ?? '';
+        }
+        if (configInputs.mode) {
+            configInputs.mode.value = config.mode ?? '';
+        }
+        if (configInputs.upload_size) {
+            configInputs.upload_size.value = config.upload_size ?? '';
+        }
+        if (configInputs.upload_ratio) {
+            configInputs.upload_ratio.value = config.upload_ratio ?? '';
+        }
+        if (configInputs.verify_manifest) {
+            configInputs.verify_manifest.value = config.verify_manifest ?? '';
+        }
+        if (configInputs.verify_sample) {
+            configInputs.verify_sample.value = config.verify_sample ?? '';
+        }
+        if (configInputs.arrival_rate) {
+            configInputs.arrival_rate.value = config.arrival_rate ?? '';
+        }
+        if (configInputs.arrival_process) {
+            configInputs.arrival_process.value = config.arrival_process ?? '';
+        }
+        if (configInputs.decode_content) {
+            configInputs.decode_content.value = config.decode_content === undefined || config.decode_content === null
+                ? ''
+                : String(config.decode_content);
+        }
         editorActiveConfig = name || null;
         if (cronPreviewEl) {
             cronPreviewEl.innerHTML = '';
@@ -302,6 +410,8 @@ document.addEventListener('DOMContentLoaded', (event) => {
     function normalizeConfigPayload(config = {}, name = null) {
         const payload = {
             urls: Array.isArray(config.urls) ? [...config.urls] : [],
+            agents: Array.isArray(config.agents) ? [...config.agents] : [],
+            url_source: config.url_source ?? null,
             url_strategy: config.url_strategy ?? null,
             threads: config.threads ?? null,
             limit_speed: config.limit_speed ?? null,
@@ -310,19 +420,47 @@ document.addEventListener('DOMContentLoaded', (event) => {
             count: config.count ?? null,
             cron_expr: config.cron_expr ?? null,
             interval: config.interval ?? null,
+            meter_basis: config.meter_basis ?? null,
+            decode_content: config.decode_content ?? null,
+            dns_ttl: config.dns_ttl ?? null,
+            resolve: config.resolve ?? null,
+            prewarm: config.prewarm ?? null,
+            mode: config.mode ?? null,
+            upload_size: config.upload_size ?? null,
+            upload_ratio: config.upload_ratio ?? null,
+            verify_manifest: config.verify_manifest ?? null,
+            verify_sample: config.verify_sample ?? null,
+            arrival_rate: config.arrival_rate ?? null,
+            arrival_process: config.arrival_process ?? null,
+            socket_rcvbuf: config.socket_rcvbuf ?? null,
+            tcp_nodelay: config.tcp_nodelay ?? null,
+            tcp_keepalive: config.tcp_keepalive ?? null,
+            tcp_congestion: config.tcp_congestion ?? null,
+            checkpoint: config.checkpoint ?? null,
+            interface: config.interface ?? null,
+            interface_limit: config.interface_limit ?? null,
+            preflight: config.preflight ?? null,
+            preflight_workers: config.preflight_workers ?? null,
+            governor: config.governor ?? null,
+            pressure_limit: config.pressure_limit ?? null,
+            bind: config.bind ?? null,
+            bind_policy: config.bind_policy ?? null,
+            memory_budget: config.memory_budget ?? null,
             config_name: name || config.config_name || null
         };
 
         payload.name = name || config.name || '';
 
-        payload.urls = payload.urls
-            .map((url) => {
-                if (typeof url === 'string') {
-                    return url.trim();
-                }
-                return url != null ? String(url).trim() : '';
-            })
-            .filter((url) => url !== '');
+        ['urls', 'agents'].forEach((key) => {
+            payload[key] = payload[key]
+                .map((url) => {
+                    if (typeof url === 'string') {
+                        return url.trim();
+                    }
+                    return url != null ? String(url).trim() : '';
+                })
+                .filter((url) => url !== '');
+        });
 
         const integerKeys = ['threads', 'traffic_limit', 'duration', 'count', 'interval'];
         integerKeys.forEach((key) => {
@@ -334,17 +472,40 @@ document.addEventListener('DOMContentLoaded', (event) => {
             payload[key] = Number.isFinite(parsed) ? parsed : null;
         });
 
-        if (payload.limit_speed !== null && payload.limit_speed !== undefined && payload.limit_speed !== '') {
-            const parsed = parseFloat(payload.limit_speed);
-            payload.limit_speed = Number.isFinite(parsed) ? parsed : null;
-        } else {
-            payload.limit_speed = null;
+        const floatKeys = ['limit_speed', 'upload_size', 'upload_ratio', 'verify_sample', 'arrival_rate'];
+        floatKeys.forEach((key) => {
+            if (payload[key] === null || payload[key] === undefined || payload[key] === '') {
+                payload[key] = null;
+                return;
+            }
+            const parsed = parseFloat(payload[key]);
+            payload[key] = Number.isFinite(parsed) ? parsed : null;
+        });
+
+        if (!payload.mode) {
+            payload.mode = null;
+        }
+
+        if (!payload.arrival_process) {
+            payload.arrival_process = null;
         }
 
         if (!payload.url_strategy) {
             payload.url_strategy = null;
         }
 
+        if (!payload.meter_basis) {
+            payload.meter_basis = null;
+        }
+
+        if (payload.decode_content === 'true' || payload.decode_content === true) {
+            payload.decode_content = true;
+        } else if (payload.decode_content === 'false' || payload.decode_content === false) {
+            payload.decode_content = false;
+        } else {
+            payload.decode_content = null;
+        }
+
         return payload;
     }
 
@@ -477,12 +638,19 @@ document.addEventListener('DOMContentLoaded', (event) => {
         updateThreadUsageChart(activeCount, idleCount, errorCount);
     }
 
-    function renderUrlUsage(stats = []) {
+    function renderUrlUsage(stats = [], pool = null) {
         if (!urlUsageList) return;
         urlUsageList.innerHTML = '';
 
+        if (pool && pool.size > (Array.isArray(stats) ? stats.length : 0)) {
+            const note = document.createElement('p');
+            note.className = 'small text-muted mb-2';
+            note.textContent = `URL池共 ${pool.size} 个，已使用 ${pool.used} 个，已失效 ${pool.invalid} 个；下方仅列出线程正在使用的URL。`;
+            urlUsageList.appendChild(note);
+        }
+
         if (!Array.isArray(stats) || stats.length === 0) {
-            urlUsageList.innerHTML = '<p class="text-muted text-center mb-0">暂无下载数据。</p>';
+            urlUsageList.insertAdjacentHTML('beforeend', '<p class="text-muted text-center mb-0">暂无下载数据。</p>');
             updateUrlPieChart([]);
             return;
         }
@@ -492,6 +660,7 @@ document.addEventListener('DOMContentLoaded', (event) => {
             const safePercent = Number.isFinite(percent) ? percent : 0;
             const safeCount = Number.isFinite(Number(item.count)) ? Number(item.count) : 0;
             const safeUrl = item.url || '未知链接';
+            const ratio = Number(item.decode_ratio);
 
             const wrapper = document.createElement('div');
             wrapper.className = 'url-usage-entry mb-2';
@@ -506,6 +675,10 @@ document.addEventListener('DOMContentLoaded', (event) => {
             const statLabel = document.createElement('span');
             statLabel.className = 'fw-bold text-nowrap';
             statLabel.textContent = `${safePercent.toFixed(1)}% · ${safeCount} 次`;
+            if (Number.isFinite(ratio) && ratio > 0) {
+                statLabel.textContent += ` · 解码/线路 ${ratio.toFixed(2)}`;
+                statLabel.title = '解码后字节数与线路字节数之比，大于1表示内容经过压缩传输';
+            }
 
             header.appendChild(urlLabel);
             header.appendChild(statLabel);
@@ -570,6 +743,100 @@ document.addEventListener('DOMContentLoaded', (event) => {
         }
     }
 
+    function formatBytes(value) {
+        const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+        let size = Number(value) || 0;
+        let unit = 0;
+        while (size >= 1024 && unit < units.length - 1) {
+            size /= 1024;
+            unit += 1;
+        }
+        return `${size.toFixed(2)} ${units[unit]}`;
+    }
+
+    function renderJobs(data) {
+        if (!jobsTableBody) return;
+        const jobs = Array.isArray(data.jobs) ? data.jobs : [];
+        jobsWorkersEl.textContent = `${data.used_workers || 0} / ${data.max_workers || 0}`;
+        jobsTotalLimitEl.textContent = data.total_limit ? `${data.total_limit} MB/s` : '不限';
+
+        // 正在编辑权重时不刷新表格，避免输入被覆盖
+        if (jobsTableBody.contains(document.activeElement)) return;
+
+        jobsTableBody.innerHTML = '';
+        if (!jobs.length) {
+            jobsTableBody.innerHTML = '<tr class="text-center"><td colspan="8">暂无任务</td></tr>';
+            return;
+        }
+        jobs.forEach((job) => {
+            const row = jobsTableBody.insertRow();
+            const cells = [
+                job.name,
+                job.running ? job.state : '已结束',
+                job.threads,
+                null,
+                `${formatBytes(job.speed)}/s`,
+                job.allocated_rate ? `${formatBytes(job.allocated_rate)}/s` : '不限',
+                formatBytes(job.total_bytes)
+            ];
+            cells.forEach((text, index) => {
+                const cell = row.insertCell();
+                if (index === 3) {
+                    const input = document.createElement('input');
+                    input.type = 'number';
+                    input.step = '0.5';
+                    input.min = '0.1';
+                    input.value = job.weight;
+                    input.className = 'form-control form-control-sm';
+                    input.style.width = '5em';
+                    input.disabled = !job.running;
+                    input.addEventListener('change', () => {
+                        socket.emit('set_job_weight', { name: job.name, weight: parseFloat(input.value) });
+                    });
+                    cell.appendChild(input);
+                } else {
+                    cell.textContent = text;
+                }
+            });
+
+            const actionCell = row.insertCell();
+            const button = document.createElement('button');
+            button.className = job.running ? 'btn btn-sm btn-outline-danger' : 'btn btn-sm btn-outline-secondary';
+            button.innerHTML = job.running ? '<i class="bi bi-stop-fill"></i>' : '<i class="bi bi-x-lg"></i>';
+            button.title = job.running ? '停止' : '移除';
+            button.addEventListener('click', () => {
+                socket.emit(job.running ? 'stop_job' : 'remove_job', { name: job.name });
+            });
+            actionCell.appendChild(button);
+        });
+    }
+
+    function pushNotice(content) {
+        if (!notificationArea) return;
+        const wrapper = document.createElement('div');
+        wrapper.className = 'alert alert-info alert-dismissible fade show';
+        wrapper.setAttribute('role', 'alert');
+
+        if (content instanceof Node) {
+            wrapper.appendChild(content);
+        } else {
+            wrapper.appendChild(document.createTextNode(content));
+        }
+
+        const closeBtn = document.createElement('button');
+        closeBtn.type = 'button';
+        closeBtn.className = 'btn-close';
+        closeBtn.setAttribute('data-bs-dismiss', 'alert');
+        closeBtn.setAttribute('aria-label', '关闭');
+        wrapper.appendChild(closeBtn);
+
+        notificationArea.appendChild(wrapper);
+
+        while (notificationArea.children.length > 3) {
+            notificationArea.removeChild(notificationArea.firstChild);
+        }
+    }
+
     // --- Socket.IO 事件处理 ---
     socket.on('connect', () => {
         console.log('已连接到服务器');
@@ -606,6 +873,20 @@ document.addEventListener('DOMContentLoaded', (event) => {
             }
         }
 
+        if (jobConfigSelect) {
+            const previousJobConfig = jobConfigSelect.value;
+            jobConfigSelect.innerHTML = '';
+            configs.forEach((name) => {
+                const option = document.createElement('option');
+                option.value = name;
+                option.textContent = name;
+                jobConfigSelect.appendChild(option);
+            });
+            if (configs.includes(previousJobConfig)) {
+                jobConfigSelect.value = previousJobConfig;
+            }
+        }
+
         if (editorConfigSelect) {
             const previousEditor = editorActiveConfig || editorConfigSelect.value;
             editorConfigSelect.innerHTML = '';
@@ -656,7 +937,7 @@ document.addEventListener('DOMContentLoaded', (event) => {
         }
     });
 
-    socket.on('status_update', (data) => {
+    function renderStatus(data) {
         if (data.running) {
             runningStatus.textContent = '运行中';
             runningStatus.className = 'badge bg-success';
@@ -667,6 +948,120 @@ document.addEventListener('DOMContentLoaded', (event) => {
         document.getElementById('speed-text').textContent = data.speed || '0 B/s';
         document.getElementById('total-bytes').textContent = data.total_bytes || '0 B';
         document.getElementById('download-count').textContent = data.download_count || '0';
+        const uploadChip = document.getElementById('upload-chip');
+        if (uploadChip) {
+            const showUpload = data.running && data.mode && data.mode !== 'download';
+            uploadChip.classList.toggle('d-none', !showUpload);
+            document.getElementById('upload-bytes').textContent = data.upload_bytes || '0 B';
+        }
+        const verifyChip = document.getElementById('verify-chip');
+        if (verifyChip) {
+            const verification = data.running ? data.verification : null;
+            verifyChip.classList.toggle('d-none', !verification);
+            if (verification) {
+                const verifyText = document.getElementById('verify-result');
+                verifyText.textContent = `${verification.passed} / ${verification.failed}`;
+                verifyText.classList.toggle('text-danger', verification.failed > 0);
+                verifyChip.title = `抽样 ${Math.round(verification.sample * 100)}%，通过 ${verification.passed} 次，`
+                    + `不通过 ${verification.failed} 次，队列已满放弃 ${verification.skipped} 次`;
+            }
+        }
+        const latencyChip = document.getElementById('latency-chip');
+        if (latencyChip) {
+            const latency = data.running && data.latency ? data.latency : null;
+            const hasLatency = Boolean(latency && latency.response && latency.response.count > 0);
+            latencyChip.classList.toggle('d-none', !hasLatency);
+            if (hasLatency) {
+                const response = latency.response;
+                const service = latency.service;
+                document.getElementById('latency-p99').textContent = `${response.p99.toFixed(1)} ms`;
+                let title = `响应时间 p50 ${response.p50.toFixed(1)} / p99.9 ${response.p999.toFixed(1)} ms，`
+                    + `服务时间 p99 ${service.p99.toFixed(1)} ms`;
+                if (latency.arrival) {
+                    title += `，开环 ${latency.arrival.rate} 次/秒，未能发出 ${latency.arrival.missed} 次`;
+                }
+                latencyChip.title = title;
+            }
+        }
+        const reconcileChip = document.getElementById('reconcile-chip');
+        if (reconcileChip) {
+            const reconcile = data.running ? data.reconcile : null;
+            reconcileChip.classList.toggle('d-none', !reconcile);
+            if (reconcile) {
+                const percent = (value) => (value === null || value === undefined ? 'N/A' : `${(value * 100).toFixed(3)}%`);
+                document.getElementById('reconcile-ratio').textContent = reconcile.overhead_ratio === null
+                    ? 'N/A' : reconcile.overhead_ratio.toFixed(3);
+                reconcileChip.title = `网卡 ${reconcile.interface}：接收 ${reconcile.rx_bytes} / 发送 ${reconcile.tx_bytes} 字节，`
+                    + `主机重传率 ${percent(reconcile.retransmit_rate)}，`
+                    + `本进程连接重传率 ${percent(reconcile.socket_retransmit_rate)}，`
+                    + `乱序到达 ${percent(reconcile.out_of_order_rate)}`;
+            }
+        }
+        const governorChip = document.getElementById('governor-chip');
+        if (governorChip) {
+            const governor = data.running ? data.governor : null;
+            governorChip.classList.toggle('d-none', !governor);
+            if (governor) {
+                const scaleText = document.getElementById('governor-scale');
+                scaleText.textContent = `${Math.round(governor.scale * 100)}%`;
+                scaleText.classList.toggle('text-warning', governor.scale < 1);
+                const signals = Object.entries(governor.signals || {})
+                    .map(([name, signal]) => (name === 'load'
+                        ? `负载 ${signal.value.toFixed(2)}/CPU`
+                        : `${name} ${signal.value.toFixed(1)}%`))
+                    .join('，');
+                let title = `并发 ${governor.threads} 线程`
+                    + (governor.rate ? `，速率 ${(governor.rate / 1024 / 1024).toFixed(2)} MB/s` : '')
+                    + `，已调节 ${governor.decision_count} 次，受限 ${governor.throttled_seconds} 秒`;
+                if (signals) {
+                    title += `\n${signals}`;
+                }
+                governor.decisions.slice().reverse().forEach((decision) => {
+                    title += `\n${decision.time} ${decision.action === 'throttle' ? '下调' : '恢复'}: ${decision.reason}`;
+                });
+                governorChip.title = title;
+            }
+        }
+        const sourceChip = document.getElementById('source-chip');
+        if (sourceChip) {
+            const sources = data.running && Array.isArray(data.sources) ? data.sources : [];
+            sourceChip.classList.toggle('d-none', sources.length === 0);
+            if (sources.length) {
+                const megabytes = (value) => `${(value / 1024 / 1024).toFixed(2)} MB/s`;
+                document.getElementById('source-speeds').textContent = sources
+                    .map((source) => megabytes(source.speed)).join(' / ');
+                sourceChip.title = sources.map((source) => {
+                    const label = source.source === source.address ? source.source : `${source.source} (${source.address})`;
+                    return `${label}：${megabytes(source.speed)}，占 ${(source.share * 100).toFixed(1)}%，`
+                        + `完成 ${source.requests} 次，出错 ${source.errors} 次`;
+                }).join('\n');
+            }
+        }
+        const memoryChip = document.getElementById('memory-chip');
+        if (memoryChip) {
+            const memory = data.running ? data.memory : null;
+            memoryChip.classList.toggle('d-none', !memory || !memory.rss);
+            if (memory && memory.rss) {
+                const megabytes = (value) => `${(value / 1024 / 1024).toFixed(1)} MB`;
+                const rssText = document.getElementById('memory-rss');
+                rssText.textContent = `${megabytes(memory.rss)} / ${megabytes(memory.budget)}`;
+                rssText.classList.toggle('text-warning', memory.rss > memory.budget);
+                const labels = { stacks: '线程栈', heap: '堆与匿名内存', files: '文件映射', other: '其他' };
+                let title = `峰值 ${megabytes(memory.peak)}，分块 ${(memory.plan.chunk_size / 1024).toFixed(0)} KB，`
+                    + `线程 ${memory.plan.threads}/${memory.plan.requested_threads}`;
+                Object.entries(memory.breakdown || {}).forEach(([key, value]) => {
+                    title += `\n${labels[key] || key}：${megabytes(value)}`;
+                });
+                memoryChip.title = title;
+            }
+        }
+        const agentChip = document.getElementById('agent-chip');
+        if (agentChip) {
+            const agents = Array.isArray(data.agents) ? data.agents : [];
+            agentChip.classList.toggle('d-none', !data.running || agents.length === 0);
+            const online = agents.filter((agent) => agent.state === '运行中').length;
+            document.getElementById('agent-online').textContent = `${online} / ${agents.length}`;
+        }
         if (currentConfigEl) {
             const safeConfigName = typeof data.config === 'string' && data.config.trim()
                 ? data.config.trim()
@@ -681,9 +1076,32 @@ document.addEventListener('DOMContentLoaded', (event) => {
 
         startBtn.disabled = data.running;
         stopBtn.disabled = !data.running;
+        if (applyConfigBtn) {
+            applyConfigBtn.disabled = !data.running;
+        }
+        if (profileBtn && !profileBtn.dataset.profiling) {
+            profileBtn.disabled = !data.running;
+        }
 
         renderThreadStatus(data.thread_status, data.thread_count);
-        renderUrlUsage(data.url_usage_stats);
+        renderUrlUsage(data.url_usage_stats, data.url_pool);
+    }
+
+    socket.on('status_update', renderStatus);
+
+    // 服务端每个周期只序列化一次快照并广播，调度状态变化不频繁，内容不变时不重新渲染
+    let lastSchedulerState = null;
+    let lastSchedulerSnapshot = {};
+    socket.on('snapshot', (raw) => {
+        const snapshot = typeof raw === 'string' ? JSON.parse(raw) : raw;
+        renderStatus(snapshot.status || {});
+        renderJobs(snapshot.jobs || {});
+        const schedulerState = JSON.stringify(snapshot.scheduler || {});
+        if (schedulerState !== lastSchedulerState) {
+            lastSchedulerState = schedulerState;
+            lastSchedulerSnapshot = snapshot.scheduler || {};
+            renderScheduler(lastSchedulerSnapshot);
+        }
     });
 
     socket.on('history_update', (record) => {
@@ -720,8 +1138,64 @@ document.addEventListener('DOMContentLoaded', (event) => {
         pushAlert(data);
     });
 
+    socket.on('error', (data) => {
+        pushAlert({ message: data.message });
+    });
+
+    socket.on('profile_started', (data) => {
+        if (profileBtn) {
+            profileBtn.dataset.profiling = '1';
+            profileBtn.disabled = true;
+        }
+        pushNotice(`性能剖析已开始，持续 ${data.seconds} 秒。`);
+    });
+
+    socket.on('profile_complete', (data) => {
+        if (profileBtn) {
+            delete profileBtn.dataset.profiling;
+        }
+        const content = document.createElement('span');
+        content.appendChild(document.createTextNode(`性能剖析完成，共 ${data.samples} 次采样：`));
+        Object.entries(data.files || {}).forEach(([kind, filename]) => {
+            const link = document.createElement('a');
+            link.href = `/api/profiles/${encodeURIComponent(filename)}`;
+            link.className = 'ms-2';
+            link.textContent = kind;
+            content.appendChild(link);
+        });
+        pushNotice(content);
+    });
+
+    socket.on('consumer_updated', (data) => {
+        const applied = data.applied || [];
+        const pending = data.restart_required || [];
+        let message = applied.length ? `已在运行中更新: ${applied.join(', ')}` : '配置没有变化。';
+        if (pending.length) {
+            message += `；需要重新启动后生效: ${pending.join(', ')}`;
+        }
+        pushNotice(message);
+    });
+
+    socket.on('jobs_update', (data) => {
+        renderJobs(data || {});
+    });
+
+    socket.on('job_started', (data) => {
+        pushNotice(`任务 "${data.name}" 已启动，线程数: ${data.threads}`);
+    });
+
     let countdownInterval;
-    socket.on('scheduler_status_update', (data) => {
+    function renderScheduler(snapshot) {
+        // 多个调度作业时显示选中的作业，未选择时为主面板任务的作业
+        const jobs = snapshot.jobs || [];
+        const selected = schedulerJobSelect.value;
+        schedulerJobSelect.innerHTML = '';
+        jobs.forEach(job => schedulerJobSelect.add(new Option(job.config, job.job_id)));
+        schedulerJobSelect.disabled = jobs.length === 0;
+        const data = jobs.find(job => job.job_id === selected) || snapshot;
+        if (data.job_id) schedulerJobSelect.value = data.job_id;
+        else if (jobs.length > 0) schedulerJobSelect.selectedIndex = -1;
+
         jobDetailsEl.textContent = data.job_details || '无';
         stopSchedulerBtn.disabled = !data.job_details;
 
@@ -756,7 +1230,7 @@ document.addEventListener('DOMContentLoaded', (event) => {
         } else {
             historyTableBody.innerHTML = '<tr class="no-history text-center"><td colspan="4">暂无历史记录</td></tr>';
         }
-    });
+    }
     
     // --- 事件监听 ---
     function getConfigFromForm() {
@@ -767,20 +1241,22 @@ document.addEventListener('DOMContentLoaded', (event) => {
                 raw[key] = null;
                 return;
             }
-            if (key === 'urls') {
-                raw.urls = element.value || '';
+            if (key === 'urls' || key === 'agents') {
+                raw[key] = element.value || '';
                 return;
             }
             const value = typeof element.value === 'string' ? element.value.trim() : element.value;
             raw[key] = value === '' ? null : value;
         });
 
-        raw.urls = raw.urls
-            ? raw.urls
-                .split(/\r?\n/)
-                .map((url) => url.trim())
-                .filter((url) => url !== '')
-            : [];
+        ['urls', 'agents'].forEach((key) => {
+            raw[key] = raw[key]
+                ? raw[key]
+                    .split(/\r?\n/)
+                    .map((url) => url.trim())
+                    .filter((url) => url !== '')
+                : [];
+        });
 
         const normalized = normalizeConfigPayload(raw, raw.name || null);
         normalized.name = raw.name || '';
@@ -803,7 +1279,27 @@ document.addEventListener('DOMContentLoaded', (event) => {
         socket.emit('stop_consumer');
     });
 
-    stopSchedulerBtn.addEventListener('click', () => socket.emit('stop_scheduler'));
+    stopSchedulerBtn.addEventListener('click', () => socket.emit('stop_scheduler', {job_id: schedulerJobSelect.value || null}));
+    schedulerJobSelect.addEventListener('change', () => renderScheduler(lastSchedulerSnapshot));
+
+    if (startJobBtn) {
+        startJobBtn.addEventListener('click', () => {
+            const config = jobConfigSelect.value;
+            if (!config) {
+                pushAlert({ message: '请先选择任务使用的配置。' });
+                return;
+            }
+            socket.emit('start_job', {
+                config,
+                name: jobNameInput.value.trim() || config,
+                weight: parseFloat(jobWeightInput.value) || 1
+            });
+        });
+    }
+
+    if (profileBtn) {
+        profileBtn.addEventListener('click', () => socket.emit('start_profiling', { seconds: 30 }));
+    }
 
     saveConfigBtn.addEventListener('click', () => {
         const config = getConfigFromForm();
@@ -815,6 +1311,24 @@ document.addEventListener('DOMContentLoaded', (event) => {
         socket.emit('save_config', { name: config.name, data: config });
     });
 
+    if (applyConfigBtn) {
+        applyConfigBtn.addEventListener('click', () => {
+            const config = getConfigFromForm();
+            const changes = {};
+            LIVE_SETTINGS.forEach((key) => {
+                if (key === 'urls' && (!config.urls || config.urls.length === 0)) {
+                    return;
+                }
+                if (key in config) {
+                    changes[key] = config[key];
+                }
+            });
+            // 清空URL清单表示改回使用下载链接列表
+            changes.url_source = config.url_source ?? '';
+            socket.emit('update_consumer', changes);
+        });
+    }
+
     if (configSelect) {
         configSelect.addEventListener('change', () => {
             const value = configSelect.value;
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行速度的时间序列 - 按秒记录，逐级聚合，查询时在服务端降采样到有限的点数
+
+1. 第0级每秒一个点；每 LEVEL_FACTOR 个点聚合为上一级的一个点 (平均、最小、最大)，
+   共 LEVELS 级，最粗一级的一个点约9小时
+2. 查询时选择范围内点数不少于目标点数的最粗一级，再用 LTTB 或按桶取最小/最大值
+   降到目标点数，处理的点数只取决于目标点数，与运行时长无关
+3. 运行结束时第0级随统计数据写入文件 (每秒8字节)，之后按运行编号读取并重建各级
+"""
+
+import os
+import struct
+from array import array
+
+LEVEL_FACTOR = 8
+LEVELS = 6  # 1秒、8秒、64秒、512秒、4096秒、32768秒
+DEFAULT_POINTS = 300
+MAX_POINTS = 5000
+METHODS = ("lttb", "minmax")
+
+SERIES_MAGIC = b"TCSERIE1"
+HEADER = struct.Struct("<8sd")  # 魔数、运行开始时间 (Unix时间戳)
+
+
+class _Level:
+    """一级聚合的平均、最小与最大值；第0级三者是同一个数组"""
+
+    __slots__ = ("mean", "low", "high")
+
+    def __init__(self, raw=False):
+        self.mean = array("d")
+        self.low = self.mean if raw else array("d")
+        self.high = self.mean if raw else array("d")
+
+    def __len__(self):
+        return len(self.mean)
+
+
+class SpeedSeries:
+    """一次运行的速度序列，单位字节/秒；由采样线程追加，查询可在其他线程进行"""
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.levels = [_Level(raw=True)] + [_Level() for _ in range(LEVELS - 1)]
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def append(self, value):
+        """追加一秒的速度，凑满 LEVEL_FACTOR 个点时逐级聚合"""
+        self.levels[0].mean.append(value)
+        index = 0
+        while index + 1 < LEVELS and len(self.levels[index]) % LEVEL_FACTOR == 0:
+            self._rollup(index, len(self.levels[index]) - LEVEL_FACTOR)
+            index += 1
+
+    def _rollup(self, index, start):
+        lower, upper = self.levels[index], self.levels[index + 1]
+        end = start + LEVEL_FACTOR
+        upper.mean.append(sum(lower.mean[start:end]) / LEVEL_FACTOR)
+        upper.low.append(min(lower.low[start:end]))
+        upper.high.append(max(lower.high[start:end]))
+
+    def query(self, start=None, end=None, points=DEFAULT_POINTS, method="lttb"):
+        """范围 [start, end) 内的速度，start 与 end 为距运行开始的秒数，降采样到最多 points 个点
+
+        lttb 返回 [[秒, 速度]]，保留曲线形状；minmax 返回 [[秒, 最小, 最大]]，保留每段的峰谷
+        """
+        points = max(3, min(MAX_POINTS, int(points)))
+        length = len(self)
+        end = length if end is None else max(0, min(length, int(end)))
+        start = 0 if start is None else max(0, min(end, int(start)))
+
+        level = self._choose_level(end - start, points)
+        step = LEVEL_FACTOR ** level
+        xs, means, lows, highs = self._collect(level, start, end)
+        if method == "minmax":
+            data = _minmax(xs, lows, highs, points)
+        else:
+            data = _lttb(xs, means, points)
+        return {
+            "start_time": self.start_time,
+            "duration": length,
+            "start": start,
+            "end": end,
+            "resolution": step,
+            "method": method,
+            "points": data
+        }
+
+    def _choose_level(self, span, points):
+        # 最粗的、范围内点数仍不少于目标点数的一级
+        for level in range(LEVELS - 1, 0, -1):
+            if span // LEVEL_FACTOR ** level >= points:
+                return level
+        return 0
+
+    def _collect(self, level, start, end):
+        """该级落在范围内的点 (取每段的中点为时间)，末尾尚未凑满一段的部分由第0级现算"""
+        step = LEVEL_FACTOR ** level
+        data = self.levels[level]
+        first = start // step
+        last = min(len(data.high), end // step)  # 最大值最后追加，以它的长度为准
+        xs = [(i + 0.5) * step for i in range(first, last)]
+        means, lows, highs = list(data.mean[first:last]), list(data.low[first:last]), list(data.high[first:last])
+        covered = max(start, last * step)
+        if covered < end:
+            raw = self.levels[0].mean[covered:end]
+            xs.append((covered + end) / 2)
+            means.append(sum(raw) / len(raw))
+            lows.append(min(raw))
+            highs.append(max(raw))
+        return xs, means, lows, highs
+
+    def save(self, path):
+        """写入第0级，各级在读取时重建"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(SERIES_MAGIC, self.start_time))
+            self.levels[0].mean.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, start_time = HEADER.unpack(f.read(HEADER.size))
+            if magic != SERIES_MAGIC:
+                raise ValueError(f"{path} 不是速度序列文件")
+            raw = array("d")
+            raw.frombytes(f.read())
+        series = cls(start_time)
+        series.levels[0].mean.extend(raw)
+        for index in range(LEVELS - 1):
+            full = len(series.levels[index]) // LEVEL_FACTOR * LEVEL_FACTOR
+            for group in range(0, full, LEVEL_FACTOR):
+                series._rollup(index, group)
+        return series
+
+
+def _lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: 保留首尾，每个桶选与相邻桶构成三角形面积最大的点"""
+    length = len(xs)
+    if length <= threshold:
+        return [[x, y] for x, y in zip(xs, ys)]
+    sampled = [[xs[0], ys[0]]]
+    every = (length - 2) / (threshold - 2)
+    chosen = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start = int((i + 1) * every) + 1
+        next_end = min(max(int((i + 2) * every) + 1, next_start + 1), length)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        ax, ay = xs[chosen], ys[chosen]
+        best_area = -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                chosen = j
+        sampled.append([xs[chosen], ys[chosen]])
+    sampled.append([xs[-1], ys[-1]])
+    return sampled
+
+
+def _minmax(xs, lows, highs, buckets):
+    """把点均分到 buckets 个桶，每个桶取最小与最大值"""
+    length = len(xs)
+    if length <= buckets:
+        return [[x, low, high] for x, low, high in zip(xs, lows, highs)]
+    result = []
+    for i in range(buckets):
+        first = i * length // buckets
+        last = (i + 1) * length // buckets
+        result.append([(xs[first] + xs[last - 1]) / 2, min(lows[first:last]), max(highs[first:last])])
+    return result
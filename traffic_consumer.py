@@ -47,9 +47,66 @@ warnings.filterwarnings("ignore", category=UserWarning, module='apscheduler')
 
 13. 查看历史统计:
     python traffic_consumer.py --show-stats
+
+14. 按线路字节计量流量限制，并跳过解压以节省CPU:
+    python traffic_consumer.py --traffic-limit 100 --meter wire --no-decode
+
+15. 上传模式 - 向自建的接收端上传流量 (mixed 模式下按字节比例混合上传与下载):
+    python traffic_consumer.py --mode upload -u "http://sink.local/upload" --upload-size 50
+    python traffic_consumer.py --mode mixed --upload-ratio 0.5 -u "http://sink.local/data"
+
+16. 性能剖析 - 运行开始后剖析30秒 (运行中也可发送 SIGUSR1 触发):
+    python traffic_consumer.py --no-gui --profile 30
+
+17. 分布式模式 - 各主机运行agent，控制器拆分全局的流量、次数与限速预算:
+    python traffic_consumer.py --agent 0.0.0.0:5002 --agent-token secret
+    python traffic_consumer.py --no-gui --agents http://10.0.0.2:5002 http://10.0.0.3:5002 --agent-token secret --traffic-limit 10240
+
+18. DNS缓存与多地址分散连接 - 把主机固定解析到多个地址，新连接在这些地址之间轮换:
+    python traffic_consumer.py --no-gui -u "http://origin.test/big.bin" --resolve origin.test:10.0.0.5,10.0.0.6 --dns-ttl 300
+
+19. 热加载配置 - 运行中修改并保存同名配置，线程数、URL、限速与各项限制立即生效，统计与连接保留:
+    python traffic_consumer.py --no-gui --config "daily_task" --load-config --watch-config
+
+20. URL清单 - 从文件或HTTP地址流式读取百万级URL，内存占用不随URL数膨胀:
+    python traffic_consumer.py --no-gui --url-source cdn_objects.txt.gz -t 32
+
+21. 完整性校验 - 抽样10%的下载，在独立线程中与清单里的摘要和长度比较:
+    python traffic_consumer.py --no-gui -u "http://origin.local/a.bin" --verify-manifest digests.txt --verify-sample 0.1
+
+22. 请求轨迹 - 记录每次请求的时间线，之后对本地源站按相同时间线重放并比较:
+    python traffic_consumer.py --no-gui -d 600 --trace incident.trace
+    python traffic_consumer.py --no-gui --replay incident.trace --replay-origin http://127.0.0.1:8080 --trace replay.trace
+    python traffic_consumer.py --trace-summary replay.trace
+
+23. 开环模式 - 按每秒50次的泊松到达发出请求，最多16个同时进行，延迟从计划开始时间算起:
+    python traffic_consumer.py --no-gui -t 16 --arrival-rate 50 --arrival-process poisson -d 300
+
+24. 套接字参数 - 高延迟线路上用更大的接收缓冲与 bbr 提高单连接吞吐，开始时日志报告单连接接收窗口:
+    python traffic_consumer.py --no-gui -u "https://far.example.com/big.bin" -t 2 --rcvbuf 16 --congestion bbr --keepalive 60
+
+25. 断点继续 - 有限额的运行每2秒记录进度，进程被杀死后再次运行同一配置，只消耗剩余的预算:
+    python traffic_consumer.py --no-gui --config "monthly" --load-config
+
+26. 网卡对账 - 与默认路由网卡的计数对账，流量限制按网卡收发的字节执行:
+    python traffic_consumer.py --no-gui --interface auto --limit-on-interface --traffic-limit 102400
+
+27. 运行前预检 - 并行探测清单中的URL，跳过失效的URL，流量限制的最后一段按剩余预算选择或截取对象:
+    python traffic_consumer.py --no-gui --url-source cdn_objects.txt -t 16 --preflight --traffic-limit 10240
+
+28. 离散事件模拟 - 不发出网络请求，按源站模型比较不同线程数与URL策略下的吞吐和公平性:
+    python traffic_consumer.py --no-gui --simulate model.json -c 500 --sweep threads=1,4,16 --sweep url_strategy=random,round_robin
+
+29. 主机压力调节 - 与其他服务共用主机，CPU、内存或IO的 PSI 压力超过阈值时自动降低并发与速率:
+    python traffic_consumer.py --no-gui -t 16 --governor --pressure-limit 20
+
+30. 多链路源地址绑定 - 新连接从两条上行链路的地址发出，按权重分配线程，按源地址统计字节与吞吐:
+    python traffic_consumer.py --no-gui -t 16 --bind eth1 eth2=3 --bind-policy weighted
+
+31. 低内存模式 - 本进程最多使用64MB内存，按预算规划线程数、线程栈与分块大小，并报告 RSS 的拆分:
+    python traffic_consumer.py --no-gui -t 64 --memory-budget 64
 """
 
-import requests
 import threading
 import time
 import argparse
@@ -58,13 +115,14 @@ import os
 import json
 import signal
 import random
-from tqdm import tqdm
+import queue
+import zlib
+from collections import deque
 from colorama import Fore, Style, init
 from datetime import datetime, timedelta, timezone
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-import http.client  # 添加导入http.client模块
-from requests.exceptions import ChunkedEncodingError, RequestException, Timeout
+
+# requests、apscheduler 等较重的依赖只在真正需要时才导入，
+# 使 --list-configs / --show-stats / --save-config 等子命令快速启动
 
 # 初始化colorama
 init(autoreset=True)
@@ -80,40 +138,163 @@ DEFAULT_URLS = [
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".traffic_consumer")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
 STATS_FILE = os.path.join(CONFIG_DIR, "stats.json")
+STATS_COLUMNS_FILE = os.path.join(CONFIG_DIR, "stats_columns.npz")  # 统计数据按列转换后的缓存，统计文件变化时重建
+PROFILE_DIR = os.path.join(CONFIG_DIR, "profiles")
+SERIES_DIR = os.path.join(CONFIG_DIR, "series")  # 每次运行的速度序列，文件名为统计数据中的运行编号
+MANIFEST_DIR = os.path.join(CONFIG_DIR, "manifests")  # Web UI 提交的URL清单与校验清单只能是该目录下的文件
+CHECKPOINT_DIR = os.path.join(CONFIG_DIR, "checkpoints")  # 有限额运行的进度检查点，每个配置一个文件
+CHECKPOINT_INTERVAL = 2.0  # 写入检查点的周期，单位秒；中断后最多重复这么长时间的工作
+JOBS_DB_FILE = os.path.join(CONFIG_DIR, "jobs.sqlite")  # 调度执行历史
+JOBS_DIR = os.path.join(CONFIG_DIR, "jobs")  # 持久化的调度作业，每个配置一个作业存储与一个运行锁
 
 DEFAULT_CHUNK_SIZE = 256 * 1024  # 256KB 默认分块大小
+MAX_RETRY_BACKOFF = 8.0  # 重试间隔每次翻倍，最长不超过该秒数
+DEFAULT_PROFILE_SECONDS = 30  # 信号或Web UI触发剖析时的默认窗口
+MAX_PROFILE_SECONDS = 600  # Web UI 可请求的最长剖析窗口
+
+# 流量计量口径: payload 按解码后的响应体计量，wire 按线路上收到的响应头与原始响应体计量
+METER_BASES = ("payload", "wire")
+# 仅声明可自行解码的压缩格式，保证解码字节数可以准确统计
+ACCEPT_ENCODING = "gzip, deflate"
+
+# 流量方向: download 仅下载，upload 仅上传，mixed 按 upload_ratio 混合
+TRANSFER_MODES = ("download", "upload", "mixed")
+UPLOAD_METHODS = ("PUT", "POST")
+DEFAULT_UPLOAD_SIZE = 10  # 单次上传大小，单位MB
+
+# 调度策略
+SCHEDULER_TIMEZONE = "Asia/Shanghai"
+DEFAULT_MISFIRE_GRACE = 3600  # 默认补偿窗口，单位秒
+SCHEDULED_JOB_FUNC = "traffic_consumer:run_scheduled_job"  # 持久化作业以文本引用保存入口函数
+
+# 连接建立
+DEFAULT_DNS_TTL = 60  # 解析结果缓存时间，单位秒，0表示每次新建连接都重新解析
+DEFAULT_SOCKET_PROFILE = (None, True, None, None)  # (接收缓冲, TCP_NODELAY, keepalive, 拥塞控制算法)，即 urllib3 的默认值
+
+# 多任务
+DEFAULT_MAX_WORKERS = 32  # Web UI多任务共享的工作线程总数上限
+
+# 分布式模式
+AGENT_TOKEN_ENV = "TRAFFIC_CONSUMER_AGENT_TOKEN"  # 控制器与agent共用的令牌
+
+# 运行中修改配置: 以下配置项立即生效，其余配置项需要重新启动任务
+LIVE_SETTINGS = ("urls", "url_source", "url_strategy", "threads", "limit_speed", "duration", "count", "traffic_limit",
+                 "mode", "upload_ratio", "upload_size", "upload_method", "decode_content", "verify_sample")
+UNLIMITED_SETTINGS = ("limit_speed", "duration", "count", "traffic_limit")  # 取值为空表示不限
+CONFIG_WATCH_INTERVAL = 1.0  # 热加载时检查配置文件修改的周期，单位秒
+
+# URL池
+URL_STATS_LIMIT = 50  # 界面、统计文件与agent上报中最多列出的URL数
+# 快照中在同一次加锁内复制的计数，agent按这些键上报，控制器按这些键汇总
+SNAPSHOT_COUNTERS = ("total_bytes", "payload_bytes", "wire_bytes", "upload_bytes", "upload_count", "download_count",
+                     "verify_passed", "verify_failed", "verify_skipped", "arrival_missed", "interface_bytes")
+
+# 完整性校验
+DEFAULT_VERIFY_SAMPLE = 0.1  # 校验清单中的URL被抽样校验的下载比例
+
+# 开环模式
+ARRIVAL_PROCESSES = ("constant", "poisson")  # 固定间隔或泊松过程 (指数分布的间隔)
+ARRIVAL_BACKLOG_SECONDS = 5  # 线程都在忙时最多积压该时长内的到达，超出的到达计为未能发出
+ARRIVAL_POLL = 0.1  # 等待到达或下一个到达时间时检查任务是否已停止的周期，单位秒
+
+# 模拟
+DEFAULT_SIM_HORIZON = 3600  # 没有任何限制的运行与定时任务模拟的虚拟时长，单位秒
+
+# 运行前预检
+DEFAULT_PREFLIGHT_WORKERS = 16  # 并行探测URL的线程数
+PLAN_WAIT = 0.05  # 限额已被进行中的请求占满时，等待其结束的周期，单位秒
+
+# 主机压力调节
+DEFAULT_PRESSURE_LIMIT = 25.0  # PSI some avg10 的阈值，单位%
+GOVERNOR_INTERVAL = 1.0  # 读取主机压力的周期，单位秒
+GOVERNOR_PARK = 0.2  # 超出调节后线程数的工作线程暂停时检查的周期，单位秒
+GOVERNOR_DECISIONS = 10  # 状态快照中附带的最近调节记录条数
+
+# 源地址绑定
+BIND_POLICIES = ("round_robin", "weighted", "per_url")  # 按线程轮流、按权重分配线程、按URL分配
+
+# 内存预算
+MEMORY_INTERVAL = 2.0  # 读取本进程 RSS 与拆分的周期，单位秒
+
+
+class UploadAborted(Exception):
+    """上传过程中任务停止或达到流量限制时中断请求体的发送"""
+
+
+class _UploadBody:
+    """上传请求体: 循环发送同一块只读零缓冲区的切片，不做任何每请求的内存分配
+
+    提供 __len__ 使 requests 设置 Content-Length，read() 返回 memoryview
+    直接交给 socket.sendall，限速与计量在读取时完成
+    """
+
+    def __init__(self, consumer, pool, url_id, size, source=None):
+        self.consumer = consumer
+        self.pool = pool
+        self.url_id = url_id
+        self.size = size
+        self.remaining = size
+        self.source = source  # 源地址编号，未绑定时为None
+
+    def __len__(self):
+        return self.size
+
+    def read(self, amt=-1):
+        if self.remaining <= 0:
+            return b""
+        buffer = self.consumer.upload_buffer
+        size = min(self.remaining, len(buffer))
+        if not self.consumer._record_upload_chunk(self.pool, self.url_id, size, self.source):
+            raise UploadAborted()
+        self.remaining -= size
+        return buffer[:size]
 
 
 class RateLimiter:
     """简单的线程安全令牌桶限速器"""
 
-    def __init__(self, rate_bytes_per_sec):
+    def __init__(self, rate_bytes_per_sec, clock=time.perf_counter):
         self.rate = max(0, rate_bytes_per_sec)
+        self.clock = clock  # 模拟时替换为虚拟时钟
         self.tokens = float(self.rate)
-        self.last_refill = time.perf_counter()
+        self.last_refill = clock()
         self.lock = threading.Lock()
 
     def acquire(self, num_bytes):
         if self.rate <= 0:
             return
 
-        request_bytes = min(num_bytes, self.rate)
-
         while True:
-            with self.lock:
-                self._refill_tokens()
+            wait = self.try_acquire(num_bytes)
+            if not wait:
+                return
+            time.sleep(min(wait, 0.5))
 
-                if self.tokens >= request_bytes:
-                    self.tokens -= request_bytes
-                    return
+    def try_acquire(self, num_bytes):
+        """尝试取出令牌，成功时返回0，令牌不足时不扣除并返回还需等待的秒数"""
+        with self.lock:
+            # 速率可能被 set_rate 动态调整，每轮在锁内重新读取
+            rate = self.rate
+            if rate <= 0:
+                return 0
+            self._refill_tokens()
+
+            request_bytes = min(num_bytes, rate)
+            if self.tokens >= request_bytes:
+                self.tokens -= request_bytes
+                return 0
 
-                deficit = request_bytes - self.tokens
+            return (request_bytes - self.tokens) / rate
 
-            sleep_time = deficit / self.rate
-            time.sleep(min(sleep_time, 0.5))
+    def set_rate(self, rate_bytes_per_sec):
+        """运行中调整速率，已积累的令牌不超过新的桶容量"""
+        with self.lock:
+            self._refill_tokens()
+            self.rate = max(0, rate_bytes_per_sec)
+            self.tokens = min(self.tokens, float(self.rate))
 
     def _refill_tokens(self):
-        now = time.perf_counter()
+        now = self.clock()
         elapsed = now - self.last_refill
         if elapsed <= 0:
             return
@@ -127,8 +308,21 @@ class TrafficConsumer:
                  duration=None, count=None, cron_expr=None,
                  traffic_limit=None, interval=None,
                  config_name="default", url_strategy="random", logger=None, history_callback=None,
-                 invalid_url_callback=None):
+                 invalid_url_callback=None, profile_seconds=None,
+                 meter_basis="payload", decode_content=True,
+                 mode="download", upload_ratio=0.5, upload_size=None, upload_method="PUT",
+                 misfire_grace_time=DEFAULT_MISFIRE_GRACE, coalesce=True,
+                 dns_ttl=DEFAULT_DNS_TTL, resolve=None, prewarm=True, watch_config=False, url_source=None,
+                 verify_manifest=None, verify_sample=DEFAULT_VERIFY_SAMPLE,
+                 trace_file=None, replay_file=None, replay_origin=None, replay_speed=1.0,
+                 arrival_rate=None, arrival_process="constant",
+                 socket_rcvbuf=None, tcp_nodelay=True, tcp_keepalive=None, tcp_congestion=None,
+                 checkpoint=True, interface=None, interface_limit=False,
+                 preflight=False, preflight_workers=DEFAULT_PREFLIGHT_WORKERS,
+                 governor=False, pressure_limit=DEFAULT_PRESSURE_LIMIT,
+                 bind=None, bind_policy="round_robin", memory_budget=None):
         self.urls = urls if urls else DEFAULT_URLS
+        self.url_source = url_source or None  # URL清单: 文件路径、HTTP(S)地址或可迭代对象，指定后忽略 urls
         self.threads = threads if threads is not None else 1
         self.limit_speed = limit_speed if limit_speed is not None else 0  # 限速，单位MB/s，0表示不限速
         self.duration = duration  # 持续时间，单位秒
@@ -141,6 +335,41 @@ class TrafficConsumer:
         self.logger = logger if logger else self._default_logger
         self.history_callback = history_callback
         self.invalid_url_callback = invalid_url_callback
+        self.profile_seconds = profile_seconds  # 启动后自动剖析的时长，单位秒
+        self.meter_basis = meter_basis if meter_basis in METER_BASES else "payload"  # 限额与统计使用的计量口径
+        self.decode_content = decode_content if decode_content is not None else True  # False时跳过解压
+        self.mode = mode if mode in TRANSFER_MODES else "download"  # 流量方向
+        self.upload_ratio = min(1.0, max(0.0, upload_ratio if upload_ratio is not None else 0.5))  # mixed模式上传字节占比
+        self.upload_size = upload_size if upload_size else DEFAULT_UPLOAD_SIZE  # 单次上传大小，单位MB
+        self.upload_method = upload_method.upper() if upload_method and upload_method.upper() in UPLOAD_METHODS else "PUT"
+        self.misfire_grace_time = misfire_grace_time  # 错过执行后仍允许补偿的时间窗口，单位秒，None表示不限
+        self.coalesce = coalesce if coalesce is not None else True  # 多次错过的执行是否合并为一次
+        self.dns_ttl = dns_ttl if dns_ttl is not None else DEFAULT_DNS_TTL  # 解析缓存时间，单位秒
+        self.resolve = resolve or {}  # 静态解析映射 {主机: [地址]}，优先于DNS
+        self.prewarm = prewarm if prewarm is not None else True  # 计时开始前预先建立连接
+        self.watch_config = bool(watch_config)  # 运行中配置文件被修改时热加载本配置
+        self.verify_manifest = verify_manifest or None  # 校验清单: 每行 URL [算法:摘要] [长度]
+        self.verify_sample = min(1.0, max(0.0, verify_sample if verify_sample is not None else DEFAULT_VERIFY_SAMPLE))
+        self.trace_file = trace_file  # 记录本次运行的请求轨迹的文件
+        self.replay_file = replay_file  # 按该轨迹的时间线重放请求，URL与线程数取自轨迹
+        self.replay_origin = replay_origin  # 重放时把URL的协议与主机替换为该地址
+        self.replay_speed = replay_speed if replay_speed is not None else 1.0  # 重放的时间倍率，0表示尽快发出
+        self.arrival_rate = arrival_rate if arrival_rate and arrival_rate > 0 else None  # 开环模式的到达率，单位次/秒，None表示闭环 (完成一次再发下一次)
+        self.arrival_process = arrival_process if arrival_process in ARRIVAL_PROCESSES else "constant"
+        self.socket_rcvbuf = socket_rcvbuf if socket_rcvbuf and socket_rcvbuf > 0 else None  # 每个连接的接收缓冲，单位MB，None表示由内核自动调整
+        self.tcp_nodelay = tcp_nodelay if tcp_nodelay is not None else True
+        self.tcp_keepalive = tcp_keepalive if tcp_keepalive and tcp_keepalive > 0 else None  # 连接空闲多少秒后开始keepalive探测
+        self.tcp_congestion = tcp_congestion or None  # 拥塞控制算法，如 bbr (仅Linux)
+        self.checkpoint = checkpoint if checkpoint is not None else True  # 有限额的运行定期记录进度，中断后从检查点继续
+        self.interface = interface or None  # 对账的网卡，"auto" 为默认路由所在的网卡，None表示不对账
+        self.interface_limit = bool(interface_limit)  # 流量限制按网卡收发的字节执行，未指定网卡时使用默认路由的网卡
+        self.preflight = bool(preflight)  # 计时开始前并行探测所有URL，按大小规划流量与次数限额
+        self.preflight_workers = preflight_workers if preflight_workers and preflight_workers > 0 else DEFAULT_PREFLIGHT_WORKERS
+        self.governor = bool(governor)  # 按主机的 PSI 压力与负载自动降低并发与速率 (仅Linux)
+        self.pressure_limit = pressure_limit if pressure_limit and pressure_limit > 0 else DEFAULT_PRESSURE_LIMIT
+        self.bind = list(bind) if bind else []  # 新连接的源地址: 本机地址或网卡名，可附带权重，如 eth1=3
+        self.bind_policy = bind_policy if bind_policy in BIND_POLICIES else "round_robin"  # 请求在源地址之间的分配策略
+        self.memory_budget = memory_budget if memory_budget and memory_budget > 0 else None  # 本进程的内存上限，单位MB，None表示不限
 
         # 网络与控制参数
         self.connect_timeout = 10
@@ -151,12 +380,21 @@ class TrafficConsumer:
         self.rate_limiter = RateLimiter(int(self.limit_speed * 1024 * 1024)) if self.limit_speed > 0 else None
         self._traffic_limit_triggered = False
         self._count_limit_triggered = False
-        self.invalid_urls = set()
 
         # 统计数据
         self.lock = threading.Lock()
-        self.total_bytes = 0
+        self.total_bytes = 0  # 按 meter_basis 计量的字节数，用于限额、限速与展示
+        self.payload_bytes = 0  # 解码后的响应体字节数
+        self.wire_bytes = 0  # 线路字节数: 响应头 + 未解码的响应体
+        self.upload_bytes = 0  # 已上传的请求体字节数 (同时计入 total_bytes)
+        self.upload_count = 0  # 完成的上传次数 (同时计入 download_count)
+        self.verify_passed = 0  # 抽样校验通过的下载次数
+        self.verify_failed = 0  # 抽样校验不通过的下载次数 (内容或长度与清单不符)
+        self.verify_skipped = 0  # 校验队列已满而放弃的抽样次数
+        self.arrival_missed = 0  # 开环模式下积压已满而未能发出的到达次数
+        self.interface_bytes = 0  # 对账的网卡在本次运行中收发的字节数，含本机其他进程的流量
         self.start_time = None
+        self.end_time = None  # 本次运行结束的时间，运行中为None
         self.active = False
         self.download_count = 0
 
@@ -169,184 +407,573 @@ class TrafficConsumer:
         # 历史统计数据
         self.history = []
         self.MAX_HISTORY_ENTRIES = 50  # 限制历史记录最大条数
+        self.history_points = deque()  # 运行中每10秒的数据点，按时间顺序，与运行记录分开保存
 
         # 状态
         self.status = "初始化"
         self.next_run_time = None
 
-        # URL轮询计数器
-        self.url_counter = 0
-        self.url_counter_lock = threading.Lock()
+        # URL池: 按编号保存每个URL的使用次数、字节数与失效标记，首次使用时创建
+        self._url_pool = None
+        self.url_pool_lock = threading.Lock()
 
-        # URL使用统计
-        self.url_usage = {url: 0 for url in self.urls}
-
-        # 线程当前使用的URL
+        # 线程当前使用的URL (用于显示) 及其在URL池中的编号
         self.thread_current_urls = {}
+        self.thread_url_ids = {}
 
-        # 加权随机选择器 - 确保URL分布更均匀
-        self.url_weights = [1.0] * len(self.urls)  # 初始权重相等
-        self.weight_lock = threading.Lock()
+        # 本次运行的工作线程 (线程编号 -> Thread)，运行中调整线程数时增减
+        self.workers = {}
+        self.workers_lock = threading.Lock()
 
         # 线程URL分配记录（避免重复打印）
         self.thread_url_assignments = {}
 
+        # 性能剖析器（仅在剖析窗口内存在）
+        self.profiler = None
+
+        # 所有上传请求共享的只读零缓冲区，仅在需要上传时分配
+        self._upload_buffer = None
+
+        # 共享的连接池适配器 (多任务管理器设置)，为None时每个会话使用自己的连接池
+        self.http_adapter = None
+        self.socket_options = None  # 新连接的套接字参数，None表示使用 urllib3 的默认值
+        self.receive_window = None  # 按套接字参数估计的单连接接收窗口，见 transport.receive_window
+        self._socket_profile = None
+
+        # 解析缓存在多次运行之间保留，定时任务再次执行时无需重新解析
+        self.resolver = None
+
+        # 抽样校验器 (指定校验清单时在启动前创建)，校验线程在多次运行之间保留
+        self.verifier = None
+
+        # 请求轨迹的写入器 (仅在运行期间存在) 与重放的时间线
+        self.tracer = None
+        self.replay = None
+
+        # 请求延迟: 响应时间从计划开始时间算起 (开环模式下包含排队等待)，服务时间从实际发出算起
+        from latency import LatencyHistogram
+        self.response_latency = LatencyHistogram()
+        self.service_latency = LatencyHistogram()
+
+        # 开环模式的到达队列 (元素为计划开始时间)，仅在开环运行期间存在
+        self.arrivals = None
+
+        # 本次运行按秒记录的速度序列，运行结束后保留到下一次运行开始
+        self.speed_series = None
+        self._series_bytes = 0
+
+        # 网卡对账，运行结束后保留到下一次运行开始
+        self.reconciler = None
+
+        # 按预检结果规划限额 (仅在启用预检的运行期间存在)
+        self.planner = None
+
+        # 主机压力调节: 调节器在运行结束后保留到下一次运行开始；调节后的线程数与限速器只在比例低于1时存在，
+        # 编号超出该线程数的工作线程暂停，限速器与 rate_limiter 同时生效
+        self.pressure_governor = None
+        self.governed_threads = None
+        self.governor_limiter = None
+        self._governor_sample = None  # 上次读取主机压力时的 (时间, 字节数, 平滑后的速度)
+
+        # 本次运行使用的源地址与按源地址的计数，运行结束后保留到下一次运行开始；None表示不绑定
+        self.sources = None
+
+        # 内存预算: 首次运行前按预算规划的线程数、分块与栈大小 (之后的运行沿用)，以及本次运行的 RSS 监控
+        self.memory_plan = None
+        self.memory_monitor = None
+
+        # 检查点: 最近一次写入的URL槽位与URL池指纹的缓存 (URL池对象, 指纹)
+        self._checkpoint_ids = ()
+        self._checkpoint_pool = (None, None)
+        self._checkpoint_failed = False
+
     def _default_logger(self, message, color=None):
         if color:
             print(f"{color}{message}{Style.RESET_ALL}")
         else:
             print(message)
         
-    def get_url_for_thread(self, thread_id):
-        """为线程获取URL"""
-        available_urls = self._get_available_urls()
-        if not available_urls:
-            return None
+    @property
+    def url_pool(self):
+        """当前的URL池，首次访问时按 url_source 或 urls 创建"""
+        if self._url_pool is None:
+            with self.url_pool_lock:
+                if self._url_pool is None:
+                    self._url_pool = self._open_url_pool(self.url_source, self.urls)
+        return self._url_pool
 
-        if self.url_strategy == "random":
-            return self.weighted_random_choice(available_urls)
-        elif self.url_strategy == "round_robin":
-            with self.url_counter_lock:
-                for _ in range(len(self.urls)):
-                    url = self.urls[self.url_counter % len(self.urls)]
-                    self.url_counter += 1
-                    if url in self.invalid_urls:
-                        continue
-                    return url
-            # 如果轮询未命中有效URL，则回退到随机策略
-            return self.weighted_random_choice(available_urls)
+    @staticmethod
+    def _open_url_pool(source, urls):
+        """创建URL池，清单无法读取时抛出 OSError 或 ValueError"""
+        from url_pool import ListUrlPool, open_url_source
+
+        return open_url_source(source) if source is not None else ListUrlPool(urls)
+
+    def url_stats(self, limit=URL_STATS_LIMIT, ranked=False):
+        """URL统计 [(url, 完成次数, 解码字节, 线路字节)]
+
+        URL数不超过 limit 时返回全部；否则 ranked 为真时返回完成次数最多的 limit 个
+        (需要遍历计数数组，适合运行结束时的汇总)，为假时只返回各线程正在使用的URL
+        """
+        pool = self._url_pool
+        if pool is None:
+            return []
+        if len(pool) <= limit:
+            url_ids = range(len(pool))
+        elif ranked:
+            url_ids = pool.most_used(limit)
         else:
-            return available_urls[0]  # 默认返回第一个有效URL
-
-    def _get_available_urls(self):
-        """获取仍然有效的URL列表"""
-        with self.lock:
-            return [url for url in self.urls if url not in self.invalid_urls]
-
-    def weighted_random_choice(self, candidates):
-        """加权随机选择URL，确保分布更均匀"""
-        with self.weight_lock:
-            # 计算当前使用次数
-            total_usage = sum(self.url_usage.values())
-
-            if total_usage == 0:
-                # 如果还没有使用记录，完全随机选择
-                return random.choice(candidates)
-
-            # 计算期望的平均使用次数
-            expected_avg = total_usage / len(self.urls) if self.urls else 0
-
-            # 更新权重：使用次数越少的URL权重越高
-            for i, url in enumerate(self.urls):
-                current_usage = self.url_usage.get(url, 0)
-                if url in self.invalid_urls:
-                    self.url_weights[i] = 0.0
-                    continue
-                if expected_avg == 0:
-                    self.url_weights[i] = 1.0
-                    continue
-                # 权重与使用次数成反比，使用次数少的URL权重更高
-                if current_usage < expected_avg:
-                    self.url_weights[i] = expected_avg - current_usage + 1
-                else:
-                    self.url_weights[i] = 1.0 / (current_usage - expected_avg + 1)
-
-            weights = []
-            for url in candidates:
-                try:
-                    idx = self.urls.index(url)
-                    weights.append(self.url_weights[idx])
-                except ValueError:
-                    weights.append(1.0)
-
-            # 根据权重进行随机选择
-            return self.weighted_choice(candidates, weights)
-
-    def weighted_choice(self, choices, weights):
-        """根据权重进行随机选择"""
-        total_weight = sum(weights)
-        if total_weight == 0:
-            return random.choice(choices)
-
-        # 生成随机数
-        r = random.uniform(0, total_weight)
-
-        # 找到对应的选择
-        cumulative_weight = 0
-        for choice, weight in zip(choices, weights):
-            cumulative_weight += weight
-            if r <= cumulative_weight:
-                return choice
-
-        # 如果由于浮点数精度问题没有找到，返回最后一个
-        return choices[-1]
-
-    def download_file(self, thread_id):
-        """单个线程的下载函数"""
-        session = self._create_session()
+            with self.lock:
+                url_ids = sorted({url_id for owner, url_id in self.thread_url_ids.values() if owner is pool})[:limit]
+        return pool.stats(url_ids)
+
+    def url_pool_summary(self):
+        """URL池的规模、已使用与已失效的URL数，URL池尚未创建时返回None"""
+        pool = self._url_pool
+        return pool.summary() if pool is not None else None
+
+    def download_file(self, thread_id, session=None):
+        """单个线程的下载函数，session 为预热过的会话"""
+        sources = self.sources
+        if session is None:
+            session = self._create_session(sources.for_thread(thread_id) if sources is not None else None)
+        # 按URL分配源地址时，每个源地址一个会话，首次使用时创建
+        sessions = {session.source_index: session}
+        if self.tracer is not None:
+            self.tracer.bind(thread_id)
 
         while self.active:
+            if thread_id > self.threads and self._retire_worker(thread_id):
+                break
+
+            governed = self.governed_threads
+            if governed is not None and thread_id > governed:
+                with self.lock:
+                    self.thread_current_urls[thread_id] = "已暂停 (主机压力)"
+                time.sleep(GOVERNOR_PARK)
+                continue
+
             if self.count is not None:
                 with self.lock:
                     if self.download_count >= self.count:
                         self._stop_due_to_count()
                         break
 
-            current_url = self.get_url_for_thread(thread_id)
+            # 开环模式下等待下一个到达，延迟从计划开始时间算起
+            intended = None
+            if self.arrivals is not None:
+                intended = self._next_arrival()
+                if intended is None:
+                    continue
 
-            if current_url is None:
+            # 运行中可能切换URL池，本次请求的计数记在选中URL时的池上
+            pool = self.url_pool
+            upload = None
+            if self.replay is not None:
+                step = self.replay.next_step(self, thread_id)
+                if step is None:
+                    if self.replay.finish_thread(thread_id) and self.active:
+                        self.logger("请求轨迹已重放完毕", Fore.CYAN)
+                        self.active = False
+                    break
+                url_id, upload = step
+            else:
+                url_id = pool.choose(self.url_strategy)
+
+            if url_id is None:
                 self.logger("未找到可用的下载链接，任务将停止。", Fore.RED)
                 with self.lock:
                     self.thread_current_urls[thread_id] = "无可用链接"
                 self.active = False
                 break
 
+            if upload is None:
+                upload = self._next_is_upload()
+
+            # 按预检结果规划限额时，可能改选放得下剩余预算的URL或只请求剩余的字节
+            planner = self.planner
+            reservation = None
+            if planner is not None and planner.pool is pool:
+                reservation = self._reserve(planner, url_id, upload)
+                if reservation is None:
+                    continue
+                url_id = reservation.url_id
+
+            if sources is not None:
+                source = sources.choose(thread_id, url_id)
+                session = sessions.get(source)
+                if session is None:
+                    session = sessions[source] = self._create_session(source)
+
+            current_url = pool.url(url_id)
             with self.lock:
                 self.thread_current_urls[thread_id] = current_url
-                if current_url not in self.url_usage:
-                    self.url_usage[current_url] = 0
+                self.thread_url_ids[thread_id] = (pool, url_id)
 
-            completed = self._download_with_retries(session, current_url, thread_id)
-
-            if not self.active:
-                break
+            started = time.perf_counter()
+            completed = self._download_with_retries(session, pool, url_id, current_url, thread_id, upload=upload,
+                                                    reservation=reservation)
+            finished = time.perf_counter()
 
+            # 按规划用完流量预算的最后一次下载在达到限制时已停止运行，先计入完成再退出
             if completed:
-                reached_count_limit = False
                 with self.lock:
-                    self.url_usage[current_url] += 1
-                    self.download_count += 1
-                    if self.count is not None and self.download_count >= self.count:
-                        reached_count_limit = True
+                    if reservation is not None:
+                        planner.release(reservation)
+                    reached_count_limit = self._record_completion(
+                        pool, url_id, finished - (started if intended is None else intended), finished - started,
+                        upload, session.source_index)
 
                 if reached_count_limit:
                     self._stop_due_to_count()
                     break
             else:
                 # 未完成意味着已触发限流或重试耗尽，循环将重新选择URL继续
+                if reservation is not None:
+                    with self.lock:
+                        planner.release(reservation)
                 continue
 
-        session.close()
+        # 共享连接池由管理器负责关闭，关闭会话会清空其他任务的连接；绑定源地址的会话使用自己的连接池
+        for session in sessions.values():
+            if self.http_adapter is None or session.source_index is not None:
+                session.close()
+
+    def _record_completion(self, pool, url_id, response_time, service_time, upload=False, source=None):
+        """记录一次完整结束的请求，调用方持有锁；返回是否达到了次数限制
+
+        模拟器也通过这里计入完成，两边对完成的判定与计数保持一致
+        """
+        self.response_latency.record(response_time)
+        self.service_latency.record(service_time)
+        pool.record_completion(url_id)
+        self.download_count += 1
+        if source is not None:
+            self.sources.requests[source] += 1
+        if upload:
+            self.upload_count += 1
+        return self.count is not None and self.download_count >= self.count
+
+    def _reserve(self, planner, url_id, upload):
+        """在限额规划中为本次请求预留，返回 Reservation；进行中的请求已占满限额时稍等并返回None，
+        剩余的流量预算放不下任何一次下载时停止任务"""
+        reservation, waiting = self._plan_request(planner, url_id, upload)
+        if waiting:
+            time.sleep(PLAN_WAIT)
+        return reservation
+
+    def _plan_request(self, planner, url_id, upload):
+        """_reserve 的不等待版本，返回 (Reservation 或 None, 是否需要等待进行中的请求结束)"""
+        with self.lock:
+            if self.count is not None and self.download_count + planner.in_flight >= self.count:
+                reservation = None
+                exhausted = False
+            else:
+                remaining = None
+                if self._plans_traffic(upload):
+                    remaining = int(self.traffic_limit * 1024 * 1024) - self.total_bytes
+                reservation = planner.reserve(url_id, remaining)
+                exhausted = reservation is None and planner.in_flight == 0
+        if exhausted:
+            self._stop_due_to_budget(remaining)
+        return reservation, reservation is None and not exhausted
+
+    def _plans_traffic(self, upload=False):
+        """流量限制是否按预检得到的大小规划: 上传大小固定不参与，按网卡执行时开销未知也不参与"""
+        return not upload and self.traffic_limit is not None and not self.interface_limit
+
+    def _next_arrival(self):
+        """取出下一个到达的计划开始时间，一个轮询周期内没有到达或任务已停止时返回None"""
+        try:
+            return self.arrivals.get(timeout=ARRIVAL_POLL)
+        except queue.Empty:
+            return None
+
+    def _dispatch_arrivals(self, arrivals):
+        """开环模式的到达生成: 按到达率产生计划开始时间，与请求何时完成无关
+
+        工作线程数即同时进行的请求上限；线程都在忙时到达在队列中排队，
+        排队时间计入响应时间，积压超过上限时计为未能发出
+        """
+        due = time.perf_counter()
+        while self.active and self.arrivals is arrivals:
+            rate = self.arrival_rate
+            due += random.expovariate(rate) if self.arrival_process == "poisson" else 1.0 / rate
+            while self.active:
+                delay = due - time.perf_counter()
+                if delay <= 0:
+                    break
+                time.sleep(min(delay, ARRIVAL_POLL))
+            try:
+                arrivals.put_nowait(due)
+            except queue.Full:
+                with self.lock:
+                    self.arrival_missed += 1
+
+    def latency_summary(self):
+        """响应时间与服务时间的汇总 (毫秒)，以及开环模式的到达统计"""
+        with self.lock:
+            response_latency = self.response_latency.copy()
+            service_latency = self.service_latency.copy()
+            missed = self.arrival_missed
+        return self._latency_summary(response_latency, service_latency, missed)
+
+    def _latency_summary(self, response_latency, service_latency, missed):
+        # 分位数需要遍历全部桶，在锁外对复制的直方图计算
+        summary = {
+            "response": response_latency.summary(),
+            "service": service_latency.summary()
+        }
+        if self.arrival_rate:
+            summary["arrival"] = {
+                "rate": self.arrival_rate,
+                "process": self.arrival_process,
+                "missed": missed
+            }
+        return summary
+
+    @property
+    def elapsed(self):
+        """本次运行的时长，单位秒；运行结束后不再增长，尚未运行时为0"""
+        if not self.start_time:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def snapshot(self, histograms=False):
+        """运行状态的快照: 计数与延迟直方图在一次加锁内复制，汇总与其余字段在锁外读取
+
+        histograms 为真时附带可合并的延迟直方图 (latency_histograms)，供agent上报给控制器
+        """
+        with self.lock:
+            counters = {key: getattr(self, key) for key in SNAPSHOT_COUNTERS}
+            thread_status = dict(self.thread_current_urls)
+            response_latency = self.response_latency.copy()
+            service_latency = self.service_latency.copy()
+        elapsed = self.elapsed
+        verification = None
+        if self.verifier is not None:
+            verification = {
+                "sample": self.verify_sample,
+                "passed": counters["verify_passed"],
+                "failed": counters["verify_failed"],
+                "skipped": counters["verify_skipped"]
+            }
+        snapshot = dict(
+            counters,
+            running=self.active,
+            state=self.status,
+            config=self.config_name,
+            threads=self.threads,
+            mode=self.mode,
+            meter_basis=self.meter_basis,
+            elapsed=elapsed,
+            speed=counters["total_bytes"] / elapsed if elapsed > 0 else 0.0,
+            thread_status=thread_status,
+            url_stats=self.url_stats(),
+            url_pool=self.url_pool_summary(),
+            verification=verification,
+            reconcile=self.reconciler.summary(counters["wire_bytes"]) if self.reconciler is not None else None,
+            governor=self.governor_summary(GOVERNOR_DECISIONS),
+            sources=self.source_summary(),
+            memory=self.memory_summary(),
+            latency=self._latency_summary(response_latency, service_latency, counters["arrival_missed"])
+        )
+        if histograms:
+            snapshot["latency_histograms"] = {
+                "response": response_latency.to_dict(),
+                "service": service_latency.to_dict()
+            }
+        return snapshot
+
+    def _start_worker(self, thread_id, session=None):
+        """启动一个工作线程，调用方需持有 self.workers_lock"""
+        thread = threading.Thread(target=self.download_file, args=(thread_id, session), name=f"download-{thread_id}")
+        thread.daemon = True
+        self.workers[thread_id] = thread
+        if self.memory_plan is None:
+            thread.start()
+            return
+        # 栈大小是进程级设置，只在创建工作线程时使用规划的大小
+        previous = threading.stack_size(self.memory_plan["stack_size"])
+        try:
+            thread.start()
+        finally:
+            threading.stack_size(previous)
+
+    def _resize_workers(self):
+        """按当前线程数补齐工作线程，编号超出的线程完成当前请求后自行退出"""
+        with self.workers_lock:
+            for thread_id in range(1, self.threads + 1):
+                worker = self.workers.get(thread_id)
+                if worker is None or not worker.is_alive():
+                    self._start_worker(thread_id)
+
+    def _retire_worker(self, thread_id):
+        """线程数调小后注销编号超出的工作线程，返回该线程是否应退出"""
+        with self.workers_lock:
+            # 在锁内复查，避免与同时调大线程数的操作交错而少启动线程
+            if thread_id <= self.threads:
+                return False
+            self.workers.pop(thread_id, None)
+        with self.lock:
+            self.thread_current_urls.pop(thread_id, None)
+            self.thread_url_ids.pop(thread_id, None)
+        return True
+
+    def _create_session(self, source=None):
+        """创建针对下载场景优化的 Session，source 为源地址编号，指定时新连接从该地址发出"""
+        import requests
 
-    def _create_session(self):
-        """创建针对下载场景优化的 Session"""
         session = requests.Session()
         session.headers.update({
             "Cache-Control": "no-cache, no-store, must-revalidate",
             "Pragma": "no-cache",
-            "Expires": "0"
+            "Expires": "0",
+            "Accept-Encoding": ACCEPT_ENCODING
         })
+        # 绑定源地址的连接不能与其他任务共用，使用会话自己的连接池
+        adapter = self.http_adapter if source is None else None
+        if adapter is None:
+            adapter = self._build_adapter((self.sources.address(source), 0) if source is not None else None)
+        if adapter is not None:
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        session.source_index = source
         return session
 
-    def _download_with_retries(self, session, url, thread_id):
-        """带指数退避的重试下载"""
+    def _build_adapter(self, source_address=None, **kwargs):
+        """按解析与套接字配置创建连接池，kwargs 传给 HTTPAdapter；不需要定制时返回None，使用 requests 的默认连接池"""
+        if self.dns_ttl or self.resolve:
+            from transport import SpreadingAdapter
+            return SpreadingAdapter(self.get_resolver(), socket_options=self.socket_options,
+                                    source_address=source_address, **kwargs)
+        if self.socket_options is not None or source_address is not None or kwargs:
+            from transport import TunedAdapter
+            return TunedAdapter(socket_options=self.socket_options, source_address=source_address, **kwargs)
+        return None
+
+    @property
+    def socket_profile(self):
+        return (self.socket_rcvbuf, self.tcp_nodelay, self.tcp_keepalive, self.tcp_congestion)
+
+    def _apply_socket_profile(self):
+        """按配置生成新连接的套接字参数，剔除内核不支持的参数并报告单连接接收窗口"""
+        profile = self.socket_profile
+        if profile == self._socket_profile:
+            return
+        from transport import build_socket_options, check_socket_options, receive_window
+
+        rcvbuf = int(self.socket_rcvbuf * 1024 * 1024) if self.socket_rcvbuf else None
+        options = build_socket_options(rcvbuf, self.tcp_nodelay, self.tcp_keepalive, self.tcp_congestion)
+        options, rejected = check_socket_options(options)
+        for label, error in rejected:
+            self.logger(f"内核不支持套接字参数 {label}，已忽略: {error}", Fore.YELLOW)
+        self.socket_options = None if profile == DEFAULT_SOCKET_PROFILE else options
+        self.receive_window = window = receive_window(options)
+        self._socket_profile = profile
+
+        if window["autotune"]:
+            self.logger(f"单连接接收窗口: 内核自动调整，最大约 {self.format_bytes(window['window'])} "
+                        f"(100ms RTT 下单连接上限约 {self.format_bytes(window['window'] * 10)}/s)", Fore.CYAN)
+        else:
+            self.logger(f"单连接接收窗口: 约 {self.format_bytes(window['window'])} (内核记账的接收缓冲 "
+                        f"{self.format_bytes(window['buffer'])}; 100ms RTT 下单连接上限约 "
+                        f"{self.format_bytes(window['window'] * 10)}/s)", Fore.CYAN)
+        if window["capped"]:
+            self.logger(f"请求的接收缓冲 {self.format_bytes(window['requested'])} 超过内核上限 net.core.rmem_max，"
+                        f"已被截断；调大 net.core.rmem_max 或不指定接收缓冲以使用自动调整", Fore.YELLOW)
+
+    def get_resolver(self):
+        """返回本实例的解析缓存，首次调用时创建"""
+        if self.resolver is None:
+            from transport import ResolverCache
+            self.resolver = ResolverCache(self.dns_ttl, self.resolve)
+        return self.resolver
+
+    def _prewarm_sessions(self):
+        """计时开始前为每个工作线程建立会话，并完成解析与握手"""
+        from transport import prewarm_sessions
+
+        self.status = "预热连接"
+        sources = self.sources
+        sessions = [self._create_session(sources.for_thread(i + 1) if sources is not None else None)
+                    for i in range(self.threads)]
+        started = time.perf_counter()
+        warmed = prewarm_sessions(sessions, self.url_pool.sample(), self.connect_timeout)
+        self.logger(f"已预热 {warmed} 个连接，耗时 {time.perf_counter() - started:.2f} 秒", Fore.CYAN)
+        return sessions
+
+    def _run_preflight(self):
+        """计时开始前并行探测所有有效的URL，标记失效的URL并按得到的大小创建限额规划"""
+        from preflight import BudgetPlanner, preflight
+
+        self.status = "预检链接"
+        pool = self.url_pool
+        sources = self.sources
+        workers = min(self.preflight_workers, len(pool))
+        if self.memory_plan is not None:
+            workers = min(workers, self.memory_plan["threads"])
+        sessions = [self._create_session(sources.for_thread(i + 1) if sources is not None else None)
+                    for i in range(workers)]
+        started = time.perf_counter()
+        try:
+            result = preflight(pool, sessions, (self.connect_timeout, self.read_timeout))
+        finally:
+            for session in sessions:
+                if self.http_adapter is None or session.source_index is not None:
+                    session.close()
+        for url_id, error in result["dead"]:
+            self._mark_url_invalid(pool, url_id, pool.url(url_id), error, probed=True)
+
+        self.logger(f"预检完成: {result['probed']} 个URL，失效 {len(result['dead'])} 个，已知大小 {result['sized']} 个 "
+                    f"(合计 {self.format_bytes(result['bytes'])})，支持Range {result['ranges']} 个，"
+                    f"耗时 {time.perf_counter() - started:.2f} 秒", Fore.CYAN)
+        # 按线路口径计量时响应头也计入限额，按探测到的最大响应头预留
+        self.planner = BudgetPlanner(pool, result["header_bytes"] if self.meter_basis == "wire" else 0)
+        if self._plans_traffic() and result["sized"]:
+            average = result["bytes"] / result["sized"]
+            self.logger(f"流量限制 {self.traffic_limit} MB 约需 {self.traffic_limit * 1024 * 1024 / average:.0f} 次下载 "
+                        f"(平均大小 {self.format_bytes(average)})，最后一段按剩余预算规划", Fore.CYAN)
+
+    def _next_is_upload(self):
+        """决定下一次请求的方向，mixed模式下使上传字节占比趋近 upload_ratio"""
+        if self.mode == "download":
+            return False
+        if self.mode == "upload":
+            return True
+        with self.lock:
+            return self.upload_bytes <= self.upload_ratio * self.total_bytes
+
+    @property
+    def upload_buffer(self):
+        if self._upload_buffer is None:
+            self._upload_buffer = memoryview(bytes(self.chunk_size))
+        return self._upload_buffer
+
+    def _download_with_retries(self, session, pool, url_id, url, thread_id, upload=False, reservation=None):
+        """带指数退避的重试下载 (upload=True 时执行上传)，reservation 为限额规划中的预留"""
+        import http.client
+        from requests.exceptions import ChunkedEncodingError, RequestException, Timeout
+        from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
         attempt = 1
         backoff = self.retry_backoff
+        tracer = self.tracer
 
         while attempt <= self.max_retries and self.active:
+            if tracer is not None:
+                tracer.request(url, upload, attempt)
             try:
-                return self._stream_download(session, url)
-            except (RequestException, Timeout, http.client.IncompleteRead, ChunkedEncodingError) as exc:
+                if upload:
+                    return self._stream_upload(session, pool, url_id, url)
+                return self._stream_download(session, pool, url_id, url, reservation)
+            except (RequestException, Timeout, http.client.IncompleteRead, ChunkedEncodingError,
+                    Urllib3HTTPError) as exc:
+                if tracer is not None:
+                    tracer.error()
+                if session.source_index is not None:
+                    with self.lock:
+                        self.sources.errors[session.source_index] += 1
                 if not self.active:
                     return False
 
@@ -356,38 +983,35 @@ class TrafficConsumer:
                 )
 
                 if attempt >= self.max_retries:
-                    self._mark_url_invalid(url, exc)
+                    self._mark_url_invalid(pool, url_id, url, exc)
                     return False
 
                 time.sleep(backoff)
-                backoff = min(backoff * 2, 8.0)
+                backoff = min(backoff * 2, MAX_RETRY_BACKOFF)
                 attempt += 1
 
         return False
 
-    def _mark_url_invalid(self, url, error):
-        """在重试耗尽后标记URL为无效并通知外部回调"""
+    def _mark_url_invalid(self, pool, url_id, url, error, probed=False):
+        """在重试耗尽或预检失败 (probed=True) 后标记URL为无效并通知外部回调"""
         notify_callback = None
         payload = None
 
         with self.lock:
-            if url in self.invalid_urls:
+            if not pool.mark_invalid(url_id):
                 return
-            self.invalid_urls.add(url)
             for thread_id, assigned_url in list(self.thread_current_urls.items()):
                 if assigned_url == url:
                     self.thread_current_urls[thread_id] = f"{url} (已失效)"
-            all_invalid = len(self.invalid_urls) == len(self.urls)
+            all_invalid = pool.invalid_count >= len(pool) and pool is self._url_pool
 
-        with self.weight_lock:
-            if url in self.urls:
-                try:
-                    idx = self.urls.index(url)
-                    self.url_weights[idx] = 0.0
-                except ValueError:
-                    pass
+        if self.tracer is not None:
+            self.tracer.invalid()
 
-        summary = f"链接 {url} 连续失败超过 {self.max_retries} 次，已标记为无效。"
+        if probed:
+            summary = f"链接 {url} 预检失败，已标记为无效。"
+        else:
+            summary = f"链接 {url} 连续失败超过 {self.max_retries} 次，已标记为无效。"
         if error:
             summary += f" 错误信息: {error}"
         self.logger(summary, Fore.RED)
@@ -395,8 +1019,8 @@ class TrafficConsumer:
         if self.invalid_url_callback:
             payload = {
                 "url": url,
-                "message": f"链接已连续失败 {self.max_retries} 次，已停止重试。",
-                "retries": self.max_retries
+                "message": "链接预检失败，已跳过。" if probed else f"链接已连续失败 {self.max_retries} 次，已停止重试。",
+                "retries": 0 if probed else self.max_retries
             }
             if error:
                 payload["error"] = str(error)
@@ -412,36 +1036,259 @@ class TrafficConsumer:
             except Exception as callback_exc:
                 self.logger(f"通知前端无效链接时出错: {callback_exc}", Fore.YELLOW)
 
-    def _stream_download(self, session, url):
-        """执行一次流式下载，返回是否完整结束"""
+    def _stream_download(self, session, pool, url_id, url, reservation=None):
+        """执行一次流式下载，返回是否完整结束；reservation 指定了长度时只请求前这么多字节"""
         completed = True
+        wire_basis = self.meter_basis == "wire"
+        tracer = self.tracer
+        received = 0
+        partial = reservation is not None and reservation.length is not None
 
         with session.get(
             url,
             stream=True,
+            headers={"Range": f"bytes=0-{reservation.length - 1}"} if partial else None,
             timeout=(self.connect_timeout, self.read_timeout)
         ) as response:
+            if tracer is not None:
+                tracer.headers(response.status_code)
             response.raise_for_status()
 
-            for chunk in response.iter_content(chunk_size=self.chunk_size):
-                if not self.active:
-                    completed = False
-                    break
+            header_bytes = self._response_header_bytes(response)
+            reconciler = self.reconciler
+            sock = self._connection_socket(response) if reconciler is not None else None
+            source = session.source_index
+            source_bytes = self.sources.bytes if source is not None else None
+            with self.lock:
+                self.wire_bytes += header_bytes
+                pool.wire[url_id] += header_bytes
+                if source is not None:
+                    source_bytes[source] += header_bytes
+                if wire_basis:
+                    self.total_bytes += header_bytes
+                    if reservation is not None:
+                        reservation.consume(header_bytes)
+
+            # 直接读取未解码的原始响应体，线路字节即为分块长度；
+            # 需要解码口径时再自行解压，只统计长度不保留解压结果
+            decoder = self._content_decoder(response) if self.decode_content else None
+
+            # 被抽中校验时，分块交给校验线程解压并计算摘要；只请求了一部分的下载不做校验
+            sample = None
+            if self.verifier is not None and not partial:
+                sample = self.verifier.begin(url, response.headers.get("Content-Encoding"), self.verify_sample)
 
-                if not chunk:
-                    continue
+            try:
+                for chunk in response.raw.stream(self.chunk_size, decode_content=False):
+                    if not self.active:
+                        completed = False
+                        break
 
-                if self.rate_limiter:
-                    self.rate_limiter.acquire(len(chunk))
+                    if not chunk:
+                        continue
 
-                with self.lock:
-                    self.total_bytes += len(chunk)
+                    wire_size = len(chunk)
+                    received += wire_size
+                    payload_size = wire_size
+                    if decoder is not None:
+                        try:
+                            payload_size = self._decoded_length(decoder, chunk)
+                        except zlib.error:
+                            decoder = None
+
+                    if sample is not None:
+                        sample.feed(chunk)
+
+                    metered = wire_size if wire_basis else payload_size
+                    if self.rate_limiter:
+                        self.rate_limiter.acquire(metered)
+                    if self.governor_limiter:
+                        self.governor_limiter.acquire(metered)
+
+                    with self.lock:
+                        self.total_bytes += metered
+                        self.payload_bytes += payload_size
+                        self.wire_bytes += wire_size
+                        pool.payload[url_id] += payload_size
+                        pool.wire[url_id] += wire_size
+                        if source is not None:
+                            source_bytes[source] += wire_size
+                        if reservation is not None:
+                            reservation.consume(metered)
+
+                    if self._check_traffic_limit():
+                        # 按规划恰好用完预算的最后一次下载已收到全部预计的字节，仍计为完成
+                        completed = (reservation is not None and reservation.expected is not None
+                                     and received >= reservation.expected)
+                        break
+            except BaseException:
+                # 下载中断的内容不完整，放弃本次抽样，由重试重新下载
+                if sample is not None:
+                    sample.finish(False)
+                raise
+
+            if sample is not None:
+                sample.finish(completed)
+            if reconciler is not None:
+                reconciler.observe(sock)
+
+        if tracer is not None:
+            if completed:
+                tracer.end(received)
+            else:
+                tracer.abort(received)
+        return completed
 
-                if self._check_traffic_limit():
-                    completed = False
-                    break
+    def _stream_upload(self, session, pool, url_id, url):
+        """执行一次流式上传，返回是否完整结束"""
+        body = _UploadBody(self, pool, url_id, int(self.upload_size * 1024 * 1024), session.source_index)
+        tracer = self.tracer
+        try:
+            with session.request(
+                self.upload_method,
+                url,
+                data=body,
+                headers={"Content-Type": "application/octet-stream"},
+                timeout=(self.connect_timeout, self.read_timeout)
+            ) as response:
+                if tracer is not None:
+                    tracer.headers(response.status_code)
+                if self.reconciler is not None:
+                    self.reconciler.observe(self._connection_socket(response))
+                response.raise_for_status()
+        except UploadAborted:
+            if tracer is not None:
+                tracer.abort(body.size - body.remaining)
+            return False
+        if tracer is not None:
+            tracer.end(body.size)
+        return True
 
-        return completed
+    def _record_upload_chunk(self, pool, url_id, size, source=None):
+        """上传一个分块前的限速与计量，source 为源地址编号；返回False表示应中断上传"""
+        if not self.active:
+            return False
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire(size)
+        if self.governor_limiter:
+            self.governor_limiter.acquire(size)
+
+        with self.lock:
+            self.total_bytes += size
+            self.payload_bytes += size
+            self.wire_bytes += size
+            self.upload_bytes += size
+            pool.payload[url_id] += size
+            pool.wire[url_id] += size
+            if source is not None:
+                self.sources.bytes[source] += size
+
+        return not self._check_traffic_limit()
+
+    def _create_tracer(self):
+        """创建本次运行的请求轨迹写入器，元数据记录重放所需的配置"""
+        from request_trace import TraceWriter
+
+        return TraceWriter(os.path.expanduser(self.trace_file), {
+            "config_name": self.config_name,
+            "threads": self.threads,
+            "url_strategy": self.url_strategy,
+            "mode": self.mode,
+            "limit_speed": self.limit_speed,
+            "replay_of": self.replay_file
+        })
+
+    def _load_replay(self):
+        """载入要重放的轨迹，以轨迹中的URL与线程数替换当前配置，返回False表示轨迹无法读取"""
+        from request_trace import ReplaySchedule
+
+        try:
+            self.replay = ReplaySchedule(os.path.expanduser(self.replay_file), self.replay_origin, self.replay_speed)
+        except (OSError, ValueError) as e:
+            self.logger(f"无法读取请求轨迹: {e}", Fore.RED)
+            return False
+        self.urls = self.replay.urls
+        self.url_source = None
+        self._url_pool = None
+        self.threads = self.replay.threads
+        self.logger(f"已载入请求轨迹 {self.replay_file}: {self.replay.requests} 次请求，"
+                    f"{len(self.replay.urls)} 个URL，{self.threads} 个线程", Fore.CYAN)
+        return True
+
+    def _load_verifier(self):
+        """指定了校验清单时创建抽样校验器，返回False表示清单无法读取或格式错误"""
+        if not self.verify_manifest or self.verifier is not None:
+            return True
+        from integrity import IntegrityVerifier, load_manifest
+
+        try:
+            expectations = load_manifest(os.path.expanduser(self.verify_manifest))
+        except (OSError, ValueError) as e:
+            self.logger(f"无法读取校验清单: {e}", Fore.RED)
+            return False
+        options = {}
+        if self.memory_plan is not None:
+            options["max_pending"] = self.memory_plan["verify_pending"]
+        self.verifier = IntegrityVerifier(expectations, self._record_verification, **options)
+        self.logger(f"已载入校验清单 {self.verify_manifest}，共 {len(expectations)} 个URL，"
+                    f"抽样比例 {self.verify_sample:.0%}", Fore.CYAN)
+        return True
+
+    def _record_verification(self, url, passed, detail):
+        """校验线程的回调: 累计校验结果，不通过时记录错误"""
+        with self.lock:
+            if passed is None:
+                self.verify_skipped += 1
+            elif passed:
+                self.verify_passed += 1
+            else:
+                self.verify_failed += 1
+        if passed is False:
+            self.logger(f"链接 {url} 的内容校验不通过: {detail}", Fore.RED)
+
+    def verification_summary(self):
+        """抽样校验的结果统计，未启用校验时返回None"""
+        if self.verifier is None:
+            return None
+        return {
+            "sample": self.verify_sample,
+            "passed": self.verify_passed,
+            "failed": self.verify_failed,
+            "skipped": self.verify_skipped
+        }
+
+    @staticmethod
+    def _connection_socket(response):
+        """响应所用连接的套接字，响应体读完后连接会归还连接池，需要在读取之前取得"""
+        connection = getattr(response.raw, "_connection", None)
+        return getattr(connection, "sock", None)
+
+    @staticmethod
+    def _response_header_bytes(response):
+        """估算状态行与响应头在线路上的字节数"""
+        version = {10: "HTTP/1.0", 11: "HTTP/1.1"}.get(response.raw.version, "HTTP/1.1")
+        size = len(f"{version} {response.status_code} {response.reason}\r\n") + 2
+        for key, value in response.raw.headers.items():
+            size += len(key) + len(value) + 4
+        return size
+
+    def _content_decoder(self, response):
+        """根据 Content-Encoding 创建解压器，不支持的编码返回None(按原始字节计量)"""
+        encoding = response.headers.get("Content-Encoding", "").strip().lower()
+        if encoding == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if encoding == "deflate":
+            return zlib.decompressobj(32 + zlib.MAX_WBITS)
+        return None
+
+    def _decoded_length(self, decoder, data):
+        """解压一个分块并返回解码后的长度，按块解压以限制内存占用"""
+        total = 0
+        while data:
+            total += len(decoder.decompress(data, self.chunk_size))
+            data = decoder.unconsumed_tail
+        return total
 
     def _check_traffic_limit(self):
         """检查是否达到流量限制"""
@@ -454,7 +1301,7 @@ class TrafficConsumer:
             if self._traffic_limit_triggered:
                 return False
 
-            if self.total_bytes < limit_bytes:
+            if self.limited_bytes < limit_bytes:
                 return False
 
             self._traffic_limit_triggered = True
@@ -470,6 +1317,31 @@ class TrafficConsumer:
         self.active = False
         return True
 
+    @property
+    def limited_bytes(self):
+        """流量限制所计的字节: 按网卡执行时为网卡收发的字节，否则为按计量口径统计的字节"""
+        if self.interface_limit and self.reconciler is not None:
+            return self.interface_bytes
+        return self.total_bytes
+
+    def _stop_due_to_budget(self, remaining):
+        """剩余的流量预算放不下任何一次完整的下载时提前结束，不留下中断在半途的下载"""
+        with self.lock:
+            if self._traffic_limit_triggered:
+                return
+            self._traffic_limit_triggered = True
+
+        self.logger(f"\n剩余流量预算 {self.format_bytes(max(remaining, 0))} 放不下任何一次完整的下载，"
+                    f"在流量限制 {self.traffic_limit} MB 之前结束", Fore.YELLOW)
+
+        if self.interval or self.cron_expr:
+            self.status = "等待下次执行"
+            self.logger("等待下次执行...", Fore.CYAN)
+        else:
+            self.logger("停止下载", Fore.YELLOW)
+
+        self.active = False
+
     def _stop_due_to_count(self):
         """达到次数限制时的统一处理"""
         if self.count is None or self._count_limit_triggered:
@@ -508,15 +1380,17 @@ class TrafficConsumer:
             # 显示流量限制进度
             traffic_limit_str = ""
             if self.traffic_limit is not None:
-                progress = min(100, self.total_bytes / (self.traffic_limit * 1024 * 1024) * 100)
-                traffic_limit_str = f" | 流量限制: {progress:.1f}% ({total_str}/{self.format_bytes(self.traffic_limit * 1024 * 1024)})"
+                limited = self.limited_bytes
+                progress = min(100, limited / (self.traffic_limit * 1024 * 1024) * 100)
+                traffic_limit_str = (f" | 流量限制: {progress:.1f}% ({self.format_bytes(limited)}/"
+                                     f"{self.format_bytes(self.traffic_limit * 1024 * 1024)})")
 
             # 更新固定显示界面
             self.update_display_interface(total_str, speed_str, traffic_limit_str, elapsed_time)
 
             # 记录历史数据点（每10秒记录一次）
             if int(elapsed_time) % 10 == 0 and int(elapsed_time) > 0:
-                self.history.append({
+                self.history_points.append({
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "bytes": current_bytes,
                     "speed": speed,
@@ -541,13 +1415,75 @@ class TrafficConsumer:
         self.logger(f"平均速度: {avg_speed_str}", Fore.CYAN)
         self.logger(f"总运行时间: {timedelta(seconds=int(elapsed_time))}", Fore.CYAN)
         self.logger(f"总下载次数: {self.download_count}", Fore.CYAN)
+        self.logger(f"计量口径: {self.meter_basis} | 线路字节: {self.format_bytes(self.wire_bytes)} | "
+                    f"解码字节: {self.format_bytes(self.payload_bytes)} | "
+                    f"解码/线路比: {self.decode_ratio(self.payload_bytes, self.wire_bytes):.2f}", Fore.CYAN)
+        if self.mode != "download":
+            self.logger(f"流量方向: {self.mode} | 上传流量: {self.format_bytes(self.upload_bytes)} | "
+                        f"上传次数: {self.upload_count}", Fore.CYAN)
+        reconcile = self.reconcile_summary()
+        if reconcile:
+            self.logger(f"网卡对账 ({reconcile['interface']}): 接收 {self.format_bytes(reconcile['rx_bytes'])} | "
+                        f"发送 {self.format_bytes(reconcile['tx_bytes'])} | 网卡/线路比: "
+                        f"{self._format_ratio(reconcile['overhead_ratio'], '.3f')} | 主机重传率: "
+                        f"{self._format_ratio(reconcile['retransmit_rate'], '.3%')} | 本进程连接重传率: "
+                        f"{self._format_ratio(reconcile['socket_retransmit_rate'], '.3%')} | 乱序到达: "
+                        f"{self._format_ratio(reconcile['out_of_order_rate'], '.3%')}", Fore.CYAN)
+        governor = self.governor_summary()
+        if governor:
+            self.logger(f"主机压力调节: 调节 {governor['decision_count']} 次 | 最低比例 {governor['min_scale']:.0%} | "
+                        f"受限时长 {timedelta(seconds=int(governor['throttled_seconds']))}",
+                        Fore.YELLOW if governor["decision_count"] else Fore.CYAN)
+        # 最终统计与主线程结束时的采样并行，这里再读取一次，峰值包含停止阶段
+        if self.memory_monitor is not None:
+            self.memory_monitor.sample()
+        memory = self.memory_summary()
+        if memory:
+            parts = memory["breakdown"] or {}
+            labels = (("stacks", "线程栈"), ("heap", "堆与匿名内存"), ("files", "文件映射"), ("other", "其他"))
+            self.logger(f"内存: 峰值 {self.format_bytes(memory['peak'])} / 预算 {self.format_bytes(memory['budget'])} | "
+                        + " | ".join(f"{label} {self.format_bytes(parts[key])}" for key, label in labels if key in parts)
+                        + (f" | 归还空闲内存 {memory['trims']} 次" if memory["trims"] else ""),
+                        Fore.YELLOW if memory["peak"] > memory["budget"] else Fore.CYAN)
+        verification = self.verification_summary()
+        if verification:
+            self.logger(f"抽样校验 ({verification['sample']:.0%}): 通过 {verification['passed']} 次 | "
+                        f"不通过 {verification['failed']} 次 | 放弃 {verification['skipped']} 次",
+                        Fore.RED if verification["failed"] else Fore.CYAN)
+        latency = self.latency_summary()
+        if latency["response"]["count"]:
+            for label, key in (("响应时间", "response"), ("服务时间", "service")):
+                values = latency[key]
+                self.logger(f"{label}: p50 {values['p50']:.1f} ms | p99 {values['p99']:.1f} ms | "
+                            f"p99.9 {values['p999']:.1f} ms | 最大 {values['max']:.1f} ms", Fore.CYAN)
+        if "arrival" in latency:
+            arrival = latency["arrival"]
+            self.logger(f"开环到达: {arrival['rate']:g} 次/秒 ({arrival['process']}) | "
+                        f"未能发出 {arrival['missed']} 次",
+                        Fore.YELLOW if arrival["missed"] else Fore.CYAN)
+
+        sources = self.source_summary()
+        if sources:
+            self.logger(f"\n=== 源地址统计 ({self.bind_policy}) ===", Fore.CYAN)
+            for source in sources:
+                label = source["source"] if source["source"] == source["address"] else \
+                    f"{source['source']} ({source['address']})"
+                self.logger(f"  {label}: {self.format_bytes(source['bytes'])} ({source['share']:.1%}) | "
+                            f"平均速度 {self.format_bytes(source['average_speed'])}/s | 完成 {source['requests']} 次 | "
+                            f"出错 {source['errors']} 次", Fore.YELLOW if source["errors"] else Fore.CYAN)
 
         # 显示URL使用统计
         self.logger("\n=== URL使用统计 ===", Fore.CYAN)
         self.logger(f"URL选择策略: {self.url_strategy}", Fore.CYAN)
-        for url, count in self.url_usage.items():
+        url_stats = self.url_stats(ranked=True)
+        summary = self.url_pool_summary()
+        if summary and summary["size"] > len(url_stats):
+            self.logger(f"URL池: 共 {summary['size']} 个，已使用 {summary['used']} 个，已失效 {summary['invalid']} 个 "
+                        f"(以下为完成次数最多的 {len(url_stats)} 个)", Fore.CYAN)
+        for url, count, payload, wire in url_stats:
             percentage = (count / self.download_count * 100) if self.download_count > 0 else 0
-            self.logger(f"  {url}: {count}次 ({percentage:.1f}%)", Fore.CYAN)
+            self.logger(f"  {url}: {count}次 ({percentage:.1f}%) 解码/线路比: {self.decode_ratio(payload, wire):.2f}",
+                        Fore.CYAN)
 
         self.logger(f"\n统计数据已保存到: {STATS_FILE}", Fore.CYAN)
         
@@ -569,6 +1505,10 @@ class TrafficConsumer:
         if len(self.history) > self.MAX_HISTORY_ENTRIES:
             self.history.pop()
         
+        # 调度作业的历史随作业一起持久化
+        if self.scheduler and _scheduled_consumers.get(self.job_id) is self:
+            append_schedule_history(self.job_id, record, self.MAX_HISTORY_ENTRIES)
+
         # 如果有回调，则调用它
         if self.history_callback:
             self.history_callback(record)
@@ -580,16 +1520,34 @@ class TrafficConsumer:
 
         # 显示标题和配置信息
         print(f"{Fore.CYAN}流量消耗器启动{Style.RESET_ALL}")
-        print(f"{Fore.CYAN}URLs ({len(self.urls)}个): {Style.RESET_ALL}")
-        for i, url in enumerate(self.urls, 1):
-            print(f"{Fore.CYAN}  {i}. {url}{Style.RESET_ALL}")
+        if self.url_source is not None:
+            pool = self.url_pool
+            print(f"{Fore.CYAN}URL清单: {pool.source} ({len(pool)}个){Style.RESET_ALL}")
+        else:
+            print(f"{Fore.CYAN}URLs ({len(self.urls)}个): {Style.RESET_ALL}")
+            for i, url in enumerate(self.urls, 1):
+                print(f"{Fore.CYAN}  {i}. {url}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}URL选择策略: {self.url_strategy}{Style.RESET_ALL}")
+        if self.verify_manifest:
+            print(f"{Fore.CYAN}抽样校验: {self.verify_sample:.0%} (清单: {self.verify_manifest}){Style.RESET_ALL}")
+        if self.arrival_rate:
+            print(f"{Fore.CYAN}开环到达: {self.arrival_rate:g} 次/秒 ({self.arrival_process}){Style.RESET_ALL}")
+        if self.mode != "download":
+            print(f"{Fore.CYAN}流量方向: {self.mode} (上传 {self.upload_method} {self.upload_size} MB/次"
+                  f"{f', 上传占比 {self.upload_ratio:.0%}' if self.mode == 'mixed' else ''}){Style.RESET_ALL}")
         print(f"{Fore.CYAN}线程数: {self.threads}{Style.RESET_ALL}")
 
         if self.limit_speed > 0:
             print(f"{Fore.CYAN}限速: {self.limit_speed} MB/s{Style.RESET_ALL}")
         else:
             print(f"{Fore.CYAN}限速: 无限制{Style.RESET_ALL}")
+        if self.pressure_governor is not None:
+            print(f"{Fore.CYAN}主机压力调节: PSI 阈值 {self.pressure_limit:g}%{Style.RESET_ALL}")
+        if self.sources is not None:
+            print(f"{Fore.CYAN}源地址 ({self.bind_policy}): "
+                  f"{', '.join(source[0] for source in self.sources.sources)}{Style.RESET_ALL}")
+        if self.memory_plan is not None:
+            print(f"{Fore.CYAN}内存预算: {self.memory_budget:g} MB (分块 {self.format_bytes(self.chunk_size)}){Style.RESET_ALL}")
 
         if self.duration:
             print(f"{Fore.CYAN}持续时间: {timedelta(seconds=self.duration)}{Style.RESET_ALL}")
@@ -615,6 +1573,16 @@ class TrafficConsumer:
         self.logger(f"\n{'=' * 50}", Fore.CYAN)
 
         # 显示统计信息
+        governor = self.pressure_governor
+        if governor is not None and governor.scale < 1.0:
+            traffic_limit_str += f" | 主机压力: 并发 {self.governed_threads or self.threads}/{self.threads}"
+        sources = self.sources
+        if sources is not None:
+            traffic_limit_str += " | 源地址: " + ", ".join(
+                f"{source[0]} {self.format_bytes(speed)}/s" for source, speed in zip(sources.sources, sources.speeds))
+        monitor = self.memory_monitor
+        if monitor is not None and monitor.status:
+            traffic_limit_str += f" | 内存: {self.format_bytes(monitor.status['rss'])}/{self.format_bytes(monitor.budget)}"
         self.logger(f"已消耗: {total_str} | 速度: {speed_str}{traffic_limit_str} | "
               f"运行时间: {timedelta(seconds=int(elapsed_time))} | "
               f"下载次数: {self.download_count}", Fore.GREEN)
@@ -624,7 +1592,216 @@ class TrafficConsumer:
         lines_to_move_up = self.threads + 4
         # print(f"\033[{lines_to_move_up}A", end="")  # 向上移动光标
 
-    def format_bytes(self, bytes_value):
+    def reconcile_summary(self):
+        """网卡对账结果，未对账时返回None"""
+        reconciler = self.reconciler
+        return reconciler.summary(self.wire_bytes) if reconciler is not None else None
+
+    def _start_reconciler(self):
+        """记下网卡与主机TCP计数的基准；未指定网卡或无法读取网卡计数时不对账"""
+        self.reconciler = None
+        if not (self.interface or self.interface_limit):
+            return
+        from netcounters import Reconciler, default_interface
+
+        name = self.interface if self.interface and self.interface != "auto" else default_interface()
+        try:
+            if name is None:
+                raise KeyError("没有默认路由")
+            self.reconciler = Reconciler(name, offset=self.interface_bytes)
+        except (OSError, KeyError) as e:
+            self.logger(f"无法读取网卡 {name or ''} 的计数，不进行对账: {e}"
+                        + ("；流量限制按应用统计的字节执行" if self.interface_limit else ""), Fore.YELLOW)
+            return
+        self.logger(f"网卡对账: {name}" + ("，流量限制按网卡收发的字节执行" if self.interface_limit else ""), Fore.CYAN)
+
+    def _sample_interface(self):
+        with self.lock:
+            self.interface_bytes = self.reconciler.sample()
+        if self.interface_limit:
+            self._check_traffic_limit()
+
+    def governor_summary(self, decisions=None):
+        """主机压力调节的状态与调节记录，未启用调节时返回None；decisions 为附带的最近记录条数，None表示全部"""
+        governor = self.pressure_governor
+        if governor is None:
+            return None
+        summary = governor.summary(decisions)
+        summary["threads"] = self.governed_threads if self.governed_threads is not None else self.threads
+        summary["rate"] = self.governor_limiter.rate if self.governor_limiter is not None else None
+        return summary
+
+    def source_summary(self):
+        """按源地址的统计，未绑定源地址时返回None"""
+        sources = self.sources
+        if sources is None:
+            return None
+        return sources.summary(self.elapsed)
+
+    def _start_binding(self):
+        """解析并检查配置的源地址，创建本次运行的源地址分配；无法绑定的源地址被跳过"""
+        self.sources = None
+        if not self.bind:
+            return
+        from binding import SourceSet, check_bindable, parse_source, resolve_source
+
+        sources = []
+        for spec in self.bind:
+            try:
+                name, weight = parse_source(spec)
+                address, interface = resolve_source(name)
+                check_bindable(address)
+            except (OSError, ValueError) as e:
+                self.logger(f"无法使用源地址 {spec}，已跳过: {e}", Fore.RED)
+                continue
+            sources.append((name, address, interface, weight))
+        if not sources:
+            self.logger("没有可用的源地址，新连接按默认路由发出", Fore.RED)
+            return
+        self.sources = SourceSet(sources, self.bind_policy, time.monotonic)
+        labels = ", ".join((name if address == name else f"{name} ({address})") + (f" x{weight}" if weight > 1 and self.bind_policy != "round_robin" else "")
+                           for name, address, _, weight in sources)
+        self.logger(f"源地址绑定 ({self.bind_policy}): {labels}", Fore.CYAN)
+
+    def _start_governor(self):
+        """创建主机压力调节器；无法读取 PSI 与系统负载时不调节"""
+        self.pressure_governor = None
+        self.governed_threads = None
+        self.governor_limiter = None
+        if not self.governor:
+            return
+        from pressure import Governor
+
+        try:
+            governor = Governor(self.pressure_limit)
+        except OSError as e:
+            self.logger(f"无法读取主机压力，不进行调节: {e}", Fore.YELLOW)
+            return
+        self._governor_sample = (time.monotonic(), self.total_bytes, 0.0)
+        self.pressure_governor = governor
+        signals = "、".join(governor.resources + ("load",)) if governor.resources else "系统负载 (没有 PSI)"
+        self.logger(f"主机压力调节: {signals}，PSI 阈值 {self.pressure_limit:g}%", Fore.CYAN)
+
+    def _govern(self):
+        """读取主机压力，比例变化时调节并发与速率并记录"""
+        governor = self.pressure_governor
+        # 未限速时以下调前的实际速度为基准，按平滑后的速度估计
+        now = time.monotonic()
+        last_time, last_bytes, speed = self._governor_sample
+        total = self.total_bytes
+        if now > last_time:
+            current = max(0, total - last_bytes) / (now - last_time)
+            speed = current if not speed else speed * 0.7 + current * 0.3
+        self._governor_sample = (now, total, speed)
+
+        change = governor.update()
+        if change is None:
+            return
+        action, reason = change
+        if action == "throttle" and governor.base_rate is None and self.limit_speed <= 0 and speed > 0:
+            governor.base_rate = speed
+        self._apply_governor()
+        threads = self.governed_threads if self.governed_threads is not None else self.threads
+        rate = self.governor_limiter.rate if self.governor_limiter is not None else None
+        governor.record(action, reason, threads, rate)
+        rate_str = f"，速率 {self.format_bytes(rate)}/s" if rate else ""
+        if action == "throttle":
+            self.logger(f"主机压力: {reason}，并发降至 {threads} 线程{rate_str}", Fore.YELLOW)
+        else:
+            self.logger(f"主机压力缓解: {reason}，并发恢复至 {threads} 线程{rate_str}"
+                        + ("" if governor.scale < 1.0 else " (已完全恢复)"), Fore.CYAN)
+
+    def _apply_governor(self):
+        """按调节器当前的比例设置线程数上限与限速器，比例恢复为1时取消"""
+        governor = self.pressure_governor
+        if governor is None:
+            return
+        if governor.scale >= 1.0:
+            governor.base_rate = None
+            self.governed_threads = None
+            self.governor_limiter = None
+            return
+        self.governed_threads = governor.limit_threads(self.threads)
+        if self.limit_speed > 0:
+            governor.base_rate = self.limit_speed * 1024 * 1024
+        rate = governor.limit_rate()
+        if rate is None:
+            self.governor_limiter = None
+        elif self.governor_limiter is None:
+            self.governor_limiter = RateLimiter(rate)
+        else:
+            self.governor_limiter.set_rate(rate)
+
+    def _apply_memory_budget(self):
+        """按内存预算规划线程数、分块大小、线程栈与内存中的统计，每个消耗器只规划一次；
+        预算不足以运行一个线程时返回False"""
+        if not self.memory_budget or self.memory_plan is not None:
+            return True
+        # 基线在下载所需的模块导入之后读取
+        import requests  # noqa: F401
+        from memory import MB, limit_arenas, plan_budget, read_status
+        from integrity import VERIFY_WORKERS
+
+        status = read_status()
+        if status is None:
+            self.logger("无法读取本进程的内存占用 (需要 /proc)，不按内存预算规划", Fore.YELLOW)
+            return True
+        # 需要解码口径时每个线程同时持有原始分块与解压结果
+        buffers = 2 if self.decode_content else 1
+        try:
+            plan = plan_budget(int(self.memory_budget * MB), status["rss"], self.threads, self.chunk_size, buffers,
+                               VERIFY_WORKERS if self.verify_manifest else 0)
+        except ValueError as e:
+            self.logger(str(e), Fore.RED)
+            return False
+
+        limit_arenas()
+        self.memory_plan = plan
+        self.chunk_size = plan["chunk_size"]
+        self.MAX_HISTORY_ENTRIES = min(self.MAX_HISTORY_ENTRIES, plan["history"])
+        del self.history[self.MAX_HISTORY_ENTRIES:]
+        self.history_points = deque(self.history_points, maxlen=plan["history"])
+        self.logger(f"内存预算 {self.memory_budget:g} MB: 进程已占用 {self.format_bytes(plan['baseline'])}，"
+                    f"保留 {self.format_bytes(plan['reserve'])}；每线程约 {self.format_bytes(plan['worker_cost'])} "
+                    f"(分块 {self.format_bytes(plan['chunk_size'])}，线程栈 {self.format_bytes(plan['stack_size'])})",
+                    Fore.CYAN)
+        if plan["threads"] < self.threads:
+            self.logger(f"内存预算只够 {plan['threads']} 个工作线程，线程数由 {self.threads} 调整为 {plan['threads']}",
+                        Fore.YELLOW)
+            self.threads = plan["threads"]
+        return True
+
+    def _start_memory_monitor(self):
+        """按内存预算运行时开始监控本进程的 RSS，峰值从这里算起"""
+        self.memory_monitor = None
+        if self.memory_plan is None:
+            return
+        from memory import MemoryMonitor
+
+        self.memory_monitor = MemoryMonitor(self.memory_plan)
+
+    def _sample_memory(self):
+        monitor = self.memory_monitor
+        if monitor.sample():
+            self.logger(f"本进程 RSS {self.format_bytes(monitor.status['rss'])} 超过内存预算 "
+                        f"{self.format_bytes(monitor.budget)}", Fore.YELLOW)
+
+    def memory_summary(self):
+        """内存预算、本进程的 RSS 与拆分以及规划结果，未设置内存预算时返回None"""
+        monitor = self.memory_monitor
+        return monitor.summary() if monitor is not None else None
+
+    @staticmethod
+    def _format_ratio(value, spec):
+        return "N/A" if value is None else format(value, spec)
+
+    @staticmethod
+    def decode_ratio(payload_bytes, wire_bytes):
+        """解码字节与线路字节之比，大于1表示内容经过压缩传输"""
+        return payload_bytes / wire_bytes if wire_bytes else 0.0
+
+    @staticmethod
+    def format_bytes(bytes_value):
         """格式化字节数为可读字符串"""
         if bytes_value < 1024:
             return f"{bytes_value:.2f} B"
@@ -651,19 +1828,41 @@ class TrafficConsumer:
         
         # 添加新的统计数据
         run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+        series_file = None
+        if self.speed_series is not None and len(self.speed_series):
+            series_file = f"{run_id}.series"
+            self.speed_series.save(os.path.join(SERIES_DIR, series_file))
+        # URL较多时只保存完成次数最多的部分URL
+        url_stats = self.url_stats(ranked=True)
         stats_data[run_id] = {
             "config_name": self.config_name,
-            "urls": self.urls,
+            "urls": self.urls if self.url_source is None else None,
+            "url_source": self._saved_url_source(),
+            "url_pool": self.url_pool_summary(),
             "url_strategy": self.url_strategy,
-            "url_usage": self.url_usage,
+            "url_usage": {url: count for url, count, _, _ in url_stats},
             "threads": self.threads,
             "limit_speed": self.limit_speed,
             "start_time": datetime.fromtimestamp(self.start_time).strftime("%Y-%m-%d %H:%M:%S") if self.start_time else None,
             "end_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_bytes": self.total_bytes,
+            "meter_basis": self.meter_basis,
+            "payload_bytes": self.payload_bytes,
+            "wire_bytes": self.wire_bytes,
+            "url_bytes": {url: [payload, wire] for url, _, payload, wire in url_stats},
+            "mode": self.mode,
+            "upload_bytes": self.upload_bytes,
+            "upload_count": self.upload_count,
+            "verification": self.verification_summary(),
+            "reconcile": self.reconcile_summary(),
+            "governor": self.governor_summary(),
+            "sources": self.source_summary(),
+            "memory": self.memory_summary(),
+            "latency": self.latency_summary(),
             "download_count": self.download_count,
-            "elapsed_seconds": int(time.time() - self.start_time) if self.start_time else 0,
-            "history": self.history
+            "elapsed_seconds": int(self.elapsed),
+            "series": series_file,
+            "history": self.history + list(self.history_points)
         }
         
         # 保存数据
@@ -685,8 +1884,19 @@ class TrafficConsumer:
                 config_data = {}
         
         # 添加或更新配置
-        config_data[self.config_name] = {
+        config_data[self.config_name] = self.to_config()
+        
+        # 保存配置
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump(config_data, f, indent=2)
+        
+        print(f"{Fore.CYAN}配置 '{self.config_name}' 已保存{Style.RESET_ALL}")
+
+    def to_config(self):
+        """导出可保存的配置项"""
+        return {
             "urls": self.urls,
+            "url_source": self._saved_url_source(),
             "url_strategy": self.url_strategy,
             "threads": self.threads,
             "limit_speed": self.limit_speed,
@@ -694,14 +1904,187 @@ class TrafficConsumer:
             "count": self.count,
             "cron_expr": self.cron_expr,
             "traffic_limit": self.traffic_limit,
-            "interval": self.interval
+            "interval": self.interval,
+            "meter_basis": self.meter_basis,
+            "decode_content": self.decode_content,
+            "mode": self.mode,
+            "upload_ratio": self.upload_ratio,
+            "upload_size": self.upload_size,
+            "upload_method": self.upload_method,
+            "misfire_grace_time": self.misfire_grace_time,
+            "coalesce": self.coalesce,
+            "dns_ttl": self.dns_ttl,
+            "resolve": self.resolve,
+            "prewarm": self.prewarm,
+            "verify_manifest": self.verify_manifest,
+            "verify_sample": self.verify_sample,
+            "arrival_rate": self.arrival_rate,
+            "arrival_process": self.arrival_process,
+            "socket_rcvbuf": self.socket_rcvbuf,
+            "tcp_nodelay": self.tcp_nodelay,
+            "tcp_keepalive": self.tcp_keepalive,
+            "tcp_congestion": self.tcp_congestion,
+            "checkpoint": self.checkpoint,
+            "interface": self.interface,
+            "interface_limit": self.interface_limit,
+            "preflight": self.preflight,
+            "preflight_workers": self.preflight_workers,
+            "governor": self.governor,
+            "pressure_limit": self.pressure_limit,
+            "bind": self.bind,
+            "bind_policy": self.bind_policy,
+            "memory_budget": self.memory_budget
         }
-        
-        # 保存配置
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config_data, f, indent=2)
-        
-        print(f"{Fore.CYAN}配置 '{self.config_name}' 已保存{Style.RESET_ALL}")
+
+    def _saved_url_source(self):
+        """可保存到配置中的URL清单，可迭代对象形式的清单不保存"""
+        return self.url_source if isinstance(self.url_source, str) else None
+
+    def reconfigure(self, changes):
+        """在运行中修改配置，保留统计数据与已建立的连接
+
+        返回 (已生效的配置项, 需要重新启动任务才能生效的配置项)，取值无效时抛出 ValueError
+        """
+        current = self.to_config()
+        unknown = set(changes) - set(current)
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+
+        updates = {}
+        restart_required = []
+        for key, value in changes.items():
+            # 未填写的项保持不变，只有限制类配置项的空值表示不限
+            if value is None and key not in UNLIMITED_SETTINGS:
+                continue
+            if key in LIVE_SETTINGS:
+                value = self._normalize_setting(key, value)
+                if value != current[key]:
+                    updates[key] = value
+            elif value != current[key]:
+                restart_required.append(key)
+
+        urls = updates.get("urls", self.urls)
+        url_source = updates.get("url_source", self.url_source)
+        if updates.get("mode", self.mode) != "download" and url_source is None and urls == DEFAULT_URLS:
+            raise ValueError("上传模式需要指定自建的接收端地址，不能使用默认下载链接")
+
+        # 先创建新的URL池，清单无法读取时不修改任何配置
+        pool = None
+        if "urls" in updates or "url_source" in updates:
+            try:
+                pool = self._open_url_pool(url_source, urls)
+            except OSError as e:
+                raise ValueError(f"无法读取URL清单: {e}") from e
+
+        plan = self.memory_plan
+        if plan is not None and updates.get("threads", 0) > plan["threads"]:
+            self.logger(f"内存预算只够 {plan['threads']} 个工作线程，线程数调整为 {plan['threads']}", Fore.YELLOW)
+            updates["threads"] = plan["threads"]
+            if updates["threads"] == self.threads:
+                del updates["threads"]
+
+        for key, value in updates.items():
+            setattr(self, key, value)
+        if pool is not None:
+            self._replace_url_pool(pool)
+        if "limit_speed" in updates:
+            self._apply_rate_limit()
+        if "threads" in updates and self.active:
+            self._resize_workers()
+        if "threads" in updates or "limit_speed" in updates:
+            self._apply_governor()
+
+        if updates:
+            self.logger(f"已在运行中更新配置: {', '.join(updates)}", Fore.CYAN)
+        if restart_required:
+            self.logger(f"以下配置项需要重新启动任务后生效: {', '.join(restart_required)}", Fore.YELLOW)
+        return list(updates), restart_required
+
+    @staticmethod
+    def _normalize_setting(key, value):
+        """校验并规范化一个可在运行中修改的配置项，取值无效时抛出 ValueError"""
+        converters = {"threads": int, "duration": int, "count": int, "limit_speed": float,
+                      "traffic_limit": float, "upload_ratio": float, "upload_size": float, "verify_sample": float}
+        if key in converters and value is not None:
+            try:
+                value = converters[key](value)
+            except (TypeError, ValueError):
+                raise ValueError(f"配置项 {key} 的取值无效: {value!r}") from None
+
+        if key == "urls":
+            urls = [value] if isinstance(value, str) else list(value or [])
+            value = [str(url).strip() for url in urls if url is not None and str(url).strip()]
+            if not value:
+                raise ValueError("URL列表不能为空")
+        elif key == "url_source" and isinstance(value, str):
+            # 空字符串表示不再使用清单，改回 urls 列表
+            value = value.strip() or None
+        elif key == "url_strategy" and value not in ("random", "round_robin"):
+            raise ValueError(f"未知的URL选择策略: {value}")
+        elif key == "threads" and value < 1:
+            raise ValueError("线程数必须大于0")
+        elif key == "limit_speed":
+            value = value or 0.0
+            if value < 0:
+                raise ValueError("限速不能为负数")
+        elif key in ("duration", "count", "traffic_limit") and value is not None and value <= 0:
+            raise ValueError(f"{key} 必须大于0，不限制时请留空")
+        elif key == "mode" and value not in TRANSFER_MODES:
+            raise ValueError(f"未知的流量方向: {value}")
+        elif key in ("upload_ratio", "verify_sample"):
+            value = min(1.0, max(0.0, value))
+        elif key == "upload_size" and value <= 0:
+            raise ValueError("上传大小必须大于0")
+        elif key == "upload_method":
+            value = str(value).upper()
+            if value not in UPLOAD_METHODS:
+                raise ValueError(f"不支持的上传方法: {value}")
+        elif key == "decode_content":
+            value = bool(value)
+        return value
+
+    def _replace_url_pool(self, pool):
+        """换用新的URL池，保留仍在列表中的URL的统计；被移除的URL在正在进行的请求结束后不再使用"""
+        old = self._url_pool
+        with self.lock:
+            if old is not None:
+                pool.carry_over(old)
+            self._url_pool = pool
+        if old is not None:
+            old.close()
+
+    def _apply_rate_limit(self):
+        """按 limit_speed 调整限速器，运行中的工作线程在下一个分块生效"""
+        rate = int(self.limit_speed * 1024 * 1024)
+        if self.rate_limiter is not None:
+            self.rate_limiter.set_rate(rate)
+        elif rate > 0:
+            self.rate_limiter = RateLimiter(rate)
+
+    def _watch_config(self):
+        """运行期间配置文件被修改时，把本配置的新取值应用到当前任务"""
+        last_mtime = self._config_mtime()
+        while self.active:
+            time.sleep(CONFIG_WATCH_INTERVAL)
+            mtime = self._config_mtime()
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            config = TrafficConsumer.load_config(self.config_name)
+            if not config:
+                continue
+            known = self.to_config()
+            try:
+                self.reconfigure({key: value for key, value in config.items() if key in known})
+            except ValueError as e:
+                self.logger(f"配置 '{self.config_name}' 的新取值无效，已忽略: {e}", Fore.RED)
+
+    @staticmethod
+    def _config_mtime():
+        try:
+            return os.stat(CONFIG_FILE).st_mtime_ns
+        except OSError:
+            return None
     
     @staticmethod
     def load_config(config_name):
@@ -821,7 +2204,7 @@ class TrafficConsumer:
                 print(f"  配置名称: {stats.get('config_name', '默认')}")
                 print(f"  开始时间: {stats.get('start_time', 'N/A')}")
                 print(f"  结束时间: {stats.get('end_time', 'N/A')}")
-                print(f"  总消耗流量: {TrafficConsumer().format_bytes(stats.get('total_bytes', 0))}")
+                print(f"  总消耗流量: {TrafficConsumer.format_bytes(stats.get('total_bytes', 0))}")
                 print(f"  下载次数: {stats.get('download_count', 0)}")
                 print(f"  运行时间: {timedelta(seconds=stats.get('elapsed_seconds', 0))}")
                 
@@ -830,31 +2213,235 @@ class TrafficConsumer:
         except Exception as e:
             print(f"{Fore.RED}显示统计数据出错: {e}{Style.RESET_ALL}")
     
+    @staticmethod
+    def _load_stats_columns(since=None):
+        """按列读取历史统计，NumPy 未安装或没有统计数据时输出原因并返回None"""
+        if not os.path.exists(STATS_FILE):
+            print(f"{Fore.YELLOW}没有历史统计数据{Style.RESET_ALL}")
+            return None
+        try:
+            import analytics
+        except ImportError:
+            print(f"{Fore.RED}错误: 分析与导出需要 NumPy。{Style.RESET_ALL}")
+            print("运行 'pip install numpy' 来安装。")
+            return None
+        try:
+            runs, urls = analytics.load_runs(STATS_FILE, STATS_COLUMNS_FILE)
+            return analytics.select_runs(runs, urls, since)
+        except ValueError as e:
+            print(f"{Fore.RED}读取统计数据出错: {e}{Style.RESET_ALL}")
+            return None
+
+    @staticmethod
+    def show_analysis(since=None):
+        """跨运行分析历史统计: 按配置与URL汇总、吞吐分位数、每日流量与趋势"""
+        columns = TrafficConsumer._load_stats_columns(since)
+        if columns is None:
+            return
+        import analytics
+
+        report = analytics.analyze(*columns)
+        if not report["runs"]:
+            print(f"{Fore.YELLOW}没有符合条件的运行{Style.RESET_ALL}")
+            return
+        fmt = TrafficConsumer.format_bytes
+
+        def speed(value):
+            return "N/A" if value != value else fmt(value) + "/s"
+
+        low, mid, high = analytics.PERCENTILES
+
+        print(f"{Fore.CYAN}=== 历史统计分析 ({report['first']} ~ {report['last']}) ==={Style.RESET_ALL}")
+        print(f"  运行次数: {report['runs']} | 总消耗流量: {fmt(report['total_bytes'])} | "
+              f"下载次数: {report['download_count']}")
+        if report["throughput"]:
+            values = report["throughput"]
+            print(f"  平均吞吐: p{low} {speed(values[low])} | p{mid} {speed(values[mid])} | "
+                  f"p{high} {speed(values[high])}")
+
+        print(f"\n{Fore.GREEN}按配置:{Style.RESET_ALL}")
+        for item in report["by_config"]:
+            values = item["throughput"]
+            trend = item["trend_per_day"]
+            trend_text = "N/A" if trend != trend else f"{'+' if trend >= 0 else '-'}{speed(abs(trend))} 每天"
+            print(f"  {item['config'] or '默认'}: {item['runs']} 次 | {fmt(item['total_bytes'])} | "
+                  f"吞吐 p{low}/p{mid}/p{high}: {speed(values[low])} / {speed(values[mid])} / {speed(values[high])} | "
+                  f"趋势: {trend_text}")
+
+        print(f"\n{Fore.GREEN}按URL (完成次数最多的 {len(report['by_url'])} 个，共 {report['urls']} 个):{Style.RESET_ALL}")
+        for item in report["by_url"]:
+            ratio = TrafficConsumer.decode_ratio(item["payload_bytes"], item["wire_bytes"])
+            print(f"  {item['url']}: {item['count']} 次 | 解码 {fmt(item['payload_bytes'])} | "
+                  f"线路 {fmt(item['wire_bytes'])} | 解码/线路比 {ratio:.2f}")
+
+        print(f"\n{Fore.GREEN}每日流量 (最近 {len(report['daily'])} 天):{Style.RESET_ALL}")
+        for item in report["daily"]:
+            print(f"  {item['date']}: {item['runs']} 次 | {fmt(item['total_bytes'])}")
+        trend = report["daily_trend"]
+        if trend == trend:
+            print(f"  每日流量趋势: {'+' if trend >= 0 else '-'}{fmt(abs(trend))} 每天")
+
+    @staticmethod
+    def export_stats(directory, fmt="csv", resolution=1, since=None):
+        """把历史运行、URL统计与速度序列按列导出到目录"""
+        columns = TrafficConsumer._load_stats_columns(since)
+        if columns is None:
+            return
+        import analytics
+
+        runs, urls = columns
+        try:
+            series = analytics.load_series_columns(runs, SERIES_DIR, resolution)
+            paths = analytics.export(runs, urls, series, os.path.expanduser(directory), fmt)
+        except ImportError:
+            print(f"{Fore.RED}错误: 导出 {fmt} 需要 pyarrow。{Style.RESET_ALL}")
+            print("运行 'pip install pyarrow' 来安装。")
+            return
+        except OSError as e:
+            print(f"{Fore.RED}导出失败: {e}{Style.RESET_ALL}")
+            return
+        print(f"{Fore.CYAN}已导出 {len(runs['run_id'])} 次运行、{len(urls['url'])} 条URL统计、"
+              f"{len(series['speed'])} 个速度点:{Style.RESET_ALL}")
+        for path in paths:
+            print(f"  {path}")
+
+    @staticmethod
+    def show_trace_summary(path):
+        """显示请求轨迹的汇总"""
+        from request_trace import summarize
+
+        try:
+            summary = summarize(os.path.expanduser(path))
+        except (OSError, ValueError) as e:
+            print(f"{Fore.RED}无法读取请求轨迹: {e}{Style.RESET_ALL}")
+            return
+
+        meta = summary["meta"]
+        events = summary["events"]
+        started_at = datetime.fromtimestamp(meta["started_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{Fore.CYAN}=== 请求轨迹: {path} ==={Style.RESET_ALL}")
+        print(f"  配置名称: {meta.get('config_name', 'N/A')} | 开始时间: {started_at} | "
+              f"时长: {summary['span_seconds']:.1f} 秒")
+        if meta.get("replay_of"):
+            print(f"  重放自: {meta['replay_of']}")
+        print(f"  线程数: {summary['threads']} | URL数: {summary['urls']} | 策略: {meta.get('url_strategy', 'N/A')}")
+        print(f"  请求: {events['start']} 次 (重试 {summary['retries']} 次) | 完成: {events['end']} | "
+              f"中断: {events['abort']} | 出错: {events['error']} | 标记失效: {events['invalid']}")
+        print(f"  传输: {TrafficConsumer.format_bytes(summary['bytes'])}")
+        for label, key in (("首字节时间", "ttfb_ms"), ("请求耗时", "duration_ms")):
+            values = summary[key]
+            print(f"  {label} (ms): p50 {values['p50']:.1f} | p95 {values['p95']:.1f} | p99 {values['p99']:.1f}")
+
+    def simulate(self, model_path, seed=0, horizon=DEFAULT_SIM_HORIZON, sweep=None):
+        """按源站模型在虚拟时钟上模拟本配置；指定 sweep 时对各配置项取值的所有组合分别模拟并列表比较"""
+        import itertools
+        from simulation import load_model, parse_sweep, simulate
+
+        try:
+            models = load_model(os.path.expanduser(model_path))
+            sweep = parse_sweep(sweep)
+        except (OSError, ValueError) as e:
+            print(f"{Fore.RED}无法模拟: {e}{Style.RESET_ALL}")
+            return
+        settings = self.schedule_settings()
+        unknown = [key for key, _ in sweep if key not in settings]
+        if unknown:
+            print(f"{Fore.RED}无法扫描未知的配置项: {', '.join(unknown)}{Style.RESET_ALL}")
+            return
+
+        if not sweep:
+            started = time.perf_counter()
+            report = simulate(settings, models, seed, horizon, self._default_logger)
+            elapsed = time.perf_counter() - started
+            print(f"{Fore.CYAN}=== 模拟结果 (种子 {seed}) ==={Style.RESET_ALL}")
+            print(f"  虚拟时长: {timedelta(seconds=int(report['virtual_seconds']))} | 实际耗时: {elapsed:.2f} 秒 | "
+                  f"加速比: {report['virtual_seconds'] / max(elapsed, 1e-6):.0f}x")
+            for index, run in enumerate(report["runs"], 1):
+                overshoot = "" if run["limit_overshoot"] is None else \
+                    f" | 超出限额: {run['limit_overshoot']:+,} B"
+                fair = "N/A" if run["fairness"] is None else f"{run['fairness']:.3f}"
+                print(f"  运行 {index} ({run['start']}): 消耗 {self.format_bytes(run['total_bytes'])} | "
+                      f"平均速度 {self.format_bytes(run['throughput'])}/s | 时长 {run['elapsed']:.1f} 秒 | "
+                      f"下载 {run['download_count']} 次{overshoot}")
+                print(f"    URL公平性: {fair} | 失败请求: {run['errors']} | 失效URL: {run['invalid']} | "
+                      f"响应时间 p50 {run['latency']['p50']:.0f} ms / p99 {run['latency']['p99']:.0f} ms")
+            if self.cron_expr or self.interval:
+                print(f"  计划执行: {len(report['runs'])} 次 | 因上一次运行未结束而跳过: {report['skipped']} 次")
+            return
+
+        keys = [key for key, _ in sweep]
+        print(f"{Fore.CYAN}=== 参数扫描 (种子 {seed}) ==={Style.RESET_ALL}")
+        print("".join(f"{key:>14}" for key in keys) +
+              f"{'运行':>6}{'平均速度':>14}{'下载次数':>10}{'超出限额(B)':>14}{'公平性':>8}{'失败请求':>10}{'跳过':>6}")
+        for values in itertools.product(*(values for _, values in sweep)):
+            report = simulate(dict(settings, **dict(zip(keys, values))), models, seed, horizon)
+            runs = report["runs"]
+            speed = sum(run["throughput"] for run in runs) / len(runs) if runs else 0.0
+            overshoots = [run["limit_overshoot"] for run in runs if run["limit_overshoot"] is not None]
+            fairness = [run["fairness"] for run in runs if run["fairness"] is not None]
+            print("".join(f"{str(value):>14}" for value in values) +
+                  f"{len(runs):>6}{self.format_bytes(speed) + '/s':>14}{sum(run['download_count'] for run in runs):>10}"
+                  f"{(f'{max(overshoots):+,}' if overshoots else '-'):>14}"
+                  f"{(f'{min(fairness):.3f}' if fairness else '-'):>8}"
+                  f"{sum(run['errors'] for run in runs):>10}{report['skipped']:>6}")
+
+    @property
+    def job_id(self):
+        """调度作业ID，按配置名区分，进程重启后据此恢复同一作业"""
+        return f"traffic_consumer_job:{self.config_name}"
+
     def setup_scheduler(self):
-        """设置调度器 (cron 或 interval)"""
+        """设置调度器 (cron 或 interval)，作业持久化保存并在重启后恢复"""
         if not self.cron_expr and not self.interval:
             return
 
-        self.scheduler = BackgroundScheduler(timezone="Asia/Shanghai")
-        job = None
-        
+        from apscheduler.triggers.cron import CronTrigger
+
         try:
             if self.cron_expr:
                 trigger = CronTrigger.from_crontab(self.cron_expr)
-                job = self.scheduler.add_job(self.scheduled_run, trigger, id='traffic_consumer_job')
-                self.logger(f"{Fore.CYAN}已设置Cron调度: {self.cron_expr}{Style.RESET_ALL}")
-            elif self.interval:
-                job = self.scheduler.add_job(self.scheduled_run, 'interval', minutes=self.interval, id='traffic_consumer_job')
-                self.logger(f"{Fore.CYAN}已设置间隔调度: 每{self.interval}分钟执行一次{Style.RESET_ALL}")
+                trigger_args = {}
+                description = f"已设置Cron调度: {self.cron_expr}"
+            else:
+                trigger = 'interval'
+                trigger_args = {'minutes': self.interval}
+                description = f"已设置间隔调度: 每{self.interval}分钟执行一次"
+
+            self.scheduler, persistent = get_scheduler(self.config_name)
+            _scheduled_consumers[self.job_id] = self
+            if persistent:
+                self.history = load_schedule_history(self.job_id, self.MAX_HISTORY_ENTRIES)
+
+            policy = {
+                'misfire_grace_time': self.misfire_grace_time,
+                'coalesce': self.coalesce,
+                'max_instances': 1  # 同一作业不允许重叠运行，避免带宽翻倍
+            }
+            kwargs = {'job_id': self.job_id, 'settings': self.schedule_settings()}
+
+            job = self.scheduler.get_job(self.job_id)
+            if job and self._same_schedule(job.kwargs.get('settings', {})):
+                # 保留持久化的下次执行时间，错过的执行将按补偿策略处理
+                job.modify(kwargs=kwargs, **policy)
+                self.logger(f"{Fore.CYAN}已从持久化存储恢复调度作业{Style.RESET_ALL}")
+                if job.next_run_time and job.next_run_time < datetime.now(job.next_run_time.tzinfo):
+                    self.logger(f"{Fore.YELLOW}检测到停机期间错过的执行 ({job.next_run_time.strftime('%Y-%m-%d %H:%M:%S')})，"
+                                f"将按补偿策略处理{Style.RESET_ALL}")
+            else:
+                self.scheduler.add_job(
+                    SCHEDULED_JOB_FUNC, trigger, id=self.job_id, kwargs=kwargs,
+                    jobstore=job_store_alias(self.config_name), replace_existing=True, **trigger_args, **policy
+                )
+                self.logger(f"{Fore.CYAN}{description}{Style.RESET_ALL}")
 
-            self.scheduler.start()
-            
-            if job:
-                # 重新从调度器获取作业以确保状态是最新的
-                job_instance = self.scheduler.get_job(job.id)
-                if job_instance and job_instance.next_run_time:
-                    self.next_run_time = job_instance.next_run_time
-                    self.logger(f"{Fore.CYAN}下一次执行时间: {self.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}{Style.RESET_ALL}")
+            self.scheduler.resume()
+            if not persistent:
+                self.logger(f"{Fore.YELLOW}未安装SQLAlchemy，调度作业仅保存在内存中，重启后不会恢复{Style.RESET_ALL}")
+
+            job_instance = self.scheduler.get_job(self.job_id)
+            if job_instance and job_instance.next_run_time:
+                self.next_run_time = job_instance.next_run_time
+                self.logger(f"{Fore.CYAN}下一次执行时间: {self.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}{Style.RESET_ALL}")
             self.logger(f"{Fore.CYAN}调度器已启动。按Ctrl+C停止。{Style.RESET_ALL}")
             
             self.status = "等待执行"
@@ -870,8 +2457,9 @@ class TrafficConsumer:
                         if remaining.total_seconds() < 0:
                             # 等待任务触发后更新时间
                             time.sleep(1)
-                            if self.scheduler.get_jobs():
-                                self.next_run_time = self.scheduler.get_jobs()[0].next_run_time
+                            job_instance = self.scheduler.get_job(self.job_id)
+                            if job_instance:
+                                self.next_run_time = job_instance.next_run_time
                             continue
 
                         remaining_str = str(remaining).split('.')[0]
@@ -885,25 +2473,88 @@ class TrafficConsumer:
         except Exception as e:
             self.logger(f"{Fore.RED}启动调度器时出错: {e}{Style.RESET_ALL}")
 
+    def schedule_settings(self):
+        """随调度作业持久化的构造参数，用于重启后重建消耗器"""
+        settings = self.to_config()
+        settings["config_name"] = self.config_name
+        return settings
+
+    def _same_schedule(self, settings):
+        """持久化作业的触发规则是否与当前配置一致"""
+        return (settings.get("cron_expr") == self.cron_expr
+                and settings.get("interval") == self.interval)
+
+    def stop_schedule(self):
+        """停止并删除当前配置的调度作业（不影响正在进行的运行）"""
+        if not self.scheduler:
+            return False
+        if self.scheduler.get_job(self.job_id):
+            self.scheduler.remove_job(self.job_id)
+        clear_schedule_history(self.job_id)
+        _scheduled_consumers.pop(self.job_id, None)
+        self.scheduler = None
+        self.next_run_time = None
+        return True
+
+    def _lock_job(self):
+        """获取作业的跨进程运行锁，返回持有锁的文件 (关闭即释放)；锁被其他进程持有时返回False，
+        平台不支持 flock 时返回None 且不加锁"""
+        try:
+            import fcntl
+        except ImportError:
+            return None
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        lock = open(job_store_path(self.config_name, ".lock"), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        return lock
+
+    def _on_job_event(self, event):
+        """处理错过执行与重叠跳过等调度事件"""
+        from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+
+        scheduled = getattr(event, 'scheduled_run_time', None) or event.scheduled_run_times[0]
+        run_time = scheduled.strftime('%Y-%m-%d %H:%M:%S')
+        if event.code == EVENT_JOB_MISSED:
+            self.logger(f"{Fore.YELLOW}计划执行 {run_time} 已错过且超出补偿窗口 "
+                        f"({self.misfire_grace_time} 秒)，已跳过{Style.RESET_ALL}")
+            self.add_history_record("错过", 0)
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            self.logger(f"{Fore.YELLOW}计划执行 {run_time} 时上一次运行尚未结束，已跳过{Style.RESET_ALL}")
+            self.add_history_record("跳过", 0)
+
     def handle_signal(self, signum, frame):
         """处理信号"""
         self.logger(f"\n{Fore.YELLOW}接收到信号 {signum}，正在停止...{Style.RESET_ALL}")
         if self.scheduler and self.scheduler.running:
-            self.scheduler.shutdown()
+            # 仅停止调度器，作业保留在持久化存储中，下次启动时恢复
+            self.scheduler.shutdown(wait=False)
         self.active = False
         sys.exit(0)
 
     def scheduled_run(self):
         """由调度器执行的任务"""
+        if self.active:
+            self.logger(f"{Fore.YELLOW}上一次运行尚未结束，跳过本次计划任务{Style.RESET_ALL}")
+            self.add_history_record("跳过", 0)
+            return
+
+        # max_instances 只防止同一调度器内的重叠，同一配置的作业在其他进程中运行时也跳过
+        lock = self._lock_job()
+        if lock is False:
+            self.logger(f"{Fore.YELLOW}该作业正在其他进程中运行，跳过本次计划任务{Style.RESET_ALL}")
+            self.add_history_record("跳过", 0)
+            return
+
         self.logger(f"\n{Fore.CYAN}[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始执行计划任务...{Style.RESET_ALL}")
         
         # 重置统计数据以进行新的运行
-        with self.lock:
-            self.total_bytes = 0
-            self.start_time = time.time()
-            self.download_count = 0
-            self.thread_current_urls = {}
-            self.url_usage = {url: 0 for url in self.urls}
+        self._reset_run_state()
+        self.start_time = time.time()
+        self.end_time = None
 
         # 记录任务开始
         start_bytes = self.total_bytes
@@ -915,28 +2566,88 @@ class TrafficConsumer:
         except Exception as e:
             self.logger(f"{Fore.RED}计划任务执行失败: {e}{Style.RESET_ALL}", Fore.RED)
             self.add_history_record("failed", 0) # 记录失败
+        finally:
+            if lock:
+                lock.close()
 
         # 从调度器获取下一次运行时间
-        if self.scheduler and self.scheduler.running and self.scheduler.get_jobs():
-            self.next_run_time = self.scheduler.get_jobs()[0].next_run_time
+        job = self.scheduler.get_job(self.job_id) if self.scheduler and self.scheduler.running else None
+        if job:
+            self.next_run_time = job.next_run_time
         
         self.status = "等待下次执行"
         self.logger(f"{Fore.CYAN}计划任务执行完毕。{Style.RESET_ALL}")
         if self.next_run_time:
             self.logger(f"{Fore.CYAN}下一次执行时间: {self.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}{Style.RESET_ALL}")
 
+    def _reset_run_state(self):
+        """清零上一次运行的计数、延迟与URL统计，并重新启用流量与次数限制"""
+        with self.lock:
+            for key in SNAPSHOT_COUNTERS:
+                setattr(self, key, 0)
+            self.response_latency.reset()
+            self.service_latency.reset()
+            self.thread_current_urls = {}
+            self.thread_url_ids = {}
+            self._traffic_limit_triggered = False
+            self._count_limit_triggered = False
+            if self._url_pool is not None:
+                self._url_pool.reset_counters()
+
     def _run_task(self):
         """执行一次完整的下载任务"""
+        # 恢复的调度作业不经过 start()，在这里补做内存规划并补建校验器；清单有误时本次运行不做校验
+        if not self._apply_memory_budget():
+            return
+        self._load_verifier()
+
+        # 套接字参数与源地址在创建任何会话之前确定，工作线程只读取结果
+        self._apply_socket_profile()
+        self._start_binding()
+        if self.memory_plan is not None and self.http_adapter is None:
+            # 按内存预算运行时所有未绑定源地址的会话共用一个连接池，不为每个线程各建一套
+            self.http_adapter = self._build_adapter(pool_maxsize=self.memory_plan["threads"])
+        # 预检在预热之前完成，失效的URL不会被预热或选中；重放的URL取自轨迹，上传目标无需探测
+        self.planner = None
+        if self.preflight and self.replay is None and self.mode != "upload":
+            self._run_preflight()
+        # 预热在计时开始之前完成，解析与握手不计入本次运行的速度
+        sessions = self._prewarm_sessions() if self.prewarm else [None] * self.threads
+
+        checkpointing = self._checkpoint_enabled()
+        resumed = self._resume_from_checkpoint() if checkpointing else 0.0
+
         self.active = True
-        self.start_time = time.time()
+        # 从检查点继续时，已运行的时长计入本次运行，时长限制只给剩余的时间
+        self.start_time = time.time() - resumed
+        self.end_time = None
         self.status = "正在执行"
+        self._start_reconciler()
+        self._start_governor()
+        self._start_memory_monitor()
+        if resumed:
+            self._check_traffic_limit()
+            if self.count is not None and self.download_count >= self.count:
+                self._stop_due_to_count()
+        self._start_series()
+        if self.trace_file:
+            self.tracer = self._create_tracer()
+        if self.arrival_rate and self.replay is None:
+            # 到达在工作线程启动前开始计时，启动期间的到达在队列中等待
+            self.arrivals = queue.Queue(max(self.threads, int(self.arrival_rate * ARRIVAL_BACKLOG_SECONDS)))
+            threading.Thread(target=self._dispatch_arrivals, args=(self.arrivals,),
+                             name="arrivals", daemon=True).start()
         
-        download_threads = []
-        for i in range(self.threads):
-            thread = threading.Thread(target=self.download_file, args=(i+1,))
-            thread.daemon = True
-            thread.start()
-            download_threads.append(thread)
+        with self.workers_lock:
+            self.workers = {}
+            for i in range(self.threads):
+                self._start_worker(i + 1, sessions[i])
+
+        if self.watch_config:
+            threading.Thread(target=self._watch_config, name="config-watch", daemon=True).start()
+
+        if self.profile_seconds:
+            self.start_profiling(self.profile_seconds)
         
         stats_thread = None
         # 仅在CLI模式下启动独立的统计显示线程
@@ -945,41 +2656,394 @@ class TrafficConsumer:
             stats_thread.daemon = True
             stats_thread.start()
         
+        next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL
+        next_govern = time.monotonic() + GOVERNOR_INTERVAL
+        next_memory = time.monotonic() + MEMORY_INTERVAL
         try:
-            # 限制条件（如时长、流量、次数）将在download_file方法内部检查
-            # 并将self.active设置为False
-            if self.duration:
-                time.sleep(self.duration)
-                self.active = False
-            else:
-                while self.active:
-                    time.sleep(0.1)
+            # 流量、次数等限制在download_file方法内部检查并将self.active设置为False；
+            # 时长每轮重新读取，运行中修改后立即生效
+            while self.active:
+                if self.duration and time.time() - self.start_time >= self.duration:
+                    self.active = False
+                    break
+                self._record_series()
+                if self.reconciler is not None:
+                    self._sample_interface()
+                if self.sources is not None:
+                    self.sources.sample()
+                if checkpointing and time.monotonic() >= next_checkpoint:
+                    self._write_checkpoint()
+                    next_checkpoint += CHECKPOINT_INTERVAL
+                if self.pressure_governor is not None and time.monotonic() >= next_govern:
+                    self._govern()
+                    next_govern = time.monotonic() + GOVERNOR_INTERVAL
+                if self.memory_monitor is not None and time.monotonic() >= next_memory:
+                    self._sample_memory()
+                    next_memory = time.monotonic() + MEMORY_INTERVAL
+                time.sleep(0.1)
         except KeyboardInterrupt:
             self.logger(f"\n{Fore.YELLOW}接收到中断信号，正在停止...{Style.RESET_ALL}")
             self.active = False
+        self.end_time = time.time()
         
+        with self.workers_lock:
+            download_threads = list(self.workers.values())
         for thread in download_threads:
             thread.join(timeout=1.0)
+        self._record_series()
+        if self.reconciler is not None:
+            with self.lock:
+                self.interface_bytes = self.reconciler.sample()
+        if self.memory_monitor is not None:
+            self._sample_memory()
         if stats_thread:
             stats_thread.join(timeout=1.0)
+        if self.verifier is not None:
+            # 等待已排队的抽样校验完毕，使保存的统计包含全部结果
+            self.verifier.drain()
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+            self.logger(f"请求轨迹已写入: {self.trace_file}", Fore.CYAN)
+        self.arrivals = None
         
         self.save_stats()
+        if checkpointing:
+            # 运行已正常结束并保存了统计，进程之后再退出也不需要继续
+            from checkpoint import remove
+            remove(self.checkpoint_path)
         self.logger(f"{Fore.CYAN}任务已停止。{Style.RESET_ALL}")
 
+    def _start_series(self):
+        """开始记录本次运行的速度序列；从检查点继续时只记录本进程内的部分"""
+        from timeseries import SpeedSeries
+
+        self.speed_series = SpeedSeries(time.time())
+        self._series_bytes = self.total_bytes
+
+    def _record_series(self):
+        """每过一秒记录一个点；采样落后时，用这段时间的平均速度补齐缺少的秒"""
+        series = self.speed_series
+        due = int(time.time() - series.start_time)
+        missing = due - len(series)
+        if missing <= 0:
+            return
+        total = self.total_bytes
+        speed = max(0, total - self._series_bytes) / missing
+        self._series_bytes = total
+        for _ in range(missing):
+            series.append(speed)
+
+    @property
+    def checkpoint_path(self):
+        from checkpoint import checkpoint_path
+
+        return checkpoint_path(CHECKPOINT_DIR, self.config_name)
+
+    def _checkpoint_enabled(self):
+        """只有一次性的有限额运行记录检查点: 定时任务每次执行都是新的运行，重放按轨迹的时间线进行，
+        可迭代对象形式的URL清单无法在重启后确认是同一份"""
+        return (self.checkpoint and not (self.cron_expr or self.interval) and self.replay is None
+                and (self.url_source is None or isinstance(self.url_source, str))
+                and bool(self.traffic_limit or self.count or self.duration))
+
+    def _pool_fingerprint(self, pool):
+        cached_pool, fingerprint = self._checkpoint_pool
+        if cached_pool is not pool:
+            from checkpoint import pool_fingerprint
+
+            fingerprint = pool_fingerprint(self.url_source, self.urls, len(pool))
+            self._checkpoint_pool = (pool, fingerprint)
+        return fingerprint
+
+    def _resume_from_checkpoint(self):
+        """有与当前URL池一致的检查点时恢复计数与URL统计，返回已运行的秒数，没有时返回0"""
+        from checkpoint import read, remove
+
+        path = self.checkpoint_path
+        saved = read(path, SNAPSHOT_COUNTERS)
+        if saved is None:
+            return 0.0
+        pool = self.url_pool
+        if saved.fingerprint != self._pool_fingerprint(pool):
+            self.logger("检查点对应的URL列表与当前配置不同，不再继续上次的运行", Fore.YELLOW)
+            remove(path)
+            return 0.0
+
+        with self.lock:
+            for key, value in saved.counters.items():
+                setattr(self, key, value)
+            for url_id, usage, payload, wire in saved.slots:
+                if url_id < len(pool):
+                    pool.restore(url_id, usage, payload, wire)
+        self._checkpoint_ids = tuple(url_id for url_id, _, _, _ in saved.slots)
+        self.logger(f"从检查点继续上次中断的运行 ({datetime.fromtimestamp(saved.written).strftime('%Y-%m-%d %H:%M:%S')}): "
+                    f"已消耗 {self.format_bytes(self.total_bytes)}，已下载 {self.download_count} 次，"
+                    f"已运行 {timedelta(seconds=int(saved.elapsed))}", Fore.CYAN)
+        return saved.elapsed
+
+    def _write_checkpoint(self):
+        """把当前进度写入检查点；写入失败只提示一次，不影响运行"""
+        from checkpoint import Checkpoint, write
+
+        pool = self.url_pool
+        with self.lock:
+            counters = {key: getattr(self, key) for key in SNAPSHOT_COUNTERS}
+            if len(pool) <= URL_STATS_LIMIT:
+                url_ids = range(len(pool))
+            else:
+                # URL较多时不遍历计数数组，在上次的槽位与各线程正在使用的URL中保留完成次数最多的部分
+                candidates = set(self._checkpoint_ids)
+                candidates.update(url_id for owner, url_id in self.thread_url_ids.values() if owner is pool)
+                url_ids = sorted(candidates, key=pool.usage.__getitem__, reverse=True)[:URL_STATS_LIMIT]
+            slots = [(url_id, pool.usage[url_id], pool.payload[url_id], pool.wire[url_id])
+                     for url_id in url_ids if pool.usage[url_id] or pool.wire[url_id]]
+        self._checkpoint_ids = tuple(slot[0] for slot in slots)
+
+        now = time.time()
+        try:
+            write(self.checkpoint_path, Checkpoint(self._pool_fingerprint(pool), now, now - self.start_time,
+                                                   counters, slots), SNAPSHOT_COUNTERS, URL_STATS_LIMIT)
+        except OSError as e:
+            if not self._checkpoint_failed:
+                self._checkpoint_failed = True
+                self.logger(f"写入检查点失败: {e}", Fore.YELLOW)
+
+    def start_profiling(self, seconds=DEFAULT_PROFILE_SECONDS, on_complete=None):
+        """在限定时间窗口内剖析下载线程，已有剖析进行中时返回False"""
+        from profiler import Profiler
+
+        with self.lock:
+            if self.profiler and self.profiler.running:
+                return False
+
+            def report(result):
+                self.logger(f"\n性能剖析完成，共 {result['samples']} 次采样", Fore.CYAN)
+                self.logger(f"  火焰图数据: {result['folded']}", Fore.CYAN)
+                self.logger(f"  热点耗时: {result['timings']}", Fore.CYAN)
+                if result['tracemalloc']:
+                    self.logger(f"  内存分配: {result['tracemalloc']}", Fore.CYAN)
+                if on_complete:
+                    on_complete(result)
+
+            self.profiler = Profiler(self, seconds, PROFILE_DIR, on_complete=report)
+
+        self.logger(f"开始性能剖析，持续 {seconds} 秒...", Fore.CYAN)
+        self.profiler.start()
+        return True
+
+    def _handle_profile_signal(self, signum, frame):
+        """SIGUSR1 触发一次剖析窗口"""
+        if self.active:
+            self.start_profiling(self.profile_seconds or DEFAULT_PROFILE_SECONDS)
+
     def start(self):
         """启动流量消耗器"""
+        if self.mode != "download" and self.url_source is None and self.urls is DEFAULT_URLS:
+            self.logger("上传模式需要通过 -u 指定自建的接收端地址，不能使用默认下载链接。", Fore.RED)
+            return
+
+        if self.replay_file and not self._load_replay():
+            return
+
+        # 开始前建立URL池，清单较大时在这里完成一次流式扫描
+        try:
+            pool = self.url_pool
+        except (OSError, ValueError) as e:
+            self.logger(f"无法读取URL清单: {e}", Fore.RED)
+            return
+        if self.url_source is not None:
+            self.logger(f"已载入URL清单 {pool.source}，共 {len(pool)} 个URL", Fore.CYAN)
+        # 内存预算在URL池建立之后规划，基线包含URL池占用的内存
+        if not self._apply_memory_budget() or not self._load_verifier():
+            return
+
+        # CLI模式下允许通过 SIGUSR1 触发性能剖析
+        if (self.logger == self._default_logger and hasattr(signal, "SIGUSR1")
+                and threading.current_thread() is threading.main_thread()):
+            signal.signal(signal.SIGUSR1, self._handle_profile_signal)
+
         if self.cron_expr or self.interval:
             self.setup_scheduler()
         else:
             self._run_task()
 
 
+# 进程内共享的调度器、已挂载的作业存储与已注册的消耗器 (job_id -> TrafficConsumer)
+_scheduler = None
+_scheduler_persistent = False
+_scheduler_lock = threading.Lock()
+_job_stores = set()
+_scheduled_consumers = {}
+_history_db_lock = threading.Lock()
+
+
+def job_store_path(config_name, extension=".sqlite"):
+    """每个配置一个作业存储文件，文件名保留可读的配置名并附带摘要以避免冲突"""
+    import re
+    import hashlib
+
+    name = config_name or "default"
+    safe = re.sub(r"[^0-9A-Za-z_.-]", "_", name)[:48]
+    suffix = hashlib.blake2b(name.encode("utf-8"), digest_size=4).hexdigest()
+    return os.path.join(JOBS_DIR, f"{safe}-{suffix}{extension}")
+
+
+def _attach_job_store(path):
+    """把作业存储文件挂载到调度器，别名为文件名；调用方持有 _scheduler_lock"""
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+    alias = os.path.splitext(os.path.basename(path))[0]
+    if alias not in _job_stores:
+        _scheduler.add_jobstore(SQLAlchemyJobStore(url=f"sqlite:///{path}"), alias=alias)
+        _job_stores.add(alias)
+    return alias
+
+
+def get_scheduler(config_name=None):
+    """返回进程内共享的调度器及其作业是否持久化
+
+    作业按配置保存在 JOBS_DIR 下各自的 SQLite 文件中，调度器只挂载本进程注册过的配置的存储
+    (传入 config_name 时挂载该配置的存储)，不会执行其他进程的作业。
+    调度器以暂停状态启动，由调用方注册完作业后再恢复运行，确保错过的执行按策略补偿
+    """
+    global _scheduler, _scheduler_persistent
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.running:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+
+            try:
+                import apscheduler.jobstores.sqlalchemy  # noqa: F401
+                os.makedirs(JOBS_DIR, exist_ok=True)
+                _scheduler_persistent = True
+            except ImportError:
+                _scheduler_persistent = False
+
+            _scheduler = BackgroundScheduler(timezone=SCHEDULER_TIMEZONE)
+            _scheduler.add_listener(_dispatch_job_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+            _scheduler.start(paused=True)
+            _job_stores.clear()
+        if config_name is not None and _scheduler_persistent:
+            _attach_job_store(job_store_path(config_name))
+        return _scheduler, _scheduler_persistent
+
+
+def attach_persisted_job_stores():
+    """挂载 JOBS_DIR 下所有配置的作业存储，供Web UI启动时恢复全部持久化作业，返回 (调度器, 是否持久化)"""
+    scheduler, persistent = get_scheduler()
+    if persistent:
+        with _scheduler_lock:
+            for name in sorted(os.listdir(JOBS_DIR)):
+                if name.endswith(".sqlite"):
+                    _attach_job_store(os.path.join(JOBS_DIR, name))
+    return scheduler, persistent
+
+
+def job_store_alias(config_name):
+    """配置的作业存储在调度器中的别名，未持久化时为默认的内存存储"""
+    if not _scheduler_persistent:
+        return "default"
+    return os.path.splitext(os.path.basename(job_store_path(config_name)))[0]
+
+
+def scheduled_consumers():
+    """本进程已注册调度作业的消耗器，job_id -> TrafficConsumer"""
+    return dict(_scheduled_consumers)
+
+
+def _dispatch_job_event(event):
+    consumer = _scheduled_consumers.get(event.job_id)
+    if consumer:
+        consumer._on_job_event(event)
+
+
+def create_consumer(agents=None, **settings):
+    """按配置创建消耗器，配置了agent时由分布式控制器把负载分发给各个agent"""
+    if agents:
+        from distributed import DistributedConsumer
+        return DistributedConsumer(agents=agents, **settings)
+    return TrafficConsumer(**settings)
+
+
+def run_scheduled_job(job_id, settings):
+    """调度作业入口，进程重启后根据持久化的配置重建消耗器"""
+    consumer = _scheduled_consumers.get(job_id)
+    if consumer is None:
+        consumer = create_consumer(**settings)
+        consumer.scheduler, _ = get_scheduler(consumer.config_name)
+        _scheduled_consumers[job_id] = consumer
+        consumer.history = load_schedule_history(job_id, consumer.MAX_HISTORY_ENTRIES)
+    consumer.scheduled_run()
+
+
+def _history_db():
+    import sqlite3
+
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB_FILE, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS schedule_history "
+                 "(id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, record TEXT NOT NULL)")
+    return conn
+
+
+def load_schedule_history(job_id, limit):
+    """读取作业的执行历史，最新的在前"""
+    with _history_db_lock:
+        conn = _history_db()
+        try:
+            rows = conn.execute("SELECT record FROM schedule_history WHERE job_id = ? ORDER BY id DESC LIMIT ?",
+                                (job_id, limit)).fetchall()
+        finally:
+            conn.close()
+    return [json.loads(row[0]) for row in rows]
+
+
+def append_schedule_history(job_id, record, limit):
+    """追加一条执行历史，并只保留最近 limit 条"""
+    with _history_db_lock:
+        conn = _history_db()
+        try:
+            with conn:
+                conn.execute("INSERT INTO schedule_history (job_id, record) VALUES (?, ?)",
+                             (job_id, json.dumps(record, ensure_ascii=False)))
+                conn.execute("DELETE FROM schedule_history WHERE job_id = ? AND id NOT IN "
+                             "(SELECT id FROM schedule_history WHERE job_id = ? ORDER BY id DESC LIMIT ?)",
+                             (job_id, job_id, limit))
+        finally:
+            conn.close()
+
+
+def clear_schedule_history(job_id):
+    with _history_db_lock:
+        conn = _history_db()
+        try:
+            with conn:
+                conn.execute("DELETE FROM schedule_history WHERE job_id = ?", (job_id,))
+        finally:
+            conn.close()
+
+
+def parse_resolve(values):
+    """解析 HOST:ADDR[,ADDR...] 形式的静态映射，返回 {主机: [地址]}"""
+    mapping = {}
+    for value in values or []:
+        host, _, addresses = value.partition(":")
+        addresses = [address.strip().strip("[]") for address in addresses.split(",") if address.strip()]
+        if not host or not addresses:
+            raise ValueError(f"无效的解析映射: {value}，格式应为 HOST:ADDR[,ADDR...]")
+        mapping.setdefault(host.lower(), []).extend(addresses)
+    return mapping
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="流量消耗器 - 用于测试网络带宽和流量消耗")
     
     # 主要参数
     parser.add_argument("-u", "--urls", nargs='+', default=None,
                       help=f"要下载的URL列表，可以指定多个URL (默认: 使用内置的{len(DEFAULT_URLS)}个测试URL)")
+    parser.add_argument("--url-source", default=None, metavar="PATH|URL",
+                      help="从清单文件 (可为.gz) 或HTTP(S)地址流式读取URL，每行一个，适合百万级URL；指定后忽略 -u")
     parser.add_argument("--url-strategy", choices=['random', 'round_robin'], default='random',
                       help="URL选择策略: random(随机选择) 或 round_robin(轮询选择) (默认: random)")
     parser.add_argument("-t", "--threads", type=int, default=8,
@@ -996,6 +3060,80 @@ def parse_args():
                       help="流量限制，单位MB (默认: 无限制)")
     parser.add_argument("--interval", type=int, default=None,
                       help="间隔执行时间，单位分钟，例如: 60 表示每60分钟执行一次 (默认: 无限制)")
+    parser.add_argument("--misfire-grace", type=int, default=DEFAULT_MISFIRE_GRACE,
+                      help=f"错过的计划执行在多少秒内仍会补偿执行，0表示不限 (默认: {DEFAULT_MISFIRE_GRACE})")
+    parser.add_argument("--no-coalesce", action="store_true",
+                      help="停机期间错过多次执行时逐次补偿，而不是合并为一次")
+    parser.add_argument("--remove-schedule", action="store_true",
+                      help="删除指定配置的持久化调度作业")
+    parser.add_argument("--meter", choices=list(METER_BASES), default="payload",
+                      help="流量计量口径: payload(解码后的响应体) 或 wire(响应头+线路上的原始响应体)，"
+                           "影响流量限制、限速和统计 (默认: payload)")
+    parser.add_argument("--no-decode", action="store_true",
+                      help="跳过gzip/deflate解压，直接按原始字节读取响应体以节省CPU")
+    parser.add_argument("--verify-manifest", default=None, metavar="PATH",
+                      help="抽样校验下载内容的清单文件 (可为.gz)，每行: URL [算法:摘要] [长度]，如 sha256:<hex> 10485760")
+    parser.add_argument("--verify-sample", type=float, default=DEFAULT_VERIFY_SAMPLE,
+                      help=f"清单中的URL被抽样校验的下载比例，0~1 (默认: {DEFAULT_VERIFY_SAMPLE})")
+
+    # 连接建立
+    parser.add_argument("--dns-ttl", type=int, default=DEFAULT_DNS_TTL,
+                      help=f"解析结果缓存时间，单位秒，缓存在后台提前刷新，0表示不缓存 (默认: {DEFAULT_DNS_TTL})")
+    parser.add_argument("--resolve", action="append", default=None, metavar="HOST:ADDR[,ADDR...]",
+                      help="把主机固定解析到指定地址，可重复使用；新连接在这些地址之间轮换")
+    parser.add_argument("--no-prewarm", action="store_true",
+                      help="不在计时开始前预先建立连接")
+    parser.add_argument("--interface", default=None, metavar="NAME",
+                      help="与网卡计数对账的网卡，auto 为默认路由所在的网卡；报告网卡/线路字节比与重传率 (仅Linux)")
+    parser.add_argument("--limit-on-interface", action="store_true",
+                      help="流量限制按网卡收发的字节 (含协议开销、重传与本机其他流量) 执行，未指定 --interface 时使用默认路由的网卡")
+    parser.add_argument("--preflight", action="store_true",
+                      help="计时开始前并行探测所有URL (HEAD或Range请求)，失效的URL直接跳过；按得到的大小规划流量与次数限额，"
+                           "最后一段不中断在半途")
+    parser.add_argument("--preflight-workers", type=int, default=DEFAULT_PREFLIGHT_WORKERS, metavar="N",
+                      help=f"预检的并行线程数 (默认: {DEFAULT_PREFLIGHT_WORKERS})")
+    parser.add_argument("--governor", action="store_true",
+                      help="按主机的 PSI 压力 (/proc/pressure) 与系统负载自动降低并发与速率，压力缓解后逐步恢复 (仅Linux)")
+    parser.add_argument("--pressure-limit", type=float, default=DEFAULT_PRESSURE_LIMIT, metavar="PERCENT",
+                      help=f"主机压力调节的阈值: CPU、内存或IO的 PSI some avg10 超过该百分比时下调 (默认: {DEFAULT_PRESSURE_LIMIT:g})")
+    parser.add_argument("--bind", nargs="+", default=None, metavar="ADDR|IFACE[=WEIGHT]",
+                      help="新连接的源地址: 本机地址或网卡名 (取其IPv4地址)，可附带权重，如 eth1=3 10.0.0.5；"
+                           "多条上行链路需要主机按源地址选择路由")
+    parser.add_argument("--bind-policy", choices=BIND_POLICIES, default="round_robin",
+                      help="请求在源地址之间的分配: round_robin(线程轮流) weighted(按权重分配线程) "
+                           "per_url(按URL与权重分配，同一URL始终从同一源地址发出) (默认: round_robin)")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                      help="本进程的内存上限，单位MB；按其规划线程数、线程栈、分块大小与内存中的统计，"
+                           "并报告 RSS 的拆分 (适合内存很小的设备，仅Linux)")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                      help=f"不记录有限额运行的进度检查点；默认每{CHECKPOINT_INTERVAL:g}秒记录一次，"
+                           "进程中断后再次运行同一配置时从检查点继续")
+    parser.add_argument("--rcvbuf", type=float, default=None, metavar="MB",
+                      help="每个连接的接收缓冲 (SO_RCVBUF)，单位MB；高带宽高延迟线路上决定单连接吞吐上限，"
+                           "指定后内核不再自动调整，且不超过 net.core.rmem_max (默认: 由内核自动调整)")
+    parser.add_argument("--no-nodelay", action="store_true",
+                      help="关闭 TCP_NODELAY，允许内核合并小包发送")
+    parser.add_argument("--keepalive", type=int, default=None, metavar="SECONDS",
+                      help="连接空闲多少秒后开始TCP keepalive探测，用于穿过会回收空闲连接的中间设备 (默认: 关闭)")
+    parser.add_argument("--congestion", default=None, metavar="NAME",
+                      help="新连接使用的拥塞控制算法，如 bbr 或 cubic (仅Linux，须在内核的可用列表中)")
+
+    # 上传
+    parser.add_argument("--mode", choices=list(TRANSFER_MODES), default="download",
+                      help="流量方向: download(下载) upload(上传) mixed(混合) (默认: download)")
+    parser.add_argument("--upload-ratio", type=float, default=0.5,
+                      help="mixed模式下上传字节占总流量的比例，0~1 (默认: 0.5)")
+    parser.add_argument("--upload-size", type=float, default=DEFAULT_UPLOAD_SIZE,
+                      help=f"单次上传的请求体大小，单位MB (默认: {DEFAULT_UPLOAD_SIZE})")
+    parser.add_argument("--upload-method", choices=list(UPLOAD_METHODS), default="PUT",
+                      help="上传使用的HTTP方法 (默认: PUT)")
+
+    # 开环模式
+    parser.add_argument("--arrival-rate", type=float, default=None, metavar="RPS",
+                      help="按固定到达率发出请求 (次/秒)，不等待上一次完成；线程数为同时进行的请求上限，"
+                           "延迟从计划开始时间算起 (默认: 关闭，完成一次再发下一次)")
+    parser.add_argument("--arrival-process", choices=list(ARRIVAL_PROCESSES), default="constant",
+                      help="到达的间隔: constant(固定间隔) poisson(泊松过程) (默认: constant)")
     
     # 配置管理
     parser.add_argument("--config", default="default",
@@ -1004,6 +3142,8 @@ def parse_args():
                       help="保存当前配置")
     parser.add_argument("--load-config", action="store_true",
                       help="加载指定配置")
+    parser.add_argument("--watch-config", action="store_true",
+                      help="运行中配置文件里的本配置被修改时，把线程数、URL、限速与各项限制等热加载到当前任务")
     parser.add_argument("--list-configs", action="store_true",
                       help="列出所有保存的配置")
     parser.add_argument("--delete-config", action="store_true",
@@ -1014,10 +3154,56 @@ def parse_args():
                       help="显示历史统计数据")
     parser.add_argument("--stats-limit", type=int, default=5,
                       help="显示的历史统计数据条数 (默认: 5)")
+    parser.add_argument("--analyze", action="store_true",
+                      help="跨运行分析历史统计: 按配置与URL汇总、吞吐分位数、每日流量与趋势 (需要 NumPy)")
+    parser.add_argument("--export", default=None, metavar="DIR",
+                      help="把历史运行、URL统计与速度序列按列导出到目录 (runs/urls/series 三张表)")
+    parser.add_argument("--export-format", choices=["csv", "parquet", "arrow"], default="csv",
+                      help="导出格式，parquet 与 arrow 需要 pyarrow (默认: csv)")
+    parser.add_argument("--export-resolution", type=int, default=1, metavar="SECONDS",
+                      help="导出速度序列时每个点覆盖的秒数，取这段时间的平均速度 (默认: 1)")
+    parser.add_argument("--since", default=None, metavar="YYYY-MM-DD",
+                      help="只分析或导出该日期及之后开始的运行")
+
+    # 诊断
+    parser.add_argument("--profile", type=int, default=None, metavar="SECONDS",
+                      help="运行开始后进行性能剖析的时长，单位秒，输出火焰图折叠栈、热点耗时和内存分配 (默认: 关闭)")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                      help="把本次运行每次请求的开始、响应头、结束、出错与重试事件记录到二进制轨迹文件")
+    parser.add_argument("--replay", default=None, metavar="PATH",
+                      help="按轨迹文件中的时间线重新发出相同的请求，URL与线程数取自轨迹")
+    parser.add_argument("--replay-origin", default=None, metavar="URL",
+                      help="重放时把URL的协议与主机替换为该地址，例如 http://127.0.0.1:8080")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                      help="重放的时间倍率，2表示以两倍速发出，0表示不等待、按顺序尽快发出 (默认: 1)")
+    parser.add_argument("--trace-summary", default=None, metavar="PATH",
+                      help="显示轨迹文件的汇总: 请求数、重试、字节数、首字节时间与请求耗时的分位数")
+
+    # 模拟
+    parser.add_argument("--simulate", default=None, metavar="MODEL",
+                      help="不发出网络请求，按源站模型 (JSON: 大小、带宽、延迟、失败率) 在虚拟时钟上模拟本配置的运行")
+    parser.add_argument("--seed", type=int, default=0,
+                      help="模拟的随机数种子，种子相同时结果完全相同 (默认: 0)")
+    parser.add_argument("--sim-horizon", type=float, default=DEFAULT_SIM_HORIZON, metavar="SECONDS",
+                      help=f"没有任何限制的运行与定时任务模拟的虚拟时长，单位秒 (默认: {DEFAULT_SIM_HORIZON})")
+    parser.add_argument("--sweep", action="append", default=None, metavar="KEY=V1,V2",
+                      help="对配置项的多个取值分别模拟并列表比较，可重复使用以扫描所有组合，例如 threads=1,4,16")
+
+    # 分布式
+    parser.add_argument("--agent", default=None, metavar="[HOST:]PORT",
+                      help="以agent模式运行，在指定地址等待控制器下发任务 (默认主机: 127.0.0.1)")
+    parser.add_argument("--agents", nargs='+', default=None, metavar="URL",
+                      help="以控制器模式运行，把任务分发给这些agent，例如 http://10.0.0.2:5002")
+    parser.add_argument("--agent-token", default=None,
+                      help=f"控制器与agent之间的共享令牌，也可通过环境变量 {AGENT_TOKEN_ENV} 设置")
 
     # UI
     parser.add_argument("--no-gui", action="store_true",
                       help="不启动Web UI，仅使用命令行")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                      help=f"Web UI多任务共享的工作线程总数上限 (默认: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--total-limit", type=float, default=0,
+                      help="Web UI多任务共享的总带宽，单位MB/s，按任务权重分配，0表示不限 (默认: 0)")
     
     return parser.parse_args()
 
@@ -1026,7 +3212,13 @@ def main():
     args = parse_args()
 
     # 如果是命令行模式或指定了no-gui
-    is_cli_mode = any(arg in sys.argv for arg in ['--list-configs', '--delete-config', '--show-stats', '--save-config', '--no-gui'])
+    is_cli_mode = any(arg in sys.argv for arg in ['--list-configs', '--delete-config', '--show-stats', '--save-config', '--no-gui',
+                                                  '--remove-schedule', '--agent', '--trace-summary', '--analyze',
+                                                  '--export', '--simulate'])
+
+    if args.agent_token:
+        # 通过环境变量传递，调度作业与 Web UI 创建的控制器也能使用
+        os.environ[AGENT_TOKEN_ENV] = args.agent_token
 
     if is_cli_mode:
         # 处理配置管理命令
@@ -1041,7 +3233,43 @@ def main():
         if args.show_stats:
             TrafficConsumer.show_stats(args.stats_limit)
             return
+
+        if args.analyze:
+            TrafficConsumer.show_analysis(args.since)
+            return
+
+        if args.export:
+            TrafficConsumer.export_stats(args.export, args.export_format, args.export_resolution, args.since)
+            return
+
+        if args.trace_summary:
+            TrafficConsumer.show_trace_summary(args.trace_summary)
+            return
         
+        if args.agent:
+            from distributed import TrafficAgent, parse_listen_address
+            host, port = parse_listen_address(args.agent)
+            try:
+                TrafficAgent(host, port).serve_forever()
+            except ValueError as e:
+                print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return
+
+        if args.remove_schedule:
+            consumer = TrafficConsumer(config_name=args.config)
+            consumer.scheduler, _ = get_scheduler(consumer.config_name)
+            if consumer.stop_schedule():
+                print(f"{Fore.CYAN}配置 '{args.config}' 的调度作业已删除{Style.RESET_ALL}")
+            return
+
+        misfire_grace = args.misfire_grace if args.misfire_grace > 0 else None
+
+        try:
+            resolve = parse_resolve(args.resolve)
+        except ValueError as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return
+
         # 加载配置
         config = None
         if args.load_config:
@@ -1060,8 +3288,10 @@ def main():
             urls = args.urls if args.urls else DEFAULT_URLS
 
         # 创建流量消耗器实例
-        consumer = TrafficConsumer(
+        consumer = create_consumer(
+            agents=config.get("agents", args.agents) if config else args.agents,
             urls=urls,
+            url_source=config.get("url_source", args.url_source) if config else args.url_source,
             url_strategy=config.get("url_strategy", args.url_strategy) if config else args.url_strategy,
             threads=config["threads"] if config and "threads" in config else args.threads,
             limit_speed=config["limit_speed"] if config and "limit_speed" in config else args.limit,
@@ -1070,20 +3300,63 @@ def main():
             cron_expr=config["cron_expr"] if config and "cron_expr" in config else args.cron,
             traffic_limit=config["traffic_limit"] if config and "traffic_limit" in config else args.traffic_limit,
             interval=config["interval"] if config and "interval" in config else args.interval,
-            config_name=args.config
+            config_name=args.config,
+            profile_seconds=args.profile,
+            meter_basis=config.get("meter_basis", args.meter) if config else args.meter,
+            decode_content=config.get("decode_content", not args.no_decode) if config else not args.no_decode,
+            mode=config.get("mode", args.mode) if config else args.mode,
+            upload_ratio=config.get("upload_ratio", args.upload_ratio) if config else args.upload_ratio,
+            upload_size=config.get("upload_size", args.upload_size) if config else args.upload_size,
+            upload_method=config.get("upload_method", args.upload_method) if config else args.upload_method,
+            misfire_grace_time=config.get("misfire_grace_time", misfire_grace) if config else misfire_grace,
+            coalesce=config.get("coalesce", not args.no_coalesce) if config else not args.no_coalesce,
+            dns_ttl=config.get("dns_ttl", args.dns_ttl) if config else args.dns_ttl,
+            resolve=config.get("resolve", resolve) if config else resolve,
+            prewarm=config.get("prewarm", not args.no_prewarm) if config else not args.no_prewarm,
+            verify_manifest=config.get("verify_manifest", args.verify_manifest) if config else args.verify_manifest,
+            verify_sample=config.get("verify_sample", args.verify_sample) if config else args.verify_sample,
+            arrival_rate=config.get("arrival_rate", args.arrival_rate) if config else args.arrival_rate,
+            arrival_process=config.get("arrival_process", args.arrival_process) if config else args.arrival_process,
+            socket_rcvbuf=config.get("socket_rcvbuf", args.rcvbuf) if config else args.rcvbuf,
+            tcp_nodelay=config.get("tcp_nodelay", not args.no_nodelay) if config else not args.no_nodelay,
+            tcp_keepalive=config.get("tcp_keepalive", args.keepalive) if config else args.keepalive,
+            tcp_congestion=config.get("tcp_congestion", args.congestion) if config else args.congestion,
+            checkpoint=config.get("checkpoint", not args.no_checkpoint) if config else not args.no_checkpoint,
+            interface=config.get("interface", args.interface) if config else args.interface,
+            interface_limit=config.get("interface_limit", args.limit_on_interface) if config else args.limit_on_interface,
+            preflight=config.get("preflight", args.preflight) if config else args.preflight,
+            preflight_workers=config.get("preflight_workers", args.preflight_workers) if config else args.preflight_workers,
+            governor=config.get("governor", args.governor) if config else args.governor,
+            pressure_limit=config.get("pressure_limit", args.pressure_limit) if config else args.pressure_limit,
+            bind=config.get("bind", args.bind) if config else args.bind,
+            bind_policy=config.get("bind_policy", args.bind_policy) if config else args.bind_policy,
+            memory_budget=config.get("memory_budget", args.memory_budget) if config else args.memory_budget,
+            watch_config=args.watch_config,
+            trace_file=args.trace,
+            replay_file=args.replay,
+            replay_origin=args.replay_origin,
+            replay_speed=args.replay_speed
         )
         
         # 如果只是保存配置
         if args.save_config:
             consumer.save_config()
             return
+
+        if args.simulate:
+            consumer.simulate(args.simulate, args.seed, args.sim_horizon, args.sweep)
+            return
         
         # 启动流量消耗器
         consumer.start()
     else:
         # 启动Web UI
         try:
-            from web_ui import app, socketio
+            import web_ui
+            from web_ui import app, socketio, resume_persisted_schedules, job_manager
+            job_manager.configure(max_workers=args.max_workers, total_limit=args.total_limit)
+            web_ui.default_agents = args.agents
+            resume_persisted_schedules()
             print("启动 Web UI, 访问 http://127.0.0.1:5001")
             socketio.run(app, host='0.0.0.0', port=5001, allow_unsafe_werkzeug=True)
         except ImportError:
@@ -1092,4 +3365,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # 让 "import traffic_consumer" 复用当前模块，避免模块被重复执行，
+    # 持久化调度作业也依赖这一点找到已注册的消耗器
+    sys.modules.setdefault("traffic_consumer", sys.modules[__name__])
     main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+传输层 - DNS缓存、多地址分散连接与连接预热
+
+1. ResolverCache: 按TTL缓存解析结果并在后台提前刷新，工作线程建立新连接时不再
+   经过系统解析器；支持 --resolve 形式的静态映射，便于用本地地址测试
+2. SpreadingAdapter: 新连接在主机解析到的全部 A/AAAA 地址之间轮换，某个地址
+   连接失败时依次尝试下一个；TLS 的 SNI 与证书校验仍使用原主机名
+3. prewarm_sessions: 在计时开始前为每个工作线程完成解析与握手
+4. TunedAdapter: 在连接前设置套接字参数 (接收缓冲、TCP_NODELAY、keepalive、拥塞控制算法)，
+   receive_window 报告按这些参数得到的单连接接收窗口；指定源地址时新连接从该本机地址发出
+"""
+
+import sys
+import time
+import socket
+import weakref
+import ipaddress
+import threading
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:  # urllib3 1.26 没有单独的解析错误，与其自身的连接一样报告为 NewConnectionError
+    NameResolutionError = None
+from urllib3.util import connection
+
+REFRESH_AHEAD = 0.25  # 在TTL剩余该比例时后台刷新
+IDLE_TTLS = 2  # 超过该倍数的TTL未使用的条目不再刷新并被移除
+MIN_REFRESH_INTERVAL = 1.0
+KEEPALIVE_PROBES = 3  # keepalive 探测的次数，探测间隔为空闲时间的三分之一
+TCP_RMEM = "/proc/sys/net/ipv4/tcp_rmem"
+
+
+def system_resolve(host, port):
+    """通过系统解析器获取主机的全部地址 (A/AAAA)，保持系统返回的顺序并去重"""
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class _Entry:
+    __slots__ = ("addresses", "expires", "last_used")
+
+    def __init__(self, addresses, expires, last_used):
+        self.addresses = addresses
+        self.expires = expires
+        self.last_used = last_used
+
+
+class ResolverCache:
+    """带TTL的解析缓存，按主机轮换返回地址顺序"""
+
+    def __init__(self, ttl=60, overrides=None, resolve_func=None):
+        self.ttl = max(0, ttl or 0)
+        self.overrides = {}
+        self.resolve_func = resolve_func if resolve_func else system_resolve
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._turns = {}
+        self.add_overrides(overrides)
+        _register(self)
+
+    def add_overrides(self, overrides):
+        for host, addresses in (overrides or {}).items():
+            self.overrides[host.lower().rstrip(".")] = list(addresses)
+
+    def addresses(self, host, port):
+        """返回主机的全部地址，每次调用的起始地址依次轮换，使新连接分散到各个地址"""
+        addresses = self._lookup(host, port)
+        with self.lock:
+            turn = self._turns.get(host, 0)
+            self._turns[host] = turn + 1
+        start = turn % len(addresses)
+        return addresses[start:] + addresses[:start]
+
+    def _lookup(self, host, port):
+        name = host.lower().rstrip(".")
+        if name in self.overrides:
+            return self.overrides[name]
+        try:
+            ipaddress.ip_address(name.strip("[]"))
+            return [name.strip("[]")]
+        except ValueError:
+            pass
+
+        key = (name, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.expires > now:
+                entry.last_used = now
+                return entry.addresses
+
+        try:
+            addresses = self.resolve_func(name, port)
+        except socket.gaierror:
+            # 解析失败时继续使用过期的结果
+            if entry:
+                return entry.addresses
+            raise
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"{name} 没有可用的地址")
+
+        with self.lock:
+            self.entries[key] = _Entry(addresses, now + self.ttl, now)
+        return addresses
+
+    def refresh(self):
+        """刷新即将过期且最近使用过的条目，移除长时间未使用的条目"""
+        if not self.ttl:
+            return
+        now = time.monotonic()
+        with self.lock:
+            due = []
+            for key, entry in list(self.entries.items()):
+                if now - entry.last_used > self.ttl * IDLE_TTLS:
+                    del self.entries[key]
+                elif entry.expires - now <= self.ttl * REFRESH_AHEAD:
+                    due.append(key)
+
+        for name, port in due:
+            try:
+                addresses = self.resolve_func(name, port)
+            except OSError:
+                continue
+            if addresses:
+                with self.lock:
+                    entry = self.entries.get((name, port))
+                    if entry:
+                        entry.addresses = addresses
+                        entry.expires = time.monotonic() + self.ttl
+
+
+# 所有解析缓存共用一个后台刷新线程
+_caches = weakref.WeakSet()
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def _register(cache):
+    global _refresher
+    with _refresher_lock:
+        _caches.add(cache)
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="dns-refresh", daemon=True)
+            _refresher.start()
+
+
+def _refresh_loop():
+    while True:
+        caches = list(_caches)
+        ttls = [cache.ttl for cache in caches if cache.ttl]
+        interval = max(MIN_REFRESH_INTERVAL, min(ttls) * REFRESH_AHEAD / 2) if ttls else MIN_REFRESH_INTERVAL
+        time.sleep(interval)
+        for cache in caches:
+            cache.refresh()
+
+
+def build_socket_options(rcvbuf=None, nodelay=True, keepalive=None, congestion=None):
+    """套接字参数列表 [(level, optname, value)]，由 urllib3 在每个新连接 connect 之前设置
+
+    rcvbuf 为接收缓冲字节数，指定后内核不再自动调整该连接的缓冲；keepalive 为空闲多少秒后开始探测；
+    congestion 为拥塞控制算法名 (仅Linux)。当前平台没有的参数直接跳过
+    """
+    options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if nodelay else 0)]
+    if rcvbuf:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, int(rcvbuf)))
+    if keepalive:
+        keepalive = int(keepalive)
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        for name, value in (("TCP_KEEPIDLE", keepalive), ("TCP_KEEPINTVL", max(1, keepalive // 3)),
+                            ("TCP_KEEPCNT", KEEPALIVE_PROBES)):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    if congestion and hasattr(socket, "TCP_CONGESTION"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_CONGESTION, congestion.encode("ascii")))
+    return options
+
+
+def option_label(level, name):
+    """套接字参数的常量名，用于日志"""
+    prefixes = ("SO_",) if level == socket.SOL_SOCKET else ("TCP_",)
+    for attr in dir(socket):
+        if attr.startswith(prefixes) and getattr(socket, attr) == name:
+            return attr
+    return f"{level}:{name}"
+
+
+def check_socket_options(options):
+    """在一个未连接的套接字上逐个试设参数，返回 (可用的参数, [(参数名, 错误)])
+
+    内核不支持的拥塞控制算法等会在 connect 之前报错，使每个新连接都失败，需要提前剔除
+    """
+    accepted, rejected = [], []
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        for level, name, value in options:
+            try:
+                sock.setsockopt(level, name, value)
+                accepted.append((level, name, value))
+            except OSError as e:
+                rejected.append((option_label(level, name), e))
+    return accepted, rejected
+
+
+def _tcp_rmem_max():
+    try:
+        with open(TCP_RMEM) as f:
+            return int(f.read().split()[2])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def receive_window(options=None):
+    """按套接字参数估计单连接的最大接收窗口
+
+    返回 {"requested", "buffer", "window", "autotune", "capped"}: buffer 为内核记账的接收缓冲，
+    Linux 把设置的值翻倍记账 (一半用于内核开销) 并以 net.core.rmem_max 为上限，window 约为其一半；
+    未设置接收缓冲时由内核自动调整，上限为 tcp_rmem 的第三项。单连接吞吐上限约为 window / RTT
+    """
+    requested = None
+    for level, name, value in options or ():
+        if level == socket.SOL_SOCKET and name == socket.SO_RCVBUF:
+            requested = value
+    linux = sys.platform.startswith("linux")
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if requested is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, requested)
+        buffer = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    autotune = requested is None and linux
+    if autotune:
+        buffer = _tcp_rmem_max() or buffer
+    window = buffer // 2 if linux else buffer
+    return {
+        "requested": requested,
+        "buffer": buffer,
+        "window": window,
+        "autotune": autotune,
+        "capped": requested is not None and window < requested
+    }
+
+
+class _SpreadingConnectionMixin:
+    """用解析缓存中的地址建立连接，失败时依次尝试下一个地址"""
+
+    resolver = None
+
+    def _new_conn(self):
+        try:
+            addresses = self.resolver.addresses(self._dns_host, self.port)
+        except socket.gaierror as e:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f"Failed to resolve '{self.host}' ({e})") from e
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for address in addresses:
+            try:
+                return connection.create_connection(
+                    (address, self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout as e:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} ({address}) timed out. (connect timeout={self.timeout})")
+                error.__cause__ = e
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection to {address}: {e}")
+                error.__cause__ = e
+        raise error
+
+
+def _pool_classes(resolver):
+    """生成绑定到指定解析缓存的连接池类"""
+    http_connection = type("SpreadingHTTPConnection", (_SpreadingConnectionMixin, HTTPConnection),
+                           {"resolver": resolver})
+    https_connection = type("SpreadingHTTPSConnection", (_SpreadingConnectionMixin, HTTPSConnection),
+                            {"resolver": resolver})
+    return {
+        "http": type("SpreadingHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http_connection}),
+        "https": type("SpreadingHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": https_connection}),
+    }
+
+
+class TunedAdapter(HTTPAdapter):
+    """新连接使用指定的套接字参数，socket_options 为None时使用 urllib3 的默认值 (只开启 TCP_NODELAY)；
+    source_address 为 (本机地址, 0) 时新连接绑定到该地址"""
+
+    def __init__(self, socket_options=None, source_address=None, **kwargs):
+        self.socket_options = socket_options
+        self.source_address = source_address
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.socket_options is not None:
+            pool_kwargs["socket_options"] = self.socket_options
+        if self.source_address is not None:
+            pool_kwargs["source_address"] = self.source_address
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.socket_options is not None:
+            proxy_kwargs.setdefault("socket_options", self.socket_options)
+        if self.source_address is not None:
+            proxy_kwargs.setdefault("source_address", self.source_address)
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+class SpreadingAdapter(TunedAdapter):
+    """通过解析缓存建立连接，并把新连接分散到主机的所有地址"""
+
+    def __init__(self, resolver, **kwargs):
+        self.resolver = resolver
+        self._pool_classes = _pool_classes(resolver)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+
+def prewarm_sessions(sessions, urls, timeout):
+    """并行地为每个会话向每个源站发送一次HEAD请求，完成解析与握手并把连接留在连接池中
+
+    返回成功预热的连接数
+    """
+    origins = {}
+    for url in urls:
+        parts = urlsplit(url)
+        origins.setdefault((parts.scheme, parts.netloc), url)
+
+    warmed = []
+
+    def warm(session):
+        for url in origins.values():
+            try:
+                session.head(url, timeout=timeout, allow_redirects=False).close()
+                warmed.append(url)
+            except Exception:
+                # 预热失败不影响任务，正式请求时会按正常流程重试
+                pass
+
+    threads = [threading.Thread(target=warm, args=(session,), name="prewarm", daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(warmed)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+URL池 - 以整数编号管理URL及其统计，支持百万级的URL清单
+
+1. ListUrlPool: 命令行 -u 或配置中 urls 给出的URL列表
+2. FileUrlPool: 流式扫描清单文件，只记录每个URL所在行的偏移量，URL在被选中时才读取；
+   .gz 清单、HTTP(S) 清单和生成器先逐行写入临时文件再建立索引，不在内存中保留URL字符串
+3. 每个URL的完成次数、解码字节、线路字节与失效标记保存在按编号索引的紧凑数组中，
+   每个URL固定占用约29字节 (清单的行偏移量8字节 + 计数21字节)，与URL长度无关；
+   运行前预检后另有大小与Range支持标记共9字节
+
+计数数组由调用方 (TrafficConsumer) 在自己的锁内更新。
+"""
+
+import os
+import gzip
+import heapq
+import random
+import shutil
+import tempfile
+import threading
+from array import array
+
+MANIFEST_COMMENT = b"#"
+RANDOM_PROBES = 32  # 随机选择时寻找有效URL的最大尝试次数，超过后顺序查找
+DEFAULT_SAMPLE = 64  # 预热等场景抽取的URL数
+
+
+class UrlPool:
+    """URL池基类: 维护按编号索引的计数数组与选择策略，编号到URL的映射由子类实现"""
+
+    source = None
+    indexed = False  # 是否支持按URL查找编号
+
+    def __init__(self, size):
+        self.usage = array("I", [0]) * size  # 完成次数
+        self.payload = array("Q", [0]) * size  # 解码字节
+        self.wire = array("Q", [0]) * size  # 线路字节
+        self.invalid = bytearray(size)  # 失效标记
+        self.invalid_count = 0
+        self.used_count = 0  # 至少完成过一次的URL数
+        self.sizes = None  # 预检得到的响应体字节数 (-1表示未知)，预检后创建
+        self.ranges = None  # 预检得到的Range支持标记，预检后创建
+        self._cursor = 0
+        self._cursor_lock = threading.Lock()
+        self.random = random  # 随机选择的随机数来源，模拟时替换为带种子的 random.Random
+
+    def __len__(self):
+        return len(self.invalid)
+
+    def url(self, url_id):
+        raise NotImplementedError
+
+    def index(self, url):
+        """返回URL的编号，URL不存在或该URL池不支持按URL查找时返回None"""
+        return None
+
+    def close(self):
+        pass
+
+    def choose(self, strategy):
+        """按策略选择一个有效URL的编号，没有有效URL时返回None"""
+        if self.invalid_count >= len(self):
+            return None
+        if strategy == "round_robin":
+            with self._cursor_lock:
+                url_id = self._next_valid(self._cursor % len(self))
+                if url_id is not None:
+                    self._cursor = url_id + 1
+            return url_id
+        return self._least_used_of_two()
+
+    def _least_used_of_two(self):
+        """随机抽取两个有效URL并选择完成次数较少的一个，各URL的使用次数因此保持均衡"""
+        size = len(self)
+        first = None
+        for _ in range(RANDOM_PROBES):
+            url_id = self.random.randrange(size)
+            if self.invalid[url_id]:
+                continue
+            if first is None:
+                first = url_id
+                continue
+            return url_id if self.usage[url_id] < self.usage[first] else first
+        if first is not None:
+            return first
+        # 绝大多数URL已失效，从随机位置开始顺序查找
+        return self._next_valid(self.random.randrange(size))
+
+    def _next_valid(self, start):
+        """从 start 开始 (到末尾后回绕) 的第一个有效URL编号"""
+        url_id = self.invalid.find(0, start)
+        if url_id < 0:
+            url_id = self.invalid.find(0, 0, start)
+        return url_id if url_id >= 0 else None
+
+    def record_completion(self, url_id):
+        if self.usage[url_id] == 0:
+            self.used_count += 1
+        self.usage[url_id] += 1
+
+    def mark_invalid(self, url_id):
+        """标记URL失效，返回是否为新标记"""
+        if self.invalid[url_id]:
+            return False
+        self.invalid[url_id] = 1
+        self.invalid_count += 1
+        return True
+
+    def reset_counters(self):
+        """清零统计，保留失效标记"""
+        size = len(self)
+        self.usage = array("I", [0]) * size
+        self.payload = array("Q", [0]) * size
+        self.wire = array("Q", [0]) * size
+        self.used_count = 0
+
+    def restore(self, url_id, usage, payload, wire):
+        """恢复检查点中某个URL的统计"""
+        if usage and not self.usage[url_id]:
+            self.used_count += 1
+        self.usage[url_id] = usage
+        self.payload[url_id] = payload
+        self.wire[url_id] = wire
+
+    def carry_over(self, other):
+        """从旧的URL池继承同一URL的统计与失效标记，仅在两个URL池都支持按URL查找时进行"""
+        if not (self.indexed and other.indexed):
+            return
+        for url_id in range(len(self)):
+            old_id = other.index(self.url(url_id))
+            if old_id is None:
+                continue
+            self.usage[url_id] = other.usage[old_id]
+            self.payload[url_id] = other.payload[old_id]
+            self.wire[url_id] = other.wire[old_id]
+            if other.usage[old_id]:
+                self.used_count += 1
+            if other.invalid[old_id]:
+                self.mark_invalid(url_id)
+
+    def stats(self, url_ids):
+        """[(url, 完成次数, 解码字节, 线路字节)]"""
+        return [(self.url(url_id), self.usage[url_id], self.payload[url_id], self.wire[url_id])
+                for url_id in url_ids]
+
+    def most_used(self, limit):
+        """完成次数最多的 limit 个URL编号，URL数超过 limit 时需要遍历计数数组"""
+        if len(self) <= limit:
+            return list(range(len(self)))
+        return heapq.nlargest(limit, range(len(self)), key=self.usage.__getitem__)
+
+    def sample(self, limit=DEFAULT_SAMPLE):
+        """最多 limit 个有效URL，URL数较多时随机抽取"""
+        if len(self) <= limit:
+            return [self.url(url_id) for url_id in range(len(self)) if not self.invalid[url_id]]
+        url_ids = {self.choose("random") for _ in range(limit)} - {None}
+        return [self.url(url_id) for url_id in sorted(url_ids)]
+
+    def summary(self):
+        return {
+            "source": self.source,
+            "size": len(self),
+            "used": self.used_count,
+            "invalid": self.invalid_count
+        }
+
+
+class ListUrlPool(UrlPool):
+    """内存中的URL列表"""
+
+    indexed = True
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self._ids = {url: url_id for url_id, url in enumerate(self.urls)}
+        super().__init__(len(self.urls))
+
+    def url(self, url_id):
+        return self.urls[url_id]
+
+    def index(self, url):
+        return self._ids.get(url)
+
+
+class FileUrlPool(UrlPool):
+    """URL清单文件: 每行一个URL，忽略空行与 # 开头的注释行；只在内存中保存各行的偏移量"""
+
+    def __init__(self, fileobj, source):
+        self.source = source
+        self._file = fileobj
+        self._lock = threading.Lock()
+        self.offsets = self._index(fileobj)
+        if not self.offsets:
+            fileobj.close()
+            raise ValueError(f"URL清单 {source} 中没有URL")
+        super().__init__(len(self.offsets))
+
+    @staticmethod
+    def _index(fileobj):
+        offsets = array("Q")
+        offset = 0
+        fileobj.seek(0)
+        for line in fileobj:
+            stripped = line.strip()
+            if stripped and not stripped.startswith(MANIFEST_COMMENT):
+                offsets.append(offset)
+            offset += len(line)
+        return offsets
+
+    def url(self, url_id):
+        with self._lock:
+            self._file.seek(self.offsets[url_id])
+            line = self._file.readline()
+        return line.strip().decode("utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+def open_url_source(source, timeout=30):
+    """按来源创建URL池: 清单文件路径 (可为 .gz)、HTTP(S) 清单地址或逐个产生URL的可迭代对象"""
+    if not isinstance(source, str):
+        return FileUrlPool(_spool(source), "<iterable>")
+    if source.startswith(("http://", "https://")):
+        return FileUrlPool(_spool(_fetch_lines(source, timeout)), source)
+    path = os.path.expanduser(source)
+    if path.endswith(".gz"):
+        # 解压后的内容已经按行分隔，整块复制到临时文件
+        spool = tempfile.TemporaryFile()
+        with gzip.open(path, "rb") as compressed:
+            shutil.copyfileobj(compressed, spool)
+        return FileUrlPool(spool, source)
+    return FileUrlPool(open(path, "rb"), source)
+
+
+def _spool(lines):
+    """把逐行产生的URL写入临时文件，关闭或进程退出时自动删除"""
+    spool = tempfile.TemporaryFile()
+    for line in lines:
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        spool.write(line.rstrip(b"\r\n") + b"\n")
+    spool.flush()
+    return spool
+
+
+def _fetch_lines(url, timeout):
+    """流式下载清单并逐行产生，不把整个清单读入内存"""
+    import requests
+
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        yield from response.iter_lines()
@@ -1,13 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import threading
-import time
 import datetime
-from flask import Flask, render_template, request, jsonify
+import functools
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, abort
 from flask_socketio import SocketIO, emit
-from croniter import croniter
-from traffic_consumer import TrafficConsumer
+from traffic_consumer import (TrafficConsumer, PROFILE_DIR, SERIES_DIR, MANIFEST_DIR, DEFAULT_PROFILE_SECONDS,
+                              MAX_PROFILE_SECONDS, attach_persisted_job_stores, scheduled_consumers,
+                              DEFAULT_MISFIRE_GRACE, create_consumer)
+from job_manager import JobManager
+from snapshot import SnapshotPublisher
+from timeseries import SpeedSeries, DEFAULT_POINTS, METHODS as SERIES_METHODS
+
+SSE_KEEPALIVE = 15  # SSE连接在没有新快照时发送注释行的间隔，单位秒，用于发现已断开的连接
 
 # 初始化 Flask 和 SocketIO
 app = Flask(__name__)
@@ -17,89 +24,254 @@ socketio = SocketIO(app, async_mode='threading')
 # 全局变量
 consumer_instance = None
 consumer_thread = None
-status_thread = None
-status_thread_stop = threading.Event()
 log_enabled = False
+default_agents = None  # 启动参数 --agents，配置中未指定agent时使用
+
+def check_manifest_settings(settings):
+    """客户端提交的 url_source 只能是 HTTP(S) 清单地址或清单目录下的文件，verify_manifest 只能是清单目录下的文件；
+    返回把文件替换为清单目录内绝对路径的设置，其他取值抛出 ValueError，不在服务器上打开任意路径"""
+    if not settings:
+        return settings
+    checked = dict(settings)
+    root = os.path.realpath(MANIFEST_DIR)
+    for key in ('url_source', 'verify_manifest'):
+        value = checked.get(key)
+        if not value:
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f'{key} 应为字符串')
+        if key == 'url_source' and value.startswith(('http://', 'https://')):
+            continue
+        path = os.path.realpath(os.path.join(root, value))
+        if path == root or os.path.commonpath([root, path]) != root:
+            raise ValueError(f'{key} 只能是 HTTP(S) 清单地址或 {MANIFEST_DIR} 下的文件' if key == 'url_source'
+                             else f'{key} 只能是 {MANIFEST_DIR} 下的文件')
+        checked[key] = path
+    return checked
+
+def log_emitter(message, color=None):
+    if log_enabled:
+        socketio.emit('log_message', {'message': message})
 
-def status_emitter():
-    """定期向前端发送状态更新"""
-    while not status_thread_stop.is_set():
-        if consumer_instance and consumer_instance.active:
-            with consumer_instance.lock:
-                thread_urls = consumer_instance.thread_current_urls.copy()
-                url_usage_snapshot = consumer_instance.url_usage.copy()
-                total_usage = sum(url_usage_snapshot.values())
-                url_usage_stats = []
-                if consumer_instance.urls:
-                    for url in consumer_instance.urls:
-                        count = url_usage_snapshot.get(url, 0)
-                        percentage = round((count / total_usage) * 100, 1) if total_usage else 0.0
-                        url_usage_stats.append({
-                            'url': url,
-                            'count': count,
-                            'percentage': percentage
-                        })
-                else:
-                    for url, count in url_usage_snapshot.items():
-                        percentage = round((count / total_usage) * 100, 1) if total_usage else 0.0
-                        url_usage_stats.append({
-                            'url': url,
-                            'count': count,
-                            'percentage': percentage
-                        })
-            status = {
-                'total_bytes': consumer_instance.format_bytes(consumer_instance.total_bytes),
-                'speed': consumer_instance.format_bytes(consumer_instance.total_bytes / (time.time() - consumer_instance.start_time) if (time.time() - consumer_instance.start_time) > 0 else 0) + '/s',
-                'download_count': consumer_instance.download_count,
-                'running': True,
-                'config': consumer_instance.config_name,
-                'thread_count': consumer_instance.threads,
-                'thread_status': thread_urls,
-                'url_usage_stats': url_usage_stats
-            }
-            socketio.emit('status_update', status)
-        else:
-            socketio.emit('status_update', {
-                'running': False,
-                'thread_status': {},
-                'thread_count': consumer_instance.threads if consumer_instance else 0,
-                'url_usage_stats': []
-            })
-        socketio.sleep(1)
-
-def scheduler_status_emitter():
-    """定期向前端发送调度器状态更新"""
-    while not status_thread_stop.is_set():
-        if consumer_instance:
-            next_run_time = None
-            job_details = None
-            if consumer_instance.scheduler and consumer_instance.scheduler.running:
-                job = consumer_instance.scheduler.get_job('traffic_consumer_job')
-                if job:
-                    next_run_time = job.next_run_time.isoformat() if job.next_run_time else None
-                    if consumer_instance.cron_expr:
-                        job_details = f"Cron: {consumer_instance.cron_expr}"
-                    elif consumer_instance.interval:
-                        job_details = f"Interval: {consumer_instance.interval} minutes"
-            
-            status = {
-                'next_run_time': next_run_time,
-                'job_details': job_details,
-                'history': consumer_instance.history
-            }
-            socketio.emit('scheduler_status_update', status)
-        else:
-            socketio.emit('scheduler_status_update', {'next_run_time': None, 'job_details': None, 'history': []})
-        socketio.sleep(2) # 调度器状态不需要太频繁更新
+def history_emitter(record):
+    socketio.emit('history_update', record)
+
+def invalid_url_emitter(payload):
+    socketio.emit('invalid_url', payload)
+
+# 多任务管理器，与主面板的单个任务相互独立
+job_manager = JobManager(logger=log_emitter, history_callback=history_emitter,
+                         invalid_url_callback=invalid_url_emitter)
+
+def resume_persisted_schedules():
+    """启动时恢复所有配置的持久化调度作业，错过的执行按作业策略补偿；
+    恢复的消耗器按作业ID登记在调度器中，不占用主面板的任务"""
+    scheduler, persistent = attach_persisted_job_stores()
+    if not persistent:
+        return
+    for job in scheduler.get_jobs():
+        settings = job.kwargs.get('settings')
+        if not settings or job.id in scheduled_consumers():
+            continue
+        consumer = create_consumer(
+            **settings,
+            logger=log_emitter,
+            history_callback=history_emitter,
+            invalid_url_callback=invalid_url_emitter
+        )
+        consumer.setup_scheduler()
+        print(f"已恢复调度作业: {settings.get('config_name')}")
+
+def running_consumer():
+    """主面板显示与控制的任务: 主面板启动的任务，其未运行时为正在执行的调度作业"""
+    consumer = consumer_instance
+    if consumer and consumer.active:
+        return consumer
+    for scheduled in scheduled_consumers().values():
+        if scheduled.active:
+            return scheduled
+    return consumer
+
+def consumer_status():
+    """主面板任务的状态，由任务快照中复制的计数格式化而来，不在锁内格式化"""
+    consumer = running_consumer()
+    if not consumer or not consumer.active:
+        return {
+            'running': False,
+            'thread_status': {},
+            'thread_count': consumer.threads if consumer else 0,
+            'url_usage_stats': []
+        }
+    snapshot = consumer.snapshot()
+    # URL较多时只列出各线程正在使用的URL，并附带URL池的汇总
+    total_usage = snapshot['download_count']
+    url_usage_stats = []
+    for url, count, payload, wire in snapshot['url_stats']:
+        url_usage_stats.append({
+            'url': url,
+            'count': count,
+            'percentage': round((count / total_usage) * 100, 1) if total_usage else 0.0,
+            'decode_ratio': round(TrafficConsumer.decode_ratio(payload, wire), 2)
+        })
+    status = {
+        'total_bytes': consumer.format_bytes(snapshot['total_bytes']),
+        'speed': consumer.format_bytes(snapshot['speed']) + '/s',
+        'download_count': snapshot['download_count'],
+        'meter_basis': snapshot['meter_basis'],
+        'wire_bytes': consumer.format_bytes(snapshot['wire_bytes']),
+        'payload_bytes': consumer.format_bytes(snapshot['payload_bytes']),
+        'mode': snapshot['mode'],
+        'upload_bytes': consumer.format_bytes(snapshot['upload_bytes']),
+        'upload_count': snapshot['upload_count'],
+        'verification': snapshot['verification'],
+        'reconcile': snapshot['reconcile'],
+        'governor': snapshot['governor'],
+        'sources': snapshot['sources'],
+        'memory': snapshot['memory'],
+        'latency': snapshot['latency'],
+        'running': True,
+        'config': snapshot['config'],
+        'thread_count': snapshot['threads'],
+        'thread_status': snapshot['thread_status'],
+        'url_usage_stats': url_usage_stats,
+        'url_pool': snapshot['url_pool']
+    }
+    if hasattr(consumer, 'agent_summary'):
+        status['agents'] = consumer.agent_summary()
+    return status
+
+def schedule_details(consumer):
+    """一个调度作业的触发规则、下次执行时间与执行历史"""
+    next_run_time = None
+    job_details = None
+    if consumer.scheduler and consumer.scheduler.running:
+        job = consumer.scheduler.get_job(consumer.job_id)
+        if job:
+            next_run_time = job.next_run_time.isoformat() if job.next_run_time else None
+            if consumer.cron_expr:
+                job_details = f"Cron: {consumer.cron_expr}"
+            elif consumer.interval:
+                job_details = f"Interval: {consumer.interval} minutes"
+    return {
+        'job_id': consumer.job_id,
+        'config': consumer.config_name,
+        'next_run_time': next_run_time,
+        'job_details': job_details,
+        'history': consumer.history
+    }
+
+def scheduler_status():
+    """所有调度作业的状态 (jobs)；顶层字段为主面板任务的调度状态，
+    主面板任务未调度时为第一个调度作业，兼容只显示一个作业的面板"""
+    jobs = [schedule_details(consumer) for consumer in scheduled_consumers().values()]
+    consumer = consumer_instance
+    if consumer and consumer.job_id not in scheduled_consumers():
+        current = {'next_run_time': None, 'job_details': None, 'history': consumer.history}
+    elif consumer:
+        current = schedule_details(consumer)
+    elif jobs:
+        current = jobs[0]
+    else:
+        current = {'next_run_time': None, 'job_details': None, 'history': []}
+    return dict(current, jobs=jobs)
+
+def build_snapshot():
+    """一个周期的完整快照，所有面板 (Socket.IO、轮询与SSE) 共用"""
+    return {
+        'status': consumer_status(),
+        'jobs': job_manager.status(),
+        'scheduler': scheduler_status()
+    }
+
+# 每个周期只构建并序列化一次快照，面板数量不影响下载线程
+publisher = SnapshotPublisher(build_snapshot, logger=log_emitter)
+publisher.subscribe(lambda snapshot: socketio.emit('snapshot', snapshot.text))
 
 @app.route('/')
 def index():
     """渲染主页面"""
     return render_template('index.html')
 
+@app.route('/api/status')
+def get_status():
+    """最近一次的状态快照，内容未变化时对 If-None-Match 返回304"""
+    publisher.start()
+    snapshot = publisher.latest()
+    response = Response(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/status/stream')
+def stream_status():
+    """以SSE推送每个新版本的状态快照，重连时按 Last-Event-ID 跳过已收到的版本"""
+    publisher.start()
+    try:
+        last_version = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_version = 0
+
+    def events():
+        version = last_version
+        snapshot = publisher.latest()
+        while True:
+            if snapshot is None:
+                yield b': keepalive\n\n'
+            elif snapshot.version != version:
+                version = snapshot.version
+                yield b'id: %d\ndata: %s\n\n' % (version, snapshot.body)
+            snapshot = publisher.wait(version, SSE_KEEPALIVE)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@functools.lru_cache(maxsize=4)
+def load_saved_series(run_id):
+    """读取已结束运行的速度序列，文件不再变化，缓存最近读取的几次运行"""
+    try:
+        return SpeedSeries.load(os.path.join(SERIES_DIR, f"{run_id}.series"))
+    except (OSError, ValueError):
+        return None
+
+@app.route('/api/series')
+def query_series():
+    """运行速度的时间序列，按范围与点数在服务端降采样
+
+    run 为 current (主面板任务的当前或最近一次运行) 或统计数据中的运行编号，job 指定多任务中的任务；
+    start/end 为距运行开始的秒数，last 表示最近若干秒，points 为最多返回的点数，method 为 lttb 或 minmax
+    """
+    job_name = request.args.get('job')
+    run = request.args.get('run', 'current')
+    if job_name:
+        job = job_manager.jobs.get(job_name)
+        series = job.consumer.speed_series if job else None
+    elif run == 'current':
+        consumer = running_consumer()
+        series = consumer.speed_series if consumer else None
+    elif run.isdigit():
+        series = load_saved_series(run)
+    else:
+        series = None
+    if series is None:
+        return jsonify({'error': '没有找到该运行的速度记录'}), 404
+
+    method = request.args.get('method', 'lttb')
+    if method not in SERIES_METHODS:
+        return jsonify({'error': f'method 应为 {" 或 ".join(SERIES_METHODS)}'}), 400
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    last = request.args.get('last', type=float)
+    if last is not None:
+        end = len(series) if end is None else end
+        start = max(0, end - last)
+    result = series.query(start, end, request.args.get('points', DEFAULT_POINTS, type=int), method)
+    return jsonify(result)
+
 @app.route('/api/preview_cron', methods=['POST'])
 def preview_cron():
     """预览Cron表达式的下5次运行时间"""
+    from croniter import croniter
+
     cron_expr = request.json.get('cron_expr')
     if not cron_expr or not croniter.is_valid(cron_expr):
         return jsonify({'error': '无效的Cron表达式'}), 400
@@ -112,22 +284,98 @@ def preview_cron():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/profiles/<path:filename>')
+def download_profile(filename):
+    """下载性能剖析结果文件"""
+    if os.path.basename(filename) != filename:
+        abort(404)
+    return send_from_directory(PROFILE_DIR, filename, as_attachment=True)
+
+@app.route('/api/consumer', methods=['PATCH'])
+def update_consumer():
+    """在运行中修改主面板任务的配置，统计与连接保留"""
+    data = request.get_json(silent=True) or {}
+    consumer = running_consumer()
+    if not (consumer and consumer.active):
+        return jsonify({'error': '流量消耗器未在运行'}), 409
+    try:
+        applied, restart_required = consumer.reconfigure(check_manifest_settings(data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'applied': applied, 'restart_required': restart_required,
+                    'config': consumer.to_config()})
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """列出多任务管理器中的所有任务"""
+    return jsonify(job_manager.status())
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """启动一个命名任务，可引用已保存的配置并覆盖其中的参数"""
+    data = request.get_json(silent=True) or {}
+    try:
+        threads = start_managed_job(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'name': data.get('name'), 'threads': threads}), 201
+
+@app.route('/api/jobs/<name>', methods=['GET'])
+def get_job(name):
+    """查询单个任务的状态"""
+    for job in job_manager.status()['jobs']:
+        if job['name'] == name:
+            return jsonify(job)
+    return jsonify({'error': f'任务 "{name}" 不存在'}), 404
+
+@app.route('/api/jobs/<name>', methods=['PATCH'])
+def update_job(name):
+    """调整任务权重，或在运行中修改任务配置 (settings)"""
+    data = request.get_json(silent=True) or {}
+    result = {'name': name}
+    try:
+        if data.get('settings'):
+            applied, restart_required = job_manager.reconfigure_job(name, check_manifest_settings(data['settings']))
+            result.update(applied=applied, restart_required=restart_required)
+        if 'weight' in data:
+            job_manager.set_weight(name, data.get('weight'))
+            result['weight'] = float(data['weight'])
+    except KeyError:
+        return jsonify({'error': f'任务 "{name}" 不存在'}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/api/jobs/<name>', methods=['DELETE'])
+def delete_job(name):
+    """停止并移除任务"""
+    try:
+        job_manager.remove_job(name)
+    except KeyError:
+        return jsonify({'error': f'任务 "{name}" 不存在'}), 404
+    return '', 204
+
+def start_managed_job(data):
+    """按请求参数启动管理器任务: config 指定的已保存配置为基础，其余字段覆盖"""
+    settings = {}
+    config_name = data.get('config')
+    if config_name:
+        config = TrafficConsumer.load_config(config_name)
+        if not config:
+            raise ValueError(f'配置 "{config_name}" 不存在')
+        settings.update(config)
+        # 兼容旧配置格式
+        if 'url' in config and 'urls' not in config:
+            settings['urls'] = [config['url']]
+    settings.update(check_manifest_settings(data.get('settings')) or {})
+    return job_manager.start_job(data.get('name') or config_name, settings, data.get('weight', 1.0))
+
 
 @socketio.on('connect')
 def handle_connect():
-    """处理客户端连接"""
-    global status_thread
-    if status_thread is None or not status_thread.is_alive():
-        status_thread_stop.clear()
-        status_thread = socketio.start_background_task(target=status_emitter)
-        # 启动调度器状态发送任务
-        socketio.start_background_task(target=scheduler_status_emitter)
-    emit('status_update', {
-        'running': consumer_instance.active if consumer_instance else False,
-        'thread_status': {},
-        'thread_count': consumer_instance.threads if consumer_instance else 0,
-        'url_usage_stats': []
-    })
+    """处理客户端连接: 发送最近一次的快照，之后随广播接收"""
+    publisher.start()
+    emit('snapshot', publisher.latest().text)
 
 @socketio.on('toggle_logs')
 def handle_toggle_logs(data):
@@ -142,19 +390,16 @@ def handle_start(data):
     if consumer_thread and consumer_thread.is_alive():
         emit('error', {'message': '流量消耗器已在运行。'})
         return
+    try:
+        data = check_manifest_settings(data)
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
 
-    def log_emitter(message, color=None):
-        if log_enabled:
-            socketio.emit('log_message', {'message': message})
-
-    def history_emitter(record):
-        socketio.emit('history_update', record)
-
-    def invalid_url_emitter(payload):
-        socketio.emit('invalid_url', payload)
-
-    consumer_instance = TrafficConsumer(
+    consumer_instance = create_consumer(
+        agents=data.get('agents') or default_agents,
         urls=data.get('urls'),
+        url_source=data.get('url_source'),
         url_strategy=data.get('url_strategy'),
         threads=data.get('threads'),
         limit_speed=data.get('limit_speed'),
@@ -164,6 +409,35 @@ def handle_start(data):
         cron_expr=data.get('cron_expr'),
         interval=data.get('interval'),
         config_name=data.get('config_name'),
+        meter_basis=data.get('meter_basis'),
+        decode_content=data.get('decode_content'),
+        dns_ttl=data.get('dns_ttl'),
+        resolve=data.get('resolve'),
+        prewarm=data.get('prewarm'),
+        verify_manifest=data.get('verify_manifest'),
+        verify_sample=data.get('verify_sample'),
+        arrival_rate=data.get('arrival_rate'),
+        arrival_process=data.get('arrival_process'),
+        socket_rcvbuf=data.get('socket_rcvbuf'),
+        tcp_nodelay=data.get('tcp_nodelay'),
+        tcp_keepalive=data.get('tcp_keepalive'),
+        tcp_congestion=data.get('tcp_congestion'),
+        checkpoint=data.get('checkpoint'),
+        interface=data.get('interface'),
+        interface_limit=data.get('interface_limit'),
+        preflight=data.get('preflight'),
+        preflight_workers=data.get('preflight_workers'),
+        governor=data.get('governor'),
+        pressure_limit=data.get('pressure_limit'),
+        bind=data.get('bind'),
+        bind_policy=data.get('bind_policy'),
+        memory_budget=data.get('memory_budget'),
+        mode=data.get('mode'),
+        upload_ratio=data.get('upload_ratio'),
+        upload_size=data.get('upload_size'),
+        upload_method=data.get('upload_method'),
+        misfire_grace_time=data.get('misfire_grace_time', DEFAULT_MISFIRE_GRACE),
+        coalesce=data.get('coalesce'),
         logger=log_emitter,
         history_callback=history_emitter,
         invalid_url_callback=invalid_url_emitter
@@ -178,25 +452,137 @@ def handle_start(data):
 def handle_stop():
     """停止流量消耗器"""
     global consumer_instance, consumer_thread
-    if consumer_instance and consumer_instance.active:
-        consumer_instance.active = False
-        if consumer_thread:
+    consumer = running_consumer()
+    if consumer and consumer.active:
+        consumer.active = False
+        # 调度作业的本次执行在调度器的线程中结束，作业保留
+        if consumer is consumer_instance and consumer_thread:
             consumer_thread.join()
-        consumer_thread = None
+            consumer_thread = None
         emit('status_update', {'running': False, 'message': '流量消耗器已停止。'})
     else:
         emit('error', {'message': '流量消耗器未在运行。'})
 
+@socketio.on('update_consumer')
+def handle_update_consumer(data):
+    """在运行中修改配置，无需停止再启动"""
+    consumer = running_consumer()
+    if not (consumer and consumer.active):
+        emit('error', {'message': '流量消耗器未在运行。'})
+        return
+    try:
+        applied, restart_required = consumer.reconfigure(check_manifest_settings(data) or {})
+    except ValueError as e:
+        emit('error', {'message': f'更新配置失败: {e}'})
+        return
+    emit('consumer_updated', {'applied': applied, 'restart_required': restart_required})
+
+@socketio.on('start_profiling')
+def handle_start_profiling(data=None):
+    """对正在运行的任务进行限时性能剖析"""
+    consumer = running_consumer()
+    if not consumer or not consumer.active:
+        emit('error', {'message': '流量消耗器未在运行，无法进行性能剖析。'})
+        return
+
+    try:
+        seconds = int((data or {}).get('seconds') or DEFAULT_PROFILE_SECONDS)
+    except (TypeError, ValueError):
+        emit('error', {'message': '无效的剖析时长。'})
+        return
+    if seconds <= 0:
+        emit('error', {'message': '剖析时长必须大于0。'})
+        return
+    seconds = min(seconds, MAX_PROFILE_SECONDS)
+
+    def profile_emitter(result):
+        files = {
+            key: os.path.basename(result[key])
+            for key in ('folded', 'timings', 'tracemalloc') if result.get(key)
+        }
+        socketio.emit('profile_complete', {'samples': result['samples'], 'files': files})
+
+    if consumer.start_profiling(seconds, on_complete=profile_emitter):
+        emit('profile_started', {'seconds': seconds})
+    else:
+        emit('error', {'message': '已有性能剖析正在进行中。'})
+
+@socketio.on('start_job')
+def handle_start_job(data):
+    """在多任务管理器中启动任务"""
+    try:
+        threads = start_managed_job(data or {})
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
+    emit('job_started', {'name': data.get('name') or data.get('config'), 'threads': threads})
+    socketio.emit('jobs_update', job_manager.status())
+
+@socketio.on('stop_job')
+def handle_stop_job(data):
+    """停止多任务管理器中的任务"""
+    try:
+        job_manager.stop_job(data.get('name'))
+    except KeyError:
+        emit('error', {'message': f'任务 "{data.get("name")}" 不存在。'})
+        return
+    socketio.emit('jobs_update', job_manager.status())
+
+@socketio.on('remove_job')
+def handle_remove_job(data):
+    """停止并移除多任务管理器中的任务"""
+    try:
+        job_manager.remove_job(data.get('name'))
+    except KeyError:
+        emit('error', {'message': f'任务 "{data.get("name")}" 不存在。'})
+        return
+    socketio.emit('jobs_update', job_manager.status())
+
+@socketio.on('set_job_weight')
+def handle_set_job_weight(data):
+    """调整任务权重"""
+    try:
+        job_manager.set_weight(data.get('name'), data.get('weight'))
+    except KeyError:
+        emit('error', {'message': f'任务 "{data.get("name")}" 不存在。'})
+        return
+    except (TypeError, ValueError) as e:
+        emit('error', {'message': f'无效的权重: {e}'})
+        return
+    socketio.emit('jobs_update', job_manager.status())
+
+@socketio.on('update_job')
+def handle_update_job(data):
+    """在运行中修改多任务管理器中任务的配置"""
+    try:
+        applied, restart_required = job_manager.reconfigure_job(data.get('name'),
+                                                                check_manifest_settings(data.get('settings')))
+    except KeyError:
+        emit('error', {'message': f'任务 "{data.get("name")}" 不存在。'})
+        return
+    except ValueError as e:
+        emit('error', {'message': f'更新任务配置失败: {e}'})
+        return
+    emit('job_updated', {'name': data.get('name'), 'applied': applied, 'restart_required': restart_required})
+    socketio.emit('jobs_update', job_manager.status())
+
 @socketio.on('stop_scheduler')
-def handle_stop_scheduler():
-    """停止调度器"""
-    global consumer_instance
-    if consumer_instance and consumer_instance.scheduler and consumer_instance.scheduler.running:
-        consumer_instance.scheduler.shutdown()
-        consumer_instance.scheduler = None
+def handle_stop_scheduler(data=None):
+    """停止调度作业，job_id 未指定时为主面板任务的作业，主面板任务未调度时为唯一的调度作业"""
+    jobs = scheduled_consumers()
+    job_id = (data or {}).get('job_id')
+    if job_id:
+        consumer = jobs.get(job_id)
+    elif consumer_instance and consumer_instance.job_id in jobs:
+        consumer = consumer_instance
+    else:
+        consumer = next(iter(jobs.values())) if len(jobs) == 1 else None
+    if consumer and consumer.scheduler and consumer.scheduler.running:
+        # 删除持久化作业，重启后不再恢复
+        consumer.stop_schedule()
         # 重置cron和interval，以防实例被复用
-        consumer_instance.cron_expr = None
-        consumer_instance.interval = None
+        consumer.cron_expr = None
+        consumer.interval = None
         emit('status_update', {'message': '调度器已停止。'})
         # 立即请求前端更新状态
         socketio.emit('request_status_update')
@@ -225,10 +611,16 @@ def handle_get_config_details(data):
 def handle_save_config(data):
     """保存配置"""
     config_name = data.get('name')
-    config_data = data.get('data')
-    
-    consumer = TrafficConsumer(
+    try:
+        config_data = check_manifest_settings(data.get('data'))
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
+
+    consumer = create_consumer(
+        agents=config_data.get('agents'),
         urls=config_data.get('urls'),
+        url_source=config_data.get('url_source'),
         url_strategy=config_data.get('url_strategy'),
         threads=config_data.get('threads'),
         limit_speed=config_data.get('limit_speed'),
@@ -237,7 +629,36 @@ def handle_save_config(data):
         traffic_limit=config_data.get('traffic_limit'),
         cron_expr=config_data.get('cron_expr'),
         interval=config_data.get('interval'),
-        config_name=config_name
+        config_name=config_name,
+        meter_basis=config_data.get('meter_basis'),
+        decode_content=config_data.get('decode_content'),
+        dns_ttl=config_data.get('dns_ttl'),
+        resolve=config_data.get('resolve'),
+        prewarm=config_data.get('prewarm'),
+        verify_manifest=config_data.get('verify_manifest'),
+        verify_sample=config_data.get('verify_sample'),
+        arrival_rate=config_data.get('arrival_rate'),
+        arrival_process=config_data.get('arrival_process'),
+        socket_rcvbuf=config_data.get('socket_rcvbuf'),
+        tcp_nodelay=config_data.get('tcp_nodelay'),
+        tcp_keepalive=config_data.get('tcp_keepalive'),
+        tcp_congestion=config_data.get('tcp_congestion'),
+        checkpoint=config_data.get('checkpoint'),
+        interface=config_data.get('interface'),
+        interface_limit=config_data.get('interface_limit'),
+        preflight=config_data.get('preflight'),
+        preflight_workers=config_data.get('preflight_workers'),
+        governor=config_data.get('governor'),
+        pressure_limit=config_data.get('pressure_limit'),
+        bind=config_data.get('bind'),
+        bind_policy=config_data.get('bind_policy'),
+        memory_budget=config_data.get('memory_budget'),
+        mode=config_data.get('mode'),
+        upload_ratio=config_data.get('upload_ratio'),
+        upload_size=config_data.get('upload_size'),
+        upload_method=config_data.get('upload_method'),
+        misfire_grace_time=config_data.get('misfire_grace_time', DEFAULT_MISFIRE_GRACE),
+        coalesce=config_data.get('coalesce')
     )
     consumer.save_config()
     emit('status_update', {'message': f'配置 "{config_name}" 已保存。'})